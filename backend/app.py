@@ -4,17 +4,28 @@ from flask_cors import CORS
 import os
 from datetime import datetime, timezone
 from database import db
-from database.models import Song, Playlist, PlaylistSong, PlayHistory
+from database.models import IS_POSTGRESQL, Song, Playlist, PlaylistSong, PlayHistory
 from file_manager import AudioFileManager
 from dotenv import load_dotenv
+from structured_logging import configure_logging
+from auth_middleware import token_required
 
 from routes.songs import songs_bp
 from routes.playlists import playlists_bp
 from routes.users import auth_bp
+from routes.uploads import uploads_bp
+from routes.jobs import jobs_bp
+from metadata.lookup_cache import lookup_cache
+from metadata.rate_limiter import DEFAULT_DB_PATH, limiter_stats
+from metadata.online_lookup import batch_stats
+from metadata.http_client import client_stats
+from services.fuzzy_search import get_trigram_indexes
+from services.jobs import maybe_recover_jobs
 
 app = Flask(__name__)
 
 load_dotenv()
+configure_logging()
 
 # CORS configuration for GKE Ingress
 # When using Ingress, frontend and backend are on the same origin
@@ -27,8 +38,15 @@ CORS(
         "http://34.96.102.237",  # GKE Ingress IP
         "http://34.96.102.237:80",  # Explicit port
     ],
-    allow_headers=["Content-Type", "Authorization"],
-    methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+    allow_headers=[
+        "Content-Type", "Authorization", "Range", "If-Range", "If-None-Match",
+        "Tus-Resumable", "Upload-Length", "Upload-Offset", "Upload-Metadata",
+    ],
+    expose_headers=[
+        "Accept-Ranges", "Content-Range", "Content-Length", "ETag",
+        "Location", "Tus-Resumable", "Upload-Length", "Upload-Offset", "Upload-Expires",
+    ],
+    methods=["GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
     supports_credentials=True,
 )
 
@@ -47,10 +65,17 @@ def after_request(response):
     if origin in allowed_origins:
         response.headers.add("Access-Control-Allow-Origin", origin)
         response.headers.add(
-            "Access-Control-Allow-Headers", "Content-Type,Authorization"
+            "Access-Control-Allow-Headers",
+            "Content-Type,Authorization,Range,If-Range,If-None-Match,"
+            "Tus-Resumable,Upload-Length,Upload-Offset,Upload-Metadata",
+        )
+        response.headers.add(
+            "Access-Control-Expose-Headers",
+            "Accept-Ranges,Content-Range,Content-Length,ETag,"
+            "Location,Tus-Resumable,Upload-Length,Upload-Offset,Upload-Expires",
         )
         response.headers.add(
-            "Access-Control-Allow-Methods", "GET,PUT,POST,DELETE,OPTIONS"
+            "Access-Control-Allow-Methods", "GET,HEAD,PUT,PATCH,POST,DELETE,OPTIONS"
         )
         response.headers.add("Access-Control-Allow-Credentials", "true")
     return response
@@ -61,7 +86,41 @@ DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///music_player.db")
 app.config["SQLALCHEMY_DATABASE_URI"] = DATABASE_URL
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 app.config["UPLOAD_FOLDER"] = os.environ.get("UPLOAD_FOLDER", "uploads")
-app.config["MAX_CONTENT_LENGTH"] = 50 * 1024 * 1024  # 50 MB limit
+app.config["MAX_CONTENT_LENGTH"] = 50 * 1024 * 1024  # 50 MB limit (per request / per chunk)
+app.config["MAX_RESUMABLE_UPLOAD_LENGTH"] = int(
+    os.environ.get("MAX_RESUMABLE_UPLOAD_LENGTH", 2 * 1024 * 1024 * 1024)
+)  # 2 GB limit for chunked uploads
+app.config["UPLOAD_EXPIRY_SECONDS"] = int(os.environ.get("UPLOAD_EXPIRY_SECONDS", 24 * 3600))  # idle resumable uploads are dropped
+app.config["UPLOAD_SWEEP_INTERVAL"] = int(os.environ.get("UPLOAD_SWEEP_INTERVAL", 600))  # seconds between sweeps per process
+app.config["RENDITION_CACHE_DIR"] = os.environ.get("RENDITION_CACHE_DIR")  # defaults to UPLOAD_FOLDER/renditions
+app.config["RENDITION_CACHE_MAX_BYTES"] = int(
+    os.environ.get("RENDITION_CACHE_MAX_BYTES", 2 * 1024 * 1024 * 1024)
+)  # 2 GB of transcoded renditions
+app.config["HLS_FOLDER"] = os.environ.get("HLS_FOLDER")  # defaults to UPLOAD_FOLDER/hls
+app.config["HLS_SEGMENT_SECONDS"] = int(os.environ.get("HLS_SEGMENT_SECONDS", 6))
+app.config["BACKGROUND_WORKERS"] = int(os.environ.get("BACKGROUND_WORKERS", 2))
+app.config["JOB_BACKEND"] = os.environ.get("JOB_BACKEND", "thread")  # 'thread' or 'queue' (worker.py)
+app.config["JOB_STALE_SECONDS"] = int(os.environ.get("JOB_STALE_SECONDS", 900))  # no heartbeat / queued this long = lost with its worker
+app.config["JOB_HEARTBEAT_INTERVAL"] = int(os.environ.get("JOB_HEARTBEAT_INTERVAL", 60))  # seconds between running job heartbeats
+app.config["JOB_RECOVERY_INTERVAL"] = int(os.environ.get("JOB_RECOVERY_INTERVAL", 300))  # seconds between stale job checks (thread backend)
+app.config["JOB_RETRY_AFTER"] = int(os.environ.get("JOB_RETRY_AFTER", 3600))  # seconds a failed segment/peaks job is reported before it is retried
+app.config["LOOKUP_CACHE_TTL"] = int(os.environ.get("LOOKUP_CACHE_TTL", 30 * 24 * 3600))
+app.config["LOOKUP_CACHE_NEGATIVE_TTL"] = int(os.environ.get("LOOKUP_CACHE_NEGATIVE_TTL", 24 * 3600))
+app.config["MUSICBRAINZ_RATE_LIMIT"] = float(os.environ.get("MUSICBRAINZ_RATE_LIMIT", 1.0))  # requests/s
+app.config["MUSICBRAINZ_BURST"] = float(os.environ.get("MUSICBRAINZ_BURST", 3))
+# 'database' = the app's database (shared by every pod), a SQLite path (every worker on the host), '' = per process
+app.config["RATE_LIMIT_DB"] = os.environ.get("RATE_LIMIT_DB", "database" if IS_POSTGRESQL else DEFAULT_DB_PATH)
+app.config["BACKFILL_RATE_LIMIT"] = float(os.environ.get("BACKFILL_RATE_LIMIT", 0.5))  # requests/s, part of MUSICBRAINZ_RATE_LIMIT
+app.config["GENRE_TAXONOMY"] = os.environ.get("GENRE_TAXONOMY")  # defaults to metadata/genres.json
+app.config["DUPLICATE_UPLOADS"] = os.environ.get("DUPLICATE_UPLOADS", "link")  # 'link' to an existing match or 'keep'
+app.config["SONGS_PAGE_SIZE"] = int(os.environ.get("SONGS_PAGE_SIZE", 100))  # default ?limit= for GET /api/songs
+app.config["SONGS_MAX_PAGE_SIZE"] = int(os.environ.get("SONGS_MAX_PAGE_SIZE", 500))
+app.config["PLAYLIST_MAX_PAGE_SIZE"] = int(os.environ.get("PLAYLIST_MAX_PAGE_SIZE", 5000))  # cap on ?limit= for GET /api/playlists/<id>
+app.config["SEARCH_PAGE_SIZE"] = int(os.environ.get("SEARCH_PAGE_SIZE", 20))  # default ?limit= for GET /api/songs/search
+app.config["SEARCH_MAX_PAGE_SIZE"] = int(os.environ.get("SEARCH_MAX_PAGE_SIZE", 100))
+app.config["FUZZY_SEARCH_THRESHOLD"] = float(os.environ.get("FUZZY_SEARCH_THRESHOLD", 0.3))  # trigram similarity for ?fuzzy=true
+app.config["FUZZY_INDEX_USERS"] = int(os.environ.get("FUZZY_INDEX_USERS", 64))  # in-process trigram indexes kept (non-PostgreSQL)
+app.config["FUZZY_INDEX_RECHECK"] = float(os.environ.get("FUZZY_INDEX_RECHECK", 30))  # seconds between staleness checks
 app.config["SECRET_KEY"] = os.environ.get("SECRET_KEY", "supersecretkey")
 
 db.init_app(app)
@@ -71,6 +130,15 @@ os.makedirs(app.config["UPLOAD_FOLDER"], exist_ok=True)
 app.register_blueprint(auth_bp, url_prefix="/api")
 app.register_blueprint(songs_bp, url_prefix="/api")
 app.register_blueprint(playlists_bp, url_prefix="/api")
+app.register_blueprint(uploads_bp, url_prefix="/api")
+app.register_blueprint(jobs_bp, url_prefix="/api")
+
+
+@app.before_request
+def recover_jobs():
+    # the thread backend has no worker.py to pick up jobs lost in a restart
+    if not app.config.get("TESTING"):
+        maybe_recover_jobs()
 
 
 @app.route("/api/health")
@@ -87,6 +155,21 @@ def health_check():
     )
 
 
+@app.route("/api/metrics")
+@token_required
+def metrics(current_user):
+    return jsonify(
+        {
+            "metadata_lookup_cache": lookup_cache.stats(),
+            "rate_limiters": limiter_stats(),
+            "musicbrainz_batches": batch_stats(),
+            "http_clients": client_stats(),
+            "trigram_indexes": get_trigram_indexes().stats(),
+            "timestamp": datetime.now(timezone.utc),
+        }
+    )
+
+
 if __name__ == "__main__":
     with app.app_context():
         try:
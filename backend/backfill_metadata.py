@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Metadata re-enrichment backfill
+
+Songs enriched while MusicBrainz or Last.fm were slow or down keep 'Unknown'
+artist/album/genre. This walks those songs in keyset batches (Song.id order),
+re-runs MetadataEnhancer.enhance_batch on them and writes the improvements
+back with one bulk UPDATE per batch. The resume point is stored in
+backfill_checkpoints in the same transaction, so a killed pod picks up after
+the last committed batch.
+
+Only one run per backfill name works at a time (a lease on the checkpoint
+row, renewed before MusicBrainz requests so a slow batch cannot outlive it),
+and its MusicBrainz requests draw from a separate, smaller bucket
+(BACKFILL_RATE_LIMIT, default 0.5/s) before the shared one, so interactive
+uploads always keep part of the budget. Both buckets are only shared with
+the API pods when RATE_LIMIT_DB points them at the same store: 'database'
+(the default on PostgreSQL) keeps them in the rate_limit_buckets table.
+
+Usage:
+    python backfill_metadata.py
+    python backfill_metadata.py --batch-size 100 --max-songs 2000 --min-age 600
+"""
+
+import argparse
+import logging
+import os
+import socket
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+# Add the backend directory to the path
+sys.path.append('/app')
+
+from sqlalchemy.exc import IntegrityError
+
+from app import app, db
+from database.models import BackfillCheckpoint, Song
+from metadata.metadata_enhancer import MetadataEnhancer
+from metadata.online_lookup import MusicDBLookup, shared_limiter
+
+logger = logging.getLogger('backfill_metadata')
+
+FIELDS = ('title', 'artist', 'album', 'genre')
+LEASE_SECONDS = 600
+
+
+def backfill_limiter():
+    """Background share of the MusicBrainz budget, drawn before the shared bucket"""
+    return shared_limiter('musicbrainz-backfill', rate=app.config['BACKFILL_RATE_LIMIT'], burst=1)
+
+
+def needs_backfill():
+    conditions = [Song.artist == 'Unknown', Song.title == 'Unknown']
+    for column in (Song.album, Song.genre):
+        conditions += [column.is_(None), column == 'Unknown']
+    return db.or_(*conditions)
+
+
+def select_batch(after, batch_size, cutoff):
+    """Next `batch_size` songs needing enrichment after Song.id `after` (keyset, no OFFSET)"""
+    query = db.select(Song.id, Song.title, Song.artist, Song.album, Song.genre, Song.format) \
+        .where(needs_backfill(), Song.upload_date < cutoff) \
+        .order_by(Song.id) \
+        .limit(batch_size)
+    if after is not None:
+        query = query.where(Song.id > after)
+    return db.session.execute(query).all()
+
+
+def song_filename(row):
+    """A filename for the parser: the title holds the original name when there were no tags"""
+    if row.artist and row.artist != 'Unknown':
+        return f"{row.artist} - {row.title}.{row.format}"
+    return f"{row.title}.{row.format}"
+
+
+def build_updates(rows, enhanced):
+    """Bulk UPDATE parameters for rows whose metadata improved"""
+    limits = {field: Song.__table__.c[field].type.length for field in FIELDS}
+    updates = []
+    for row, metadata in zip(rows, enhanced):
+        values = {}
+        for field in FIELDS:
+            current, new = getattr(row, field), metadata.get(field)
+            if new and new != 'Unknown' and new != current:
+                values[field] = new[:limits[field]]
+        if values:
+            # same keys on every row so the UPDATE runs as a single executemany
+            updates.append({'id': row.id, **{field: values.get(field, getattr(row, field)) for field in FIELDS},
+                            'updated_at': datetime.now(timezone.utc)})
+    return updates
+
+
+def acquire_lease(name, owner, now):
+    """Create the checkpoint if needed and take its lease; False while another run holds it"""
+    if db.session.get(BackfillCheckpoint, name) is None:
+        try:
+            db.session.add(BackfillCheckpoint(name=name, processed=0, updated=0))
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+
+    result = db.session.execute(
+        db.update(BackfillCheckpoint)
+        .where(
+            BackfillCheckpoint.name == name,
+            db.or_(BackfillCheckpoint.locked_by.is_(None), BackfillCheckpoint.locked_by == owner,
+                   BackfillCheckpoint.locked_until < now)
+        )
+        .values(locked_by=owner, locked_until=now + timedelta(seconds=LEASE_SECONDS))
+    )
+    db.session.commit()
+    return result.rowcount == 1
+
+
+class LeaseLost(Exception):
+    """Raised when another run has taken over the checkpoint lease"""
+
+
+class Lease:
+    """This run's hold on a checkpoint row.
+
+    renew() pushes locked_until out again once a quarter of the lease has
+    passed. It writes on its own connection, so it is safe in the middle of a
+    batch and from lookup threads.
+    """
+
+    def __init__(self, name, owner):
+        self.name = name
+        self.owner = owner
+        self.renewed_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def renew(self, force=False):
+        with self._lock:
+            if not force and time.monotonic() - self.renewed_at < LEASE_SECONDS / 4:
+                return
+            with db.engine.begin() as connection:
+                result = connection.execute(
+                    db.update(BackfillCheckpoint)
+                    .where(BackfillCheckpoint.name == self.name, BackfillCheckpoint.locked_by == self.owner)
+                    .values(locked_until=datetime.now(timezone.utc) + timedelta(seconds=LEASE_SECONDS))
+                )
+            if result.rowcount != 1:
+                raise LeaseLost(f"Backfill '{self.name}' was taken over by another run")
+            self.renewed_at = time.monotonic()
+
+
+def lease_throttle(lease, limiter):
+    """MusicBrainz throttle for the backfill: keep the lease alive, then wait for the backfill bucket"""
+    def throttle():
+        lease.renew()
+        limiter.acquire()
+    return throttle
+
+
+def release_lease(name, owner):
+    db.session.execute(
+        db.update(BackfillCheckpoint)
+        .where(BackfillCheckpoint.name == name, BackfillCheckpoint.locked_by == owner)
+        .values(locked_by=None, locked_until=None)
+    )
+    db.session.commit()
+
+
+def backfill(name='metadata', batch_size=100, max_songs=None, min_age=600, enhancer=None, owner=None):
+    """Run (or resume) the backfill; returns stats for this run, or None if another run holds the lease"""
+    owner = owner or f"{socket.gethostname()}:{os.getpid()}"
+    if not acquire_lease(name, owner, datetime.now(timezone.utc)):
+        return None
+
+    lease = Lease(name, owner)
+    enhancer = enhancer or MetadataEnhancer(MusicDBLookup(throttle=lease_throttle(lease, backfill_limiter())))
+    id_type = Song.__table__.c.id.type.python_type
+    stats = {'processed': 0, 'updated': 0, 'batches': 0, 'pass_complete': False}
+    started = time.perf_counter()
+    try:
+        checkpoint = db.session.get(BackfillCheckpoint, name)
+        if checkpoint.last_id is None:
+            checkpoint.started_at, checkpoint.processed, checkpoint.updated = datetime.now(timezone.utc), 0, 0
+            db.session.commit()
+        after = id_type(checkpoint.last_id) if checkpoint.last_id is not None else None
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=min_age)  # leave fresh uploads to the ingest job
+
+        while max_songs is None or stats['processed'] < max_songs:
+            limit = batch_size if max_songs is None else min(batch_size, max_songs - stats['processed'])
+            rows = select_batch(after, limit, cutoff)
+            if not rows:
+                checkpoint.last_id, checkpoint.finished_at = None, datetime.now(timezone.utc)
+                db.session.commit()
+                stats['pass_complete'] = True
+                break
+
+            items = [({field: getattr(row, field) or 'Unknown' for field in FIELDS}, song_filename(row)) for row in rows]
+            enhanced = enhancer.enhance_batch(items)
+            # a run that lost its lease mid-batch must not write over the new owner's progress
+            lease.renew(force=True)
+            updates = build_updates(rows, enhanced)
+            if updates:
+                db.session.execute(db.update(Song), updates)
+
+            # progress and the rows it covers commit together
+            after = rows[-1].id
+            checkpoint.last_id = str(after)
+            checkpoint.processed += len(rows)
+            checkpoint.updated += len(updates)
+            db.session.commit()
+
+            stats['processed'] += len(rows)
+            stats['updated'] += len(updates)
+            stats['batches'] += 1
+            elapsed = time.perf_counter() - started
+            logger.info("%d checked, %d improved this pass | %.1f songs/s",
+                        checkpoint.processed, checkpoint.updated, stats['processed'] / elapsed)
+    finally:
+        db.session.rollback()
+        release_lease(name, owner)
+    return stats
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--name', default='metadata', help='checkpoint name (one run per name at a time)')
+    parser.add_argument('--batch-size', type=int, default=100, help='songs per lookup batch and UPDATE')
+    parser.add_argument('--max-songs', type=int, default=None, help='stop after this many songs; the next run resumes')
+    parser.add_argument('--min-age', type=int, default=600, help='skip songs uploaded less than this many seconds ago')
+    args = parser.parse_args()
+
+    with app.app_context():
+        try:
+            result = backfill(args.name, args.batch_size, args.max_songs, args.min_age)
+        except LeaseLost as e:
+            logger.error("%s", e)
+            sys.exit(1)
+    if result is None:
+        logger.info("Backfill '%s' is already running elsewhere", args.name)
+        sys.exit(0)
+    logger.info("Done: %d songs checked, %d updated%s", result['processed'], result['updated'],
+                ' (pass complete)' if result['pass_complete'] else '')
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Fuzzy library search benchmark
+
+Builds a synthetic library of --songs titles/artists (made-up words, some
+accented, some with "N'"-style punctuation) for one user in a throwaway
+SQLite database, then queries /api/songs/search?fuzzy=true with misspelled
+versions of random songs' artists and titles: accents dropped, one letter
+deleted, substituted or transposed. Reports p50/p95 latency and how often
+the intended song made the first page, three ways: cold (the user's trigram
+index dropped before each query, so every query pays the build), warm, and
+after a write (a song retitled and committed before each query). The exact
+(FTS5) search is timed on the correctly spelled queries for comparison.
+
+Usage:
+    python benchmarks/bench_fuzzy_search.py [--songs 100000] [--queries 500] [--cold 20]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import unicodedata
+
+WORKDIR = tempfile.mkdtemp(prefix='waves-bench-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(WORKDIR, 'bench.db')}"
+os.environ['UPLOAD_FOLDER'] = os.path.join(WORKDIR, 'uploads')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app  # noqa: E402
+from database import db  # noqa: E402
+from database.models import Song, User  # noqa: E402
+
+SYLLABLES = ['ka', 'lo', 'mi', 're', 'sun', 'ton', 'bel', 'ya', 'dri', 'vo', 'ne', 'chan', 'ro', 'ses',
+             'gun', 'bey', 'on', 'cé', 'mö', 'tley', 'crü', 'da', 'le', 'ri', 'pha', 'no', 'ël', 'fi']
+
+
+def word(rng):
+    return ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3))).capitalize()
+
+
+def name(rng, words):
+    text = ' '.join(word(rng) for _ in range(words))
+    return text.replace(' ', " N' ", 1) if rng.random() < 0.05 else text
+
+
+def misspell(rng, text):
+    text = ''.join(ch for ch in unicodedata.normalize('NFKD', text) if not unicodedata.combining(ch)).lower()
+    letters = [i for i, ch in enumerate(text) if ch.isalpha()]
+    i = rng.choice(letters[1:-1] or letters)
+    edit = rng.choice(('delete', 'substitute', 'transpose'))
+    if edit == 'delete':
+        return text[:i] + text[i + 1:]
+    if edit == 'substitute':
+        return text[:i] + rng.choice('aeioustn') + text[i + 1:]
+    return text[:i] + text[i + 1:i + 2] + text[i] + text[i + 2:]
+
+
+def setup(songs, rng):
+    artists = [name(rng, rng.randint(1, 2)) for _ in range(max(songs // 12, 1))]
+    library = [(name(rng, rng.randint(1, 4)), rng.choice(artists)) for _ in range(songs)]
+    with app.app_context():
+        db.create_all()
+        user = User(username='bench', email='bench@example.com')
+        user.set_password('BenchPass123')
+        db.session.add(user)
+        db.session.commit()
+        db.session.execute(db.insert(Song), [{
+            'title': title, 'artist': artist, 'file_path': f"blobs/{n:08x}.mp3", 'file_size': 1, 'format': 'mp3',
+            'user_id': user.id,
+        } for n, (title, artist) in enumerate(library)])
+        db.session.commit()
+    return library
+
+
+def timed(client, auth, **params):
+    start = time.perf_counter()
+    body = client.get('/api/songs/search', headers=auth, query_string=params).get_json()
+    return (time.perf_counter() - start) * 1000, body
+
+
+def report(label, latencies, found=None):
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    hit_rate = f"{100 * found / len(latencies):>9.1f}%" if found is not None else f"{'-':>10}"
+    print(f"{label:<22}{statistics.median(latencies):>10.2f}{p95:>10.2f}{hit_rate}")
+
+
+def fuzzy_queries(client, auth, label, targets, rng, before=None):
+    latencies, found = [], 0
+    for n, (title, artist) in enumerate(targets):
+        field = n % 2  # alternate artist and title typos
+        if before is not None:
+            before()
+        elapsed, body = timed(client, auth, fuzzy='true', limit=10, fields='title,artist',
+                              q=misspell(rng, (title, artist)[field]))
+        latencies.append(elapsed)
+        found += any(song[('title', 'artist')[field]] == (title, artist)[field] for song in body['songs'])
+    report(label, latencies, found)
+
+
+def run(songs, queries, cold):
+    rng = random.Random(0)
+    start = time.perf_counter()
+    library = setup(songs, rng)
+    print(f"{songs} songs loaded in {time.perf_counter() - start:.1f} s")
+
+    client = app.test_client()
+    resp = client.post('/api/login', json={'username': 'bench', 'password': 'BenchPass123'})
+    auth = {'Authorization': f"Bearer {resp.get_json()['token']}"}
+
+    def drop_index():
+        app.extensions.pop('trigram_indexes', None)
+
+    def write():
+        with app.app_context():
+            song = db.session.get(Song, rng.randint(1, songs))
+            song.title = name(rng, rng.randint(1, 4))
+            db.session.commit()
+
+    targets = [rng.choice(library) for _ in range(queries)]
+    print(f"{'query':<22}{'p50 ms':>10}{'p95 ms':>10}{'top 10':>10}")
+    fuzzy_queries(client, auth, 'fuzzy, cold', targets[:cold], rng, before=drop_index)
+    fuzzy_queries(client, auth, 'fuzzy, warm', targets, rng)
+    fuzzy_queries(client, auth, 'fuzzy, after write', targets, rng, before=write)
+
+    latencies = [timed(client, auth, limit=10, fields='title', q=target[0])[0] for target in targets]
+    report('exact (FTS5), title', latencies)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--songs', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--cold', type=int, default=20, help='queries timed with the index dropped first')
+    args = parser.parse_args()
+    run(args.songs, args.queries, args.cold)
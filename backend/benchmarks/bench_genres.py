@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Genre classification benchmark
+
+Compares the old Last.fm genre filter (a ~150 entry set rebuilt per call and
+a nested substring scan per tag) with metadata.genres.GenreClassifier on a
+few thousand top-tag lists. The lists are synthesized from a vocabulary of
+common Last.fm tags (genres, decades, moods, "seen live", ...) with the usual
+count-ordered shape, so no API key is needed.
+
+Usage:
+    python benchmarks/bench_genres.py [--lists 5000] [--seed 0]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metadata.genres import get_classifier  # noqa: E402
+
+
+NOISE_TAGS = [
+    'seen live', 'favorites', 'Favourite', 'female vocalists', 'male vocalists', 'awesome', 'love',
+    'beautiful', 'chill', 'mellow', 'sad', 'happy', 'summer', 'party', 'dance', 'catchy', 'epic',
+    '00s', '90s', '80s', '70s', '2010s', 'british', 'american', 'canadian', 'swedish', 'german',
+    'singer-songwriter', 'acoustic', 'instrumental', 'guitar', 'piano', 'cover', 'live', 'remix',
+    'my top songs', 'spotify', 'under 2000 listeners', 'albums i own', 'amazing', 'check out',
+]
+GENRE_TAGS = [
+    'rock', 'pop', 'indie', 'alternative', 'electronic', 'Hip-Hop', 'rap', 'jazz', 'classical', 'folk',
+    'country', 'blues', 'metal', 'punk', 'reggae', 'soul', 'funk', 'rnb', 'RnB', 'disco', 'house',
+    'techno', 'ambient', 'experimental', 'progressive rock', 'psychedelic', 'indie rock', 'indie pop',
+    'dream pop', 'shoegaze', 'post-punk', 'new wave', 'synthpop', 'synth pop', 'britpop', 'lo-fi',
+    'trip-hop', 'drum and bass', 'Drum n Bass', 'dubstep', 'trap', 'k-pop', 'j-pop', 'latin', 'ska',
+    'emo', 'hardcore', 'industrial', 'folk rock', 'classic rock', 'post-rock', 'math rock',
+    'death metal', 'black metal', 'doom metal', 'nu metal', 'post-hardcore', 'alternative rock',
+    'electronica', 'soundtrack', 'video game music', 'christmas', 'gospel', 'bossa nova', 'afrobeat',
+    '90s alternative', 'female fronted metal', 'indie folk', 'chillwave', 'vaporwave', 'synthwave',
+]
+
+LEGACY_GENRES = [
+    'rock', 'pop', 'indie', 'alternative', 'electronic', 'hip hop', 'rap',
+    'jazz', 'classical', 'folk', 'country', 'blues', 'metal', 'punk',
+    'reggae', 'soul', 'funk', 'r&b', 'disco', 'house', 'techno',
+    'ambient', 'experimental', 'progressive', 'psychedelic', 'garage',
+    'grunge', 'indie pop', 'indie rock', 'dream pop', 'shoegaze',
+    'post-punk', 'new wave', 'synthpop', 'britpop', 'lo-fi',
+    'bedroom pop', 'chillwave', 'downtempo', 'trip hop', 'drum and bass',
+    'dubstep', 'trap', 'k-pop', 'j-pop', 'c-pop', 'latin', 'salsa',
+    'tango', 'flamenco', 'bluegrass', 'gospel', 'ska', 'emo', 'hardcore',
+    'industrial', 'folk rock', 'country rock', 'soft rock', 'classic rock',
+    'baroque pop', 'art pop', 'art rock', 'post-rock', 'math rock', 'noise rock',
+    'surf rock', 'rock and roll', 'doo-wop', 'motown', 'funk rock', 'psytrance',
+    'vaporwave', 'synthwave', 'new age', 'world', 'afrobeat', 'bossa nova',
+    'fado', 'celtic', 'medieval', 'renaissance', 'baroque', 'romantic',
+    'modern classical', 'contemporary classical', 'minimalism', 'avant-garde', 'soundtrack', 'musical theater',
+    'video game music', 'chiptune', 'anime', 'children\'s music', 'holiday', 'christmas', 'easter', 'halloween',
+    'worship', 'chant', 'spiritual', 'new wave of british heavy metal', 'post-hardcore',
+    'screamo', 'grindcore', 'mathcore', 'sludge metal', 'doom metal', 'black metal', 'death metal',
+    'thrash metal', 'power metal', 'folk metal', 'viking metal', 'symphonic metal',
+    'gothic metal', 'nu metal', 'rap metal', 'rap rock', 'funk metal', 'crossover thrash',
+]
+
+
+def legacy_genre(tags):
+    """The pre-classifier logic from MusicDBLookup._search_lastfm_genre"""
+    valid_genres = set(LEGACY_GENRES)  # rebuilt on every call, as before
+    for tag in tags:
+        tag_name = tag['name'].lower().strip()
+        if tag_name in valid_genres:
+            return tag['name'].title()
+        for genre in valid_genres:
+            if genre in tag_name or tag_name in genre:
+                return tag['name'].title()
+    return 'Unknown'
+
+
+def synth_tag_lists(count, seed):
+    rng = random.Random(seed)
+    lists = []
+    for _ in range(count):
+        size = rng.randint(3, 50)  # track.getTopTags returns up to 50
+        names = rng.sample(GENRE_TAGS, rng.randint(0, 5)) + rng.sample(NOISE_TAGS, min(size, len(NOISE_TAGS)))
+        rng.shuffle(names)
+        counts = sorted((rng.randint(1, 100) for _ in names), reverse=True)
+        counts[0] = 100
+        lists.append([{'name': name, 'count': c} for name, c in zip(names, counts)])
+    return lists
+
+
+def run(count, seed):
+    lists = synth_tag_lists(count, seed)
+    tags_total = sum(len(tags) for tags in lists)
+
+    start = time.perf_counter()
+    legacy = [legacy_genre(tags) for tags in lists]
+    legacy_s = time.perf_counter() - start
+
+    classifier = get_classifier()
+    start = time.perf_counter()
+    current = [classifier.best_genre(tags) or 'Unknown' for tags in lists]
+    current_s = time.perf_counter() - start
+
+    without_genre = sum(1 for tags in lists if not any(tag['name'] in GENRE_TAGS for tag in tags))
+    print(f"{count} tag lists, {tags_total} tags (synthetic), {without_genre} lists carry no genre tag at all")
+    print(f"{'matcher':<22}{'total ms':>10}{'us/list':>10}{'unknown':>10}")
+    for label, seconds, results in (('legacy nested scan', legacy_s, legacy), ('aho-corasick', current_s, current)):
+        unknown = sum(1 for genre in results if genre == 'Unknown')
+        print(f"{label:<22}{seconds * 1000:>10.1f}{seconds / count * 1e6:>10.1f}{unknown:>10}")
+    changed = sum(1 for a, b in zip(legacy, current) if a.lower() != b.lower())
+    print(f"lists classified differently: {changed}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lists', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    run(args.lists, args.seed)
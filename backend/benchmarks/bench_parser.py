@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Filename parsing benchmark
+
+Parses the labelled corpus in tests/fixtures/filename_corpus.tsv, repeated
+up to --files names, with the previous per-call parser (module-level re.sub
+and a debug print per pattern, stdout sent to /dev/null here) and with
+MetadataParser.parse_filenames. Also reports accuracy against the labels.
+
+Usage:
+    python benchmarks/bench_parser.py [--files 50000]
+"""
+
+import argparse
+import contextlib
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metadata.metadata_parser import MetadataParser  # noqa: E402
+from tests.test_metadata_parser import load_corpus  # noqa: E402
+
+
+def legacy_clean_title(title):
+    title = re.sub(r'[_\s]*(official|video|audio|lyrics|remastered|hd|hq|feat\.?.*?)([_\s]*.*)?$', '', title, flags=re.IGNORECASE)
+    title = title.replace('_', ' ')
+    return re.sub(r'\s+', ' ', title).strip()
+
+
+def legacy_parse(filename):
+    """The pre-rule-table MetadataParser.parse_filename"""
+    name = re.sub(r'_[a-f0-9]{8}$', '', os.path.splitext(filename)[0])
+    print(f"DEBUG - Cleaned filename: {name}")
+    for sep in ('_-_', ' - '):
+        if sep in name:
+            artist, title = name.split(sep, 1)
+            title = legacy_clean_title(title)
+            print(f"DEBUG - Cleaned title: '{title}'")
+            return {'artist': artist.strip(), 'title': title}
+    if name.count('_') == 1:
+        artist, title = name.split('_', 1)
+        title = legacy_clean_title(title)
+        print(f"DEBUG - Cleaned title: '{title}'")
+        return {'artist': artist.strip(), 'title': title}
+    if '_' in name:
+        parts = name.split('_')
+        first = parts[0]
+        if len(first) <= 15 and not any(w in first.lower() for w in ['official', 'video', 'remastered', 'lyrics', 'audio']):
+            title = legacy_clean_title(' '.join(parts[1:]))
+            print(f"DEBUG - Cleaned title: '{title}'")
+            return {'artist': first, 'title': title or ' '.join(parts[1:])}
+    title = legacy_clean_title(name)
+    words = title.split()
+    if len(words) >= 2:
+        return {'artist': words[0], 'title': ' '.join(words[1:])}
+    return {'artist': 'Unknown', 'title': title or name}
+
+
+def accuracy(corpus, results):
+    correct = sum(1 for (_, artist, title), r in zip(corpus, results) if (r['artist'], r['title']) == (artist, title))
+    return correct / len(corpus)
+
+
+def run(files):
+    corpus = load_corpus()
+    filenames = [row[0] for row in corpus] * (files // len(corpus) + 1)
+    filenames = filenames[:files]
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        for filename in filenames:
+            legacy_parse(filename)
+        legacy_s = time.perf_counter() - start
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        legacy_acc = accuracy(corpus, [legacy_parse(row[0]) for row in corpus])
+
+    parser = MetadataParser()
+    start = time.perf_counter()
+    parser.parse_filenames(filenames)
+    current_s = time.perf_counter() - start
+    current_acc = accuracy(corpus, parser.parse_filenames(row[0] for row in corpus))
+
+    print(f"{files} filenames ({len(corpus)} labelled, repeated)")
+    print(f"{'parser':<22}{'total ms':>10}{'us/name':>10}{'names/s':>12}{'accuracy':>10}")
+    for label, seconds, acc in (('legacy per-call', legacy_s, legacy_acc), ('rule table batch', current_s, current_acc)):
+        print(f"{label:<22}{seconds * 1000:>10.1f}{seconds / files * 1e6:>10.2f}{files / seconds:>12.0f}{acc:>10.1%}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=50000)
+    args = parser.parse_args()
+    run(args.files)
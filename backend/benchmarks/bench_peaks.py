@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Waveform peaks benchmark
+
+Computes peaks for a synthetic decoded track (what the `peaks` job does after
+ffmpeg) and then times /api/songs/<id>/peaks responses, which is what the
+player pays on every page load.
+
+Usage:
+    python benchmarks/bench_peaks.py [--minutes 5] [--requests 500]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+WORKDIR = tempfile.mkdtemp(prefix='waves-bench-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(WORKDIR, 'bench.db')}"
+os.environ['UPLOAD_FOLDER'] = os.path.join(WORKDIR, 'uploads')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+from app import app  # noqa: E402
+from database import db  # noqa: E402
+from database.models import Song, User  # noqa: E402
+from services.peaks import RESOLUTIONS, SAMPLE_RATE, compute_peaks, peaks_path, write_peaks  # noqa: E402
+
+
+def setup(minutes: int):
+    rng = np.random.default_rng(0)
+    samples = (rng.standard_normal(SAMPLE_RATE * 60 * minutes) * 8000).clip(-32768, 32767).astype(np.int16)
+
+    start = time.perf_counter()
+    levels = compute_peaks(samples)
+    compute_ms = (time.perf_counter() - start) * 1000
+
+    with app.app_context():
+        db.create_all()
+        user = User(username='bench', email='bench@example.com')
+        user.set_password('BenchPass123')
+        db.session.add(user)
+        db.session.commit()
+        song = Song(title='Bench', artist='Bench', album='Bench', genre='Bench',
+                    duration=60.0 * minutes, file_path='bench_track.flac',
+                    file_size=0, bitrate=1411, format='flac', user_id=user.id)
+        db.session.add(song)
+        db.session.commit()
+        path = peaks_path(song)
+        write_peaks(path, levels, SAMPLE_RATE, samples.size)
+        return song.id, compute_ms, os.path.getsize(path)
+
+
+def run(minutes: int, requests: int):
+    song_id, compute_ms, file_size = setup(minutes)
+    client = app.test_client()
+    resp = client.post('/api/login', json={'username': 'bench', 'password': 'BenchPass123'})
+    auth = {'Authorization': f"Bearer {resp.get_json()['token']}"}
+
+    print(f"track: {minutes} min @ {SAMPLE_RATE} Hz, compute_peaks: {compute_ms:.1f} ms, peaks file: {file_size / 1024:.1f} KB")
+    print(f"{'resolution':<12}{'bits':>6}{'body KB':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for resolution in RESOLUTIONS:
+        for bits in (8, 16):
+            latencies = []
+            for _ in range(requests):
+                start = time.perf_counter()
+                response = client.get(f'/api/songs/{song_id}/peaks?resolution={resolution}&bits={bits}', headers=auth)
+                body = response.data
+                latencies.append((time.perf_counter() - start) * 1000)
+            latencies.sort()
+            p95 = latencies[int(len(latencies) * 0.95) - 1]
+            print(f"{resolution:<12}{bits:>6}{len(body) / 1024:>10.1f}{statistics.median(latencies):>10.3f}{p95:>10.3f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--minutes', type=int, default=5)
+    parser.add_argument('--requests', type=int, default=500)
+    args = parser.parse_args()
+    run(args.minutes, args.requests)
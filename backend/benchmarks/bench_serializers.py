@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Song list serialization benchmark
+
+Builds a throwaway SQLite library of --songs rows and renders the whole
+list as a JSON body two ways: the previous list_songs path (ORM entities,
+a hand-built dict per row, Flask's JSON provider) and the
+database.serializers path (Core select of the projected columns, compiled
+row encoder). Each run happens in a fresh process so peak RSS is measured
+per approach; also times a sparse ?fields=id,title,artist projection.
+
+Usage:
+    python benchmarks/bench_serializers.py [--songs 50000] [--repeat 3]
+"""
+
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def setup(db_path):
+    os.environ['DATABASE_URL'] = f"sqlite:///{db_path}"
+    sys.path.insert(0, BACKEND)
+    from app import app  # noqa: E402
+    return app
+
+
+def populate(db_path, songs):
+    app = setup(db_path)
+    from database import db
+    from database.models import Song, User
+
+    with app.app_context():
+        db.create_all()
+        user = User(username='bench', email='bench@example.com')
+        user.set_password('BenchPass123')
+        db.session.add(user)
+        db.session.commit()
+        start = datetime(2020, 1, 1, tzinfo=timezone.utc)
+        db.session.execute(db.insert(Song), [{
+            'title': f"Track {n} – \"Live\"",
+            'artist': f"Artist {n % 700}",
+            'album': f"Album {n % 3000}" if n % 5 else None,
+            'genre': 'Rock',
+            'duration': 180 + n % 120 + 0.5,
+            'file_path': f"blobs/{n:08x}.mp3",
+            'file_size': 4_000_000 + n,
+            'bitrate': 320000,
+            'format': 'mp3',
+            'upload_date': start + timedelta(seconds=n),
+            'cover_hash': f"{n % 3000:064x}" if n % 4 else None,
+            'user_id': user.id,
+        } for n in range(songs)])
+        db.session.commit()
+        return user.id
+
+
+def legacy_body(app, user_id):
+    from database.models import Song
+    songs = Song.query.filter_by(user_id=user_id).order_by(Song.upload_date.desc()).all()
+    song_list = [{
+        'id': str(song.id),
+        'title': song.title,
+        'artist': song.artist,
+        'album': song.album,
+        'genre': song.genre,
+        'duration': song.duration,
+        'file_size': song.file_size,
+        'bitrate': song.bitrate,
+        'format': song.format,
+        'upload_date': song.upload_date,
+        'cover_url': f"/api/songs/{song.id}/cover" if song.cover_hash else None
+    } for song in songs]
+    return app.json.dumps({'songs': song_list, 'total_songs': len(song_list)})
+
+
+def projected_body(fields_spec):
+    def render(app, user_id):
+        from database import db
+        from database.models import Song
+        from database.serializers import SONG_FIELDS, Raw, json_body
+        fields = SONG_FIELDS.parse_fields(fields_spec)
+        query = SONG_FIELDS.select(fields).where(Song.user_id == user_id) \
+            .order_by(Song.upload_date.desc(), Song.id.desc())
+        rows = db.session.execute(query).all()
+        return json_body(songs=Raw(SONG_FIELDS.encode_rows(rows, fields)), total_songs=len(rows))
+    return render
+
+
+APPROACHES = {
+    'orm + dicts + jsonify': legacy_body,
+    'core rows + encoder': projected_body(None),
+    'core, fields=3': projected_body('id,title,artist'),
+}
+
+
+def measure(db_path, user_id, label, repeat, results):
+    """Runs in a fresh process: best time over `repeat` and peak RSS growth"""
+    app = setup(db_path)
+    render = APPROACHES[label]
+    from database import db
+    with app.app_context():
+        db.session.execute(db.text('SELECT 1'))  # connect before the baseline
+        baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        best, size = float('inf'), 0
+        for _ in range(repeat):
+            db.session.expunge_all()
+            start = time.perf_counter()
+            body = render(app, user_id)
+            best = min(best, time.perf_counter() - start)
+            size = len(body)
+            del body
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results[label] = (best, (peak - baseline) / 1024, size)  # ru_maxrss is KiB on Linux
+
+
+def run(songs, repeat):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        ctx = multiprocessing.get_context('spawn')
+        with ctx.Pool(1) as pool:
+            user_id = pool.apply(populate, (db_path, songs))
+
+        results = ctx.Manager().dict()
+        for label in APPROACHES:
+            process = ctx.Process(target=measure, args=(db_path, user_id, label, repeat, results))
+            process.start()
+            process.join()
+
+        print(f"{songs} songs, best of {repeat}")
+        print(f"{'approach':<24}{'ms':>10}{'rows/s':>12}{'peak RSS MB':>13}{'body MB':>10}")
+        for label in APPROACHES:
+            seconds, rss_mb, size = results[label]
+            print(f"{label:<24}{seconds * 1000:>10.1f}{songs / seconds:>12.0f}{rss_mb:>13.1f}{size / 1e6:>10.2f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--songs', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    run(args.songs, args.repeat)
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Seek benchmark for /api/songs/<id>/stream
+
+Simulates an <audio> element seeking around a large track. Each seek is
+measured twice: once as a plain GET (what the old send_file path cost: the
+whole file for every seek) and once with an open-ended `Range: bytes=N-`
+request where the player reads a playback buffer and then drops the
+connection, which is what browsers do.
+
+Usage:
+    python benchmarks/bench_stream_seek.py [--size-mb 40] [--seeks 50]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+WORKDIR = tempfile.mkdtemp(prefix='waves-bench-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(WORKDIR, 'bench.db')}"
+os.environ['UPLOAD_FOLDER'] = os.path.join(WORKDIR, 'uploads')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app  # noqa: E402
+from database import db  # noqa: E402
+from database.models import Song, User  # noqa: E402
+
+
+PLAYBACK_BUFFER = 256 * 1024  # bytes a player typically reads after a seek
+
+
+def setup(size_mb: int):
+    path = os.path.join(app.config['UPLOAD_FOLDER'], 'bench_track.flac')
+    with open(path, 'wb') as f:
+        for _ in range(size_mb):
+            f.write(os.urandom(1024 * 1024))
+
+    with app.app_context():
+        db.create_all()
+        user = User(username='bench', email='bench@example.com')
+        user.set_password('BenchPass123')
+        db.session.add(user)
+        db.session.commit()
+        song = Song(title='Bench', artist='Bench', album='Bench', genre='Bench',
+                    duration=600.0, file_path='bench_track.flac',
+                    file_size=os.path.getsize(path), bitrate=1411, format='flac',
+                    user_id=user.id)
+        db.session.add(song)
+        db.session.commit()
+        return song.id, os.path.getsize(path)
+
+
+def token():
+    client = app.test_client()
+    resp = client.post('/api/login', json={'username': 'bench', 'password': 'BenchPass123'})
+    return resp.get_json()['token']
+
+
+def read_response(response, limit=None):
+    sent = 0
+    for chunk in response.response:
+        sent += len(chunk)
+        if limit is not None and sent >= limit:
+            break
+    response.close()
+    return sent
+
+
+def run(seeks: int, size_mb: int):
+    song_id, file_size = setup(size_mb)
+    auth = {'Authorization': f'Bearer {token()}'}
+    client = app.test_client()
+    offsets = [random.randrange(0, file_size) for _ in range(seeks)]
+
+    results = {}
+    for label, use_range in (('full GET', False), ('Range bytes=N-', True)):
+        latencies, sent = [], []
+        for offset in offsets:
+            headers = dict(auth)
+            if use_range:
+                headers['Range'] = f'bytes={offset}-'
+            start = time.perf_counter()
+            response = client.get(f'/api/songs/{song_id}/stream', headers=headers, buffered=False)
+            if use_range:
+                # player reads its buffer from the seek point and stops
+                sent.append(read_response(response, PLAYBACK_BUFFER))
+            else:
+                # without ranges the player has to pull everything up to the seek point
+                sent.append(read_response(response, offset + PLAYBACK_BUFFER))
+            latencies.append((time.perf_counter() - start) * 1000)
+        results[label] = (latencies, sent)
+
+    print(f"file size: {file_size / 1e6:.1f} MB, seeks: {seeks}")
+    print(f"{'mode':<18}{'p50 ms':>10}{'p95 ms':>10}{'avg KB/seek':>14}")
+    for label, (latencies, sent) in results.items():
+        latencies.sort()
+        p95 = latencies[int(len(latencies) * 0.95) - 1]
+        print(f"{label:<18}{statistics.median(latencies):>10.2f}{p95:>10.2f}"
+              f"{statistics.mean(sent) / 1024:>14.0f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size-mb', type=int, default=40)
+    parser.add_argument('--seeks', type=int, default=50)
+    args = parser.parse_args()
+    run(args.seeks, args.size_mb)
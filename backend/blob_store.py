@@ -0,0 +1,284 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import uuid
+from datetime import datetime, timezone
+from typing import BinaryIO, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from database import db
+from database.models import AudioBlob
+
+
+class BlobStore:
+    """Content-addressed audio storage.
+
+    Every file is named by the SHA-256 of its bytes and fanned out into
+    `blobs/<aa>/<bb>/` under the upload folder, so identical uploads share one
+    file on disk. `AudioBlob.ref_count` tracks how many songs point at a blob;
+    the file is only removed when the last reference is released.
+
+    A new copy of bytes that are already stored is kept until the session
+    that references them commits, and put back if a concurrent delete
+    removed the stored file in the meantime; files placed by a transaction
+    that rolls back are taken out again (see _defer).
+    """
+    CHUNK_SIZE = 1024 * 1024
+    BLOB_DIR = 'blobs'
+    # derived per-blob files (waveform peaks, ...) stored as `<sha><suffix>`
+    SIDECAR_SUFFIXES = ('.peaks',)
+
+    def __init__(self, upload_folder: str):
+        self.upload_folder = upload_folder
+        self.root = os.path.join(upload_folder, self.BLOB_DIR)
+        self.tmp_dir = os.path.join(self.root, 'tmp')
+
+    @classmethod
+    def relative_path(cls, sha256: str, ext: str) -> str:
+        return os.path.join(cls.BLOB_DIR, sha256[:2], sha256[2:4], f"{sha256}{ext.lower()}")
+
+    def absolute_path(self, rel_path: str) -> str:
+        return os.path.join(self.upload_folder, rel_path)
+
+    @staticmethod
+    def sidecar_path(blob_path: str, suffix: str) -> str:
+        return os.path.splitext(blob_path)[0] + suffix
+
+    def write_stream(self, stream: BinaryIO, ext: str) -> Tuple[str, str, int]:
+        """Copy `stream` into the store, hashing in the same pass.
+
+        Returns (sha256, path relative to the upload folder, size in bytes).
+        """
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir)
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                while True:
+                    chunk = stream.read(self.CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    out.write(chunk)
+                    size += len(chunk)
+            return self._commit_tmp(tmp_path, digest.hexdigest(), ext, size)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def ingest_path(self, path: str, move: bool = True, ext: str = None,
+                    sha256: str = None) -> Tuple[str, str, int]:
+        """Add a file that is already on disk (yt-dlp output, finished resumable uploads, bulk imports).
+
+        A moved file only leaves `path` for good once the session commits; on
+        rollback it is put back. Pass `sha256` when the bytes were already
+        hashed (resumable uploads hash as chunks arrive) to skip re-reading them.
+        """
+        ext = ext if ext is not None else os.path.splitext(path)[1]
+        if not move:
+            with open(path, 'rb') as f:
+                return self.write_stream(f, ext)
+
+        if sha256 is None:
+            digest = hashlib.sha256()
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(self.CHUNK_SIZE), b''):
+                    digest.update(chunk)
+            sha256 = digest.hexdigest()
+        return self._commit_tmp(path, sha256, ext, os.path.getsize(path), owned=False)
+
+    def ingest_hashed(self, path: str, sha256: str, ext: str = None, known_path: str = None) -> Tuple[str, str, int]:
+        """Copy a file whose hash was already computed elsewhere (bulk import workers).
+
+        `known_path` is the stored path when the blob already has a row, which
+        saves a lookup per file.
+        """
+        ext = ext if ext is not None else os.path.splitext(path)[1]
+        rel_path = known_path or self.relative_path(sha256, ext)
+        final_path = self.absolute_path(rel_path)
+        if os.path.exists(final_path):
+            _defer('copy', path, final_path)
+        else:
+            _copy(path, final_path)
+            _defer('placed', None, final_path)
+        return sha256, rel_path, os.path.getsize(final_path)
+
+    def _commit_tmp(self, tmp_path: str, sha256: str, ext: str, size: int,
+                    owned: bool = True) -> Tuple[str, str, int]:
+        """Place `tmp_path` at the blob's path; `owned` is False for a caller's file moved in"""
+        existing = db.session.get(AudioBlob, sha256)
+        rel_path = existing.file_path if existing else self.relative_path(sha256, ext)
+        final_path = self.absolute_path(rel_path)
+
+        if os.path.exists(final_path):
+            # identical bytes are already stored
+            _defer('temp' if owned else 'file', tmp_path, final_path)
+        else:
+            _move(tmp_path, final_path)
+            _defer('placed' if owned else 'moved', tmp_path, final_path)
+        return sha256, rel_path, size
+
+    def acquire(self, sha256: str, rel_path: str, size: int) -> AudioBlob:
+        """Add one reference to a blob, creating its row if needed. Caller commits."""
+        # the row lock orders us against a concurrent release() of the last reference
+        blob = db.session.get(AudioBlob, sha256, with_for_update=True, populate_existing=True)
+        if blob is None:
+            try:
+                with db.session.begin_nested():
+                    blob = AudioBlob(sha256=sha256, file_path=rel_path, file_size=size, ref_count=1)
+                    db.session.add(blob)
+                return blob
+            except IntegrityError:
+                # another upload of the same bytes created it first
+                blob = db.session.get(AudioBlob, sha256, with_for_update=True, populate_existing=True)
+
+        db.session.execute(
+            db.update(AudioBlob)
+            .where(AudioBlob.sha256 == sha256)
+            .values(ref_count=AudioBlob.ref_count + 1)
+        )
+        db.session.refresh(blob)
+        return blob
+
+    def acquire_many(self, blobs: Dict[str, Tuple[str, int, int]]) -> None:
+        """Batch form of acquire for bulk inserts.
+
+        `blobs` maps sha256 -> (relative path, size, references to add). Caller commits.
+        """
+        if not blobs:
+            return
+        existing = set(db.session.execute(
+            db.select(AudioBlob.sha256).where(AudioBlob.sha256.in_(list(blobs))).with_for_update()
+        ).scalars())
+
+        new_rows = [
+            {'sha256': sha, 'file_path': rel_path, 'file_size': size, 'ref_count': refs,
+             'created_at': datetime.now(timezone.utc)}
+            for sha, (rel_path, size, refs) in blobs.items() if sha not in existing
+        ]
+        if new_rows:
+            db.session.execute(db.insert(AudioBlob), new_rows)
+
+        for sha in existing:
+            db.session.execute(
+                db.update(AudioBlob)
+                .where(AudioBlob.sha256 == sha)
+                .values(ref_count=AudioBlob.ref_count + blobs[sha][2])
+            )
+
+    def release(self, sha256: str) -> Optional[str]:
+        """Drop one reference. Returns the file to unlink once the caller has
+        committed, or None while other songs still use the blob."""
+        db.session.get(AudioBlob, sha256, with_for_update=True)
+        db.session.execute(
+            db.update(AudioBlob)
+            .where(AudioBlob.sha256 == sha256)
+            .values(ref_count=AudioBlob.ref_count - 1)
+        )
+        blob = db.session.get(AudioBlob, sha256, populate_existing=True)
+        if blob is None or blob.ref_count > 0:
+            return None
+
+        path = self.absolute_path(blob.file_path)
+        db.session.delete(blob)
+        return path
+
+    @classmethod
+    def unlink(cls, path: Optional[str], derived_roots: Iterable[str] = ()) -> None:
+        """Remove a released blob, its sidecars and its `<root>/<sha>/`
+        directories under `derived_roots` (HLS segments), unless an upload
+        of the same bytes has referenced it again since the release"""
+        if not path or not _take_back(db.session, path):
+            return
+        sha256 = os.path.basename(cls.sidecar_path(path, ''))
+        for target in [cls.sidecar_path(path, suffix) for suffix in cls.SIDECAR_SUFFIXES]:
+            if os.path.exists(target):
+                os.remove(target)
+        for root in derived_roots:
+            shutil.rmtree(os.path.join(root, sha256), ignore_errors=True)
+
+
+def _move(source: str, final_path: str) -> None:
+    os.makedirs(os.path.dirname(final_path), exist_ok=True)
+    try:
+        os.replace(source, final_path)
+    except OSError:
+        # different filesystem (e.g. yt-dlp temp dir)
+        shutil.move(source, final_path)
+
+
+def _copy(source: str, final_path: str) -> None:
+    # via a temp file beside the target, so readers never see a partial blob
+    os.makedirs(os.path.dirname(final_path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(final_path))
+    os.close(fd)
+    try:
+        shutil.copyfile(source, tmp_path)
+        os.replace(tmp_path, final_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _take_back(session, final_path: str, restore_to: str = None) -> bool:
+    """Take an unreferenced blob file out of the store: removed, or moved back
+    to `restore_to`. Returns False, leaving the file in place, when a row
+    references the blob by the time we look."""
+    # move the file aside before looking: an upload committing after the check
+    # then finds it missing and puts its own copy back (see _settle_pending)
+    aside = restore_to or f"{final_path}.{uuid.uuid4().hex}.unlinking"
+    if os.path.exists(final_path):
+        _move(final_path, aside)
+    sha256 = os.path.basename(BlobStore.sidecar_path(final_path, ''))
+    try:
+        referenced = bool(session.scalar(db.select(AudioBlob.ref_count).where(AudioBlob.sha256 == sha256)))
+    except SQLAlchemyError:
+        referenced = True  # cannot tell; keeping a file is the safe side
+    if referenced:
+        if os.path.exists(aside):
+            (_copy if restore_to else _move)(aside, final_path)
+        return False
+    if not restore_to and os.path.exists(aside):
+        os.remove(aside)
+    return True
+
+
+# What becomes of a blob file this transaction touched (source, final path) once it ends:
+#   'temp'    our copy of bytes already stored: moved in if the stored file vanished, else removed / removed
+#   'file'    a caller's file, likewise: moved in or removed on commit / left where it is on rollback
+#   'copy'    a file the caller keeps: copied in if the stored file vanished / nothing
+#   'placed'  our copy, moved in as a new blob: nothing / removed unless referenced since
+#   'moved'   a caller's file, moved in as a new blob: nothing / moved back unless referenced since
+def _defer(mode: str, source: Optional[str], final_path: str) -> None:
+    db.session.info.setdefault('blob_pending', []).append((mode, source, final_path))
+
+
+@event.listens_for(Session, 'after_commit')
+def _settle_pending(session):
+    if session.in_nested_transaction():
+        return  # a savepoint; the outer transaction can still roll back
+    for mode, source, final_path in session.info.pop('blob_pending', ()):
+        if mode in ('placed', 'moved'):
+            continue
+        if not os.path.exists(final_path):
+            (_copy if mode == 'copy' else _move)(source, final_path)
+        elif mode != 'copy' and os.path.exists(source):
+            os.remove(source)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_pending(session, previous_transaction):
+    if previous_transaction.nested:
+        return
+    for mode, source, final_path in reversed(session.info.pop('blob_pending', ())):
+        if mode == 'temp' and os.path.exists(source):
+            os.remove(source)
+        elif mode in ('placed', 'moved'):
+            _take_back(session, final_path, source if mode == 'moved' else None)
@@ -0,0 +1,111 @@
+import hashlib
+import io
+import logging
+import os
+import tempfile
+from typing import Optional
+
+from mutagen import File
+from PIL import Image
+
+from database import db
+from database.models import Song
+from metadata.tag_reader import extract_picture
+
+logger = logging.getLogger(__name__)
+
+
+class CoverStore:
+    """Content-addressed cover art.
+
+    An image is named by the SHA-256 of its original bytes and stored only as
+    resized JPEG variants, `covers/<aa>/<sha>-<size>.jpg` under the upload
+    folder. Every track of an album usually embeds the same picture, so a
+    whole album resolves to one set of files and later tracks skip decoding.
+    Songs point at it through `Song.cover_hash`.
+    """
+    COVER_DIR = 'covers'
+    SIZES = (64, 256, 600)
+    DEFAULT_SIZE = 256
+    JPEG_QUALITY = 85
+
+    def __init__(self, upload_folder: str):
+        self.upload_folder = upload_folder
+        self.root = os.path.join(upload_folder, self.COVER_DIR)
+
+    def path(self, cover_hash: str, size: int) -> str:
+        return os.path.join(self.root, cover_hash[:2], f"{cover_hash}-{size}.jpg")
+
+    def has(self, cover_hash: str) -> bool:
+        # the smallest variant is written last, so it marks a complete set
+        return os.path.exists(self.path(cover_hash, min(self.SIZES)))
+
+    def save(self, data: Optional[bytes]) -> Optional[str]:
+        """Store the variants for an image unless they exist; returns its hash, None if unreadable"""
+        if not data:
+            return None
+        cover_hash = hashlib.sha256(data).hexdigest()
+        if self.has(cover_hash):
+            return cover_hash
+        return cover_hash if self._store(cover_hash, data) else None
+
+    def restore(self, cover_hash: str, audio_path: str) -> bool:
+        """Re-create variants from the picture embedded in a song's audio file.
+
+        release() checks for songs and removes files in two steps, so a song
+        committed in between can point at a deleted set; serving repairs it.
+        Only art that came from the file itself (not downloaded thumbnails)
+        can be restored.
+        """
+        try:
+            audio = File(audio_path)
+            data = extract_picture(audio) if audio is not None else None
+        except Exception as e:
+            logger.warning("Cannot re-read cover art from %s: %s", audio_path, e)
+            return False
+        if not data or hashlib.sha256(data).hexdigest() != cover_hash:
+            return False
+        return self._store(cover_hash, data)
+
+    def _store(self, cover_hash: str, data: bytes) -> bool:
+        try:
+            with Image.open(io.BytesIO(data)) as image:
+                image = image.convert('RGB')
+                # largest first; each variant is downsampled from the previous one
+                for size in sorted(self.SIZES, reverse=True):
+                    image.thumbnail((size, size), Image.LANCZOS)
+                    self._write(image, self.path(cover_hash, size))
+        except Exception as e:
+            logger.warning("Unreadable cover art %s: %s", cover_hash[:12], e)
+            return False
+        return True
+
+    def save_file(self, path: str) -> Optional[str]:
+        """Store an image file from disk (e.g. a downloaded thumbnail)"""
+        with open(path, 'rb') as f:
+            return self.save(f.read())
+
+    def _write(self, image, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                image.save(out, 'JPEG', quality=self.JPEG_QUALITY, optimize=True, progressive=True)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def release(self, cover_hash: Optional[str]):
+        """Remove the variants once no song uses them; call after the song row is gone"""
+        if not cover_hash:
+            return
+        in_use = db.session.execute(
+            db.select(Song.id).where(Song.cover_hash == cover_hash).limit(1)
+        ).first()
+        if in_use:
+            return
+        for size in self.SIZES:
+            path = self.path(cover_hash, size)
+            if os.path.exists(path):
+                os.remove(path)
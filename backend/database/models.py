@@ -1,7 +1,9 @@
 from database import db
 from datetime import datetime, timezone
+from sqlalchemy import DDL, event
 import json
 import os
+import secrets
 from werkzeug.security import generate_password_hash, check_password_hash
 
 
@@ -10,9 +12,25 @@ DATABASE_URL = os.environ.get('DATABASE_URL', 'sqlite:///music_player.db')
 IS_POSTGRESQL = DATABASE_URL.startswith('postgresql')
 
 if IS_POSTGRESQL:
-    from sqlalchemy.dialects.postgresql import UUID, JSONB
+    from sqlalchemy.dialects.postgresql import UUID, JSONB, TSVECTOR
     import uuid
 
+# PostgreSQL case/accent folding for library search, matching FTS5's remove_diacritics on SQLite.
+# unaccent() is only STABLE; pinning the dictionary makes the wrapper safe to index and generate from
+SONGS_FOLD_DDL = (
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    "CREATE OR REPLACE FUNCTION songs_fold(text) RETURNS text "
+    "LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT "
+    "AS $$ SELECT lower(public.unaccent('public.unaccent'::regdictionary, $1)) $$",
+)
+
+# full-text search over the library (services/library_search.py): title, artist, album, genre
+# weighted A..D. PostgreSQL keeps a generated tsvector column; SQLite an FTS5 table (below)
+SEARCH_VECTOR_SQL = " || ".join(
+    f"setweight(to_tsvector('simple', songs_fold(coalesce({column}, ''))), '{weight}')"
+    for column, weight in (('title', 'A'), ('artist', 'B'), ('album', 'C'), ('genre', 'D'))
+)
+
 class User(db.Model):
     __tablename__ = 'users'
 
@@ -66,7 +84,9 @@ class Song(db.Model):
     album = db.Column(db.String(255), nullable=True, index=True)
     genre = db.Column(db.String(100), nullable=True, index=True)
     duration = db.Column(db.Float, nullable=True)
-    file_path = db.Column(db.String(500), nullable=False, unique=True)
+    file_path = db.Column(db.String(500), nullable=False, index=True)  # shared when songs dedupe to one blob
+    blob_hash = db.Column(db.String(64), db.ForeignKey('audio_blobs.sha256'), nullable=True, index=True)
+    cover_hash = db.Column(db.String(64), nullable=True, index=True)  # see CoverStore; shared across an album
     file_size = db.Column(db.BigInteger, nullable=False)  # size in bytes
     bitrate = db.Column(db.Integer, nullable=True)  # bitrate in kbps
     format = db.Column(db.String(20), nullable=False)  # e.g., mp3, wav
@@ -81,6 +101,15 @@ class Song(db.Model):
         metadata_json = db.Column(JSONB, nullable=True)  # Store extra metadata
         play_count = db.Column(db.Integer, default=0)
         last_played = db.Column(db.DateTime(timezone=True), nullable=True)
+        search_vector = db.Column(TSVECTOR, db.Computed(SEARCH_VECTOR_SQL, persisted=True))
+    else:
+        metadata_json = db.Column(db.JSON, nullable=True)  # track number, year, album artist, ReplayGain
+
+    # keyset pagination of a user's library, newest first
+    __table_args__ = (db.Index('ix_songs_user_upload_date', 'user_id', 'upload_date', 'id'),)
+    if IS_POSTGRESQL:
+        # the pg_trgm indexes behind fuzzy search are expression indexes, see SONGS_TRGM_DDL below
+        __table_args__ += (db.Index('ix_songs_search_vector', 'search_vector', postgresql_using='gin'),)
     
     # relationships
     user = db.relationship('User', back_populates='song')
@@ -88,24 +117,244 @@ class Song(db.Model):
     play_history = db.relationship('PlayHistory', back_populates='song', cascade='all, delete-orphan')
 
     def to_dict(self):
-        return {
-            'id': str(self.id) if IS_POSTGRESQL else self.id,
-            'title': self.title,
-            'artist': self.artist,
-            'album': self.album,
-            'genre': self.genre,
-            'duration': self.duration,
-            'file_size': self.file_size,
-            'bitrate': self.bitrate,
-            'format': self.format,
-            'upload_date': self.upload_date.isoformat() if self.upload_date else None,
-            'user_id': str(self.user_id) if IS_POSTGRESQL else self.user_id
-        }
+        # serializers imports this module, so the field table is looked up at call time
+        from database.serializers import SONG_FIELDS
+        return SONG_FIELDS.as_dict(self, SONG_FIELDS.fields)
     
+    @classmethod
+    def from_metadata(cls, metadata, user_id):
+        """Build a song row from the dict returned by AudioFileManager"""
+        return cls(
+            title=metadata['title'],
+            artist=metadata['artist'],
+            album=metadata['album'],
+            genre=metadata.get('genre', 'Unknown'),
+            duration=metadata.get('duration'),
+            file_path=metadata['file_path'],
+            file_size=metadata['file_size'],
+            bitrate=metadata.get('bitrate', 0),
+            format=metadata['format'],
+            blob_hash=metadata.get('blob_hash'),
+            metadata_json=metadata.get('metadata_json'),
+            cover_hash=metadata.get('cover_hash'),
+            user_id=user_id
+        )
+
+    def update_from_metadata(self, metadata):
+        """Apply extracted/enriched metadata to an existing (placeholder) row"""
+        for field in ('title', 'artist', 'album', 'genre', 'duration', 'bitrate', 'format', 'metadata_json', 'cover_hash'):
+            if metadata.get(field) is not None:
+                setattr(self, field, metadata[field])
+
     def __repr__(self):
         return f'<Song {self.artist} - {self.title}>'
 
 
+# SQLite: an external-content FTS5 index over the searchable song columns, kept in sync by triggers
+SONGS_FTS_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS songs_fts USING fts5("
+    "title, artist, album, genre, content='songs', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS songs_fts_insert AFTER INSERT ON songs BEGIN "
+    "INSERT INTO songs_fts(rowid, title, artist, album, genre) VALUES (new.id, new.title, new.artist, new.album, new.genre); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS songs_fts_delete AFTER DELETE ON songs BEGIN "
+    "INSERT INTO songs_fts(songs_fts, rowid, title, artist, album, genre) "
+    "VALUES ('delete', old.id, old.title, old.artist, old.album, old.genre); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS songs_fts_update AFTER UPDATE OF title, artist, album, genre ON songs BEGIN "
+    "INSERT INTO songs_fts(songs_fts, rowid, title, artist, album, genre) "
+    "VALUES ('delete', old.id, old.title, old.artist, old.album, old.genre); "
+    "INSERT INTO songs_fts(rowid, title, artist, album, genre) VALUES (new.id, new.title, new.artist, new.album, new.genre); "
+    "END",
+)
+
+# fuzzy search (services/fuzzy_search.py) on PostgreSQL: trigram GIN indexes over the folded columns
+SONGS_TRGM_DDL = (
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_songs_title_trgm ON songs USING gin (songs_fold(title) gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_songs_artist_trgm ON songs USING gin (songs_fold(artist) gin_trgm_ops)",
+)
+
+for statement in SONGS_FTS_DDL:
+    event.listen(Song.__table__, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+# search_vector is generated from songs_fold(), so it has to exist before the table
+for statement in SONGS_FOLD_DDL:
+    event.listen(Song.__table__, 'before_create', DDL(statement).execute_if(dialect='postgresql'))
+for statement in SONGS_TRGM_DDL:
+    event.listen(Song.__table__, 'after_create', DDL(statement).execute_if(dialect='postgresql'))
+event.listen(Song.__table__, 'before_drop', DDL("DROP TABLE IF EXISTS songs_fts").execute_if(dialect='sqlite'))
+
+
+class AudioBlob(db.Model):
+    """One stored audio file, addressed by its SHA-256 and shared by every song with the same bytes"""
+    __tablename__ = 'audio_blobs'
+
+    sha256 = db.Column(db.String(64), primary_key=True)
+    file_path = db.Column(db.String(500), nullable=False, unique=True)  # relative to UPLOAD_FOLDER
+    file_size = db.Column(db.BigInteger, nullable=False)
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+
+    def __repr__(self):
+        return f'<AudioBlob {self.sha256[:12]} refs={self.ref_count}>'
+
+
+class SongFingerprint(db.Model):
+    """Chroma fingerprint of a song: one 32-bit sub-fingerprint per analysis frame"""
+    __tablename__ = 'song_fingerprints'
+
+    if IS_POSTGRESQL:
+        song_id = db.Column(UUID(as_uuid=True), db.ForeignKey('songs.id', ondelete='CASCADE'), primary_key=True)
+    else:
+        song_id = db.Column(db.Integer, db.ForeignKey('songs.id', ondelete='CASCADE'), primary_key=True)
+
+    fingerprint = db.Column(db.LargeBinary, nullable=False)  # little-endian uint32 array
+    frame_count = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+
+    def __repr__(self):
+        return f'<SongFingerprint {self.song_id} frames={self.frame_count}>'
+
+
+class FingerprintTerm(db.Model):
+    """Inverted index over fingerprint bands, used to find duplicate candidates without a full scan"""
+    __tablename__ = 'fingerprint_terms'
+
+    term = db.Column(db.Integer, primary_key=True)
+
+    if IS_POSTGRESQL:
+        song_id = db.Column(UUID(as_uuid=True), db.ForeignKey('songs.id', ondelete='CASCADE'), primary_key=True, index=True)
+        user_id = db.Column(UUID(as_uuid=True), db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    else:
+        song_id = db.Column(db.Integer, db.ForeignKey('songs.id', ondelete='CASCADE'), primary_key=True, index=True)
+        user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+
+    __table_args__ = (db.Index('ix_fingerprint_terms_user_term', 'user_id', 'term'),)
+
+
+class MetadataLookupCache(db.Model):
+    """Cached MusicBrainz / Last.fm answers; a NULL result is a cached miss"""
+    __tablename__ = 'metadata_lookup_cache'
+
+    source = db.Column(db.String(20), primary_key=True)  # 'musicbrainz' or 'lastfm'
+    lookup_key = db.Column(db.String(512), primary_key=True)  # normalized artist + title (or query)
+    result = db.Column(db.Text, nullable=True)  # JSON
+    fetched_at = db.Column(db.DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    expires_at = db.Column(db.DateTime(timezone=True), nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<MetadataLookupCache {self.source}:{self.lookup_key}>'
+
+
+class RateLimitBucket(db.Model):
+    """Token bucket state shared by every pod (metadata/rate_limiter.py, RATE_LIMIT_DB=database)"""
+    __tablename__ = 'rate_limit_buckets'
+
+    name = db.Column(db.String(50), primary_key=True)
+    tokens = db.Column(db.Float, nullable=False)
+    updated = db.Column(db.Float, nullable=False)  # unix time of the last reservation
+
+    def __repr__(self):
+        return f'<RateLimitBucket {self.name} {self.tokens:.2f}>'
+
+
+class BackfillCheckpoint(db.Model):
+    """Resume point and lease of a keyset-batched backfill, one row per backfill name"""
+    __tablename__ = 'backfill_checkpoints'
+
+    name = db.Column(db.String(50), primary_key=True)
+    last_id = db.Column(db.String(36), nullable=True)  # str() of the last Song.id handled; NULL starts a new pass
+    processed = db.Column(db.Integer, nullable=False, default=0)  # this pass
+    updated = db.Column(db.Integer, nullable=False, default=0)  # this pass
+    locked_by = db.Column(db.String(64), nullable=True)  # run currently holding the lease
+    locked_until = db.Column(db.DateTime(timezone=True), nullable=True)
+    started_at = db.Column(db.DateTime(timezone=True), nullable=True)  # start of the current pass
+    finished_at = db.Column(db.DateTime(timezone=True), nullable=True)  # end of the last complete pass
+    updated_at = db.Column(db.DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+
+    def __repr__(self):
+        return f'<BackfillCheckpoint {self.name} after={self.last_id}>'
+
+
+class UploadSession(db.Model):
+    """State of a resumable (tus-style) upload while its chunks arrive"""
+    __tablename__ = 'upload_sessions'
+
+    id = db.Column(db.String(32), primary_key=True, default=lambda: secrets.token_hex(16))
+
+    if IS_POSTGRESQL:
+        user_id = db.Column(UUID(as_uuid=True), db.ForeignKey('users.id'), nullable=False, index=True)
+    else:
+        user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+
+    filename = db.Column(db.String(255), nullable=False)
+    upload_length = db.Column(db.BigInteger, nullable=False)  # total bytes announced by the client
+    upload_offset = db.Column(db.BigInteger, nullable=False, default=0)  # bytes durably written so far
+    sha256 = db.Column(db.String(64), nullable=True)  # of the whole file, recorded with the last chunk
+    created_at = db.Column(db.DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    updated_at = db.Column(db.DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'filename': self.filename,
+            'upload_length': self.upload_length,
+            'upload_offset': self.upload_offset,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+    def __repr__(self):
+        return f'<UploadSession {self.id} {self.upload_offset}/{self.upload_length}>'
+
+
+class Job(db.Model):
+    """A unit of background work (ingest, segmenting, ...) and its progress"""
+    __tablename__ = 'jobs'
+
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCEEDED = 'succeeded'
+    STATUS_FAILED = 'failed'
+
+    id = db.Column(db.String(32), primary_key=True, default=lambda: secrets.token_hex(16))
+
+    if IS_POSTGRESQL:
+        user_id = db.Column(UUID(as_uuid=True), db.ForeignKey('users.id'), nullable=True, index=True)
+    else:
+        user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True, index=True)
+
+    kind = db.Column(db.String(50), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default=STATUS_QUEUED)
+    progress = db.Column(db.Integer, nullable=False, default=0)  # 0-100
+    dedupe_key = db.Column(db.String(255), nullable=True, index=True)  # at most one active job per key
+    payload = db.Column(db.Text, nullable=True)  # JSON
+    result = db.Column(db.Text, nullable=True)  # JSON
+    error = db.Column(db.Text, nullable=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    started_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    heartbeat_at = db.Column(db.DateTime(timezone=True), nullable=True)  # renewed while running; a stale one means the worker died
+    finished_at = db.Column(db.DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (db.Index('ix_jobs_status_created_at', 'status', 'created_at'),)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'progress': self.progress,
+            'result': json.loads(self.result) if self.result else None,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+    def __repr__(self):
+        return f'<Job {self.kind} {self.id} {self.status}>'
+
+
 class Playlist(db.Model):
     __tablename__ = 'playlists'
     
@@ -120,6 +369,9 @@ class Playlist(db.Model):
     description = db.Column(db.String(255), nullable=True)
     created_at = db.Column(db.DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
     structure_type = db.Column(db.String(50), default='list')  # 'list', 'queue', 'stack', 'tree'
+    # denormalized from playlist_songs, kept current by services.playlist_stats
+    song_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    total_duration = db.Column(db.Float, nullable=False, default=0.0, server_default='0')
     
     # relationships
     user = db.relationship('User', back_populates='playlist')
@@ -132,7 +384,8 @@ class Playlist(db.Model):
             'description': self.description,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'user_id': str(self.user_id) if IS_POSTGRESQL else self.user_id,
-            'song_count': len(self.playlist_songs)
+            'song_count': self.song_count,
+            'total_duration': self.total_duration
         }
     
     def __repr__(self):
@@ -158,8 +411,11 @@ class PlaylistSong(db.Model):
     playlist = db.relationship('Playlist', back_populates='playlist_songs')
     song = db.relationship('Song', back_populates='playlist_songs')
 
-    #prevent duplicate songs in the same playlist
-    __table_args__ = (db.UniqueConstraint('playlist_id', 'song_id', name='unique_playlist_song'),)
+    #prevent duplicate songs in the same playlist; GET /playlists/<id> reads in (playlist_id, position) order
+    __table_args__ = (
+        db.UniqueConstraint('playlist_id', 'song_id', name='unique_playlist_song'),
+        db.Index('ix_playlist_songs_playlist_position', 'playlist_id', 'position'),
+    )
 
 
 class PlayHistory(db.Model):
@@ -0,0 +1,228 @@
+"""
+Column-projected JSON serialization for list endpoints
+
+A RowSerializer describes the public fields of a resource as column
+expressions plus a kind. For a requested field set (`?fields=`) it builds a
+Core select() of just those columns and, once per field set, a list of
+per-field getters that turn a result row straight into a JSON object
+string, so list endpoints skip ORM entities, per-row dicts and the generic
+encoder. The same field table gives the dict form used by Song.to_dict().
+"""
+
+import json
+import math
+from datetime import datetime
+from itertools import islice
+from json.encoder import encode_basestring_ascii
+from typing import Callable, Dict, Iterable, Iterator, Optional, Sequence, Tuple
+
+from database import db
+from database.models import PlaylistSong, Song
+
+
+def _str(value) -> str:
+    return 'null' if value is None else encode_basestring_ascii(value)
+
+
+def _num(value) -> str:
+    # JSON has no NaN/Infinity; a non-finite float is reported as missing
+    return repr(value) if value is not None and math.isfinite(value) else 'null'
+
+
+def _finite(value):
+    return value if value is None or math.isfinite(value) else None
+
+
+# ids keep the wire format of the old to_dict(): UUID strings on PostgreSQL, integers on SQLite
+_NUMERIC_IDS = Song.id.type.python_type is int
+
+
+def _id(value) -> str:
+    if value is None:
+        return 'null'
+    return str(value) if _NUMERIC_IDS else f'"{value}"'
+
+
+def _id_value(value):
+    return value if value is None or _NUMERIC_IDS else str(value)
+
+
+def _datetime(value) -> str:
+    return 'null' if value is None else f'"{value.isoformat()}"'
+
+
+# kind -> (JSON text for a row value, Python value for dicts)
+KINDS = {
+    'str': (_str, lambda v: v),
+    'num': (_num, _finite),
+    'id': (_id, _id_value),
+    'datetime': (_datetime, lambda v: v.isoformat() if v is not None else None),
+}
+
+
+class Field:
+    """One public field. Derived fields pass a tuple of columns plus their own `encode` and `value`, both taking the column values"""
+    __slots__ = ('name', 'columns', 'encode', 'value')
+
+    def __init__(self, name: str, columns, kind: str = 'str', encode: Callable = None, value: Callable = None):
+        self.name = name
+        self.columns = columns if isinstance(columns, tuple) else (columns,)
+        self.encode = encode or KINDS[kind][0]
+        self.value = value or KINDS[kind][1]
+
+
+class RowSerializer:
+    def __init__(self, fields: Iterable[Field], default: Optional[Sequence[str]] = None):
+        self.fields: Dict[str, Field] = {field.name: field for field in fields}
+        self.default = tuple(default or self.fields)
+        self._encoders: Dict[Tuple[str, ...], Tuple[list, Callable]] = {}
+
+    def extend(self, *fields: Field, default: Optional[Sequence[str]] = None) -> 'RowSerializer':
+        """A new serializer with extra fields (added to the default set unless `default` is given)"""
+        return RowSerializer(list(self.fields.values()) + list(fields),
+                             default or self.default + tuple(field.name for field in fields))
+
+    def parse_fields(self, spec: Optional[str]) -> Tuple[str, ...]:
+        """`?fields=id,title` -> ('id', 'title'); the default set when empty, ValueError for unknown names"""
+        if not spec:
+            return self.default
+        names = tuple(dict.fromkeys(name.strip() for name in spec.split(',') if name.strip()))
+        unknown = [name for name in names if name not in self.fields]
+        if unknown or not names:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(self.fields)}")
+        return names
+
+    def columns(self, names: Sequence[str]) -> list:
+        """The distinct columns behind `names`, in the order the encoder expects them"""
+        return self._compiled(names)[0]
+
+    def select(self, names: Sequence[str], *extra):
+        """select() of the projected columns; `extra` columns (sort keys, ...) come after them"""
+        return db.select(*self.columns(names), *extra)
+
+    def encoder(self, names: Sequence[str]) -> Callable:
+        """row -> JSON object string, compiled once per field set"""
+        return self._compiled(names)[1]
+
+    def encode_rows(self, rows: Iterable, names: Sequence[str]) -> str:
+        return '[' + ','.join(map(self.encoder(names), rows)) + ']'
+
+    def as_dict(self, obj, names: Optional[Sequence[str]] = None) -> dict:
+        """Dict form for a single ORM instance"""
+        result = {}
+        for name in names or self.default:
+            field = self.fields[name]
+            values = [getattr(obj, column.key) for column in field.columns]
+            result[name] = field.value(*values)
+        return result
+
+    def _compiled(self, names: Sequence[str]):
+        key = tuple(names)
+        compiled = self._encoders.get(key)
+        if compiled is None:
+            compiled = self._encoders[key] = self._compile(key)
+        return compiled
+
+    def _compile(self, names: Tuple[str, ...]):
+        columns, slots, getters = [], {}, []
+        for name in names:
+            field = self.fields[name]
+            indexes = []
+            for column in field.columns:
+                # keyed by identity: == on a column builds an SQL expression
+                if id(column) not in slots:
+                    slots[id(column)] = len(columns)
+                    columns.append(column)
+                indexes.append(slots[id(column)])
+            getters.append(_getter(encode_basestring_ascii(name) + ':', field.encode, indexes))
+
+        def encode(row):
+            return '{' + ','.join([getter(row) for getter in getters]) + '}'
+        return columns, encode
+
+
+def _getter(prefix: str, encode: Callable, indexes: Sequence[int]) -> Callable:
+    """row -> `"name":<json>` for one field"""
+    if len(indexes) == 1:
+        index = indexes[0]
+        return lambda row: prefix + encode(row[index])
+    return lambda row: prefix + encode(*[row[index] for index in indexes])
+
+
+SONG_FIELDS = RowSerializer(
+    [
+        Field('id', Song.id, 'id'),
+        Field('title', Song.title),
+        Field('artist', Song.artist),
+        Field('album', Song.album),
+        Field('genre', Song.genre),
+        Field('duration', Song.duration, 'num'),
+        Field('file_size', Song.file_size, 'num'),
+        Field('bitrate', Song.bitrate, 'num'),
+        Field('format', Song.format),
+        Field('upload_date', Song.upload_date, 'datetime'),
+        Field(
+            'cover_url', (Song.id, Song.cover_hash),
+            encode=lambda song_id, cover_hash: 'null' if not cover_hash else f'"/api/songs/{song_id}/cover"',
+            value=lambda song_id, cover_hash: f"/api/songs/{song_id}/cover" if cover_hash else None
+        ),
+        Field('user_id', Song.user_id, 'id'),
+    ],
+    default=('id', 'title', 'artist', 'album', 'genre', 'duration', 'file_size', 'bitrate', 'format',
+             'upload_date', 'cover_url')
+)
+
+PLAYLIST_SONG_FIELDS = SONG_FIELDS.extend(Field('position', PlaylistSong.position, 'num'))
+
+
+class Raw:
+    """Marks an already-encoded JSON fragment for json_body()"""
+    __slots__ = ('raw',)
+
+    def __init__(self, raw: str):
+        self.raw = raw
+
+
+def json_body(**parts) -> str:
+    """A JSON object from encoded fragments (Raw) and plain values"""
+    return '{' + ','.join(
+        f"{encode_basestring_ascii(key)}:{value.raw if isinstance(value, Raw) else json.dumps(value, default=_default)}"
+        for key, value in parts.items()
+    ) + '}'
+
+
+class RawRows:
+    """Result rows for json_stream(), encoded batch by batch as they are fetched"""
+    __slots__ = ('rows', 'encode', 'batch')
+
+    def __init__(self, rows: Iterable, encode: Callable, batch: int = 500):
+        self.rows = rows
+        self.encode = encode
+        self.batch = batch
+
+
+def json_stream(**parts) -> Iterator[str]:
+    """json_body() as chunks for a streamed response; a RawRows part becomes a JSON array"""
+    separator = '{'
+    for key, value in parts.items():
+        prefix = f"{separator}{encode_basestring_ascii(key)}:"
+        separator = ','
+        if not isinstance(value, RawRows):
+            yield prefix + (value.raw if isinstance(value, Raw) else json.dumps(value, default=_default))
+            continue
+        yield prefix + '['
+        rows, comma = iter(value.rows), ''
+        while True:
+            batch = list(islice(rows, value.batch))
+            if not batch:
+                break
+            yield comma + ','.join(map(value.encode, batch))
+            comma = ','
+        yield ']'
+    yield '}' if separator == ',' else '{}'
+
+
+def _default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
@@ -1,9 +1,32 @@
+import logging
 import os
 from mutagen import File
 from werkzeug.utils import secure_filename
-import hashlib
 from typing import Dict, Optional
 from metadata.metadata_enhancer import MetadataEnhancer
+from metadata.tag_reader import extract_picture, extract_tags, split_extras
+from blob_store import BlobStore
+from cover_store import CoverStore
+
+logger = logging.getLogger(__name__)
+
+def resolve_audio_path(upload_folder: str, stored_path: str) -> str:
+    """Absolute path on disk for a Song.file_path value"""
+    # Build the full file path - ensure it's always absolute
+    if os.path.isabs(stored_path):
+        # Already absolute path
+        file_path = stored_path
+    elif stored_path.startswith('uploads/'):
+        # Path already includes 'uploads/', remove it since we'll add UPLOAD_FOLDER
+        filename = stored_path.replace('uploads/', '')
+        file_path = os.path.join(upload_folder, filename)
+    else:
+        # Just filename
+        file_path = os.path.join(upload_folder, stored_path)
+
+    # Make sure the path is absolute
+    return os.path.abspath(file_path)
+
 
 class AudioFileManager:
     ALLOWED_EXTENSIONS = {'mp3', 'wav', 'flac', 'aac', 'ogg', 'm4a'}
@@ -11,11 +34,13 @@ class AudioFileManager:
     def __init__(self, upload_folder: str):
         self.upload_folder = upload_folder
         self.enhancer = MetadataEnhancer()
+        self.blob_store = BlobStore(upload_folder)
+        self.covers = CoverStore(upload_folder)
 
     def allowed_file(self, filename: str) -> bool:
         return '.' in filename and filename.rsplit('.', 1)[1].lower() in self.ALLOWED_EXTENSIONS
 
-    def save_file(self, file, custom_filename:str = None) -> Optional[str]:
+    def save_file(self, file, custom_filename:str = None, extract: bool = True) -> Optional[str]:
         if not self.allowed_file(file.filename):
             raise ValueError("Unsupported file type")
         
@@ -26,76 +51,90 @@ class AudioFileManager:
         else:
             filename = secure_filename(original_filename)
 
-        # create unique filename to avoid collisions
-        file_hash = hashlib.md5(file.read()).hexdigest()[:8]
-        file.seek(0)  # reset file pointer after reading
+        # hash while writing into the content-addressed store; identical audio shares one blob
+        ext = os.path.splitext(filename)[1]
+        blob_hash, rel_path, file_size = self.blob_store.write_stream(file.stream, ext)
+        return self._register_blob(blob_hash, rel_path, file_size, filename, extract)
 
-        name, ext = os.path.splitext(filename)
-        unique_filename = f"{name}_{file_hash}{ext}"
-        file_path = os.path.join(self.upload_folder, unique_filename)
+    def save_local_file(self, path: str, original_filename: str, extract: bool = True, sha256: str = None) -> Dict:
+        """Move a file already on disk (e.g. an assembled resumable upload) into the store"""
+        if not self.allowed_file(original_filename):
+            raise ValueError("Unsupported file type")
 
-        file.save(file_path)
-        
-        metadata = self.extract_metadata(file_path)  
-        metadata['file_path'] = unique_filename
-        return metadata
+        filename = secure_filename(original_filename)
+        ext = os.path.splitext(filename)[1]
+        blob_hash, rel_path, file_size = self.blob_store.ingest_path(path, ext=ext, sha256=sha256)
+        return self._register_blob(blob_hash, rel_path, file_size, filename, extract)
 
+    def _register_blob(self, blob_hash: str, rel_path: str, file_size: int, filename: str, extract: bool) -> Dict:
+        self.blob_store.acquire(blob_hash, rel_path, file_size)
 
-    def extract_metadata(self, file_path: str) -> Dict:
+        if extract:
+            metadata = self.extract_metadata(self.blob_store.absolute_path(rel_path), filename)
+        else:
+            # placeholder until the ingest job reads tags and enriches it
+            metadata = self.placeholder_metadata(filename, file_size)
+        metadata['file_path'] = rel_path
+        metadata['blob_hash'] = blob_hash
+        metadata['original_filename'] = filename
+        return metadata
 
-        metadata = self._extract_embedded_tags(file_path)
-        filename = os.path.basename(file_path)
+    @staticmethod
+    def placeholder_metadata(filename: str, file_size: int) -> Dict:
+        return {
+            'title': os.path.splitext(filename)[0],
+            'artist': 'Unknown',
+            'album': 'Unknown',
+            'genre': 'Unknown',
+            'duration': 0,
+            'bitrate': 0,
+            'format': os.path.splitext(filename)[1][1:].lower(),
+            'file_size': file_size
+        }
+
+
+    def extract_metadata(self, file_path: str, filename: str = None) -> Dict:
+
+        # blobs are named by hash, so parse the name the user gave the file
+        filename = filename or os.path.basename(file_path)
+        metadata = self._extract_embedded_tags(file_path, filename, self.covers)
         enhanced_metadata = self.enhancer.enhance_metadata(metadata, filename)
         return enhanced_metadata
 
 
-    def _extract_embedded_tags(self, file_path: str) -> Dict:
+    @staticmethod
+    def _extract_embedded_tags(file_path: str, filename: str = None, covers: CoverStore = None) -> Dict:
+        # static so bulk imports can run it in worker processes; with `covers`,
+        # embedded artwork is stored from the same parse and its hash returned
+        display_name = os.path.splitext(filename or os.path.basename(file_path))[0]
         try:
             audio_file = File(file_path)
             if audio_file is None:
                 raise ValueError("Unsupported or corrupted audio file")
         
-            #tag values handler
-            def get_tag_value(audio_file, tag_key, default='Unknown'):
-                tag = audio_file.get(tag_key)
-                print(f"Debug - Tag {tag_key}: {tag}") 
-                if tag is None:
-                    return default
-                
-                #different tag formats handler
-                if isinstance(tag, list):
-                    if len(tag) > 0:
-                        value = tag[0]
-                        if hasattr(value, 'text'):
-                            return str(value.text[0]) if  value.text else default
-                        return str(value)
-                    else:
-                        return default
-                    
-                #direct string value
-                if hasattr(tag, 'text'):
-                    return str(tag.text[0]) if tag.text else default
-                return str(tag)
+            # one pass over whichever tag container the format uses (ID3, Vorbis, MP4, APE)
+            tags = extract_tags(audio_file.tags)
+            logger.debug("Tags: %s", tags)
 
             metadata = {
-                'title': get_tag_value(audio_file, 'TIT2') 
-                    if get_tag_value(audio_file, 'TIT2') != 'Unknown' 
-                    else os.path.splitext(os.path.basename(file_path))[0],
-                'artist': get_tag_value(audio_file, 'TPE1'), 
-                'album': get_tag_value(audio_file, 'TALB'),
-                'genre': get_tag_value(audio_file, 'TCON'),
+                'title': tags.get('title', display_name),
+                'artist': tags.get('artist') or tags.get('album_artist', 'Unknown'),
+                'album': tags.get('album', 'Unknown'),
+                'genre': tags.get('genre', 'Unknown'),
                 'duration': getattr(audio_file.info, 'length', 0),
                 'bitrate': getattr(audio_file.info, 'bitrate', 0),
                 'format': os.path.splitext(file_path)[1][1:].lower(),
-                'file_size': os.path.getsize(file_path)
+                'file_size': os.path.getsize(file_path),
+                'metadata_json': split_extras(tags) or None,
+                'cover_hash': covers.save(extract_picture(audio_file)) if covers else None
             }
-            print(f"Debug - Extracted metadata: {metadata}")
+            logger.debug("Extracted metadata: %s", metadata)
             return metadata
         
         except Exception as e:
-            print(f"Error extracting metadata: {e}")
+            logger.warning("Error extracting metadata from %s: %s", file_path, e)
             return {
-                'title': os.path.splitext(os.path.basename(file_path))[0],
+                'title': display_name,
                 'artist': 'Unknown',
                 'album': 'Unknown',
                 'genre': 'Unknown',
@@ -111,10 +150,10 @@ class AudioFileManager:
                 os.remove(file_path)
                 return True
             else:
-                print("File does not exist")
+                logger.info("File does not exist: %s", file_path)
                 return False
         except Exception as e:
-            print(f"Error deleting file: {e}")
+            logger.error("Error deleting file %s: %s", file_path, e)
             return False
 
 
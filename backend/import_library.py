@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Bulk library import
+
+Walks a directory tree, reads tags from every supported audio file across a
+process pool, copies the files into the content-addressed blob store and
+inserts Song rows in large batches (one commit per batch). Embedded cover
+art is resized in the same worker processes. Fingerprint, peaks and HLS
+segment jobs are queued in the same commit for worker.py (or the API's job
+recovery) to run. Progress is checkpointed after every batch so an
+interrupted import picks up where it stopped.
+
+Usage:
+    python import_library.py /music --user alice
+    python import_library.py /music --user alice --skip-enrichment --workers 8 --batch-size 1000
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import islice
+
+# Add the backend directory to the path
+sys.path.append('/app')
+
+from werkzeug.utils import secure_filename
+
+from app import app, db
+from blob_store import BlobStore
+from cover_store import CoverStore
+from database.models import AudioBlob, Job, Song, User
+from file_manager import AudioFileManager
+from metadata.metadata_enhancer import MetadataEnhancer
+
+HASH_CHUNK = 1024 * 1024
+COLUMN_LIMITS = {'title': 255, 'artist': 255, 'album': 255, 'genre': 100}
+
+
+def walk_key(root, path):
+    """Sort key of `path` in iter_audio_files order: its components below `root`"""
+    return tuple(os.path.relpath(path, root).split(os.sep))
+
+
+def iter_audio_files(root, resume_after=None):
+    """Yield audio files ordered by walk_key, skipping everything up to and including `resume_after`.
+
+    Resuming compares keys rather than looking for `resume_after` itself, so it
+    still works when that file was moved or deleted since the checkpoint.
+    """
+    resume_key = walk_key(root, resume_after) if resume_after else None
+
+    def walk(directory):
+        with os.scandir(directory) as entries:
+            entries = sorted(entries, key=lambda entry: entry.name)
+        for entry in entries:
+            key = walk_key(root, entry.path)
+            if entry.is_dir(follow_symlinks=False):
+                # directories sorting wholly before the checkpoint are not read at all
+                if resume_key is None or key >= resume_key[:len(key)]:
+                    yield from walk(entry.path)
+                continue
+            name = entry.name
+            if '.' not in name or name.rsplit('.', 1)[1].lower() not in AudioFileManager.ALLOWED_EXTENSIONS:
+                continue
+            if resume_key is None or key > resume_key:
+                yield entry.path
+
+    yield from walk(root)
+
+
+def scan_file(path, covers=None):
+    """Worker process: hash the file, read its embedded tags and store its cover art"""
+    try:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+                digest.update(chunk)
+        tags = AudioFileManager._extract_embedded_tags(path, os.path.basename(path), covers)
+        return path, digest.hexdigest(), tags, None
+    except Exception as e:
+        return path, None, None, str(e)
+
+
+def song_row(metadata, user_id):
+    row = {
+        'title': metadata['title'],
+        'artist': metadata['artist'],
+        'album': metadata['album'],
+        'genre': metadata.get('genre', 'Unknown'),
+        'duration': metadata.get('duration'),
+        'file_path': metadata['file_path'],
+        'file_size': metadata['file_size'],
+        'bitrate': metadata.get('bitrate', 0),
+        'format': metadata['format'],
+        'blob_hash': metadata['blob_hash'],
+        'cover_hash': metadata.get('cover_hash'),
+        'metadata_json': metadata.get('metadata_json'),
+        'user_id': user_id
+    }
+    for column, limit in COLUMN_LIMITS.items():
+        if row[column] and len(row[column]) > limit:
+            row[column] = row[column][:limit]
+    return row
+
+
+def load_checkpoint(path, root):
+    if path and os.path.exists(path):
+        with open(path) as f:
+            checkpoint = json.load(f)
+        if checkpoint.get('root') == os.path.abspath(root):
+            return checkpoint
+        print(f"Ignoring checkpoint for a different root: {checkpoint.get('root')}")
+    return {'root': os.path.abspath(root), 'last_path': None, 'pending_path': None, 'imported': 0, 'failed': 0, 'bytes': 0}
+
+
+def save_checkpoint(path, checkpoint):
+    if not path:
+        return
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+
+def job_rows(songs, new_blobs):
+    """Queued fingerprint jobs for every song and peaks/segment jobs for every new blob"""
+    rows = [{'kind': 'fingerprint', 'payload': json.dumps({'song_id': str(song_id)}),
+             'dedupe_key': f"fingerprint:{song_id}"} for song_id, _ in songs]
+    first_song = {}
+    for song_id, sha in songs:
+        if sha in new_blobs:
+            first_song.setdefault(sha, song_id)
+    for sha, song_id in first_song.items():
+        rows += [{'kind': kind, 'payload': json.dumps({'song_id': str(song_id)}), 'dedupe_key': f"{kind}:{sha}"}
+                 for kind in ('segment', 'peaks')]
+    return rows
+
+
+def insert_batch(results, user_id, store, enhancer, enrich, recheck=frozenset()):
+    """Copy blobs, build rows and insert them and their jobs with one commit.
+
+    Files in `recheck` belong to a batch whose commit may or may not have
+    landed before an interruption; those the user already has are skipped.
+    Returns (imported, failed, bytes).
+    """
+    hashes = {sha for _, sha, _, _ in results if sha}
+    known_paths = dict(db.session.execute(
+        db.select(AudioBlob.sha256, AudioBlob.file_path).where(AudioBlob.sha256.in_(hashes))
+    ).all()) if hashes else {}
+    owned = set(db.session.execute(
+        db.select(Song.blob_hash).where(Song.user_id == user_id, Song.blob_hash.in_(hashes))
+    ).scalars()) if recheck and hashes else set()
+
+    scanned, failed = [], 0
+    for path, sha, tags, error in results:
+        if error:
+            print(f"  skipped {path}: {error}")
+            failed += 1
+            continue
+        if path in recheck and sha in owned:
+            continue
+        scanned.append((path, sha, tags, secure_filename(os.path.basename(path))))
+
+    # one batched MusicBrainz pass for the whole batch instead of a query per file
+    enhanced = enhancer.enhance_batch([(tags, filename) for _, _, tags, filename in scanned], online=enrich)
+
+    rows, blob_refs, total_bytes = [], {}, 0
+    for (path, sha, _, filename), metadata in zip(scanned, enhanced):
+        ext = os.path.splitext(filename)[1]
+        known = known_paths.get(sha) or (blob_refs[sha][0] if sha in blob_refs else None)
+        _, rel_path, size = store.ingest_hashed(path, sha, ext, known)
+
+        metadata.update({'file_path': rel_path, 'file_size': size, 'blob_hash': sha})
+        rows.append(song_row(metadata, user_id))
+
+        refs = blob_refs[sha][2] if sha in blob_refs else 0
+        blob_refs[sha] = (rel_path, size, refs + 1)
+        total_bytes += size
+
+    store.acquire_many(blob_refs)
+    if rows:
+        songs = db.session.execute(
+            db.insert(Song).returning(Song.id, Song.blob_hash, sort_by_parameter_order=True), rows
+        ).all()
+        db.session.execute(db.insert(Job), job_rows(songs, set(blob_refs) - set(known_paths)))
+    db.session.commit()
+    return len(rows), failed, total_bytes
+
+
+def import_library(root, username, batch_size, workers, enrich, checkpoint_path):
+    with app.app_context():
+        user = User.query.filter_by(username=username).first()
+        if not user:
+            print(f"User '{username}' not found")
+            return 1
+
+        store = BlobStore(app.config['UPLOAD_FOLDER'])
+        scan = partial(scan_file, covers=CoverStore(app.config['UPLOAD_FOLDER']))
+        enhancer = MetadataEnhancer()
+        checkpoint = load_checkpoint(checkpoint_path, root)
+        if checkpoint['last_path']:
+            print(f"Resuming after {checkpoint['last_path']} ({checkpoint['imported']} already imported)")
+        # the batch that was being inserted when the last run stopped
+        pending_key = walk_key(root, checkpoint['pending_path']) if checkpoint.get('pending_path') else None
+
+        paths = iter_audio_files(root, checkpoint['last_path'])
+        started = time.perf_counter()
+        session_files, session_bytes = 0, 0
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # keep the pool scanning the next batch while this one is inserted
+            batch = list(islice(paths, batch_size))
+            pending = pool.map(scan, batch, chunksize=max(1, len(batch) // (workers * 4)))
+            while batch:
+                next_batch = list(islice(paths, batch_size))
+                next_pending = pool.map(scan, next_batch, chunksize=max(1, len(next_batch) // (workers * 4))) if next_batch else None
+
+                recheck = frozenset(path for path in batch if pending_key and walk_key(root, path) <= pending_key)
+                checkpoint['pending_path'] = batch[-1]
+                save_checkpoint(checkpoint_path, checkpoint)
+                imported, failed, batch_bytes = insert_batch(list(pending), user.id, store, enhancer, enrich, recheck)
+
+                checkpoint['last_path'] = batch[-1]
+                checkpoint['pending_path'] = None
+                checkpoint['imported'] += imported
+                checkpoint['failed'] += failed
+                checkpoint['bytes'] += batch_bytes
+                save_checkpoint(checkpoint_path, checkpoint)
+
+                session_files += imported + failed
+                session_bytes += batch_bytes
+                elapsed = time.perf_counter() - started
+                print(f"{checkpoint['imported']} imported, {checkpoint['failed']} failed | "
+                      f"{session_files / elapsed:.1f} files/s, {session_bytes / elapsed / 1e6:.1f} MB/s")
+
+                batch, pending = next_batch, next_pending
+
+        elapsed = time.perf_counter() - started
+        print(f"Done: {session_files} files, {session_bytes / 1e6:.1f} MB in {elapsed:.1f}s "
+              f"({session_files / max(elapsed, 1e-9):.1f} files/s, {session_bytes / max(elapsed, 1e-9) / 1e6:.1f} MB/s)")
+        return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('root', help='directory to import')
+    parser.add_argument('--user', required=True, help='username that will own the songs')
+    parser.add_argument('--batch-size', type=int, default=500, help='rows per INSERT/commit')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2, help='tag extraction processes')
+    parser.add_argument('--skip-enrichment', action='store_true', help='no MusicBrainz/Last.fm lookups, tags and filenames only')
+    parser.add_argument('--checkpoint', default='.import_checkpoint.json', help='checkpoint file ("" to disable)')
+    args = parser.parse_args()
+
+    sys.exit(import_library(args.root, args.user, args.batch_size, args.workers,
+                            not args.skip_enrichment, args.checkpoint))
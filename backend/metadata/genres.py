@@ -0,0 +1,197 @@
+import json
+import os
+import re
+import threading
+import unicodedata
+from collections import deque
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from flask import current_app, has_app_context
+
+
+DEFAULT_TAXONOMY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'genres.json')
+
+EXACT_WEIGHT = 1.0  # tag is exactly a genre ("indie rock")
+PARTIAL_WEIGHT = 0.5  # genre inside a longer tag ("90s indie rock")
+PARENT_BONUS = 0.25  # share of an ancestor's score added to a matched sub-genre
+TAG_CACHE_SIZE = 65536  # Last.fm tag vocabulary is heavily repeated across tracks
+
+_NON_WORD = re.compile(r'[^\w]+')
+
+
+def normalize_tag(tag: str) -> str:
+    """Case/accent-folded, '&' spelled out, punctuation collapsed to single spaces"""
+    text = unicodedata.normalize('NFKD', tag or '')
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch)).casefold()
+    text = text.replace('&', ' and ').replace("'", '')
+    return _NON_WORD.sub(' ', text).strip()
+
+
+class GenreMatch(NamedTuple):
+    genre: str
+    score: float
+    parents: Tuple[str, ...]
+
+
+class _AhoCorasick:
+    """Multi-pattern matcher: one pass over the text finds every pattern"""
+
+    def __init__(self, patterns: Dict[str, str]):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.output: List[List[Tuple[int, str]]] = [[]]
+
+        for pattern, value in patterns.items():
+            state = 0
+            for ch in pattern:
+                nxt = self.goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[state][ch] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                state = nxt
+            self.output[state].append((len(pattern), value))
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self.goto[state].items():
+                queue.append(nxt)
+                fallback = self.fail[state]
+                while fallback and ch not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[nxt] = self.goto[fallback].get(ch, 0)
+                self.output[nxt] = self.output[nxt] + self.output[self.fail[nxt]]
+
+    def find(self, text: str) -> List[Tuple[int, int, str]]:
+        """(start, end, value) for every occurrence"""
+        matches = []
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(ch, 0)
+            for length, value in self.output[state]:
+                matches.append((i + 1 - length, i + 1, value))
+        return matches
+
+
+class GenreClassifier:
+    """Maps free-form tags (Last.fm top tags) onto a genre taxonomy.
+
+    Every genre name and alias is normalized and compiled into one
+    Aho-Corasick automaton when the taxonomy is loaded. Patterns are padded
+    with spaces so they only match whole words ("rap" never matches "trap").
+    Within a tag only maximal matches count, so "rap metal" is Rap Metal
+    rather than Rap + Metal.
+    """
+
+    def __init__(self, taxonomy: Dict[str, dict]):
+        self.parents: Dict[str, Optional[str]] = {}
+        patterns: Dict[str, str] = {}
+        for genre, entry in taxonomy.items():
+            self.parents[genre] = entry.get('parent')
+            for alias in [genre] + list(entry.get('aliases', [])):
+                key = normalize_tag(alias)
+                if key:
+                    patterns.setdefault(f" {key} ", genre)
+        for genre, parent in self.parents.items():
+            if parent is not None and parent not in self.parents:
+                raise ValueError(f"Genre '{genre}' has unknown parent '{parent}'")
+
+        self.ancestors: Dict[str, Tuple[str, ...]] = {genre: self._ancestors(genre) for genre in self.parents}
+        self._matcher = _AhoCorasick(patterns)
+        self._tag_cache: Dict[str, Tuple[Tuple[str, float], ...]] = {}
+
+    @classmethod
+    def from_file(cls, path: str) -> 'GenreClassifier':
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f)['genres'])
+
+    def _ancestors(self, genre: str) -> Tuple[str, ...]:
+        chain, seen = [], {genre}
+        parent = self.parents.get(genre)
+        while parent is not None and parent not in seen:
+            chain.append(parent)
+            seen.add(parent)
+            parent = self.parents.get(parent)
+        return tuple(chain)
+
+    def match_tag(self, tag: str) -> Tuple[Tuple[str, float], ...]:
+        """Genres in one tag with their match weight"""
+        cached = self._tag_cache.get(tag)
+        if cached is not None:
+            return cached
+
+        normalized = normalize_tag(tag)
+        text = f" {normalized} "
+        spans = self._matcher.find(text) if normalized else []
+        maximal = [
+            (start, end, genre) for start, end, genre in spans
+            if not any(s <= start and end <= e and (s, e) != (start, end) for s, e, _ in spans)
+        ]
+        matches = tuple(
+            (genre, EXACT_WEIGHT if end - start == len(text) else PARTIAL_WEIGHT)
+            for start, end, genre in maximal
+        )
+
+        if len(self._tag_cache) >= TAG_CACHE_SIZE:
+            self._tag_cache.clear()
+        self._tag_cache[tag] = matches
+        return matches
+
+    def classify(self, tags: Iterable) -> List[GenreMatch]:
+        """Score every genre found in `tags`, best first.
+
+        `tags` are strings in rank order, or Last.fm tag dicts with a `count`
+        (0-100). A tag contributes its count (or 100 / rank) times the match
+        weight; sub-genres also get PARENT_BONUS of their ancestors' scores,
+        so "indie rock" + "rock" prefers Indie Rock. Ties go to the deeper
+        genre, then alphabetically, so the result never depends on set order.
+        """
+        scores: Dict[str, float] = {}
+        for rank, tag in enumerate(tags):
+            if isinstance(tag, dict):
+                name = tag.get('name', '')
+                try:
+                    weight = float(tag.get('count'))
+                except (TypeError, ValueError):
+                    weight = 100.0 / (rank + 1)
+            else:
+                name, weight = tag, 100.0 / (rank + 1)
+            for genre, match_weight in self.match_tag(name):
+                scores[genre] = scores.get(genre, 0.0) + weight * match_weight
+
+        ranked = []
+        for genre, score in scores.items():
+            total = score + PARENT_BONUS * sum(scores.get(parent, 0.0) for parent in self.ancestors[genre])
+            ranked.append(GenreMatch(genre, round(total, 4), self.ancestors[genre]))
+        ranked.sort(key=lambda match: (-match.score, -len(match.parents), match.genre))
+        return ranked
+
+    def best_genre(self, tags: Iterable) -> Optional[str]:
+        ranked = self.classify(tags)
+        return ranked[0].genre if ranked and ranked[0].score > 0 else None
+
+
+_classifiers: Dict[str, GenreClassifier] = {}
+_lock = threading.Lock()
+
+
+def get_classifier(path: Optional[str] = None) -> GenreClassifier:
+    """Classifier for GENRE_TAXONOMY (or the bundled genres.json), built once per file"""
+    if path is None:
+        path = current_app.config.get('GENRE_TAXONOMY') if has_app_context() else None
+    path = path or DEFAULT_TAXONOMY
+    with _lock:
+        classifier = _classifiers.get(path)
+        if classifier is None:
+            classifier = GenreClassifier.from_file(path)
+            _classifiers[path] = classifier
+        return classifier
+
+
+# build the bundled taxonomy at import so no request pays for it
+get_classifier(DEFAULT_TAXONOMY)
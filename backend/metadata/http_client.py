@@ -0,0 +1,171 @@
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from flask import current_app, has_app_context
+
+
+logger = logging.getLogger(__name__)
+
+POOL_SIZE = 10  # kept-alive connections per host
+MAX_PER_HOST = 4  # concurrent requests per host
+RETRIES = 2
+BACKOFF = 0.5  # seconds, doubled per attempt with full jitter
+MAX_BACKOFF = 8.0
+DEFAULT_TIMEOUT = (3.05, 10)  # (connect, read)
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+FAN_OUT_WORKERS = 8
+
+
+class ProviderClient:
+    """HTTP client shared by the metadata providers (MusicBrainz, Last.fm).
+
+    One `requests.Session` keeps connections alive across lookups, a
+    semaphore per host caps concurrent requests to each provider, and
+    connection errors, timeouts and 429/5xx answers are retried with jittered
+    exponential backoff (a Retry-After header wins when it is shorter than
+    MAX_BACKOFF). `throttle` runs before every attempt, so retries still go
+    through the provider's rate limiter.
+    """
+
+    def __init__(self, pool_size: int = POOL_SIZE, max_per_host: int = MAX_PER_HOST,
+                 retries: int = RETRIES, backoff: float = BACKOFF):
+        self.max_per_host = max_per_host
+        self.retries = retries
+        self.backoff = backoff
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._lock = threading.Lock()
+        self._hosts: Dict[str, threading.BoundedSemaphore] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def _host(self, host: str):
+        with self._lock:
+            semaphore = self._hosts.get(host)
+            if semaphore is None:
+                semaphore = threading.BoundedSemaphore(self.max_per_host)
+                self._hosts[host] = semaphore
+                self._stats[host] = {'requests': 0, 'retries': 0, 'errors': 0, 'in_flight': 0}
+            return semaphore, self._stats[host]
+
+    def _count(self, stats: Dict[str, int], name: str, delta: int = 1):
+        with self._lock:
+            stats[name] += delta
+
+    def _delay(self, attempt: int, response: Optional[requests.Response]) -> float:
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), MAX_BACKOFF)
+            except ValueError:
+                pass  # HTTP-date form; fall back to backoff
+        return random.uniform(0, min(MAX_BACKOFF, self.backoff * (2 ** attempt)))
+
+    def get(self, url: str, params=None, headers=None, timeout=DEFAULT_TIMEOUT,
+            throttle: Optional[Callable[[], object]] = None) -> requests.Response:
+        """GET with pooling, per-host limits and retries.
+
+        Returns the last response (which may still be a 5xx once retries run
+        out) or raises the last connection error.
+        """
+        semaphore, stats = self._host(urlsplit(url).netloc)
+        for attempt in range(self.retries + 1):
+            if throttle:
+                throttle()
+            response, error = None, None
+            with semaphore:
+                self._count(stats, 'in_flight')
+                try:
+                    response = self.session.get(url, params=params, headers=headers, timeout=timeout)
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    error = e
+                finally:
+                    self._count(stats, 'in_flight', -1)
+                    self._count(stats, 'requests')
+
+            retryable = error is not None or response.status_code in RETRY_STATUSES
+            if not retryable or attempt == self.retries:
+                break
+            delay = self._delay(attempt, response)
+            logger.info("Retrying %s in %.2fs (%s)", url, delay, error or response.status_code)
+            self._count(stats, 'retries')
+            time.sleep(delay)
+
+        if error is not None:
+            self._count(stats, 'errors')
+            raise error
+        return response
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {host: dict(stats) for host, stats in self._stats.items()}
+
+
+_client: Optional[ProviderClient] = None
+_client_lock = threading.Lock()
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_client() -> ProviderClient:
+    """The process-wide client; HTTP_POOL_SIZE / HTTP_MAX_PER_HOST / HTTP_RETRIES of the first caller win"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            config = current_app.config if has_app_context() else {}
+            _client = ProviderClient(
+                pool_size=int(config.get('HTTP_POOL_SIZE', POOL_SIZE)),
+                max_per_host=int(config.get('HTTP_MAX_PER_HOST', MAX_PER_HOST)),
+                retries=int(config.get('HTTP_RETRIES', RETRIES))
+            )
+        return _client
+
+
+def client_stats() -> Dict[str, Dict[str, int]]:
+    with _client_lock:
+        client = _client
+    return client.stats() if client else {}
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _client_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=FAN_OUT_WORKERS, thread_name_prefix='waves-http')
+        return _executor
+
+
+def fan_out(*calls: Callable[[], object]) -> List:
+    """Run independent calls concurrently and return their results in order.
+
+    The first call runs in the caller's thread, the rest on a shared pool
+    inside the caller's app context. Before waiting, the caller takes back
+    any call the pool has not started yet, so nested fan-outs can never
+    deadlock on a saturated pool. The first exception is re-raised.
+    """
+    if len(calls) < 2:
+        return [call() for call in calls]
+
+    app = current_app._get_current_object() if has_app_context() else None
+
+    def in_context(call):
+        def run():
+            if app is None:
+                return call()
+            with app.app_context():
+                return call()
+        return run
+
+    executor = _get_executor()
+    futures = [executor.submit(in_context(call)) for call in calls[1:]]
+    results = [calls[0]()]
+    for call, future in zip(calls[1:], futures):
+        results.append(call() if future.cancel() else future.result())
+    return results
@@ -0,0 +1,175 @@
+import json
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+
+from flask import current_app, has_app_context
+from sqlalchemy.exc import SQLAlchemyError
+
+from database import db
+from database.models import MetadataLookupCache
+
+
+DEFAULT_TTL = 30 * 24 * 3600  # found results: MusicBrainz/Last.fm data rarely changes
+DEFAULT_NEGATIVE_TTL = 24 * 3600  # misses: retry daily in case the databases caught up
+MEMORY_ENTRIES = 10000
+
+_NON_WORD = re.compile(r'[^\w\s]')
+_SPACES = re.compile(r'\s+')
+
+
+def normalize_key(*parts: Optional[str]) -> str:
+    """Case/accent/punctuation-insensitive key, so 'Beyoncé - Halo!' and 'beyonce halo' share an entry"""
+    normalized = []
+    for part in parts:
+        text = unicodedata.normalize('NFKD', part or '')
+        text = ''.join(ch for ch in text if not unicodedata.combining(ch)).casefold()
+        text = _SPACES.sub(' ', _NON_WORD.sub(' ', text)).strip()
+        normalized.append(text)
+    return '\x1f'.join(normalized)[:512]
+
+
+class LookupCache:
+    """Two-level cache for online metadata lookups.
+
+    An in-process LRU answers repeats in microseconds; the
+    `metadata_lookup_cache` table shares results across workers and
+    restarts. `None` values are cached too (negative caching) with a shorter
+    TTL. The table is only used inside an app context.
+    """
+    MISS = object()
+
+    def __init__(self, max_entries: int = MEMORY_ENTRIES):
+        self.max_entries = max_entries
+        self._memory: 'OrderedDict[Tuple[str, str], Tuple[float, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[str, int]] = {}
+
+    def get(self, source: str, key: str) -> Any:
+        """Cached value (possibly None for a cached miss) or LookupCache.MISS"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get((source, key))
+            if entry is not None:
+                if entry[0] > now:
+                    self._memory.move_to_end((source, key))
+                    self._count(source, 'memory_hits', negative=entry[1] is None)
+                    return entry[1]
+                del self._memory[(source, key)]
+
+        value, expires = self._db_get(source, key)
+        with self._lock:
+            if value is self.MISS:
+                self._count(source, 'misses')
+                return self.MISS
+            self._count(source, 'db_hits', negative=value is None)
+            self._remember(source, key, value, expires)
+        return value
+
+    def set(self, source: str, key: str, value: Any, ttl: Optional[int] = None):
+        if ttl is None:
+            ttl = self._ttl(value is None)
+        expires = time.time() + ttl
+        with self._lock:
+            self._remember(source, key, value, expires)
+            self._count(source, 'stores')
+        self._db_set(source, key, value, expires)
+
+    def clear_memory(self):
+        with self._lock:
+            self._memory.clear()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            stats = {}
+            for source, counters in self._counters.items():
+                hits = counters.get('memory_hits', 0) + counters.get('db_hits', 0)
+                lookups = hits + counters.get('misses', 0)
+                stats[source] = dict(counters, hit_ratio=round(hits / lookups, 3) if lookups else 0.0,
+                                     requests_saved=hits)
+            stats['memory_entries'] = len(self._memory)
+            return stats
+
+    def _count(self, source: str, name: str, negative: bool = False):
+        counters = self._counters.setdefault(source, {
+            'memory_hits': 0, 'db_hits': 0, 'negative_hits': 0, 'misses': 0, 'stores': 0, 'errors': 0
+        })
+        counters[name] += 1
+        if negative:
+            counters['negative_hits'] += 1
+
+    def _remember(self, source: str, key: str, value: Any, expires: float):
+        self._memory[(source, key)] = (expires, value)
+        self._memory.move_to_end((source, key))
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    @staticmethod
+    def _ttl(negative: bool) -> int:
+        if has_app_context():
+            name = 'LOOKUP_CACHE_NEGATIVE_TTL' if negative else 'LOOKUP_CACHE_TTL'
+            return int(current_app.config.get(name, DEFAULT_NEGATIVE_TTL if negative else DEFAULT_TTL))
+        return DEFAULT_NEGATIVE_TTL if negative else DEFAULT_TTL
+
+    def _db_get(self, source: str, key: str) -> Tuple[Any, float]:
+        if not has_app_context():
+            return self.MISS, 0
+        try:
+            # own connection: never touches the caller's session or transaction
+            with db.engine.connect() as conn:
+                row = conn.execute(
+                    db.select(MetadataLookupCache.result, MetadataLookupCache.expires_at)
+                    .where(MetadataLookupCache.source == source, MetadataLookupCache.lookup_key == key)
+                ).first()
+        except SQLAlchemyError as e:
+            current_app.logger.warning("Lookup cache read failed: %s", e)
+            with self._lock:
+                self._count(source, 'errors')
+            return self.MISS, 0
+
+        if row is None:
+            return self.MISS, 0
+        expires_at = row.expires_at if row.expires_at.tzinfo else row.expires_at.replace(tzinfo=timezone.utc)
+        if expires_at <= datetime.now(timezone.utc):
+            return self.MISS, 0
+        return (json.loads(row.result) if row.result is not None else None), expires_at.timestamp()
+
+    def _db_set(self, source: str, key: str, value: Any, expires: float):
+        if not has_app_context():
+            return
+        values = {
+            'source': source,
+            'lookup_key': key,
+            'result': json.dumps(value) if value is not None else None,
+            'fetched_at': datetime.now(timezone.utc),
+            'expires_at': datetime.fromtimestamp(expires, timezone.utc),
+        }
+        try:
+            with db.engine.begin() as conn:
+                dialect = conn.dialect.name
+                if dialect == 'postgresql':
+                    from sqlalchemy.dialects.postgresql import insert
+                elif dialect == 'sqlite':
+                    from sqlalchemy.dialects.sqlite import insert
+                else:
+                    conn.execute(db.delete(MetadataLookupCache).where(
+                        MetadataLookupCache.source == source, MetadataLookupCache.lookup_key == key))
+                    conn.execute(db.insert(MetadataLookupCache).values(**values))
+                    return
+                statement = insert(MetadataLookupCache).values(**values)
+                conn.execute(statement.on_conflict_do_update(
+                    index_elements=['source', 'lookup_key'],
+                    set_={name: statement.excluded[name] for name in ('result', 'fetched_at', 'expires_at')}
+                ))
+        except SQLAlchemyError as e:
+            current_app.logger.warning("Lookup cache write failed: %s", e)
+            with self._lock:
+                self._count(source, 'errors')
+
+
+# process-wide: every MusicDBLookup shares one memory layer and one set of counters
+lookup_cache = LookupCache()
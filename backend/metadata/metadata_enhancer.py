@@ -1,12 +1,15 @@
+import logging
 from .metadata_parser import MetadataParser
 from .online_lookup import MusicDBLookup
-from typing import Dict
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
 
 
 class MetadataEnhancer:
-    def __init__(self):
+    def __init__(self, lookup_service: MusicDBLookup = None):
         self.parser = MetadataParser()  
-        self.lookup_service = MusicDBLookup()
+        self.lookup_service = lookup_service or MusicDBLookup()
 
     def _needs_enhancement(self, metadata: Dict) -> bool:
         return (metadata.get('title') == 'Unknown' or 
@@ -14,72 +17,92 @@ class MetadataEnhancer:
                 metadata.get('album') == 'Unknown' or
                 metadata.get('genre') == 'Unknown')
     
-    def enhance_metadata(self, metadata: Dict, filename: str) -> Dict:
-        """Enhance metadata using filename parsing and online lookup"""
-        print(f"DEBUG - enhance_metadata called with filename: {filename}")
-        print(f"DEBUG - Input metadata: {metadata}")
+    def enhance_metadata(self, metadata: Dict, filename: str, online: bool = True, parsed: Dict = None) -> Dict:
+        """Enhance metadata using filename parsing and (unless online=False) online lookup"""
+        logger.debug("enhance_metadata called with filename: %s", filename)
+        logger.debug("Input metadata: %s", metadata)
         
         enhanced = metadata.copy()
         
         needs_enhancement = self._needs_enhancement(metadata)
-        print(f"DEBUG - Needs enhancement: {needs_enhancement}")
+        logger.debug("Needs enhancement: %s", needs_enhancement)
         
         if needs_enhancement:
-            parsed = self.parser.parse_filename(filename)
-            print(f"DEBUG - Parsed filename: {parsed}")
+            if parsed is None:
+                parsed = self.parser.parse_filename(filename)
+            logger.debug("Parsed filename: %s", parsed)
             
             for key, value in parsed.items():
                 if enhanced.get(key) == 'Unknown' and value != 'Unknown':
-                    print(f"DEBUG - Updating {key}: {enhanced.get(key)} -> {value}")
+                    logger.debug("Updating %s: %s -> %s", key, enhanced.get(key), value)
                     enhanced[key] = value
                 elif key == 'title' and value != 'Unknown' and enhanced.get(key) != 'Unknown':
-                    print(f"DEBUG - Updating title from parsed: {enhanced.get(key)} -> {value}")
+                    logger.debug("Updating title from parsed: %s -> %s", enhanced.get(key), value)
                     enhanced[key] = value
             
-            print(f"DEBUG - After filename parsing: {enhanced}")
+            logger.debug("After filename parsing: %s", enhanced)
             
             # online lookup if we have artist + title
-            if (enhanced.get('artist') != 'Unknown' and 
+            if (online and
+                enhanced.get('artist') != 'Unknown' and 
                 enhanced.get('title') != 'Unknown'):
                 
-                print(f"DEBUG - Attempting online lookup for: {enhanced['artist']} - {enhanced['title']}")
-                
+                logger.debug("Attempting online lookup for: %s - %s", enhanced['artist'], enhanced['title'])
                 
-                # Try online lookup with original artist/title
-                online_result = self.lookup_service.search_track(
-                    artist=enhanced.get('artist'),
-                    title=enhanced.get('title')
-                )
                 
-                print(f"DEBUG - Online lookup result: {online_result}")   
+                online_result = self.lookup_service.search_track(artist=enhanced.get('artist'), title=enhanced.get('title'))
+                logger.debug("Online lookup result: %s", online_result)
+
+                # the swapped names are only tried when the original finds nothing
+                if not online_result:
+                    online_result = self.lookup_service.search_track(artist=enhanced.get('title'), title=enhanced.get('artist'))
+                    if online_result:
+                        logger.debug("Reverse lookup succeeded! Using swapped metadata")
 
-                # try swapping artist/title if no result
-                if (not online_result and 
-                    enhanced.get('artist') != 'Unknown' and 
-                    enhanced.get('title') != 'Unknown'):
-                    
-                    print(f"DEBUG - Original lookup failed, trying reversed...")
-                    
-                    reversed_result = self.lookup_service.search_track(
-                        artist=enhanced.get('title'),   
-                        title=enhanced.get('artist')    
-                    )
-                    
-                    if reversed_result:
-                        print(f"DEBUG - Reverse lookup succeeded! Using swapped metadata")
-                        online_result = reversed_result
-                        enhanced['artist'] = reversed_result['artist']
-                        enhanced['title'] = reversed_result['title']
-                
                 # apply online result if found
                 if online_result:
-                    # Prefer online data over parsed data (more accurate)
-                    for key, value in online_result.items():
-                        if value != 'Unknown':
-                            print(f"DEBUG - Online update {key}: {enhanced.get(key)} -> {value}")
-                            enhanced[key] = value
+                    self._apply_online_result(enhanced, online_result)
             else:
-                print(f"DEBUG - Skipping online lookup - missing artist or title")
+                logger.debug("Skipping online lookup - missing artist or title")
         
-        print(f"DEBUG - Final enhanced metadata: {enhanced}")
-        return enhanced
\ No newline at end of file
+        logger.debug("Final enhanced metadata: %s", enhanced)
+        return enhanced
+
+    def _apply_online_result(self, enhanced: Dict, online_result: Dict):
+        # Prefer online data over parsed data (more accurate)
+        for key, value in online_result.items():
+            if value != 'Unknown':
+                logger.debug("Online update %s: %s -> %s", key, enhanced.get(key), value)
+                enhanced[key] = value
+
+    def enhance_batch(self, items: List[Tuple[Dict, str]], online: bool = True) -> List[Dict]:
+        """Bulk form of enhance_metadata for (metadata, filename) pairs.
+
+        Filename parsing runs per item; the online part is one batched
+        MusicBrainz pass for all items, then one more for the swapped
+        artist/title of whatever is still unresolved.
+        """
+        parsed = self.parser.parse_filenames([filename for _, filename in items])
+        enhanced = [
+            self.enhance_metadata(metadata, filename, online=False, parsed=names)
+            for (metadata, filename), names in zip(items, parsed)
+        ]
+        if not online:
+            return enhanced
+
+        todo = [
+            i for i, (metadata, _) in enumerate(items)
+            if self._needs_enhancement(metadata)
+            and enhanced[i].get('artist') != 'Unknown' and enhanced[i].get('title') != 'Unknown'
+        ]
+        results = self.lookup_service.search_tracks([(enhanced[i]['artist'], enhanced[i]['title']) for i in todo])
+
+        missing = [i for i, result in zip(todo, results) if not result]
+        reversed_results = self.lookup_service.search_tracks(
+            [(enhanced[i]['title'], enhanced[i]['artist']) for i in missing]
+        ) if missing else []
+
+        for i, result in list(zip(todo, results)) + list(zip(missing, reversed_results)):
+            if result:
+                self._apply_online_result(enhanced[i], result)
+        return enhanced
@@ -1,110 +1,197 @@
 import re
-import os
-from typing import Dict
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional
+
+# all patterns are compiled once at import; parsing does no I/O.
+# `_` counts as a word character for \b, so word edges are spelled out
+# to catch secure_filename's underscores ("Get_Lucky_Official_Video").
+_START, _END = r'(?<![^\W_])', r'(?![^\W_])'
+_UPLOAD_SUFFIX = re.compile(r'[a-f0-9]{8}')  # '_<8 hex>' added to stored uploads
+_TRACK_NUMBER = re.compile(
+    r'^(?P<open>[(\[])?(?P<track>(?:\d[-.])?\d{1,3})(?(open)[)\]])(?P<sep>\s*[.)]\s*|\s*[-_]+\s*|\s+)'
+)
+_SEPARATOR = re.compile(r'_-_|\s[-–—]\s|_')
+_TRACK_START = frozenset('0123456789([')
+_OPENERS = {')': '(', ']': '[', '}': '{'}
+_BRACKET_NOISE = re.compile(
+    _START + r'(?:official|video|audio|lyrics?|remaster(?:ed)?|hd|hq|4k|1080p|720p|visuali[sz]er|explicit|mv|m/v)' + _END,
+    re.IGNORECASE
+)
+_DASH = re.compile(r'\s[-–—]\s')
+# these two start with a separator character so the regex engine can skip ahead to candidates
+_FEAT = re.compile(r'[\s_(\[](?:feat|ft|featuring)' + _END + r'\.?[\s_]', re.IGNORECASE)
+_NOISE_TAIL = re.compile(r'[\s_(\[](?:official|video|audio|lyrics?|remaster(?:ed)?|hd|hq)' + _END, re.IGNORECASE)
+_CUT_CHARS = ' _-([{'  # separators left dangling once a tail is cut off
+_ARTIST_NOISE = ('official', 'video', 'remastered', 'lyrics', 'audio')
+
+
+class ParsedName:
+    """Working state for one filename as it passes through the rule table"""
+    __slots__ = ('stem', 'artist', 'title')
+
+    def __init__(self, stem: str):
+        self.stem = stem
+        self.artist: Optional[str] = None
+        self.title: Optional[str] = None
+
+
+class FilenameRule(NamedTuple):
+    name: str
+    apply: Callable[[ParsedName], None]
+
+
+def _strip_upload_suffix(parsed: ParsedName):
+    stem = parsed.stem
+    if len(stem) > 9 and stem[-9] == '_' and _UPLOAD_SUFFIX.fullmatch(stem, len(stem) - 8):
+        parsed.stem = stem[:-9]
+
+
+def _strip_track_number(parsed: ParsedName):
+    """'01 - ', '01. ', '(03) ', '1-07 '; a bare '50 ' or '311 - ' is part of the name"""
+    if parsed.stem[:1] not in _TRACK_START:
+        return
+    match = _TRACK_NUMBER.match(parsed.stem)
+    if not match:
+        return
+    rest = parsed.stem[match.end():]
+    track, sep = match.group('track'), match.group('sep')
+    if (match.group('open') or '.' in sep or ')' in sep or track[0] == '0' or not track.isdigit()
+            or (sep.strip() and _SEPARATOR.search(rest))):
+        if rest:
+            parsed.stem = rest
+
+
+def _strip_bracketed_suffix(parsed: ParsedName):
+    """Trailing '(Official Video)', '[HD]', '{Lyrics}' groups; '(Live)' or '(Remix)' stay"""
+    stem = parsed.stem.rstrip(' _')
+    while stem[-1:] in _OPENERS:
+        start = stem.rfind(_OPENERS[stem[-1]], 0, -1)
+        if start <= 0 or not _BRACKET_NOISE.search(stem, start + 1, len(stem) - 1):
+            break
+        stem = stem[:start].rstrip(' _')
+    if len(stem) < len(parsed.stem.rstrip(' _')):
+        parsed.stem = stem
+
+
+def _split_on(separator: str) -> Callable[[ParsedName], None]:
+    def split(parsed: ParsedName):
+        if parsed.title is None and separator in parsed.stem:
+            parsed.artist, parsed.title = parsed.stem.split(separator, 1)
+    return split
+
+
+def _split_dash(parsed: ParsedName):
+    if parsed.title is None:
+        parts = _DASH.split(parsed.stem, 1)
+        if len(parts) == 2:
+            parsed.artist, parsed.title = parts
+
+
+def _split_single_underscore(parsed: ParsedName):
+    if parsed.title is None and parsed.stem.count('_') == 1:
+        parsed.artist, parsed.title = parsed.stem.split('_', 1)
+
+
+def _split_underscores(parsed: ParsedName):
+    if parsed.title is None and '_' in parsed.stem:
+        first, rest = parsed.stem.split('_', 1)
+        if len(first) <= 15 and not any(word in first.lower() for word in _ARTIST_NOISE):
+            parsed.artist, parsed.title = first, rest
+
+
+def _split_words(parsed: ParsedName):
+    """Last resort: the first word is taken as the artist"""
+    if parsed.title is None:
+        words = MetadataParser._clean_title(parsed.stem).split()
+        if len(words) >= 2:
+            parsed.artist, parsed.title = words[0], ' '.join(words[1:])
+        else:
+            parsed.title = parsed.stem
+
+
+def _cut_at(pattern: re.Pattern, text: str) -> str:
+    """`text` up to the first match of `pattern`, or unchanged when that leaves nothing"""
+    match = pattern.search(text)
+    if not match:
+        return text
+    return text[:match.start()].rstrip(_CUT_CHARS) or text
+
+
+def _squash(text: str) -> str:
+    return ' '.join(text.replace('_', ' ').split())
+
+
+def _strip_featuring(parsed: ParsedName):
+    """'Artist feat. X' -> 'Artist', 'Title (ft. X)' -> 'Title'"""
+    if parsed.artist:
+        parsed.artist = _cut_at(_FEAT, parsed.artist)
+    if parsed.title:
+        parsed.title = _cut_at(_FEAT, parsed.title)
+
+
+def _clean_fields(parsed: ParsedName):
+    if parsed.artist is not None:
+        parsed.artist = _squash(parsed.artist)
+    raw_title = parsed.title or ''
+    parsed.title = MetadataParser._clean_title(raw_title) or _squash(raw_title)
+
+
+DEFAULT_RULES = (
+    FilenameRule('upload_suffix', _strip_upload_suffix),
+    FilenameRule('track_number', _strip_track_number),
+    FilenameRule('bracketed_suffix', _strip_bracketed_suffix),
+    FilenameRule('artist_underscore_dash_title', _split_on('_-_')),
+    FilenameRule('artist_dash_title', _split_dash),
+    FilenameRule('artist_underscore_title', _split_single_underscore),
+    FilenameRule('artist_underscores_title', _split_underscores),
+    FilenameRule('words', _split_words),
+    FilenameRule('featuring', _strip_featuring),
+    FilenameRule('clean', _clean_fields),
+)
+
 
 class MetadataParser:
+    """Guesses artist and title from a filename with an ordered rule table.
+
+    Rules run in order on a ParsedName: the first few tidy the stem, the
+    split rules fill in artist/title (each one only if nothing earlier did),
+    and the last ones clean the two fields. Pass `rules` or use add_rule to
+    plug in more.
+    """
+
+    def __init__(self, rules: Optional[Iterable[FilenameRule]] = None):
+        self.rules: List[FilenameRule] = list(DEFAULT_RULES if rules is None else rules)
+
+    def add_rule(self, rule: FilenameRule, before: Optional[str] = None):
+        """Insert `rule` ahead of the rule named `before` (or at the end)"""
+        names = [existing.name for existing in self.rules]
+        self.rules.insert(names.index(before) if before else len(self.rules), rule)
+
     @staticmethod
     def _clean_title(title: str) -> str:
         """Clean up title by removing common video/audio keywords"""
         # remove common suffixes
-        title = re.sub(r'[_\s]*(official|video|audio|lyrics|remastered|hd|hq|feat\.?.*?)([_\s]*.*)?$', '', title, flags=re.IGNORECASE)
+        match = _NOISE_TAIL.search(title)
+        if match:
+            title = title[:match.start()].rstrip(_CUT_CHARS)
         # replace underscores with spaces and clean up
-        title = title.replace('_', ' ')
-        title = re.sub(r'\s+', ' ', title).strip()
-        return title
-    
-    @staticmethod
-    def parse_filename(filename: str) -> Dict[str, str]:
-        name = os.path.splitext(filename)[0]
-        name = re.sub(r'_[a-f0-9]{8}$', '', name)
-        
-        print(f"DEBUG - Cleaned filename: {name}")
-        
-        #algos for different patterns
-        # Pattern 1: Artist_-_Title
-        if '_-_' in name:
-            parts = name.split('_-_', 1)
-            if len(parts) == 2:
-                artist = parts[0].strip()
-                title = MetadataParser._clean_title(parts[1])
-                
-                print(f"DEBUG - Pattern 1 - Cleaned title: '{title}'")
-                
-                return {
-                    'artist': artist,
-                    'title': title,
-                    'album': 'Unknown',
-                    'genre': 'Unknown'
-                }
-        
-        # Pattern 2: Artist - Title  
-        if ' - ' in name:
-            parts = name.split(' - ', 1)
-            if len(parts) == 2:
-                artist = parts[0].strip()
-                title = MetadataParser._clean_title(parts[1])
-                
-                print(f"DEBUG - Pattern 2 - Cleaned title: '{title}'")
-                
-                return {
-                    'artist': artist,
-                    'title': title,
-                    'album': 'Unknown',
-                    'genre': 'Unknown'
-                }
-        
-        # Pattern 3: Artist_Title (single underscore)
-        if '_' in name and name.count('_') == 1:
-            parts = name.split('_', 1)
-            artist = parts[0].strip()
-            title = MetadataParser._clean_title(parts[1])
-            
-            print(f"DEBUG - Pattern 3 - Cleaned title: '{title}'")
-            
-            return {
-                'artist': artist,
-                'title': title,
-                'album': 'Unknown',
-                'genre': 'Unknown'
-            }
-        
-        # Pattern 4: Multiple underscores
-        if '_' in name:
-            parts = name.split('_')
-            if len(parts) >= 2:
-                first_part = parts[0]
-                if (len(first_part) <= 15 and  
-                    not any(word in first_part.lower() for word in ['official', 'video', 'remastered', 'lyrics', 'audio'])):
-                    
-                    title_parts = parts[1:]
-                    title = MetadataParser._clean_title(' '.join(title_parts))
-                    
-                    print(f"DEBUG - Pattern 4 - Cleaned title: '{title}'")
-                    
-                    return {
-                        'artist': first_part,
-                        'title': title if title else ' '.join(parts[1:]),
-                        'album': 'Unknown',
-                        'genre': 'Unknown'
-                    }
-        
-        # fallback
-        title = MetadataParser._clean_title(name)
-        words = title.split()
-        
-        if len(words) >= 2:
-            return {
-                'artist': words[0],
-                'title': ' '.join(words[1:]),
+        return _squash(title).strip(' -')
+
+    def parse_filename(self, filename: str) -> Dict[str, str]:
+        return self.parse_filenames((filename,))[0]
+
+    def parse_filenames(self, filenames: Iterable[str]) -> List[Dict[str, str]]:
+        """Parse many filenames (bulk imports, backfills) in one call"""
+        appliers = [rule.apply for rule in self.rules]
+        results = []
+        for filename in filenames:
+            dot = filename.rfind('.')
+            parsed = ParsedName(filename[:dot] if dot > 0 else filename)  # os.path.splitext for a basename
+            for apply in appliers:
+                apply(parsed)
+            results.append({
+                'artist': parsed.artist or 'Unknown',
+                'title': parsed.title or parsed.stem or 'Unknown',
                 'album': 'Unknown',
                 'genre': 'Unknown'
-            }
-        
-        return {
-            'artist': 'Unknown',
-            'title': title if title else name,
-            'album': 'Unknown',
-            'genre': 'Unknown'
-        }
-    
-
+            })
+        return results
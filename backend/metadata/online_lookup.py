@@ -1,50 +1,229 @@
-import requests
-import time
+import logging
 import os
+import threading
+from difflib import SequenceMatcher
+from typing import Dict, List, Optional, Tuple
 from dotenv import load_dotenv
+from flask import current_app, has_app_context
+from database import db
+from metadata.genres import get_classifier
+from metadata.http_client import fan_out, get_client
+from metadata.lookup_cache import LookupCache, lookup_cache, normalize_key
+from metadata.rate_limiter import DEFAULT_DB_PATH, get_limiter
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 10  # artist/recording clauses per MusicBrainz query
+RESULTS_PER_TRACK = 5
+ACCEPT_SIMILARITY = 0.85  # batched candidate taken as-is
+CANDIDATE_SIMILARITY = 0.5  # below this the batch found nothing for the track
+
+_batch_totals = {'batches': 0, 'tracks': 0, 'cache_hits': 0, 'batched_requests': 0,
+                 'fallback_requests': 0, 'requests_saved': 0}
+_batch_lock = threading.Lock()
+
+
+def batch_stats() -> Dict[str, int]:
+    with _batch_lock:
+        return dict(_batch_totals)
+
+
+def _lucene_phrase(text: str) -> str:
+    return '"' + text.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def _similarity(a: str, b: str) -> float:
+    return SequenceMatcher(None, normalize_key(a), normalize_key(b)).ratio()
+
+
+def shared_limiter(name: str, rate: float, burst: float = 1):
+    """get_limiter() with its state where RATE_LIMIT_DB says: 'database' (the app's database, shared
+    by every pod), a SQLite file (every process on the host) or '' (this process only)"""
+    config = current_app.config if has_app_context() else {}
+    target = config.get('RATE_LIMIT_DB', DEFAULT_DB_PATH)
+    if target == 'database':
+        return get_limiter(name, rate, burst, engine=db.engine)
+    return get_limiter(name, rate, burst, db_path=target or None)
+
+
+def musicbrainz_limiter():
+    """The process-wide MusicBrainz bucket, shared with other processes through RATE_LIMIT_DB"""
+    config = current_app.config if has_app_context() else {}
+    return shared_limiter(
+        'musicbrainz',
+        rate=float(config.get('MUSICBRAINZ_RATE_LIMIT', 1.0)),
+        burst=float(config.get('MUSICBRAINZ_BURST', 3))
+    )
+
+
 class MusicDBLookup:
-    def __init__(self):
+    def __init__(self, throttle=None):
         self.base_url = "https://musicbrainz.org/ws/2"
         self.headers = {'User-Agent': 'Waves/0.1 (https://github.com/timothyhioe/waves)'}
-        self.last_request = 0
         self.lastfm_api_key = os.getenv('LASTFM_API_KEY')
+        self.last_batch_stats = None
+        self.http = None  # ProviderClient; the shared one unless a caller injects its own
+        self.throttle = throttle  # extra budget drawn before the shared one (background jobs)
     
     def search_track(self, artist: str = None, title: str = None, query: str = None):
         """Search using MusicBrainz for metadata + Last.fm for genre"""
-        print(f"DEBUG - Hybrid search for: {artist} - {title}")
+        logger.debug("Hybrid search for: %s - %s", artist, title)
         
-        #get basic metadata from MusicBrainz
-        musicbrainz_data = self._search_musicbrainz(artist, title, query)
-        print(f"DEBUG - MusicBrainz result: {musicbrainz_data}")
+        #get basic metadata from MusicBrainz, with the Last.fm genre for the
+        #names as given fetched alongside (MusicBrainz usually agrees with them)
+        if artist and title and not query:
+            musicbrainz_data, speculative_genre = fan_out(
+                lambda: self._search_musicbrainz(artist, title),
+                lambda: self._search_lastfm_genre(artist, title)
+            )
+        else:
+            musicbrainz_data, speculative_genre = self._search_musicbrainz(artist, title, query), None
+        logger.debug("MusicBrainz result: %s", musicbrainz_data)
         
         #get genre from Last.fm
         if musicbrainz_data and musicbrainz_data.get('artist') != 'Unknown':
-            print(f"DEBUG - Attempting Last.fm lookup...")
-            lastfm_genre = self._search_lastfm_genre(
-                musicbrainz_data['artist'], 
-                musicbrainz_data['title']
-            )
-            print(f"DEBUG - Last.fm genre result: {lastfm_genre}")
+            logger.debug("Attempting Last.fm lookup...")
+            if (speculative_genre is not None and
+                    normalize_key(musicbrainz_data['artist'], musicbrainz_data['title']) == normalize_key(artist, title)):
+                lastfm_genre = speculative_genre
+            else:
+                lastfm_genre = self._search_lastfm_genre(
+                    musicbrainz_data['artist'], 
+                    musicbrainz_data['title']
+                )
+            logger.debug("Last.fm genre result: %s", lastfm_genre)
             musicbrainz_data['genre'] = lastfm_genre
         else:
-            print(f"DEBUG - Skipping Last.fm - no valid MusicBrainz data")
+            logger.debug("Skipping Last.fm - no valid MusicBrainz data")
     
         return musicbrainz_data
     
+    def search_tracks(self, pairs: List[Tuple[str, str]]) -> List[Optional[Dict]]:
+        """Batch form of search_track for bulk enrichment; results line up with `pairs`.
+
+        Up to BATCH_SIZE uncached (artist, title) pairs go out as one OR-ed
+        Lucene query. Each input is mapped back to the returned recordings by
+        fuzzy artist/title similarity; only tracks whose best candidate is
+        ambiguous fall back to a single query. `self.last_batch_stats`
+        reports how many requests the batch saved.
+        """
+        results: List[Optional[Dict]] = [None] * len(pairs)
+        stats = {'tracks': len(pairs), 'cache_hits': 0, 'batched_requests': 0, 'fallback_requests': 0}
+        pending: Dict[str, Tuple[str, str, List[int]]] = {}
+
+        for index, (artist, title) in enumerate(pairs):
+            if not artist or not title:
+                continue
+            key = normalize_key(artist, title)
+            if key in pending:
+                pending[key][2].append(index)
+                continue
+            cached = lookup_cache.get('musicbrainz', key)
+            if cached is not LookupCache.MISS:
+                stats['cache_hits'] += 1
+                results[index] = dict(cached) if cached else None
+                continue
+            pending[key] = (artist, title, [index])
+
+        items = list(pending.items())
+        for start in range(0, len(items), BATCH_SIZE):
+            chunk = items[start:start + BATCH_SIZE]
+            for key, result in self._search_musicbrainz_batch(chunk, stats).items():
+                for index in pending[key][2]:
+                    results[index] = dict(result) if result else None
+
+        # Last.fm has no batch endpoint; fetch the genres concurrently (cached per track)
+        found = [result for result in results if result and result.get('artist') != 'Unknown']
+        genres = fan_out(*[
+            lambda result=result: self._search_lastfm_genre(result['artist'], result['title']) for result in found
+        ])
+        for result, genre in zip(found, genres):
+            result['genre'] = genre
+
+        stats['requests_saved'] = len(pending) - stats['batched_requests'] - stats['fallback_requests']
+        self.last_batch_stats = stats
+        with _batch_lock:
+            _batch_totals['batches'] += 1
+            for name, value in stats.items():
+                _batch_totals[name] += value
+        logger.debug("Batch lookup: %s", stats)
+        return results
+
+    def _search_musicbrainz_batch(self, chunk, stats) -> Dict[str, Optional[Dict]]:
+        """Resolve up to BATCH_SIZE uncached pairs with one query (plus fallbacks)"""
+        if len(chunk) == 1:
+            key, (artist, title, _) = chunk[0]
+            stats['fallback_requests'] += 1
+            return {key: self._search_musicbrainz(artist, title)}
+
+        limit = min(100, len(chunk) * RESULTS_PER_TRACK)
+        params = {
+            'query': ' OR '.join(
+                f"(artist:{_lucene_phrase(artist)} AND recording:{_lucene_phrase(title)})"
+                for _, (artist, title, _) in chunk
+            ),
+            'fmt': 'json',
+            'limit': limit,
+            'inc': 'artist-credits+releases'
+        }
+
+        stats['batched_requests'] += 1
+        recordings = None
+        try:
+            response = self._get(f"{self.base_url}/recording", params=params, headers=self.headers,
+                                 timeout=(3.05, 15), throttle=self._rate_limit)
+            if response.status_code == 200:
+                recordings = response.json().get('recordings') or []
+        except Exception as e:
+            logger.warning("MusicBrainz batch error: %s", e)
+
+        resolved = {}
+        for key, (artist, title, _) in chunk:
+            best = self._best_candidate(artist, title, recordings or [])
+            if recordings is not None and best and best[0] >= ACCEPT_SIMILARITY:
+                result = self._parse_musicbrainz_recording(best[1])
+                lookup_cache.set('musicbrainz', key, result)
+                resolved[key] = result
+            elif recordings is not None and (best is None or best[0] < CANDIDATE_SIMILARITY) and len(recordings) < limit:
+                # the result page was not full, so MusicBrainz has nothing close for this clause
+                lookup_cache.set('musicbrainz', key, None)
+                resolved[key] = None
+            else:
+                stats['fallback_requests'] += 1
+                resolved[key] = self._search_musicbrainz(artist, title)
+        return resolved
+
+    @staticmethod
+    def _best_candidate(artist: str, title: str, recordings) -> Optional[Tuple[float, dict]]:
+        """Highest artist/title similarity among `recordings` (MusicBrainz order breaks ties)"""
+        best = None
+        for recording in recordings:
+            credits = recording.get('artist-credit') or []
+            credited = ''.join(credit.get('name', '') + credit.get('joinphrase', '') for credit in credits)
+            first = credits[0].get('name', '') if credits else ''
+            artist_score = max(_similarity(artist, credited), _similarity(artist, first))
+            score = (artist_score + _similarity(title, recording.get('title', ''))) / 2
+            if best is None or score > best[0]:
+                best = (score, recording)
+        return best
+
     def _search_musicbrainz(self, artist: str = None, title: str = None, query: str = None):
         """Get basic metadata from MusicBrainz"""
-        self._rate_limit()
-        
         if query:
             search_query = query
+            cache_key = normalize_key('query', query)
         elif artist and title:
             search_query = f'artist:"{artist}" AND recording:"{title}"'
+            cache_key = normalize_key(artist, title)
         else:
             return None
-        
+
+        cached = lookup_cache.get('musicbrainz', cache_key)
+        if cached is not LookupCache.MISS:
+            return dict(cached) if cached else None
+
         params = {
             'query': search_query,
             'fmt': 'json',
@@ -53,14 +232,17 @@ class MusicDBLookup:
         }
         
         try:
-            response = requests.get(f"{self.base_url}/recording", params=params, headers=self.headers, timeout=10)
+            response = self._get(f"{self.base_url}/recording", params=params, headers=self.headers,
+                                 throttle=self._rate_limit)
             
             if response.status_code == 200:
                 data = response.json()
-                if data.get('recordings'):
-                    return self._parse_musicbrainz_recording(data['recordings'][0])
+                result = self._parse_musicbrainz_recording(data['recordings'][0]) if data.get('recordings') else None
+                # only definitive answers are cached; errors and 503s are retried next time
+                lookup_cache.set('musicbrainz', cache_key, result)
+                return dict(result) if result else None
         except Exception as e:
-            print(f"MusicBrainz error: {e}")
+            logger.warning("MusicBrainz error: %s", e)
         
         return None
     
@@ -89,35 +271,24 @@ class MusicDBLookup:
     
     def _search_lastfm_genre(self, artist: str, title: str):
         """Get genre from Last.fm with proper genre filtering"""
-        print(f"DEBUG - Last.fm API call for: {artist} - {title}")
-        
         if not self.lastfm_api_key:
-            print("DEBUG - No Last.fm API key found")
+            logger.debug("No Last.fm API key found")
             return 'Unknown'
-    
-        valid_genres = {
-            'rock', 'pop', 'indie', 'alternative', 'electronic', 'hip hop', 'rap',
-            'jazz', 'classical', 'folk', 'country', 'blues', 'metal', 'punk',
-            'reggae', 'soul', 'funk', 'r&b', 'disco', 'house', 'techno',
-            'ambient', 'experimental', 'progressive', 'psychedelic', 'garage',
-            'grunge', 'indie pop', 'indie rock', 'dream pop', 'shoegaze',
-            'post-punk', 'new wave', 'synthpop', 'britpop', 'lo-fi',
-            'bedroom pop', 'chillwave', 'downtempo', 'trip hop', 'drum and bass',
-            'dubstep', 'trap', 'k-pop', 'j-pop', 'c-pop', 'latin', 'salsa',
-            'tango', 'flamenco', 'bluegrass', 'gospel', 'ska', 'emo', 'hardcore',
-            'industrial', 'folk rock', 'country rock', 'soft rock', 'classic rock',
-            'baroque pop', 'art pop', 'art rock', 'post-rock', 'math rock', 'noise rock',
-            'surf rock', 'rock and roll', 'doo-wop', 'motown', 'funk rock', 'psytrance',
-            'vaporwave', 'synthwave', 'new age', 'world', 'afrobeat', 'bossa nova',
-            'flamenco', 'fado', 'celtic', 'medieval', 'renaissance', 'baroque', 'romantic',
-            'modern classical', 'contemporary classical', 'minimalism', 'avant-garde', 'soundtrack', 'musical theater',
-            'video game music', 'chiptune', 'anime', 'children\'s music', 'holiday', 'christmas', 'easter', 'halloween',
-            'worship', 'chant', 'spiritual', 'new wave of british heavy metal', 'post-hardcore',
-            'screamo', 'grindcore', 'mathcore', 'sludge metal', 'doom metal', 'black metal', 'death metal',
-            'thrash metal', 'power metal', 'folk metal', 'viking metal', 'symphonic metal',
-            'gothic metal', 'nu metal', 'rap metal', 'rap rock', 'funk metal', 'crossover thrash'
-        }
-        
+
+        cache_key = normalize_key(artist, title)
+        cached = lookup_cache.get('lastfm', cache_key)
+        if cached is not LookupCache.MISS:
+            return cached or 'Unknown'
+        genre = self._fetch_lastfm_genre(artist, title)
+        if genre is not LookupCache.MISS:
+            lookup_cache.set('lastfm', cache_key, None if genre == 'Unknown' else genre)
+            return genre
+        return 'Unknown'
+
+    def _fetch_lastfm_genre(self, artist: str, title: str):
+        """Last.fm track.getTopTags; LookupCache.MISS when the request itself failed"""
+        logger.debug("Last.fm API call for: %s - %s", artist, title)
+
         url = "http://ws.audioscrobbler.com/2.0/"
         params = {
             'method': 'track.getTopTags',
@@ -128,38 +299,33 @@ class MusicDBLookup:
         }
         
         try:
-            response = requests.get(url, params=params, timeout=10)
+            response = self._get(url, params=params)
             
             if response.status_code == 200:
                 data = response.json()
-                if data.get('toptags') and data['toptags'].get('tag'):
-                    tags = data['toptags']['tag']
-                    if isinstance(tags, list):
-                        print(f"DEBUG - All Last.fm tags: {[tag['name'] for tag in tags[:10]]}") 
-                        
-                        #find first valid genre
-                        for tag in tags:
-                            tag_name = tag['name'].lower().strip()
-                            
-                            if tag_name in valid_genres:
-                                print(f"DEBUG - Found valid genre: {tag['name']}")
-                                return tag['name'].title()
-                            
-                            # partial match
-                            for genre in valid_genres:
-                                if genre in tag_name or tag_name in genre:
-                                    print(f"DEBUG - Found partial genre match: {tag['name']}")
-                                    return tag['name'].title()
-                    
-                    print("DEBUG - No valid genres found in Last.fm tags")
+                tags = (data.get('toptags') or {}).get('tag') or []
+                if isinstance(tags, dict):
+                    tags = [tags]  # a single tag comes back as an object
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("All Last.fm tags: %s", [tag.get('name') for tag in tags[:10]])
+
+                genre = get_classifier().best_genre(tags)
+                if genre:
+                    logger.debug("Classified genre: %s", genre)
+                    return genre
+                logger.debug("No valid genres found in Last.fm tags")
+                return 'Unknown'
 
         except Exception as e:
-            print(f"Last.fm error: {e}")
+            logger.warning("Last.fm error: %s", e)
         
-        return 'Unknown'
+        return LookupCache.MISS
     
+    def _get(self, url: str, **kwargs):
+        return (self.http or get_client()).get(url, **kwargs)
+
     def _rate_limit(self):
-        elapsed = time.time() - self.last_request
-        if elapsed < 1:
-            time.sleep(1 - elapsed)
-        self.last_request = time.time()
\ No newline at end of file
+        if self.throttle:
+            self.throttle()
+        # one budget for every lookup instance, thread and worker (MusicBrainz allows ~1 req/s per IP)
+        musicbrainz_limiter().acquire()
\ No newline at end of file
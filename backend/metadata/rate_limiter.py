@@ -0,0 +1,167 @@
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Dict, Optional
+
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = os.path.join(tempfile.gettempdir(), 'waves-rate-limits.sqlite')
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a token would not be available within `max_wait`"""
+
+
+class TokenBucket:
+    """Token bucket refilled at `rate` tokens/s, holding at most `burst`.
+
+    With `db_path` the bucket state lives in a small SQLite file, so every
+    gunicorn worker and CLI process on the host draws from the same budget;
+    `BEGIN IMMEDIATE` serializes the read-modify-write. With `engine` it
+    lives in the rate_limit_buckets table of that database instead (row
+    locked with FOR UPDATE), which every pod of a deployment shares. Callers
+    reserve a token (the balance may go negative) and sleep outside any
+    lock, so waiting requests queue in arrival order without holding each
+    other up. Without either (or if the store is unusable) the bucket is
+    per-process.
+    """
+
+    def __init__(self, name: str, rate: float, burst: float = 1, db_path: Optional[str] = None, engine=None):
+        self.name = name
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.db_path = db_path
+        self.engine = engine
+        self._lock = threading.Lock()
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._conn = None
+        self._conn_pid = None
+        self._stats = {'acquired': 0, 'waited': 0, 'rejected': 0, 'waiting': 0,
+                       'total_wait_seconds': 0.0, 'max_wait_seconds': 0.0}
+
+    def acquire(self, max_wait: Optional[float] = None) -> float:
+        """Take one token, sleeping until it is due. Returns the seconds waited."""
+        with self._lock:
+            wait = self._reserve(max_wait)
+            if wait is None:
+                self._stats['rejected'] += 1
+                raise RateLimitExceeded(f"{self.name}: no token within {max_wait}s")
+            self._stats['waiting'] += 1
+
+        try:
+            if wait > 0:
+                time.sleep(wait)
+        finally:
+            with self._lock:
+                self._stats['waiting'] -= 1
+                self._stats['acquired'] += 1
+                if wait > 0:
+                    self._stats['waited'] += 1
+                    self._stats['total_wait_seconds'] += wait
+                    self._stats['max_wait_seconds'] = max(self._stats['max_wait_seconds'], wait)
+        return wait
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats['avg_wait_seconds'] = stats['total_wait_seconds'] / stats['acquired'] if stats['acquired'] else 0.0
+        backend = 'database' if self.engine is not None else 'sqlite' if self.db_path else 'process'
+        stats.update(rate=self.rate, burst=self.burst, backend=backend)
+        return stats
+
+    def _take(self, tokens: float, updated: float, now: float, max_wait: Optional[float]):
+        tokens = min(self.burst, tokens + max(0.0, now - updated) * self.rate)
+        wait = max(0.0, (1 - tokens) / self.rate)
+        if max_wait is not None and wait > max_wait:
+            return tokens, None
+        return tokens - 1, wait
+
+    def _reserve(self, max_wait: Optional[float]) -> Optional[float]:
+        if self.engine is not None:
+            try:
+                return self._reserve_database(max_wait)
+            except SQLAlchemyError as e:
+                logger.warning("Shared rate limiter '%s' unavailable (%s), limiting per process", self.name, e)
+                self.engine = None
+
+        if self.db_path:
+            try:
+                return self._reserve_shared(max_wait)
+            except sqlite3.Error as e:
+                logger.warning("Shared rate limiter '%s' unavailable (%s), limiting per process", self.name, e)
+                self.db_path = None
+
+        now = time.monotonic()
+        tokens, wait = self._take(self._tokens, self._updated, now, max_wait)
+        self._tokens, self._updated = tokens, now
+        return wait
+
+    def _connection(self) -> sqlite3.Connection:
+        # connections must not cross a fork (gunicorn --preload)
+        if self._conn is None or self._conn_pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)')
+            self._conn, self._conn_pid = conn, os.getpid()
+        return self._conn
+
+    def _reserve_shared(self, max_wait: Optional[float]) -> Optional[float]:
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            now = time.time()  # wall clock: shared between processes
+            row = conn.execute('SELECT tokens, updated FROM buckets WHERE name = ?', (self.name,)).fetchone()
+            tokens, updated = row if row else (self.burst, now)
+            tokens, wait = self._take(tokens, updated, now, max_wait)
+            if wait is not None:
+                conn.execute('INSERT OR REPLACE INTO buckets (name, tokens, updated) VALUES (?, ?, ?)',
+                             (self.name, tokens, now))
+            conn.execute('COMMIT')
+            return wait
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+
+    def _reserve_database(self, max_wait: Optional[float]) -> Optional[float]:
+        lock = ' FOR UPDATE' if self.engine.dialect.name == 'postgresql' else ''  # SQLite: the INSERT's write lock
+        with self.engine.begin() as conn:
+            now = time.time()  # wall clock: shared between pods
+            conn.execute(text('INSERT INTO rate_limit_buckets (name, tokens, updated) '
+                              'VALUES (:name, :tokens, :updated) ON CONFLICT DO NOTHING'),
+                         {'name': self.name, 'tokens': self.burst, 'updated': now})
+            tokens, updated = conn.execute(
+                text(f'SELECT tokens, updated FROM rate_limit_buckets WHERE name = :name{lock}'), {'name': self.name}
+            ).one()
+            tokens, wait = self._take(tokens, updated, now, max_wait)
+            if wait is not None:
+                conn.execute(text('UPDATE rate_limit_buckets SET tokens = :tokens, updated = :updated WHERE name = :name'),
+                             {'name': self.name, 'tokens': tokens, 'updated': now})
+            return wait
+
+
+_limiters: Dict[str, TokenBucket] = {}
+_registry_lock = threading.Lock()
+
+
+def get_limiter(name: str, rate: float, burst: float = 1, db_path: Optional[str] = None, engine=None) -> TokenBucket:
+    """One bucket per name per process; the first caller's settings win"""
+    with _registry_lock:
+        limiter = _limiters.get(name)
+        if limiter is None:
+            limiter = TokenBucket(name, rate, burst, db_path, engine)
+            _limiters[name] = limiter
+        return limiter
+
+
+def limiter_stats() -> Dict[str, Dict]:
+    with _registry_lock:
+        limiters = list(_limiters.values())
+    return {limiter.name: limiter.stats() for limiter in limiters}
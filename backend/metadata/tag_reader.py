@@ -0,0 +1,218 @@
+"""
+Format-aware tag extraction
+
+Maps ID3 frames (MP3, WAV, AAC), Vorbis comments (FLAC, OGG, Opus), MP4
+atoms (M4A) and APEv2 items onto one schema, in a single pass over whatever
+tag container mutagen found. mutagen only reads the header and tag regions,
+never the audio stream, so this stays cheap on large files.
+
+Core fields (title, artist, album, genre) go into the song columns; the
+rest (track number, year, album artist, ReplayGain) are kept for
+Song.metadata_json. extract_picture() pulls embedded cover art from the
+same parsed file.
+"""
+
+import base64
+import binascii
+import re
+from typing import Dict, Iterable, Optional, Tuple
+
+from mutagen import Tags
+from mutagen.apev2 import APEv2, BINARY
+from mutagen.flac import Picture, error as FLACError
+from mutagen.id3 import ID3
+from mutagen.mp4 import MP4Tags
+
+CORE_FIELDS = ('title', 'artist', 'album', 'genre')
+
+REPLAYGAIN_FIELDS = {
+    'replaygain_track_gain': 'replaygain_track_gain',
+    'replaygain_track_peak': 'replaygain_track_peak',
+    'replaygain_album_gain': 'replaygain_album_gain',
+    'replaygain_album_peak': 'replaygain_album_peak',
+}
+
+ID3_FRAMES = {
+    'TIT2': 'title',
+    'TPE1': 'artist',
+    'TALB': 'album',
+    'TCON': 'genre',
+    'TRCK': 'track_number',
+    'TDRC': 'year',
+    'TYER': 'year',
+    'TPE2': 'album_artist',
+    **REPLAYGAIN_FIELDS,  # TXXX:<description>
+}
+
+VORBIS_FIELDS = {
+    'title': 'title',
+    'artist': 'artist',
+    'album': 'album',
+    'genre': 'genre',
+    'tracknumber': 'track_number',
+    'date': 'year',
+    'year': 'year',
+    'albumartist': 'album_artist',
+    'album artist': 'album_artist',
+    **REPLAYGAIN_FIELDS,
+}
+
+MP4_ATOMS = {
+    '\xa9nam': 'title',
+    '\xa9ART': 'artist',
+    '\xa9alb': 'album',
+    '\xa9gen': 'genre',
+    'trkn': 'track_number',
+    '\xa9day': 'year',
+    'aART': 'album_artist',
+    **REPLAYGAIN_FIELDS,  # ----:com.apple.iTunes:<name>
+}
+
+APE_FIELDS = {
+    'title': 'title',
+    'artist': 'artist',
+    'album': 'album',
+    'genre': 'genre',
+    'track': 'track_number',
+    'year': 'year',
+    'album artist': 'album_artist',
+    **REPLAYGAIN_FIELDS,
+}
+
+FRONT_COVER = 3  # ID3/FLAC picture type
+
+_YEAR = re.compile(r'\d{4}')
+_NUMBER = re.compile(r'[-+]?\d+(?:\.\d+)?')
+
+
+def _id3_items(tags: ID3) -> Iterable[Tuple[str, object]]:
+    for key, frame in tags.items():
+        if key.startswith('TXXX:'):
+            yield frame.desc.lower(), frame.text
+        elif key == 'TCON':
+            # resolves ID3v1 numeric genres like "(13)"
+            yield key, frame.genres
+        elif key in ID3_FRAMES:
+            yield key, frame.text
+
+
+def _vorbis_items(tags: Tags) -> Iterable[Tuple[str, object]]:
+    # iterating a Vorbis comment list gives (key, value) pairs in file order
+    for key, value in tags:
+        yield key.lower(), value
+
+
+def _mp4_items(tags: MP4Tags) -> Iterable[Tuple[str, object]]:
+    for key, values in tags.items():
+        # mutagen already maps numeric 'gnre' atoms to \xa9gen text
+        if key.startswith('----:'):
+            yield key.rsplit(':', 1)[-1].lower(), values
+        else:
+            yield key, values
+
+
+def _ape_items(tags: APEv2) -> Iterable[Tuple[str, object]]:
+    for key, value in tags.items():
+        if getattr(value, 'kind', None) == 0:  # text items only
+            yield key.lower(), str(value).split('\0')
+
+
+# checked in order; the first matching container type wins. mutagen keeps its
+# Vorbis comment class private, so it is whatever Tags is left after the rest
+_FORMATS = (
+    (ID3, ID3_FRAMES, _id3_items),
+    (MP4Tags, MP4_ATOMS, _mp4_items),
+    (APEv2, APE_FIELDS, _ape_items),
+    (Tags, VORBIS_FIELDS, _vorbis_items),
+)
+
+
+def _first(value):
+    if isinstance(value, list):
+        value = value[0] if value else None
+    if isinstance(value, bytes):
+        value = value.decode('utf-8', 'replace')
+    return value
+
+
+def _convert(field: str, value) -> Optional[object]:
+    value = _first(value)
+    if value is None:
+        return None
+    if field == 'track_number':
+        # "3/12", "03" or an MP4 (track, total) tuple
+        number = value[0] if isinstance(value, tuple) else str(value).split('/', 1)[0].strip()
+        try:
+            return int(number) or None
+        except ValueError:
+            return None
+    if field == 'year':
+        match = _YEAR.search(str(value))
+        return int(match.group()) if match else None
+    if field.startswith('replaygain_'):
+        # "-6.48 dB" / "0.988553"
+        match = _NUMBER.search(str(value))
+        return float(match.group()) if match else None
+    value = str(value).strip()
+    return value or None
+
+
+def extract_tags(tags) -> Dict:
+    """Map a mutagen tag container to the common schema, reading each tag once"""
+    if tags is None:
+        return {}
+    for tag_type, fields, items in _FORMATS:
+        if isinstance(tags, tag_type):
+            break
+    else:
+        return {}
+
+    result = {}
+    for key, value in items(tags):
+        field = fields.get(key)
+        if field is None or field in result:
+            continue
+        converted = _convert(field, value)
+        if converted is not None:
+            result[field] = converted
+    return result
+
+
+def split_extras(tags: Dict) -> Dict:
+    """The non-column part of extract_tags() output, for Song.metadata_json"""
+    return {field: value for field, value in tags.items() if field not in CORE_FIELDS}
+
+
+def _vorbis_pictures(tags: Tags):
+    # OGG files carry FLAC picture blocks base64-encoded in a comment
+    for value in tags.get('metadata_block_picture', []):
+        try:
+            yield Picture(base64.b64decode(value))
+        except (binascii.Error, FLACError):
+            continue
+
+
+def extract_picture(audio) -> Optional[bytes]:
+    """Embedded cover image bytes from a mutagen.File() result, front cover preferred"""
+    tags = audio.tags
+    pictures = getattr(audio, 'pictures', None)  # FLAC METADATA_BLOCK_PICTURE blocks
+    if pictures:
+        candidates = [(picture.type == FRONT_COVER, picture.data) for picture in pictures]
+    elif isinstance(tags, ID3):
+        candidates = [(frame.type == FRONT_COVER, frame.data) for frame in tags.getall('APIC')]
+    elif isinstance(tags, MP4Tags):
+        candidates = [(False, bytes(cover)) for cover in tags.get('covr', [])]
+    elif isinstance(tags, APEv2):
+        cover = tags.get('Cover Art (Front)')
+        # "<filename>\0<image bytes>"
+        candidates = [(True, cover.value.partition(b'\0')[2])] if cover is not None and cover.kind == BINARY else []
+    elif isinstance(tags, Tags):  # Vorbis comments, see _FORMATS
+        candidates = [(picture.type == FRONT_COVER, picture.data) for picture in _vorbis_pictures(tags)]
+    else:
+        return None
+
+    candidates = [(front, data) for front, data in candidates if data]
+    if not candidates:
+        return None
+    # max() keeps the first of equal keys, so this is the first front cover, else the first picture
+    return max(candidates, key=lambda candidate: candidate[0])[1]
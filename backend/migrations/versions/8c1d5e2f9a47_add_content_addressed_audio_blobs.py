@@ -0,0 +1,50 @@
+"""Add content-addressed audio blobs
+
+Revision ID: 8c1d5e2f9a47
+Revises: 36542155044a
+Create Date: 2026-10-18 10:02:11.204518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c1d5e2f9a47'
+down_revision: Union[str, Sequence[str], None] = '36542155044a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'audio_blobs',
+        sa.Column('sha256', sa.String(length=64), nullable=False),
+        sa.Column('file_path', sa.String(length=500), nullable=False),
+        sa.Column('file_size', sa.BigInteger(), nullable=False),
+        sa.Column('ref_count', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('sha256'),
+        sa.UniqueConstraint('file_path'),
+    )
+    with op.batch_alter_table('songs') as batch_op:
+        # several songs can now point at the same blob
+        batch_op.drop_constraint('songs_file_path_key', type_='unique')
+        batch_op.create_index('ix_songs_file_path', ['file_path'])
+        batch_op.add_column(sa.Column('blob_hash', sa.String(length=64), nullable=True))
+        batch_op.create_index('ix_songs_blob_hash', ['blob_hash'])
+        batch_op.create_foreign_key('fk_songs_blob_hash', 'audio_blobs', ['blob_hash'], ['sha256'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('songs') as batch_op:
+        batch_op.drop_constraint('fk_songs_blob_hash', type_='foreignkey')
+        batch_op.drop_index('ix_songs_blob_hash')
+        batch_op.drop_column('blob_hash')
+        batch_op.drop_index('ix_songs_file_path')
+        batch_op.create_unique_constraint('songs_file_path_key', ['file_path'])
+    op.drop_table('audio_blobs')
@@ -0,0 +1,40 @@
+"""Add backfill checkpoints
+
+Revision ID: a3e9c5d7f2b1
+Revises: f1d8b2c6e4a0
+Create Date: 2026-10-18 17:12:40.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3e9c5d7f2b1'
+down_revision: Union[str, Sequence[str], None] = 'f1d8b2c6e4a0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'backfill_checkpoints',
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.Column('last_id', sa.String(length=36), nullable=True),
+        sa.Column('processed', sa.Integer(), nullable=False),
+        sa.Column('updated', sa.Integer(), nullable=False),
+        sa.Column('locked_by', sa.String(length=64), nullable=True),
+        sa.Column('locked_until', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('name'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('backfill_checkpoints')
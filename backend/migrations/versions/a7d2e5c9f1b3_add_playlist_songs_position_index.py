@@ -0,0 +1,28 @@
+"""Add playlist_songs (playlist_id, position) index
+
+Revision ID: a7d2e5c9f1b3
+Revises: f3c7d1e9a2b4
+Create Date: 2026-10-18 21:02:47.318205
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7d2e5c9f1b3'
+down_revision: Union[str, Sequence[str], None] = 'f3c7d1e9a2b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_playlist_songs_playlist_position', 'playlist_songs', ['playlist_id', 'position'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_playlist_songs_playlist_position', table_name='playlist_songs')
@@ -0,0 +1,34 @@
+"""Add rate limit buckets
+
+Revision ID: a8e4c1f7d3b5
+Revises: f6a2d8c4b1e9
+Create Date: 2026-10-19 12:26:40.915374
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a8e4c1f7d3b5'
+down_revision: Union[str, Sequence[str], None] = 'f6a2d8c4b1e9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'rate_limit_buckets',
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.Column('tokens', sa.Float(), nullable=False),
+        sa.Column('updated', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('rate_limit_buckets')
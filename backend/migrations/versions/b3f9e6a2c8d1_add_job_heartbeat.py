@@ -0,0 +1,30 @@
+"""Add job heartbeat
+
+Revision ID: b3f9e6a2c8d1
+Revises: a8e4c1f7d3b5
+Create Date: 2026-10-19 13:02:18.640257
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3f9e6a2c8d1'
+down_revision: Union[str, Sequence[str], None] = 'a8e4c1f7d3b5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('jobs') as batch_op:
+        batch_op.add_column(sa.Column('heartbeat_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('jobs') as batch_op:
+        batch_op.drop_column('heartbeat_at')
@@ -0,0 +1,48 @@
+"""Add resumable upload sessions
+
+Revision ID: b47e0d93c215
+Revises: 8c1d5e2f9a47
+Create Date: 2026-10-18 11:40:37.918342
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b47e0d93c215'
+down_revision: Union[str, Sequence[str], None] = '8c1d5e2f9a47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _id_type():
+    if op.get_bind().dialect.name == 'postgresql':
+        return postgresql.UUID(as_uuid=True)
+    return sa.Integer()
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'upload_sessions',
+        sa.Column('id', sa.String(length=32), nullable=False),
+        sa.Column('user_id', _id_type(), nullable=False),
+        sa.Column('filename', sa.String(length=255), nullable=False),
+        sa.Column('upload_length', sa.BigInteger(), nullable=False),
+        sa.Column('upload_offset', sa.BigInteger(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_upload_sessions_user_id', 'upload_sessions', ['user_id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_upload_sessions_user_id', table_name='upload_sessions')
+    op.drop_table('upload_sessions')
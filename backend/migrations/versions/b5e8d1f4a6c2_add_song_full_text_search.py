@@ -0,0 +1,65 @@
+"""Add song full-text search
+
+Revision ID: b5e8d1f4a6c2
+Revises: a7d2e5c9f1b3
+Create Date: 2026-10-18 21:48:13.902716
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5e8d1f4a6c2'
+down_revision: Union[str, Sequence[str], None] = 'a7d2e5c9f1b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SEARCH_VECTOR_SQL = " || ".join(
+    f"setweight(to_tsvector('simple', coalesce({column}, '')), '{weight}')"
+    for column, weight in (('title', 'A'), ('artist', 'B'), ('album', 'C'), ('genre', 'D'))
+)
+
+SONGS_FTS_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS songs_fts USING fts5("
+    "title, artist, album, genre, content='songs', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS songs_fts_insert AFTER INSERT ON songs BEGIN "
+    "INSERT INTO songs_fts(rowid, title, artist, album, genre) VALUES (new.id, new.title, new.artist, new.album, new.genre); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS songs_fts_delete AFTER DELETE ON songs BEGIN "
+    "INSERT INTO songs_fts(songs_fts, rowid, title, artist, album, genre) "
+    "VALUES ('delete', old.id, old.title, old.artist, old.album, old.genre); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS songs_fts_update AFTER UPDATE OF title, artist, album, genre ON songs BEGIN "
+    "INSERT INTO songs_fts(songs_fts, rowid, title, artist, album, genre) "
+    "VALUES ('delete', old.id, old.title, old.artist, old.album, old.genre); "
+    "INSERT INTO songs_fts(rowid, title, artist, album, genre) VALUES (new.id, new.title, new.artist, new.album, new.genre); "
+    "END",
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        # a generated column, so every existing row is indexed as part of the ALTER
+        op.add_column('songs', sa.Column('search_vector', postgresql.TSVECTOR(),
+                                         sa.Computed(SEARCH_VECTOR_SQL, persisted=True), nullable=True))
+        op.create_index('ix_songs_search_vector', 'songs', ['search_vector'], postgresql_using='gin')
+        return
+    for statement in SONGS_FTS_DDL:
+        op.execute(statement)
+    op.execute("INSERT INTO songs_fts(songs_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_index('ix_songs_search_vector', table_name='songs')
+        op.drop_column('songs', 'search_vector')
+        return
+    for trigger in ('songs_fts_insert', 'songs_fts_delete', 'songs_fts_update'):
+        op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    op.execute("DROP TABLE IF EXISTS songs_fts")
@@ -0,0 +1,35 @@
+"""Add song metadata_json on SQLite
+
+Revision ID: c6f2a8d4e1b7
+Revises: a3e9c5d7f2b1
+Create Date: 2026-10-18 18:04:52.671093
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c6f2a8d4e1b7'
+down_revision: Union[str, Sequence[str], None] = 'a3e9c5d7f2b1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # PostgreSQL has had the JSONB column since the tables were created
+    if op.get_bind().dialect.name == 'postgresql':
+        return
+    with op.batch_alter_table('songs') as batch_op:
+        batch_op.add_column(sa.Column('metadata_json', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        return
+    with op.batch_alter_table('songs') as batch_op:
+        batch_op.drop_column('metadata_json')
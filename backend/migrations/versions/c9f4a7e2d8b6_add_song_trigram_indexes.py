@@ -0,0 +1,44 @@
+"""Add song trigram indexes
+
+Revision ID: c9f4a7e2d8b6
+Revises: b5e8d1f4a6c2
+Create Date: 2026-10-18 22:31:56.470183
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c9f4a7e2d8b6'
+down_revision: Union[str, Sequence[str], None] = 'b5e8d1f4a6c2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # SQLite deployments use the in-process index in services/fuzzy_search.py
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute("CREATE EXTENSION IF NOT EXISTS unaccent")
+    # unaccent() is only STABLE; pinning the dictionary makes the wrapper safe to index
+    op.execute(
+        "CREATE OR REPLACE FUNCTION songs_fold(text) RETURNS text "
+        "LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT "
+        "AS $$ SELECT lower(public.unaccent('public.unaccent'::regdictionary, $1)) $$"
+    )
+    op.execute("CREATE INDEX ix_songs_title_trgm ON songs USING gin (songs_fold(title) gin_trgm_ops)")
+    op.execute("CREATE INDEX ix_songs_artist_trgm ON songs USING gin (songs_fold(artist) gin_trgm_ops)")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.drop_index('ix_songs_artist_trgm', table_name='songs')
+    op.drop_index('ix_songs_title_trgm', table_name='songs')
+    op.execute("DROP FUNCTION IF EXISTS songs_fold(text)")
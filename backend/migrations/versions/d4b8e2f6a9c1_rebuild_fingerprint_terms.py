@@ -0,0 +1,50 @@
+"""Rebuild fingerprint terms as 24-bit bands
+
+Revision ID: d4b8e2f6a9c1
+Revises: c9f4a7e2d8b6
+Create Date: 2026-10-18 23:12:40.318245
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import numpy as np
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4b8e2f6a9c1'
+down_revision: Union[str, Sequence[str], None] = 'c9f4a7e2d8b6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _bands(data: bytes, low_bits: int):
+    # frozen copy of services.fingerprint.index_terms at each revision
+    voiced = np.frombuffer(data, dtype='<u4')
+    voiced = voiced[voiced != 0].astype(np.int64)
+    mask = (1 << low_bits) - 1
+    return np.unique(np.concatenate([voiced & mask, (voiced >> (32 - low_bits)) | (1 << low_bits)])).tolist()
+
+
+def _rebuild(low_bits: int) -> None:
+    bind = op.get_bind()
+    terms = sa.table('fingerprint_terms', sa.column('term'), sa.column('song_id'), sa.column('user_id'))
+    op.execute(terms.delete())
+    rows = bind.execute(sa.text(
+        "SELECT f.song_id, s.user_id, f.fingerprint FROM song_fingerprints f JOIN songs s ON s.id = f.song_id"
+    ))
+    for song_id, user_id, data in rows.fetchall():
+        values = [{'term': term, 'song_id': song_id, 'user_id': user_id} for term in _bands(data, low_bits)]
+        if values:
+            bind.execute(terms.insert(), values)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    _rebuild(24)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    _rebuild(16)
@@ -0,0 +1,32 @@
+"""Add song cover hash
+
+Revision ID: d8b3f6a1c9e2
+Revises: c6f2a8d4e1b7
+Create Date: 2026-10-18 18:41:07.902315
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd8b3f6a1c9e2'
+down_revision: Union[str, Sequence[str], None] = 'c6f2a8d4e1b7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('songs') as batch_op:
+        batch_op.add_column(sa.Column('cover_hash', sa.String(length=64), nullable=True))
+        batch_op.create_index('ix_songs_cover_hash', ['cover_hash'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('songs') as batch_op:
+        batch_op.drop_index('ix_songs_cover_hash')
+        batch_op.drop_column('cover_hash')
@@ -0,0 +1,57 @@
+"""Add song fingerprints
+
+Revision ID: e5c7a9f1b3d4
+Revises: d2a64f1e8b90
+Create Date: 2026-10-18 15:02:41.318604
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5c7a9f1b3d4'
+down_revision: Union[str, Sequence[str], None] = 'd2a64f1e8b90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _id_type():
+    if op.get_bind().dialect.name == 'postgresql':
+        return postgresql.UUID(as_uuid=True)
+    return sa.Integer()
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'song_fingerprints',
+        sa.Column('song_id', _id_type(), nullable=False),
+        sa.Column('fingerprint', sa.LargeBinary(), nullable=False),
+        sa.Column('frame_count', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['song_id'], ['songs.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('song_id'),
+    )
+    op.create_table(
+        'fingerprint_terms',
+        sa.Column('term', sa.Integer(), nullable=False),
+        sa.Column('song_id', _id_type(), nullable=False),
+        sa.Column('user_id', _id_type(), nullable=False),
+        sa.ForeignKeyConstraint(['song_id'], ['songs.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('term', 'song_id'),
+    )
+    op.create_index('ix_fingerprint_terms_song_id', 'fingerprint_terms', ['song_id'])
+    op.create_index('ix_fingerprint_terms_user_term', 'fingerprint_terms', ['user_id', 'term'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_fingerprint_terms_user_term', table_name='fingerprint_terms')
+    op.drop_index('ix_fingerprint_terms_song_id', table_name='fingerprint_terms')
+    op.drop_table('fingerprint_terms')
+    op.drop_table('song_fingerprints')
@@ -0,0 +1,58 @@
+"""Fold accents in the song search vector
+
+Revision ID: e7c3a1f5b9d2
+Revises: d4b8e2f6a9c1
+Create Date: 2026-10-19 09:41:27.503816
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7c3a1f5b9d2'
+down_revision: Union[str, Sequence[str], None] = 'd4b8e2f6a9c1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = (('title', 'A'), ('artist', 'B'), ('album', 'C'), ('genre', 'D'))
+FOLDED_SQL = " || ".join(
+    f"setweight(to_tsvector('simple', songs_fold(coalesce({column}, ''))), '{weight}')" for column, weight in COLUMNS
+)
+PLAIN_SQL = " || ".join(
+    f"setweight(to_tsvector('simple', coalesce({column}, '')), '{weight}')" for column, weight in COLUMNS
+)
+
+
+def _replace_search_vector(expression: str) -> None:
+    # a generated column's expression cannot be altered in place
+    op.drop_index('ix_songs_search_vector', table_name='songs')
+    op.drop_column('songs', 'search_vector')
+    op.add_column('songs', sa.Column('search_vector', postgresql.TSVECTOR(),
+                                     sa.Computed(expression, persisted=True), nullable=True))
+    op.create_index('ix_songs_search_vector', 'songs', ['search_vector'], postgresql_using='gin')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # SQLite's FTS5 table already folds diacritics (remove_diacritics 2)
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute("CREATE EXTENSION IF NOT EXISTS unaccent")
+    op.execute(
+        "CREATE OR REPLACE FUNCTION songs_fold(text) RETURNS text "
+        "LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT "
+        "AS $$ SELECT lower(public.unaccent('public.unaccent'::regdictionary, $1)) $$"
+    )
+    _replace_search_vector(FOLDED_SQL)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    # songs_fold() stays: the trigram indexes use it too
+    _replace_search_vector(PLAIN_SQL)
@@ -0,0 +1,28 @@
+"""Add songs (user_id, upload_date, id) index
+
+Revision ID: e9a4c2b7d5f3
+Revises: d8b3f6a1c9e2
+Create Date: 2026-10-18 19:10:26.514870
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e9a4c2b7d5f3'
+down_revision: Union[str, Sequence[str], None] = 'd8b3f6a1c9e2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_songs_user_upload_date', 'songs', ['user_id', 'upload_date', 'id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_songs_user_upload_date', table_name='songs')
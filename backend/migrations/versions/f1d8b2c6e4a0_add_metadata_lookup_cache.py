@@ -0,0 +1,38 @@
+"""Add metadata lookup cache
+
+Revision ID: f1d8b2c6e4a0
+Revises: e5c7a9f1b3d4
+Create Date: 2026-10-18 15:47:09.552081
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1d8b2c6e4a0'
+down_revision: Union[str, Sequence[str], None] = 'e5c7a9f1b3d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'metadata_lookup_cache',
+        sa.Column('source', sa.String(length=20), nullable=False),
+        sa.Column('lookup_key', sa.String(length=512), nullable=False),
+        sa.Column('result', sa.Text(), nullable=True),
+        sa.Column('fetched_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('source', 'lookup_key'),
+    )
+    op.create_index('ix_metadata_lookup_cache_expires_at', 'metadata_lookup_cache', ['expires_at'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_metadata_lookup_cache_expires_at', table_name='metadata_lookup_cache')
+    op.drop_table('metadata_lookup_cache')
@@ -0,0 +1,43 @@
+"""Add playlist song_count and total_duration
+
+Revision ID: f3c7d1e9a2b4
+Revises: e9a4c2b7d5f3
+Create Date: 2026-10-18 19:52:38.120447
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3c7d1e9a2b4'
+down_revision: Union[str, Sequence[str], None] = 'e9a4c2b7d5f3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('playlists') as batch_op:
+        batch_op.add_column(sa.Column('song_count', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('total_duration', sa.Float(), nullable=False, server_default='0'))
+
+    # fill the counters for existing playlists
+    op.execute("""
+        UPDATE playlists SET
+            song_count = (SELECT COUNT(*) FROM playlist_songs WHERE playlist_songs.playlist_id = playlists.id),
+            total_duration = (
+                SELECT COALESCE(SUM(songs.duration), 0)
+                FROM playlist_songs JOIN songs ON songs.id = playlist_songs.song_id
+                WHERE playlist_songs.playlist_id = playlists.id
+            )
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('playlists') as batch_op:
+        batch_op.drop_column('total_duration')
+        batch_op.drop_column('song_count')
@@ -0,0 +1,30 @@
+"""Add upload session sha256
+
+Revision ID: f6a2d8c4b1e9
+Revises: e7c3a1f5b9d2
+Create Date: 2026-10-19 11:07:52.381946
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f6a2d8c4b1e9'
+down_revision: Union[str, Sequence[str], None] = 'e7c3a1f5b9d2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('upload_sessions') as batch_op:
+        batch_op.add_column(sa.Column('sha256', sa.String(length=64), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('upload_sessions') as batch_op:
+        batch_op.drop_column('sha256')
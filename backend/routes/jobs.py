@@ -0,0 +1,21 @@
+from flask import Blueprint, jsonify, current_app
+from database.models import Job
+from auth_middleware import token_required
+
+jobs_bp = Blueprint('jobs', __name__)
+
+
+#job status endpoint
+@jobs_bp.route('/jobs/<job_id>', methods=['GET'])
+@token_required
+def get_job(current_user, job_id):
+    try:
+        job = Job.query.filter_by(id=job_id, user_id=current_user.id).first()
+        if not job:
+            return jsonify({'error': 'Job not found'}), 404
+
+        return jsonify({'job': job.to_dict()}), 200
+
+    except Exception as e:
+        current_app.logger.error(f"Error retrieving job: {e}")
+        return jsonify({'error': 'Failed to retrieve job'}), 500
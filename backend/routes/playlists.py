@@ -1,11 +1,19 @@
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, Response, request, jsonify, current_app
 from data_structures import PlaylistManager
 from database.models import Playlist, Song, PlaylistSong, db
+from database.serializers import PLAYLIST_SONG_FIELDS, RawRows, json_stream
+from services.pagination import offset, page_size
+from services.playlist_stats import enqueue_playlist_repair, song_added, song_removed
 import uuid
 from auth_middleware import token_required
 
 playlists_bp = Blueprint('playlists', __name__)
 
+# playlist columns returned by GET /playlists/<id> next to its songs
+PLAYLIST_KEYS = ('id', 'name', 'description', 'structure_type', 'created_at', 'song_count')
+PLAYLIST_COLUMNS = tuple(getattr(Playlist, key) for key in PLAYLIST_KEYS)
+STREAM_BATCH = 500
+
 
 
 #playlist creation endpoint
@@ -60,7 +68,9 @@ def list_playlists(current_user):
             'description': pl.description,
             'structure_type': pl.structure_type,
             'created_at': pl.created_at,
-            'song_count': len(pl.playlist_songs)
+            # maintained counters, so no per-playlist load of playlist_songs
+            'song_count': pl.song_count,
+            'total_duration': pl.total_duration
         } for pl in playlists]
 
         return jsonify({
@@ -86,34 +96,46 @@ def get_playlist(current_user, playlist_id):
             # It's a UUID string, keep it as is
             pass
 
-        playlist = Playlist.query.filter_by(id=playlist_id, user_id=current_user.id).first()
-        if not playlist:
-            return jsonify({'error': 'Playlist not found'}), 404
-        
-        songs = [{
-            'id': str(ps.song.id),
-            'title': ps.song.title,
-            'artist': ps.song.artist,
-            'album': ps.song.album,
-            'genre': ps.song.genre,
-            'duration': ps.song.duration,
-            'file_size': ps.song.file_size,
-            'bitrate': ps.song.bitrate,
-            'format': ps.song.format,
-            'upload_date': ps.song.upload_date.isoformat() if ps.song.upload_date else None,
-            'position': ps.position
-        } for ps in playlist.playlist_songs]
-        
-        playlist_data = {
-            'id': playlist.id,
-            'name': playlist.name,
-            'description': playlist.description,
-            'structure_type': playlist.structure_type,
-            'created_at': playlist.created_at.isoformat() if playlist.created_at else None,
-            'songs': songs,
-            'song_count': len(songs)
-        }
-        return jsonify(playlist_data), 200
+        try:
+            fields = PLAYLIST_SONG_FIELDS.parse_fields(request.args.get('fields'))
+            start = offset(request.args.get('offset'))
+            # no ?limit= means the whole playlist
+            limit = page_size(request.args.get('limit'), None, current_app.config['PLAYLIST_MAX_PAGE_SIZE'])
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        # the playlist and its songs in one round trip: playlist columns ride along on every row
+        # (an empty playlist still yields one row, with NULL song columns), ordered by
+        # ix_playlist_songs_playlist_position. Rows are fetched before the response starts, so
+        # query errors still get a clean 500 and no cursor stays open while a slow client reads;
+        # only the JSON encoding is streamed.
+        columns = PLAYLIST_SONG_FIELDS.columns(fields)
+        rows = db.session.execute(
+            db.select(*columns, PlaylistSong.id, *PLAYLIST_COLUMNS)
+            .select_from(Playlist)
+            .outerjoin(PlaylistSong, PlaylistSong.playlist_id == Playlist.id)
+            .outerjoin(Song, PlaylistSong.song_id == Song.id)
+            .where(Playlist.id == playlist_id, Playlist.user_id == current_user.id)
+            .order_by(PlaylistSong.playlist_id, PlaylistSong.position, PlaylistSong.id)
+            .offset(start).limit(limit)
+        ).all()
+        if rows:
+            playlist = dict(zip(PLAYLIST_KEYS, rows[0][len(columns) + 1:]))
+            songs = rows if rows[0][len(columns)] is not None else ()
+        else:
+            # no rows at all: either not the user's playlist, or ?offset= is past the end
+            found = Playlist.query.filter_by(id=playlist_id, user_id=current_user.id).first()
+            if not found:
+                return jsonify({'error': 'Playlist not found'}), 404
+            playlist = {key: getattr(found, key) for key in PLAYLIST_KEYS}
+            songs = ()
+
+        return Response(json_stream(
+            **playlist,
+            offset=start,
+            limit=limit,
+            songs=RawRows(songs, PLAYLIST_SONG_FIELDS.encoder(fields), STREAM_BATCH)
+        ), mimetype='application/json'), 200
     
     except Exception as e:
         current_app.logger.error(f"Error retrieving playlist: {e}")
@@ -163,6 +185,7 @@ def add_song_to_playlist(current_user, playlist_id):
             position=max_position + 1
         )
         db.session.add(playlist_song)
+        song_added(playlist_id, song)
         db.session.commit()
         
         return jsonify({
@@ -203,6 +226,7 @@ def remove_song_from_playlist(current_user, playlist_id, song_id):
         if not playlist_song:
             return jsonify({'error': 'Song not in playlist'}), 404
         
+        song_removed(playlist_id, playlist_song.song)
         db.session.delete(playlist_song)
         db.session.commit()
         
@@ -324,4 +348,20 @@ def shuffle_playlist(current_user, playlist_id):
     except Exception as e:
         db.session.rollback()
         current_app.logger.error(f"Error shuffling playlist: {e}")
-        return jsonify({'error': 'Failed to shuffle playlist'}), 500
\ No newline at end of file
+        return jsonify({'error': 'Failed to shuffle playlist'}), 500
+
+
+#playlist counters repair endpoint
+@playlists_bp.route('/playlists/repair', methods=['POST'])
+@token_required
+def repair_playlists(current_user):
+    """Recompute song_count/total_duration for the user's playlists in the background"""
+    try:
+        job = enqueue_playlist_repair(current_user.id)
+        response = jsonify({'job': job.to_dict()})
+        response.headers['Location'] = f"/api/jobs/{job.id}"
+        return response, 202
+
+    except Exception as e:
+        current_app.logger.error(f"Error queueing playlist repair: {e}")
+        return jsonify({'error': 'Failed to queue playlist repair'}), 500
@@ -1,13 +1,32 @@
 from flask import Blueprint, request, jsonify, Response, current_app, send_file
-from file_manager import AudioFileManager
-from database.models import Song, db
+from file_manager import AudioFileManager, resolve_audio_path
+from blob_store import BlobStore
+from cover_store import CoverStore
+from database.models import Job, Song, db
+from database.serializers import SONG_FIELDS, Raw, json_body
 from flask_cors import cross_origin
 from services.music_search import MusicSearchService
+from services.fuzzy_search import fuzzy_song_ids
+from services.library_search import apply_search, search_terms
+from services.pagination import decode_cursor, encode_cursor, flag, offset, page_size
+from services.playlist_stats import song_deleted
+from services.streaming import build_etag, send_file_ranges
+from services.segmenter import MANIFEST_NAME, SEGMENT_PATTERN, enqueue_segmenting, is_segmented, segment_dir, segment_key, segment_root
+from services.ingest import enqueue_ingest
+from services.fingerprint import duplicate_groups, remove_fingerprint
+from services.peaks import DEFAULT_RESOLUTION, RESOLUTIONS, enqueue_peaks, has_peaks, peaks_path, read_peaks
+from services.transcoder import CODECS, TranscodeError, get_rendition_cache, resolve_rendition
+import logging
 import os
+import shutil
 import uuid
+from datetime import datetime
 from auth_middleware import token_required
 
 songs_bp = Blueprint('songs', __name__)
+logger = logging.getLogger(__name__)
+
+STREAM_LOG_SAMPLE = 50  # keep one stream debug record in this many
 
 #song upload endpoint
 @songs_bp.route('/songs', methods=['POST'])
@@ -23,30 +42,24 @@ def upload_song(current_user):
         return jsonify({'error': 'Unsupported file type'}), 400
     
     try:
-        metadata = manager.save_file(file)
-        new_song = Song(
-            title=metadata['title'],
-            artist=metadata['artist'],
-            album=metadata['album'],
-            genre=metadata.get('genre', 'Unknown'),
-            duration=metadata.get('duration'),
-            file_path=metadata['file_path'],
-            file_size=metadata['file_size'],
-            bitrate=metadata.get('bitrate', 0),
-            format=metadata['format'],
-            user_id=current_user.id
-        )
+        # persist the file and a placeholder row now; tags and enrichment run in the ingest job
+        metadata = manager.save_file(file, extract=False)
+        new_song = Song.from_metadata(metadata, current_user.id)
         db.session.add(new_song)
         db.session.commit()
-        return jsonify({
-            'message': 'Song uploaded successfully',
+        job = enqueue_ingest(new_song, metadata['original_filename'])
+        response = jsonify({
+            'message': 'Upload accepted',
+            'job': job.to_dict(),
             'song': {
                 'id': str(new_song.id),
                 'title': new_song.title,
                 'artist': new_song.artist,
                 'album': new_song.album
             }
-        }), 201
+        })
+        response.headers['Location'] = f"/api/jobs/{job.id}"
+        return response, 202
     
     
     except Exception as e:
@@ -58,29 +71,112 @@ def upload_song(current_user):
 @songs_bp.route('/songs', methods=['GET'])
 @token_required
 def list_songs(current_user):
+    """Newest first, one page at a time: ?limit=, ?cursor=<next_cursor>, ?include_total=true, ?fields=id,title"""
     try:
-        songs = Song.query.filter_by(user_id = current_user.id).order_by(Song.upload_date.desc()).all()
-        song_list = [{
-            'id': str(song.id),
-            'title': song.title,
-            'artist': song.artist,
-            'album': song.album,
-            'genre': song.genre,
-            'duration': song.duration,
-            'file_size': song.file_size,
-            'bitrate': song.bitrate,
-            'format': song.format,
-            'upload_date': song.upload_date
-        } for song in songs]
-        return jsonify({
-            'songs': song_list,
-            'total_songs': len(song_list)
-        }), 200
+        limit = page_size(request.args.get('limit'), current_app.config['SONGS_PAGE_SIZE'],
+                          current_app.config['SONGS_MAX_PAGE_SIZE'])
+        cursor = request.args.get('cursor')
+        after = decode_cursor(cursor, (datetime, Song.__table__.c.id.type.python_type)) if cursor else None
+    except ValueError:
+        return jsonify({'error': 'Invalid limit or cursor'}), 400
+
+    try:
+        fields = SONG_FIELDS.parse_fields(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        # only the requested columns plus the sort key, straight from Core rows to JSON
+        query = SONG_FIELDS.select(fields, Song.upload_date, Song.id).where(Song.user_id == current_user.id)
+        if after:
+            # keyset on (upload_date, id), served by ix_songs_user_upload_date; no OFFSET, so every page costs the same
+            query = query.where(db.tuple_(Song.upload_date, Song.id) < after)
+        rows = db.session.execute(query.order_by(Song.upload_date.desc(), Song.id.desc()).limit(limit + 1)).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        body = {
+            'songs': Raw(SONG_FIELDS.encode_rows(rows, fields)),
+            'next_cursor': encode_cursor(rows[-1][-2], rows[-1][-1]) if has_more else None
+        }
+        if flag(request.args.get('include_total')):
+            # a full count of the user's songs, so only when the client asks
+            body['total_songs'] = db.session.scalar(
+                db.select(db.func.count()).select_from(Song).where(Song.user_id == current_user.id)
+            )
+        return Response(json_body(**body), mimetype='application/json'), 200
     
     except Exception as e:
         current_app.logger.error(f"Error listing songs: {e}")
         return jsonify({'error': 'Failed to list songs'}), 500
 
+#library search endpoint
+@songs_bp.route('/songs/search', methods=['GET'])
+@token_required
+def search_library(current_user):
+    """Ranked search of the user's own songs: ?q=, ?fuzzy=true, ?limit=, ?offset=<next_offset>, ?fields=id,title"""
+    text = request.args.get('q', '')
+    terms = search_terms(text)
+    if not terms:
+        return jsonify({'error': 'No search query provided'}), 400
+
+    try:
+        limit = page_size(request.args.get('limit'), current_app.config['SEARCH_PAGE_SIZE'],
+                          current_app.config['SEARCH_MAX_PAGE_SIZE'])
+        start = offset(request.args.get('offset'))
+        fields = SONG_FIELDS.parse_fields(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        if flag(request.args.get('fuzzy')):
+            # typo-tolerant title/artist similarity; rank first, then load just the page's rows
+            ids = fuzzy_song_ids(current_user.id, text, start, limit + 1, current_app.config['FUZZY_SEARCH_THRESHOLD'])
+            rank = {song_id: n for n, song_id in enumerate(ids)}
+            rows = db.session.execute(
+                SONG_FIELDS.select(fields, Song.id).where(Song.id.in_(ids[:limit]), Song.user_id == current_user.id)
+            ).all()
+            rows.sort(key=lambda row: rank[row[-1]])
+            has_more = len(ids) > limit
+        else:
+            query = apply_search(SONG_FIELDS.select(fields), current_user.id, terms)
+            rows = db.session.execute(query.offset(start).limit(limit + 1)).all()
+            has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        return Response(json_body(
+            songs=Raw(SONG_FIELDS.encode_rows(rows, fields)),
+            next_offset=start + limit if has_more else None
+        ), mimetype='application/json'), 200
+
+    except Exception as e:
+        current_app.logger.error(f"Library search error: {e}")
+        return jsonify({'error': 'Search failed'}), 500
+
+#duplicate songs report endpoint
+@songs_bp.route('/songs/duplicates', methods=['GET'])
+@token_required
+def list_duplicates(current_user):
+    try:
+        groups = duplicate_groups(current_user.id)
+        song_ids = {song_id for group in groups for song_id in group['song_ids']}
+        songs = {song.id: song for song in Song.query.filter(Song.id.in_(song_ids)).all()} if song_ids else {}
+
+        return jsonify({
+            'groups': [
+                {
+                    'similarity': group['similarity'],
+                    'songs': [songs[song_id].to_dict() for song_id in group['song_ids'] if song_id in songs]
+                }
+                for group in groups
+            ],
+            'count': len(groups)
+        }), 200
+
+    except Exception as e:
+        current_app.logger.error(f"Duplicate report error: {e}")
+        return jsonify({'error': 'Failed to build duplicate report'}), 500
+
 #listing by song_id endpoint
 @songs_bp.route('/songs/<song_id>', methods=['GET'])
 @token_required
@@ -98,18 +194,7 @@ def get_song(current_user, song_id):
         if not song:
             return jsonify({'error': 'Song not found'}), 404
         
-        return jsonify({
-            'id': str(song.id),
-            'title': song.title,
-            'artist': song.artist,
-            'album': song.album,
-            'genre': song.genre,
-            'duration': song.duration,
-            'file_size': song.file_size,
-            'bitrate': song.bitrate,
-            'format': song.format,
-            'upload_date': song.upload_date.isoformat() if song.upload_date else None
-        }), 200
+        return jsonify(SONG_FIELDS.as_dict(song)), 200
 
     except ValueError:
         return jsonify({'error': 'Invalid song ID format'}), 400
@@ -132,19 +217,34 @@ def delete_song(current_user, song_id):
             pass
 
         song = Song.query.filter_by(id=song_id, user_id=current_user.id).first()
-        file_path = song.file_path
 
         if not song:
             return jsonify({'error': 'Song not found'}), 404
 
-        # Delete file from filesystem
-        file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], song.file_path)
-        if os.path.exists(file_path):
-            os.remove(file_path)
-        
-        # Delete from database
-        db.session.delete(song)
-        db.session.commit()
+        remove_fingerprint(song.id)
+        song_deleted(song)
+        cover_hash = song.cover_hash
+
+        if song.blob_hash:
+            # shared blob: only unlink once no other song references it
+            store = BlobStore(current_app.config['UPLOAD_FOLDER'])
+            unreferenced_path = store.release(song.blob_hash)
+            db.session.delete(song)
+            db.session.commit()
+            store.unlink(unreferenced_path, derived_roots=(segment_root(),))
+        else:
+            # Delete file (and its peaks and segments) from filesystem
+            for file_path in (os.path.join(current_app.config['UPLOAD_FOLDER'], song.file_path), peaks_path(song)):
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+            shutil.rmtree(segment_dir(song), ignore_errors=True)
+
+            # Delete from database
+            db.session.delete(song)
+            db.session.commit()
+
+        # album art is shared, so it goes with the last song using it
+        CoverStore(current_app.config['UPLOAD_FOLDER']).release(cover_hash)
         
         return jsonify({'message': 'Song deleted successfully'}), 200
         
@@ -172,25 +272,11 @@ def stream_song(current_user, song_id):
         if not song:
             return jsonify({'error': 'Song not found'}), 404
 
-        # Build the full file path - ensure it's always absolute
-        if os.path.isabs(song.file_path):
-            # Already absolute path
-            file_path = song.file_path
-        elif song.file_path.startswith('uploads/'):
-            # Path already includes 'uploads/', remove it since we'll add UPLOAD_FOLDER
-            filename = song.file_path.replace('uploads/', '')
-            file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-        else:
-            # Just filename
-            file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], song.file_path)
-        
-        # Make sure the path is absolute
-        if not os.path.isabs(file_path):
-            file_path = os.path.abspath(file_path)
+        file_path = resolve_audio_path(current_app.config['UPLOAD_FOLDER'], song.file_path)
         
-        print(f"Song file_path from DB: {song.file_path}")  # Debug
-        print(f"Full file path: {file_path}")  # Debug
-        print(f"File exists: {os.path.exists(file_path)}")  # Debug
+        # every seek is a request, so only a sample of these is kept
+        logger.debug("Streaming song %s: %s -> %s", song.id, song.file_path, file_path,
+                     extra={'song_id': str(song.id), 'sample': STREAM_LOG_SAMPLE})
 
         if not os.path.exists(file_path):
             return jsonify({'error': 'Audio file not found'}), 404
@@ -205,19 +291,185 @@ def stream_song(current_user, song_id):
 
         mimetype = mime_types.get(song.format.lower(), 'audio/mpeg')
 
-        return send_file(
+        # optional smaller rendition (?codec=opus|mp3, ?quality=low|high|<kbps>)
+        try:
+            rendition = resolve_rendition(request.args.get('codec'), request.args.get('quality'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        if rendition:
+            codec, bitrate = rendition
+            source_key = song.blob_hash or build_etag(song, os.stat(file_path))
+            for attempt in range(2):
+                try:
+                    rendition_path = get_rendition_cache().get_or_create(source_key, file_path, codec, bitrate)
+                except TranscodeError as e:
+                    current_app.logger.error(f"Transcode error: {e}")
+                    return jsonify({'error': 'Transcoding unavailable'}), 503
+
+                try:
+                    # content-addressed, so clients may cache it for good
+                    return send_file_ranges(
+                        rendition_path,
+                        mimetype=CODECS[codec]['mimetype'],
+                        etag=os.path.basename(rendition_path),
+                        download_name=f"{song.artist} - {song.title}.{CODECS[codec]['ext']}",
+                        cache_control='private, max-age=31536000, immutable'
+                    )
+                except FileNotFoundError:
+                    # evicted by another worker before we opened it; encode it once more
+                    if attempt:
+                        raise
+
+        # Range-aware response so seeks in <audio> fetch only the bytes they need
+        etag = build_etag(song, os.stat(file_path))
+        return send_file_ranges(
             file_path,  # Use the calculated file_path
             mimetype=mimetype,
-            as_attachment=False,
+            etag=etag,
             download_name=f"{song.artist} - {song.title}.{song.format}"
         )
     
     except ValueError:
         return jsonify({'error': 'Invalid song ID format'}), 400
     except Exception as e:
-        print(f"Streaming error: {e}")  # Debug
+        current_app.logger.error(f"Streaming error: {e}")
         return jsonify({'error': 'Failed to stream audio'}), 500
     
+def _get_user_song(current_user, song_id):
+    return Song.query.filter_by(id=song_id, user_id=current_user.id).first()
+
+
+IMMUTABLE_CACHE = 'private, max-age=31536000, immutable'
+
+#hls manifest endpoint
+@songs_bp.route('/songs/<song_id>/hls/index.m3u8', methods=['GET'])
+@token_required
+def hls_manifest(current_user, song_id):
+    try:
+        song = _get_user_song(current_user, song_id)
+        if not song:
+            return jsonify({'error': 'Song not found'}), 404
+
+        if not is_segmented(song):
+            # songs uploaded before segmenting existed are cut on first request
+            job = enqueue_segmenting(song)
+            if job.status == Job.STATUS_FAILED:
+                return jsonify({'error': 'Failed to segment song', 'reason': job.error}), 422
+            response = jsonify({'status': 'processing'})
+            response.headers['Retry-After'] = '5'
+            return response, 202
+
+        # manifest and segments are keyed by blob hash and never rewritten
+        return send_file_ranges(
+            os.path.join(segment_dir(song), MANIFEST_NAME),
+            mimetype='application/vnd.apple.mpegurl',
+            etag=f"{segment_key(song)}-{MANIFEST_NAME}",
+            cache_control=IMMUTABLE_CACHE
+        )
+
+    except Exception as e:
+        current_app.logger.error(f"HLS manifest error: {e}")
+        return jsonify({'error': 'Failed to load manifest'}), 500
+
+#hls segment endpoint
+@songs_bp.route('/songs/<song_id>/hls/<segment>', methods=['GET'])
+@token_required
+def hls_segment(current_user, song_id, segment):
+    if not SEGMENT_PATTERN.match(segment):
+        return jsonify({'error': 'Segment not found'}), 404
+
+    try:
+        song = _get_user_song(current_user, song_id)
+        if not song:
+            return jsonify({'error': 'Song not found'}), 404
+
+        segment_path = os.path.join(segment_dir(song), segment)
+        if not os.path.exists(segment_path):
+            return jsonify({'error': 'Segment not found'}), 404
+
+        return send_file_ranges(
+            segment_path,
+            mimetype='video/mp2t',
+            etag=f"{segment_key(song)}-{segment}",
+            cache_control=IMMUTABLE_CACHE
+        )
+
+    except Exception as e:
+        current_app.logger.error(f"HLS segment error: {e}")
+        return jsonify({'error': 'Failed to load segment'}), 500
+
+#waveform peaks endpoint
+@songs_bp.route('/songs/<song_id>/peaks', methods=['GET'])
+@token_required
+def song_peaks(current_user, song_id):
+    try:
+        resolution = int(request.args.get('resolution', DEFAULT_RESOLUTION))
+        bits = int(request.args.get('bits', 16))
+    except ValueError:
+        resolution, bits = None, None
+    if resolution not in RESOLUTIONS or bits not in (8, 16):
+        return jsonify({'error': f"resolution must be one of {list(RESOLUTIONS)} and bits 8 or 16"}), 400
+
+    try:
+        song = _get_user_song(current_user, song_id)
+        if not song:
+            return jsonify({'error': 'Song not found'}), 404
+
+        if not has_peaks(song):
+            job = enqueue_peaks(song)
+            if job.status == Job.STATUS_FAILED:
+                return jsonify({'error': 'Failed to extract peaks', 'reason': job.error}), 422
+            response = jsonify({'status': 'processing'})
+            response.headers['Retry-After'] = '5'
+            return response, 202
+
+        # a few KB of int8/int16 min/max pairs, see services/peaks.py for the layout
+        response = Response(read_peaks(peaks_path(song), resolution, bits), mimetype='application/octet-stream')
+        response.set_etag(f"{song.blob_hash or song.id}-peaks-{resolution}-{bits}")
+        response.headers['Cache-Control'] = IMMUTABLE_CACHE
+        return response.make_conditional(request)
+
+    except Exception as e:
+        current_app.logger.error(f"Peaks error: {e}")
+        return jsonify({'error': 'Failed to load peaks'}), 500
+
+#cover art endpoint
+@songs_bp.route('/songs/<song_id>/cover', methods=['GET'])
+@token_required
+def song_cover(current_user, song_id):
+    try:
+        size = int(request.args.get('size', CoverStore.DEFAULT_SIZE))
+    except ValueError:
+        size = None
+    if size not in CoverStore.SIZES:
+        return jsonify({'error': f"size must be one of {list(CoverStore.SIZES)}"}), 400
+
+    try:
+        song = _get_user_song(current_user, song_id)
+        if not song:
+            return jsonify({'error': 'Song not found'}), 404
+
+        if not song.cover_hash:
+            return jsonify({'error': 'No cover art'}), 404
+        covers = CoverStore(current_app.config['UPLOAD_FOLDER'])
+        cover_path = covers.path(song.cover_hash, size)
+        if not os.path.exists(cover_path) and not covers.restore(
+                song.cover_hash, resolve_audio_path(current_app.config['UPLOAD_FOLDER'], song.file_path)):
+            return jsonify({'error': 'No cover art'}), 404
+
+        # variants are named by content hash and never rewritten
+        return send_file_ranges(
+            cover_path,
+            mimetype='image/jpeg',
+            etag=f"{song.cover_hash}-{size}",
+            cache_control=IMMUTABLE_CACHE
+        )
+
+    except Exception as e:
+        current_app.logger.error(f"Cover art error: {e}")
+        return jsonify({'error': 'Failed to load cover art'}), 500
+    
 #search music online endpoint
 @songs_bp.route('/search', methods=['GET'])
 def search_songs():
@@ -264,8 +516,17 @@ def download_song(current_user):
         if not full_filename:
             return jsonify({'error': 'Download failed'}), 500
         
-        # Extract filename
-        filename = os.path.basename(full_filename)
+        # Move the download into the content-addressed store
+        store = BlobStore(current_app.config['UPLOAD_FOLDER'])
+        blob_hash, filename, file_size = store.ingest_path(full_filename)
+        store.acquire(blob_hash, filename, file_size)
+
+        # the video thumbnail becomes the cover; only its resized variants are kept
+        cover_hash = None
+        thumbnail = search_service.thumbnail_for(full_filename)
+        if thumbnail:
+            cover_hash = CoverStore(current_app.config['UPLOAD_FOLDER']).save_file(thumbnail)
+            os.remove(thumbnail)
         
         # Create metadata from song info
         metadata = {
@@ -275,7 +536,7 @@ def download_song(current_user):
             'genre': song_info.get('genre', 'Unknown'),
             'duration': song_info.get('duration', 0),
             'file_path': filename,
-            'file_size': os.path.getsize(full_filename),
+            'file_size': file_size,
             'bitrate': 192000,  # yt-dlp default
             'format': 'mp3'
         }
@@ -291,11 +552,15 @@ def download_song(current_user):
             file_size=metadata['file_size'],
             bitrate=metadata['bitrate'],
             format=metadata['format'],
+            blob_hash=blob_hash,
+            cover_hash=cover_hash,
             user_id=current_user.id 
         )
         
         db.session.add(song)
         db.session.commit()
+        enqueue_segmenting(song)
+        enqueue_peaks(song)
         
         return jsonify({
             'message': 'Song downloaded successfully',
@@ -0,0 +1,374 @@
+from flask import Blueprint, request, jsonify, current_app, Response
+from werkzeug.exceptions import ClientDisconnected
+from werkzeug.http import http_date
+from file_manager import AudioFileManager
+from database.models import Song, UploadSession, db
+from auth_middleware import token_required
+from services.ingest import enqueue_ingest
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+import base64
+import fcntl
+import hashlib
+import logging
+import os
+import threading
+import time
+
+uploads_bp = Blueprint('uploads', __name__)
+logger = logging.getLogger(__name__)
+
+TUS_VERSION = '1.0.0'
+CHUNK_SIZE = 1024 * 1024
+
+_sweep_lock = threading.Lock()
+_last_sweep = 0.0
+
+# running SHA-256 of each upload's bytes so far: upload id -> (offset, hasher). hashlib state
+# cannot be stored in the row, so a chunk landing on another process re-reads the .part once
+MAX_DIGESTS = 1024
+_digests = OrderedDict()
+_digests_lock = threading.Lock()
+
+
+def _partial_dir(upload_folder):
+    return os.path.join(upload_folder, 'partial')
+
+
+def _partial_path(upload):
+    return os.path.join(_partial_dir(current_app.config['UPLOAD_FOLDER']), f"{upload.id}.part")
+
+
+def _expires_at(upload):
+    """An upload expires UPLOAD_EXPIRY_SECONDS after its last chunk (tus `expiration` extension)"""
+    last_activity = upload.updated_at or upload.created_at or datetime.now(timezone.utc)
+    if last_activity.tzinfo is None:
+        last_activity = last_activity.replace(tzinfo=timezone.utc)
+    return last_activity + timedelta(seconds=current_app.config['UPLOAD_EXPIRY_SECONDS'])
+
+
+def expire_uploads(upload_folder, max_age_seconds) -> int:
+    """Delete upload sessions idle for longer than `max_age_seconds` and their .part files.
+
+    Also removes .part files that no session owns any more (a crash between the
+    row and the file going away). Returns the number of files removed.
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=max_age_seconds)
+    expired = UploadSession.query.filter(UploadSession.updated_at < cutoff).all()
+    expired_ids = {upload.id for upload in expired}
+    for upload in expired:
+        db.session.delete(upload)
+    db.session.commit()
+
+    partial_dir = _partial_dir(upload_folder)
+    if not os.path.isdir(partial_dir):
+        return 0
+    live = {upload_id for (upload_id,) in db.session.execute(db.select(UploadSession.id))}
+    removed = 0
+    for name in os.listdir(partial_dir):
+        path = os.path.join(partial_dir, name)
+        upload_id = name[:-len('.part')] if name.endswith('.part') else None
+        if upload_id in live:
+            continue
+        try:
+            if upload_id in expired_ids or os.path.getmtime(path) < cutoff.timestamp():
+                os.remove(path)
+                removed += 1
+        except OSError:
+            pass
+    return removed
+
+
+def _maybe_expire_uploads():
+    """Sweep abandoned uploads at most once per UPLOAD_SWEEP_INTERVAL seconds in this process"""
+    global _last_sweep
+    with _sweep_lock:
+        if time.monotonic() - _last_sweep < current_app.config['UPLOAD_SWEEP_INTERVAL']:
+            return
+        _last_sweep = time.monotonic()
+    try:
+        removed = expire_uploads(current_app.config['UPLOAD_FOLDER'], current_app.config['UPLOAD_EXPIRY_SECONDS'])
+        if removed:
+            logger.info("Expired %d abandoned upload(s)", removed)
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error("Upload sweep error: %s", e)
+
+
+def _digest_at(upload_id, part, offset):
+    """The hasher for the first `offset` bytes of `part`"""
+    with _digests_lock:
+        entry = _digests.pop(upload_id, None)
+    if entry is not None and entry[0] == offset:
+        return entry[1]
+    digest = hashlib.sha256()
+    part.seek(0)
+    remaining = offset
+    while remaining:
+        chunk = part.read(min(CHUNK_SIZE, remaining))
+        if not chunk:
+            break
+        digest.update(chunk)
+        remaining -= len(chunk)
+    return digest
+
+
+def _remember_digest(upload_id, offset, digest):
+    with _digests_lock:
+        _digests[upload_id] = (offset, digest)
+        while len(_digests) > MAX_DIGESTS:
+            _digests.popitem(last=False)
+
+
+def _forget_digest(upload_id):
+    with _digests_lock:
+        _digests.pop(upload_id, None)
+
+
+def _parse_upload_metadata(header):
+    """Decode a tus `Upload-Metadata` header ("key b64value,key b64value")"""
+    metadata = {}
+    for pair in (header or '').split(','):
+        key, _, value = pair.strip().partition(' ')
+        if not key:
+            continue
+        try:
+            metadata[key] = base64.b64decode(value).decode('utf-8') if value else ''
+        except (ValueError, UnicodeDecodeError):
+            continue
+    return metadata
+
+
+def _offset_headers(upload):
+    return {
+        'Tus-Resumable': TUS_VERSION,
+        'Upload-Offset': str(upload.upload_offset),
+        'Upload-Length': str(upload.upload_length),
+        'Upload-Expires': http_date(_expires_at(upload)),
+        'Cache-Control': 'no-store'
+    }
+
+
+def _get_upload(upload_id, user):
+    """The user's live upload session; an expired one is removed and reported as missing"""
+    upload = UploadSession.query.filter_by(id=upload_id, user_id=user.id).first()
+    if upload and _expires_at(upload) <= datetime.now(timezone.utc):
+        part_path = _partial_path(upload)
+        db.session.delete(upload)
+        db.session.commit()
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        return None
+    return upload
+
+
+#create upload session endpoint
+@uploads_bp.route('/uploads', methods=['POST'])
+@token_required
+def create_upload(current_user):
+    # accept tus headers or a JSON body ({"filename": ..., "size": ...})
+    data = request.get_json(silent=True) or {}
+    metadata = _parse_upload_metadata(request.headers.get('Upload-Metadata'))
+    filename = data.get('filename') or metadata.get('filename')
+
+    try:
+        upload_length = int(request.headers.get('Upload-Length', data.get('size', -1)))
+    except (TypeError, ValueError):
+        upload_length = -1
+
+    if not filename:
+        return jsonify({'error': 'filename is required'}), 400
+    if upload_length < 0:
+        return jsonify({'error': 'Upload-Length is required'}), 400
+    if upload_length > current_app.config['MAX_RESUMABLE_UPLOAD_LENGTH']:
+        return jsonify({'error': 'Upload too large'}), 413
+
+    manager = AudioFileManager(current_app.config['UPLOAD_FOLDER'])
+    if not manager.allowed_file(filename):
+        return jsonify({'error': 'Unsupported file type'}), 400
+
+    _maybe_expire_uploads()
+
+    try:
+        upload = UploadSession(filename=filename, upload_length=upload_length, user_id=current_user.id)
+        db.session.add(upload)
+        db.session.commit()
+
+        part_path = _partial_path(upload)
+        os.makedirs(os.path.dirname(part_path), exist_ok=True)
+        open(part_path, 'wb').close()
+
+        response = jsonify({'upload': upload.to_dict()})
+        response.status_code = 201
+        response.headers.update(_offset_headers(upload))
+        response.headers['Location'] = f"/api/uploads/{upload.id}"
+        return response
+
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error("Upload session error: %s", e)
+        return jsonify({'error': 'Failed to create upload'}), 500
+
+
+#upload offset endpoint (HEAD for tus clients, GET for everything else)
+@uploads_bp.route('/uploads/<upload_id>', methods=['GET', 'HEAD'])
+@token_required
+def get_upload(current_user, upload_id):
+    upload = _get_upload(upload_id, current_user)
+    if not upload:
+        return jsonify({'error': 'Upload not found'}), 404
+
+    response = jsonify({'upload': upload.to_dict()})
+    response.headers.update(_offset_headers(upload))
+    return response, 200
+
+
+#chunk append endpoint
+@uploads_bp.route('/uploads/<upload_id>', methods=['PATCH'])
+@token_required
+def append_chunk(current_user, upload_id):
+    upload = _get_upload(upload_id, current_user)
+    if not upload:
+        return jsonify({'error': 'Upload not found'}), 404
+
+    if request.mimetype != 'application/offset+octet-stream':
+        return jsonify({'error': 'Content-Type must be application/offset+octet-stream'}), 415
+
+    try:
+        offset = int(request.headers['Upload-Offset'])
+    except (KeyError, ValueError):
+        return jsonify({'error': 'Upload-Offset header is required'}), 400
+
+    part_path = _partial_path(upload)
+    if not os.path.exists(part_path):
+        return jsonify({'error': 'Upload data missing, start a new upload'}), 410
+
+    written = 0
+    with open(part_path, 'r+b') as part:
+        # one PATCH per upload at a time, across threads and gunicorn workers
+        try:
+            fcntl.flock(part, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return jsonify({'error': 'Another chunk for this upload is in progress'}), 423
+
+        db.session.refresh(upload)
+        if offset != upload.upload_offset:
+            response = jsonify({'error': 'Upload-Offset does not match the current offset'})
+            response.headers.update(_offset_headers(upload))
+            return response, 409
+
+        remaining = upload.upload_length - upload.upload_offset
+        if request.content_length is not None and request.content_length > remaining:
+            return jsonify({'error': 'Chunk exceeds Upload-Length'}), 413
+
+        # hash as the bytes arrive, so finalizing never re-reads the assembled file
+        digest = _digest_at(upload.id, part, offset)
+        try:
+            # stream the body straight to disk; only CHUNK_SIZE bytes are ever in memory
+            part.truncate(offset)  # drop bytes from an interrupted chunk that were never acknowledged
+            part.seek(offset)
+            while written < remaining:
+                chunk = request.stream.read(min(CHUNK_SIZE, remaining - written))
+                if not chunk:
+                    break
+                part.write(chunk)
+                digest.update(chunk)
+                written += len(chunk)
+            part.flush()
+            os.fsync(part.fileno())
+        except ClientDisconnected:
+            # keep what arrived; the client resumes from the offset reported by HEAD
+            pass
+
+        try:
+            # compare-and-set, so a writer that got past a non-flock filesystem cannot move the offset twice
+            result = db.session.execute(
+                db.update(UploadSession)
+                .where(UploadSession.id == upload.id, UploadSession.upload_offset == offset)
+                .values(upload_offset=offset + written, updated_at=datetime.now(timezone.utc),
+                        sha256=digest.hexdigest() if written == remaining else None)
+            )
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error("Upload chunk error: %s", e)
+            return jsonify({'error': 'Failed to record chunk'}), 500
+
+        db.session.refresh(upload)
+        if result.rowcount != 1:
+            response = jsonify({'error': 'Upload-Offset does not match the current offset'})
+            response.headers.update(_offset_headers(upload))
+            return response, 409
+        if written < remaining:
+            _remember_digest(upload.id, offset + written, digest)
+
+    return Response(status=204, headers=_offset_headers(upload))
+
+
+#finalize upload endpoint
+@uploads_bp.route('/uploads/<upload_id>/complete', methods=['POST'])
+@token_required
+def complete_upload(current_user, upload_id):
+    upload = _get_upload(upload_id, current_user)
+    if not upload:
+        return jsonify({'error': 'Upload not found'}), 404
+
+    if upload.upload_offset != upload.upload_length:
+        response = jsonify({'error': 'Upload is incomplete'})
+        response.headers.update(_offset_headers(upload))
+        return response, 409
+
+    manager = AudioFileManager(current_app.config['UPLOAD_FOLDER'])
+    upload_id = upload.id
+
+    try:
+        # renames the assembled file into the blob store under the hash the chunks built up
+        # (a rollback moves it back); the ingest job does the metadata path
+        metadata = manager.save_local_file(_partial_path(upload), upload.filename, extract=False,
+                                           sha256=upload.sha256)
+        new_song = Song.from_metadata(metadata, current_user.id)
+        db.session.add(new_song)
+        db.session.delete(upload)
+        db.session.commit()
+        _forget_digest(upload_id)
+        job = enqueue_ingest(new_song, metadata['original_filename'])
+        response = jsonify({
+            'message': 'Upload accepted',
+            'job': job.to_dict(),
+            'song': {
+                'id': str(new_song.id),
+                'title': new_song.title,
+                'artist': new_song.artist,
+                'album': new_song.album
+            }
+        })
+        response.headers['Location'] = f"/api/jobs/{job.id}"
+        return response, 202
+
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error("Upload finalize error: %s", e)
+        return jsonify({'error': 'Failed to finalize upload'}), 500
+
+
+#abort upload endpoint
+@uploads_bp.route('/uploads/<upload_id>', methods=['DELETE'])
+@token_required
+def delete_upload(current_user, upload_id):
+    upload = _get_upload(upload_id, current_user)
+    if not upload:
+        return jsonify({'error': 'Upload not found'}), 404
+
+    try:
+        part_path = _partial_path(upload)
+        _forget_digest(upload.id)
+        db.session.delete(upload)
+        db.session.commit()
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        return Response(status=204, headers={'Tus-Resumable': TUS_VERSION})
+
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error("Upload delete error: %s", e)
+        return jsonify({'error': 'Failed to delete upload'}), 500
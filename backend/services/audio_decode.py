@@ -0,0 +1,31 @@
+import subprocess
+
+import numpy as np
+
+
+class DecodeError(Exception):
+    """Raised when ffmpeg cannot decode a song to PCM"""
+
+
+def decode_pcm(source_path: str, sample_rate: int = 8000, timeout: int = 300) -> np.ndarray:
+    """Decode any supported file to mono signed 16-bit PCM at `sample_rate`.
+
+    Analysis jobs (peaks, fingerprints) only need a low rate, which keeps a
+    full track to a few MB in memory.
+    """
+    cmd = [
+        'ffmpeg', '-nostdin', '-v', 'error',
+        '-i', source_path,
+        '-vn', '-ac', '1', '-ar', str(sample_rate),
+        '-f', 's16le', '-',
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, timeout=timeout)
+    except FileNotFoundError:
+        raise DecodeError('ffmpeg is not installed')
+    except subprocess.TimeoutExpired:
+        raise DecodeError('Decoding timed out')
+    if result.returncode != 0:
+        raise DecodeError(result.stderr.decode('utf-8', errors='replace').strip() or 'ffmpeg failed')
+
+    return np.frombuffer(result.stdout, dtype='<i2')
@@ -0,0 +1,46 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from flask import current_app
+
+
+_executor_lock = threading.Lock()
+
+
+def _get_executor(app) -> ThreadPoolExecutor:
+    with _executor_lock:
+        executor = app.extensions.get('background_executor')
+        if executor is None:
+            executor = ThreadPoolExecutor(
+                max_workers=app.config.get('BACKGROUND_WORKERS', 2),
+                thread_name_prefix='waves-bg'
+            )
+            app.extensions['background_executor'] = executor
+        return executor
+
+
+def submit(fn, *args, **kwargs) -> Future:
+    """Run `fn` after the request, inside an app context, on a small thread pool.
+
+    Runs inline when the app is TESTING or BACKGROUND_JOBS_EAGER is set, so
+    tests see the result without racing the teardown.
+    """
+    app = current_app._get_current_object()
+
+    def run():
+        with app.app_context():
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                app.logger.error("Background job %s failed: %s", fn.__name__, e)
+                raise
+
+    if app.config.get('TESTING') or app.config.get('BACKGROUND_JOBS_EAGER'):
+        future = Future()
+        try:
+            future.set_result(run())
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    return _get_executor(app).submit(run)
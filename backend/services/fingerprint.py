@@ -0,0 +1,284 @@
+import math
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from flask import current_app
+
+from database.models import FingerprintTerm, Song, SongFingerprint, db
+from file_manager import resolve_audio_path
+from services.audio_decode import decode_pcm
+from services.jobs import job_handler
+
+
+SAMPLE_RATE = 11025
+FRAME_SIZE = 4096  # ~370 ms analysis window
+HOP_SIZE = 2048
+MIN_FREQ = 55.0
+MAX_FREQ = 3520.0
+SILENCE_FLOOR = 1e-3  # relative frame energy below which a frame carries no bits
+
+MAX_SHIFT = 20  # frames of lead-in difference tolerated when comparing (~3.7 s)
+MATCH_THRESHOLD = 0.75  # 1 - bit error rate; unrelated tracks sit around 0.55
+# a candidate is verified once it shares this fraction of the shorter song's
+# bands (re-encoded copies share 4-10%, unrelated tracks well under 1%)
+MIN_SHARED_FRACTION = 0.02
+MIN_SHARED_TERMS = 4
+MAX_CANDIDATES = 20
+# bands held by more songs than this (silence, test tones, a shared intro)
+# carry no signal and would square the library self-join
+MAX_TERM_SONGS = 25
+
+
+@lru_cache(maxsize=1)
+def _chroma_filter() -> np.ndarray:
+    """(FFT bins, 12) matrix folding spectrum magnitudes into pitch classes"""
+    freqs = np.fft.rfftfreq(FRAME_SIZE, 1.0 / SAMPLE_RATE)
+    in_range = (freqs >= MIN_FREQ) & (freqs <= MAX_FREQ)
+    pitch_class = np.zeros(freqs.size, dtype=np.int64)
+    pitch_class[in_range] = np.round(12 * np.log2(freqs[in_range] / 440.0) + 69).astype(np.int64) % 12
+    matrix = np.zeros((freqs.size, 12), dtype=np.float32)
+    matrix[np.nonzero(in_range)[0], pitch_class[in_range]] = 1.0
+    return matrix
+
+
+def chroma(samples: np.ndarray) -> np.ndarray:
+    """(frames, 12) pitch-class energy, each frame scaled to max 1 (silent frames stay 0)"""
+    if samples.size < FRAME_SIZE:
+        return np.zeros((0, 12), dtype=np.float32)
+    frames = np.lib.stride_tricks.sliding_window_view(samples, FRAME_SIZE)[::HOP_SIZE]
+    window = np.hanning(FRAME_SIZE).astype(np.float32)
+    spectrum = np.abs(np.fft.rfft(frames.astype(np.float32) * window, axis=1)).astype(np.float32)
+    bins = spectrum @ _chroma_filter()
+
+    peak = bins.max(axis=1, keepdims=True)
+    loud = peak[:, 0] > SILENCE_FLOOR * max(float(peak.max()), 1e-9)
+    return np.where(loud[:, None], bins / np.maximum(peak, 1e-9), 0).astype(np.float32)
+
+
+def compute_fingerprint(samples: np.ndarray) -> np.ndarray:
+    """One uint32 per frame: 12 bits of neighbouring-pitch order, 12 bits of
+    (smoothed) change over time and 8 bits of third-apart pitch order.
+
+    Relative comparisons survive re-encoding, gain changes and resampling,
+    which is what makes a YouTube rip match the original upload.
+    """
+    c = chroma(samples)
+    if c.shape[0] == 0:
+        return np.zeros(0, dtype=np.uint32)
+
+    padded = np.vstack([c[:1], c, c[-1:]])
+    smoothed = (padded[:-2] + padded[1:-1] + padded[2:]) / 3
+    previous = np.vstack([smoothed[:1], smoothed[:-1]])
+
+    bits = np.hstack([
+        c > np.roll(c, -1, axis=1),
+        smoothed > previous,
+        c[:, :8] > np.roll(c, -3, axis=1)[:, :8],
+    ])
+    weights = (np.uint64(1) << np.arange(32, dtype=np.uint64))
+    return (bits.astype(np.uint64) @ weights).astype(np.uint32)
+
+
+def similarity(a: np.ndarray, b: np.ndarray, max_shift: int = MAX_SHIFT) -> float:
+    """Best 1 - bit error rate over small time offsets"""
+    if a.size == 0 or b.size == 0:
+        return 0.0
+    min_overlap = max(1, min(a.size, b.size) // 2)
+    best = 0.0
+    for shift in range(-max_shift, max_shift + 1):
+        x = a[max(0, shift):]
+        y = b[max(0, -shift):]
+        n = min(x.size, y.size)
+        if n < min_overlap:
+            continue
+        errors = int(np.bitwise_count(x[:n] ^ y[:n]).sum())
+        best = max(best, 1.0 - errors / (32.0 * n))
+    return best
+
+
+def index_terms(fingerprint: np.ndarray) -> List[int]:
+    """LSH bands: the low and high 24 bits of each sub-fingerprint, tagged by band.
+
+    24-bit bands rarely collide by chance (16-bit halves were shared by ~12% of
+    unrelated tracks' terms) yet one of the two survives most frames of a
+    re-encode. Values stay below 2**25, so they fit the INTEGER column.
+    """
+    voiced = fingerprint[fingerprint != 0].astype(np.int64)
+    low = voiced & 0xFFFFFF
+    high = (voiced >> 8) | (1 << 24)
+    return np.unique(np.concatenate([low, high])).tolist()
+
+
+def required_shared_terms(term_count: int, other_term_count: int) -> int:
+    """Shared bands needed before two songs are compared frame by frame"""
+    return max(MIN_SHARED_TERMS, math.ceil(MIN_SHARED_FRACTION * min(term_count, other_term_count)))
+
+
+def _term_counts(song_ids) -> Dict:
+    return dict(db.session.execute(
+        db.select(FingerprintTerm.song_id, db.func.count())
+        .where(FingerprintTerm.song_id.in_(list(song_ids)))
+        .group_by(FingerprintTerm.song_id)
+    ).all())
+
+
+def to_bytes(fingerprint: np.ndarray) -> bytes:
+    return fingerprint.astype('<u4').tobytes()
+
+
+def from_bytes(data: bytes) -> np.ndarray:
+    return np.frombuffer(data, dtype='<u4')
+
+
+def fingerprint_song(song) -> np.ndarray:
+    """Fingerprint from a song with the same blob if there is one, else decode"""
+    if song.blob_hash:
+        existing = db.session.execute(
+            db.select(SongFingerprint.fingerprint)
+            .join(Song, Song.id == SongFingerprint.song_id)
+            .where(Song.blob_hash == song.blob_hash, Song.id != song.id)
+            .limit(1)
+        ).scalar()
+        if existing is not None:
+            return from_bytes(existing)
+
+    source_path = resolve_audio_path(current_app.config['UPLOAD_FOLDER'], song.file_path)
+    return compute_fingerprint(decode_pcm(source_path, SAMPLE_RATE))
+
+
+def store_fingerprint(song, fingerprint: np.ndarray):
+    """Save the fingerprint and its index terms. Caller commits."""
+    remove_fingerprint(song.id)
+    db.session.add(SongFingerprint(song_id=song.id, fingerprint=to_bytes(fingerprint), frame_count=int(fingerprint.size)))
+    terms = index_terms(fingerprint)
+    if terms:
+        db.session.execute(
+            db.insert(FingerprintTerm),
+            [{'term': term, 'song_id': song.id, 'user_id': song.user_id} for term in terms]
+        )
+
+
+def remove_fingerprint(song_id):
+    """Drop a song's fingerprint and index terms. Caller commits."""
+    db.session.execute(db.delete(FingerprintTerm).where(FingerprintTerm.song_id == song_id))
+    db.session.execute(db.delete(SongFingerprint).where(SongFingerprint.song_id == song_id))
+
+
+def _load_fingerprints(song_ids) -> Dict:
+    rows = db.session.execute(
+        db.select(SongFingerprint.song_id, SongFingerprint.fingerprint)
+        .where(SongFingerprint.song_id.in_(list(song_ids)))
+    ).all()
+    return {song_id: from_bytes(data) for song_id, data in rows}
+
+
+def find_duplicates(song, fingerprint: np.ndarray) -> List[Tuple[object, float]]:
+    """Other songs in the owner's library that sound like `song`, best first.
+
+    The band index narrows the library to a handful of candidates; only
+    those are compared frame by frame.
+    """
+    terms = index_terms(fingerprint)
+    if not terms:
+        return []
+
+    shared = db.session.execute(
+        db.select(FingerprintTerm.song_id, db.func.count())
+        .where(
+            FingerprintTerm.user_id == song.user_id,
+            FingerprintTerm.term.in_(terms),
+            FingerprintTerm.song_id != song.id
+        )
+        .group_by(FingerprintTerm.song_id)
+        .having(db.func.count() >= MIN_SHARED_TERMS)
+        .order_by(db.func.count().desc())
+        .limit(MAX_CANDIDATES)
+    ).all()
+    counts = _term_counts(song_id for song_id, _ in shared)
+    candidates = [song_id for song_id, n in shared if n >= required_shared_terms(len(terms), counts[song_id])]
+
+    matches = []
+    for song_id, other in _load_fingerprints(candidates).items():
+        score = similarity(fingerprint, other)
+        if score >= MATCH_THRESHOLD:
+            matches.append((song_id, score))
+    return sorted(matches, key=lambda match: match[1], reverse=True)
+
+
+def duplicate_groups(user_id) -> List[dict]:
+    """Clusters of near-duplicate songs in one library.
+
+    Candidate pairs come from a single self-join on the band index (pairs
+    sharing enough bands, see required_shared_terms), are verified, then
+    merged with union-find so A~B and B~C report as one group. Bands are
+    selective enough that the join only pairs songs with real overlap; the
+    few that are not (see MAX_TERM_SONGS) are left out of it.
+    """
+    a = db.aliased(FingerprintTerm)
+    b = db.aliased(FingerprintTerm)
+    frequent = (
+        db.select(FingerprintTerm.term)
+        .where(FingerprintTerm.user_id == user_id)
+        .group_by(FingerprintTerm.term)
+        .having(db.func.count() > MAX_TERM_SONGS)
+    )
+    shared = db.session.execute(
+        db.select(a.song_id, b.song_id, db.func.count())
+        .join(b, db.and_(a.term == b.term, a.user_id == b.user_id, a.song_id < b.song_id))
+        .where(a.user_id == user_id, a.term.not_in(frequent))
+        .group_by(a.song_id, b.song_id)
+        .having(db.func.count() >= MIN_SHARED_TERMS)
+    ).all()
+    counts = _term_counts({song_id for left, right, _ in shared for song_id in (left, right)}) if shared else {}
+    pairs = [(left, right) for left, right, n in shared
+             if n >= required_shared_terms(counts[left], counts[right])]
+    if not pairs:
+        return []
+
+    fingerprints = _load_fingerprints({song_id for pair in pairs for song_id in pair})
+    parent: Dict = {}
+    scores: Dict = {}
+
+    def find(x):
+        while parent.setdefault(x, x) != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for left, right in pairs:
+        score = similarity(fingerprints[left], fingerprints[right])
+        if score < MATCH_THRESHOLD:
+            continue
+        root_left, root_right = find(left), find(right)
+        parent[root_left] = root_right
+        scores[(left, right)] = score
+
+    groups: Dict = {}
+    weakest: Dict = {}
+    for (left, right), score in scores.items():
+        root = find(left)
+        groups.setdefault(root, set()).update((left, right))
+        weakest[root] = min(score, weakest.get(root, score))
+
+    return [{'song_ids': sorted(members), 'similarity': round(weakest[root], 3)}
+            for root, members in groups.items()]
+
+
+def check_duplicate(song) -> Optional[Tuple[object, float]]:
+    """Fingerprint and index a freshly ingested song; returns its best match, if any"""
+    fingerprint = fingerprint_song(song)
+    store_fingerprint(song, fingerprint)
+    matches = find_duplicates(song, fingerprint)
+    return matches[0] if matches else None
+
+
+@job_handler('fingerprint')
+def fingerprint_job(job, payload):
+    """Background job: fingerprint and index a song that never went through ingest (bulk imports)"""
+    song = Song.query.filter_by(id=payload['song_id']).first()
+    if song is None:
+        return None
+    duplicate = check_duplicate(song)
+    db.session.commit()
+    return {'duplicate_of': str(duplicate[0]) if duplicate else None}
@@ -0,0 +1,300 @@
+"""
+Typo-tolerant lookup of a user's songs by title or artist
+
+Scores are trigram similarity as pg_trgm defines it: each word is padded
+("  word "), cut into 3-character grams, and two strings score
+|shared| / |union| of their gram sets. Both sides are case-, accent- and
+punctuation-folded first, so "beyonce" finds "Beyoncé" and "guns n roses"
+finds "Guns N' Roses". A song's score is the better of its title and artist.
+
+PostgreSQL answers from the pg_trgm GIN indexes on songs_fold(title) and
+songs_fold(artist) (see database/models.py). Elsewhere each user's titles and
+artists are held in an in-process inverted trigram index (TrigramIndex),
+built once on first use and then kept current row by row; queries are a
+numpy bincount over the posting lists of the query's grams, so they cost the
+same however the library was spelled.
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect, text
+from sqlalchemy.orm import Session
+
+from database.models import IS_POSTGRESQL, Song, db
+from metadata.lookup_cache import normalize_key
+
+DEFAULT_THRESHOLD = 0.3  # pg_trgm's default similarity_threshold
+
+_WORDS = re.compile(r'[^\W_]+')
+
+
+def fold(text: Optional[str]) -> str:
+    """Case/accent/punctuation folding shared by both backends"""
+    return normalize_key(text)
+
+
+def trigrams(text: Optional[str]) -> Set[str]:
+    """pg_trgm's gram set of the folded text"""
+    grams = set()
+    for word in _WORDS.findall(fold(text)):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class TrigramIndex:
+    """Inverted trigram index over the titles and artists of one user's songs.
+
+    Songs added or changed after construction go to an append-only tail and
+    the slots they replace are masked out, so keeping up with writes never
+    re-reads the library; once tail and mask grow past an eighth of the
+    index it is repacked from the texts it already holds.
+    """
+
+    COMPACT_MIN = 1024
+
+    def __init__(self, rows: Iterable[Tuple[object, Optional[str], Optional[str]]] = ()):
+        self._lock = threading.RLock()
+        self._pack(rows)
+
+    def _pack(self, rows):
+        self.song_ids: list = []  # slot -> song id; documents 2n and 2n + 1 are its title and artist
+        self._texts: list = []  # slot -> (title, artist), kept for repacking
+        self._slots: dict = {}  # song id -> its live slot
+        self._dead: Set[int] = set()
+        postings, sizes = defaultdict(list), []
+        for song_id, title, artist in rows:
+            self._append(song_id, title, artist, postings, sizes, 0)
+        self.postings = {gram: np.array(docs, dtype=np.int32) for gram, docs in postings.items()}
+        self.sizes = np.array(sizes, dtype=np.int32)
+        self._tail, self._tail_sizes = defaultdict(list), []
+
+    def _append(self, song_id, title, artist, postings, sizes, first_doc):
+        self._slots[song_id] = len(self.song_ids)
+        self.song_ids.append(song_id)
+        self._texts.append((title, artist))
+        for text in (title, artist):
+            grams = trigrams(text)
+            for gram in grams:
+                postings[gram].append(first_doc + len(sizes))
+            sizes.append(len(grams))
+
+    def __len__(self):
+        return len(self._slots)
+
+    def upsert(self, song_id, title: Optional[str], artist: Optional[str]):
+        with self._lock:
+            slot = self._slots.get(song_id)
+            if slot is not None:
+                if self._texts[slot] == (title, artist):
+                    return
+                self._dead.add(slot)
+            self._append(song_id, title, artist, self._tail, self._tail_sizes, len(self.sizes))
+            self._maybe_compact()
+
+    def remove(self, song_id):
+        with self._lock:
+            slot = self._slots.pop(song_id, None)
+            if slot is not None:
+                self._dead.add(slot)
+                self._maybe_compact()
+
+    def _maybe_compact(self):
+        if len(self._tail_sizes) // 2 + len(self._dead) > max(self.COMPACT_MIN, len(self.song_ids) // 8):
+            self.compact()
+
+    def compact(self):
+        with self._lock:
+            live = sorted(self._slots.items(), key=lambda item: item[1])
+            texts = self._texts
+            self._pack((song_id, *texts[slot]) for song_id, slot in live)
+
+    def search(self, query: str, threshold: float = DEFAULT_THRESHOLD) -> List[Tuple[object, float]]:
+        """(song_id, score) of every song scoring at least `threshold`, best first"""
+        grams = trigrams(query)
+        with self._lock:
+            hits = [self.postings[gram] for gram in grams if gram in self.postings]
+            hits += [np.array(self._tail[gram], dtype=np.int32) for gram in grams if gram in self._tail]
+            if not hits:
+                return []
+            sizes = np.concatenate((self.sizes, np.array(self._tail_sizes, dtype=np.int32)))
+            shared = np.bincount(np.concatenate(hits), minlength=len(sizes))
+            scores = (shared / (len(grams) + sizes - shared)).reshape(-1, 2).max(axis=1)
+            if self._dead:
+                scores[list(self._dead)] = -1.0
+            matches = np.flatnonzero(scores >= threshold)
+            ids = [self.song_ids[n] for n in matches]
+        # best score first, then id order
+        order = np.lexsort((np.array(ids), -scores[matches])) if ids else []
+        return [(ids[n], float(scores[matches[n]])) for n in order]
+
+
+class TrigramIndexes:
+    """Per-user TrigramIndex cache.
+
+    Song rows committed by this process are applied to the owner's index as
+    they commit. Changes made elsewhere (the worker, bulk imports) are pulled
+    in at most every `recheck` seconds: rows whose updated_at moved are
+    re-indexed, and only a song count that still disagrees (rows deleted
+    behind our back) costs a full rebuild. One thread per user does that
+    work while the others wait for its result.
+    """
+
+    def __init__(self, max_users: int = 64, recheck: float = 30.0):
+        self.max_users = max_users
+        self.recheck = recheck
+        # user id -> (index, newest updated_at it has seen, monotonic time of the last check)
+        self._indexes: 'OrderedDict[object, Tuple[TrigramIndex, object, float]]' = OrderedDict()
+        self._refreshing: dict = {}  # user id -> lock held while its index is built or checked
+        self._lock = threading.Lock()
+
+    def get(self, user_id) -> TrigramIndex:
+        with self._lock:
+            entry = self._fresh(user_id)
+            if entry is not None:
+                return entry[0]
+            refreshing = self._refreshing.setdefault(user_id, threading.Lock())
+
+        with refreshing:
+            with self._lock:
+                # another request may have refreshed it while we waited
+                entry = self._fresh(user_id)
+                if entry is not None:
+                    return entry[0]
+                entry = self._indexes.get(user_id)
+            checked = time.monotonic()
+            index, seen = self._refresh(user_id, entry)
+            with self._lock:
+                self._indexes[user_id] = (index, seen, checked)
+                self._indexes.move_to_end(user_id)
+                while len(self._indexes) > self.max_users:
+                    evicted, _ = self._indexes.popitem(last=False)
+                    self._refreshing.pop(evicted, None)
+        return index
+
+    def _fresh(self, user_id):
+        entry = self._indexes.get(user_id)
+        if entry is None:
+            return None
+        self._indexes.move_to_end(user_id)
+        return entry if time.monotonic() - entry[2] < self.recheck else None
+
+    def cached(self, user_id) -> Optional[TrigramIndex]:
+        with self._lock:
+            entry = self._indexes.get(user_id)
+            return entry[0] if entry is not None else None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'users': len(self._indexes), 'songs': sum(len(entry[0]) for entry in self._indexes.values())}
+
+    @staticmethod
+    def _refresh(user_id, entry) -> Tuple[TrigramIndex, object]:
+        columns = (Song.id, Song.title, Song.artist, Song.updated_at)
+        if entry is not None and entry[1] is not None:
+            index, seen = entry[0], entry[1]
+            for song_id, title, artist, updated_at in db.session.execute(
+                db.select(*columns).where(Song.user_id == user_id, Song.updated_at >= seen)
+            ):
+                index.upsert(song_id, title, artist)
+                seen = max(seen, updated_at)
+            count = db.session.scalar(db.select(db.func.count()).select_from(Song).where(Song.user_id == user_id))
+            if count == len(index):
+                return index, seen
+
+        rows = db.session.execute(db.select(*columns).where(Song.user_id == user_id).order_by(Song.id)).all()
+        seen = max((row[3] for row in rows if row[3] is not None), default=None)
+        return TrigramIndex(row[:3] for row in rows), seen
+
+
+_indexes_lock = threading.Lock()
+
+
+def get_trigram_indexes() -> TrigramIndexes:
+    """Process-wide index cache for the current app"""
+    with _indexes_lock:
+        indexes = current_app.extensions.get('trigram_indexes')
+        if indexes is None:
+            indexes = TrigramIndexes(current_app.config['FUZZY_INDEX_USERS'], current_app.config['FUZZY_INDEX_RECHECK'])
+            current_app.extensions['trigram_indexes'] = indexes
+        return indexes
+
+
+@event.listens_for(Session, 'after_flush')
+def _record_changes(session, flush_context):
+    if IS_POSTGRESQL:
+        return
+    changes = session.info.setdefault('trigram_changes', [])
+    for obj in (*session.new, *session.dirty):
+        if isinstance(obj, Song):
+            changes.append((obj.user_id, obj.id, (obj.title, obj.artist)))
+            # a song handed to another user leaves its old owner's index
+            changes.extend((old, obj.id, None) for old in inspect(obj).attrs.user_id.history.deleted or ())
+    changes.extend((obj.user_id, obj.id, None) for obj in session.deleted if isinstance(obj, Song))
+
+
+@event.listens_for(Session, 'after_transaction_create')
+def _mark_savepoint(session, transaction):
+    if transaction.nested:
+        marks = session.info.setdefault('trigram_marks', {})
+        marks[transaction] = len(session.info.get('trigram_changes', ()))
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_changes(session):
+    if session.in_nested_transaction():
+        return  # a savepoint; the outer transaction can still roll back
+    session.info.pop('trigram_marks', None)
+    changes = session.info.pop('trigram_changes', None)
+    if not changes or not has_app_context():
+        return
+    indexes = current_app.extensions.get('trigram_indexes')
+    if indexes is None:
+        return
+    for user_id, song_id, texts in changes:
+        index = indexes.cached(user_id)
+        if index is None:
+            continue
+        if texts is None:
+            index.remove(song_id)
+        else:
+            index.upsert(song_id, *texts)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_changes(session, previous_transaction):
+    if previous_transaction.nested:
+        # only what was flushed inside the savepoint is undone
+        mark = session.info.get('trigram_marks', {}).pop(previous_transaction, None)
+        if mark is not None:
+            del session.info.get('trigram_changes', [])[mark:]
+        return
+    session.info.pop('trigram_marks', None)
+    session.info.pop('trigram_changes', None)
+
+
+def fuzzy_song_ids(user_id, query: str, offset: int, limit: int, threshold: float = DEFAULT_THRESHOLD) -> list:
+    """Ids of the user's songs resembling `query`, best match first, sliced to [offset, offset + limit)"""
+    if not IS_POSTGRESQL:
+        matches = get_trigram_indexes().get(user_id).search(query, threshold)
+        return [song_id for song_id, _ in matches[offset:offset + limit]]
+
+    folded = fold(query)
+    title, artist = db.func.songs_fold(Song.title), db.func.songs_fold(Song.artist)
+    score = db.func.greatest(db.func.similarity(title, folded), db.func.similarity(artist, folded))
+    # `%` is the operator the GIN indexes serve and it compares against pg_trgm.similarity_threshold,
+    # so set that for this transaction (SET LOCAL) rather than filtering again on `score`
+    db.session.execute(text("SELECT set_config('pg_trgm.similarity_threshold', :threshold, true)"),
+                       {'threshold': str(threshold)})
+    return db.session.scalars(
+        db.select(Song.id)
+        .where(Song.user_id == user_id, db.or_(title.op('%')(folded), artist.op('%')(folded)))
+        .order_by(score.desc(), Song.id)
+        .offset(offset).limit(limit)
+    ).all()
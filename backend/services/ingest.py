@@ -0,0 +1,89 @@
+from flask import current_app
+
+from blob_store import BlobStore
+from cover_store import CoverStore
+from database.models import Song, db
+from file_manager import AudioFileManager, resolve_audio_path
+from services.audio_decode import DecodeError
+from services.fingerprint import check_duplicate, remove_fingerprint
+from services.jobs import enqueue, job_handler, set_progress
+from services.peaks import enqueue_peaks
+from services.playlist_stats import duration_changed, song_deleted
+from services.segmenter import enqueue_segmenting, segment_root
+
+
+def enqueue_ingest(song, filename: str):
+    """Queue tag extraction and online enrichment for a placeholder song"""
+    return enqueue(
+        'ingest',
+        {'song_id': str(song.id), 'filename': filename},
+        user_id=song.user_id,
+        dedupe_key=f"ingest:{song.id}"
+    )
+
+
+@job_handler('ingest')
+def ingest_song(job, payload):
+    """Read tags, run filename parsing + MusicBrainz/Last.fm enrichment, update the song"""
+    song = Song.query.filter_by(id=payload['song_id']).first()
+    if song is None:
+        # deleted before the worker got to it
+        return None
+
+    manager = AudioFileManager(current_app.config['UPLOAD_FOLDER'])
+    file_path = resolve_audio_path(current_app.config['UPLOAD_FOLDER'], song.file_path)
+    filename = payload.get('filename') or song.file_path
+    set_progress(job, 10)
+
+    metadata = manager._extract_embedded_tags(file_path, filename, manager.covers)
+    set_progress(job, 40)
+
+    # network-bound part: MusicBrainz (rate limited) and Last.fm
+    metadata = manager.enhancer.enhance_metadata(metadata, filename)
+    set_progress(job, 90)
+
+    song = Song.query.filter_by(id=payload['song_id']).first()
+    if song is None:
+        return None
+    old_duration = song.duration
+    song.update_from_metadata(metadata)
+    duration_changed(song, old_duration)
+    db.session.commit()
+
+    try:
+        duplicate = check_duplicate(song)
+        db.session.commit()
+    except DecodeError as e:
+        db.session.rollback()
+        current_app.logger.warning("Fingerprinting skipped for song %s: %s", song.id, e)
+        duplicate = None
+
+    if duplicate and current_app.config.get('DUPLICATE_UPLOADS', 'link') == 'link':
+        # same recording is already in the library: point the client at it and drop this copy
+        duplicate_id, score = duplicate
+        _discard(song)
+        return {'song_id': None, 'duplicate_of': str(duplicate_id), 'similarity': round(score, 3)}
+
+    enqueue_segmenting(song)
+    enqueue_peaks(song)
+
+    return {
+        'song_id': str(song.id),
+        'title': song.title,
+        'artist': song.artist,
+        'album': song.album,
+        'genre': song.genre,
+        'duplicate_of': str(duplicate[0]) if duplicate else None
+    }
+
+
+def _discard(song):
+    store = BlobStore(current_app.config['UPLOAD_FOLDER'])
+    unreferenced_path = store.release(song.blob_hash) if song.blob_hash else None
+    cover_hash = song.cover_hash
+    remove_fingerprint(song.id)
+    song_deleted(song)
+    db.session.delete(song)
+    db.session.commit()
+    store.unlink(unreferenced_path, derived_roots=(segment_root(),))
+    CoverStore(current_app.config['UPLOAD_FOLDER']).release(cover_hash)
@@ -0,0 +1,224 @@
+import json
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Optional
+
+from flask import current_app
+
+from database.models import Job, db
+from services.background import submit
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = (Job.STATUS_QUEUED, Job.STATUS_RUNNING)
+
+_handlers: Dict[str, Callable] = {}
+
+_recovery_lock = threading.Lock()
+_last_recovery = float('-inf')  # the first request after start-up recovers at once
+
+
+def job_handler(kind: str):
+    """Register `fn(job, payload)` as the handler for jobs of `kind`.
+
+    Whatever the handler returns (JSON-serializable) is stored as the job result.
+    """
+    def decorator(fn):
+        _handlers[kind] = fn
+        return fn
+    return decorator
+
+
+def enqueue(kind: str, payload: Optional[dict] = None, user_id=None, dedupe_key: Optional[str] = None) -> Job:
+    """Persist a job and hand it to the configured backend.
+
+    JOB_BACKEND=thread (default) runs it on the in-process worker pool;
+    JOB_BACKEND=queue only writes the row, for `worker.py` to pick up.
+    With a `dedupe_key`, an already queued or running job with the same key is
+    returned instead of creating a second one.
+    """
+    if dedupe_key:
+        existing = Job.query.filter(
+            Job.dedupe_key == dedupe_key,
+            Job.status.in_(ACTIVE_STATUSES)
+        ).first()
+        if existing:
+            return existing
+
+    job = Job(kind=kind, payload=json.dumps(payload or {}), user_id=user_id, dedupe_key=dedupe_key)
+    db.session.add(job)
+    db.session.commit()
+
+    if current_app.config.get('JOB_BACKEND', 'thread') != 'queue':
+        submit(run_job, job.id)
+    return job
+
+
+def recent_failure(dedupe_key: str) -> Optional[Job]:
+    """The newest job for `dedupe_key` if it failed less than JOB_RETRY_AFTER seconds ago.
+
+    On-demand work (segmenting, peaks) reports such a failure to the client
+    instead of queueing the same doomed job again on every poll.
+    """
+    job = Job.query.filter_by(dedupe_key=dedupe_key).order_by(Job.created_at.desc()).first()
+    if job is None or job.status != Job.STATUS_FAILED or job.finished_at is None:
+        return None
+    finished_at = job.finished_at if job.finished_at.tzinfo else job.finished_at.replace(tzinfo=timezone.utc)
+    retry_after = timedelta(seconds=current_app.config.get('JOB_RETRY_AFTER', 3600))
+    return job if datetime.now(timezone.utc) - finished_at < retry_after else None
+
+
+def set_progress(job: Job, progress: int):
+    job.progress = max(0, min(100, int(progress)))
+    job.heartbeat_at = datetime.now(timezone.utc)
+    db.session.commit()
+
+
+def claim(job_id: str) -> bool:
+    """Atomically move a job from queued to running; False if someone else got it"""
+    now = datetime.now(timezone.utc)
+    result = db.session.execute(
+        db.update(Job)
+        .where(Job.id == job_id, Job.status == Job.STATUS_QUEUED)
+        .values(status=Job.STATUS_RUNNING, started_at=now, heartbeat_at=now, attempts=Job.attempts + 1)
+    )
+    db.session.commit()
+    return result.rowcount == 1
+
+
+def claim_next() -> Optional[str]:
+    """Claim the oldest queued job, for queue workers"""
+    candidates = db.session.execute(
+        db.select(Job.id)
+        .where(Job.status == Job.STATUS_QUEUED)
+        .order_by(Job.created_at)
+        .limit(10)
+    ).scalars().all()
+    for job_id in candidates:
+        if claim(job_id):
+            return job_id
+    return None
+
+
+def requeue_stale(max_age_seconds: int = 900) -> int:
+    """Put jobs whose worker died mid-run back on the queue.
+
+    A live run renews heartbeat_at every JOB_HEARTBEAT_INTERVAL seconds (see
+    execute), so only runs silent for `max_age_seconds` are taken back,
+    however long they have been going.
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=max_age_seconds)
+    result = db.session.execute(
+        db.update(Job)
+        .where(Job.status == Job.STATUS_RUNNING,
+               db.func.coalesce(Job.heartbeat_at, Job.started_at) < cutoff)
+        .values(status=Job.STATUS_QUEUED)
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+def recover_jobs(max_age_seconds: int = 900) -> int:
+    """Thread backend counterpart of worker.py's start-up recovery.
+
+    Requeues jobs whose thread died mid-run and hands queued jobs older than
+    `max_age_seconds` (their pool went away with a restart) back to this
+    process's pool. claim() keeps a job that is still waiting in another
+    process's pool from running twice. Returns the number of jobs submitted.
+    """
+    requeue_stale(max_age_seconds)
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=max_age_seconds)
+    job_ids = db.session.execute(
+        db.select(Job.id)
+        .where(Job.status == Job.STATUS_QUEUED, Job.created_at < cutoff)
+        .order_by(Job.created_at)
+    ).scalars().all()
+    for job_id in job_ids:
+        submit(run_job, job_id)
+    return len(job_ids)
+
+
+def maybe_recover_jobs():
+    """Run recover_jobs at most once per JOB_RECOVERY_INTERVAL seconds in this process"""
+    global _last_recovery
+    if current_app.config.get('JOB_BACKEND', 'thread') == 'queue':
+        return
+    with _recovery_lock:
+        if time.monotonic() - _last_recovery < current_app.config['JOB_RECOVERY_INTERVAL']:
+            return
+        _last_recovery = time.monotonic()
+    try:
+        recovered = recover_jobs(current_app.config['JOB_STALE_SECONDS'])
+        if recovered:
+            current_app.logger.info("Resubmitted %d stale job(s)", recovered)
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error("Job recovery error: %s", e)
+
+
+def run_job(job_id: str):
+    """Claim and execute one job (thread backend entry point)"""
+    if claim(job_id):
+        execute(job_id)
+
+
+class _Heartbeat:
+    """Renews a running job's heartbeat_at every `interval` seconds from its own thread and connection"""
+
+    def __init__(self, job_id: str, interval: float):
+        self.job_id = job_id
+        self.interval = interval
+        self.engine = db.engine
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f'job-heartbeat-{job_id}', daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                with self.engine.begin() as connection:
+                    connection.execute(
+                        db.update(Job)
+                        .where(Job.id == self.job_id, Job.status == Job.STATUS_RUNNING)
+                        .values(heartbeat_at=datetime.now(timezone.utc))
+                    )
+            except Exception as e:
+                # a missed beat only matters once JOB_STALE_SECONDS of them add up
+                logger.warning("Heartbeat for job %s failed: %s", self.job_id, e)
+
+
+def execute(job_id: str):
+    """Run the handler for an already claimed job and record the outcome"""
+    job = db.session.get(Job, job_id)
+    handler = _handlers.get(job.kind)
+
+    try:
+        if handler is None:
+            raise LookupError(f"No handler registered for job kind '{job.kind}'")
+        with _Heartbeat(job_id, current_app.config.get('JOB_HEARTBEAT_INTERVAL', 60)):
+            result = handler(job, json.loads(job.payload or '{}'))
+
+        job = db.session.get(Job, job_id)
+        job.status = Job.STATUS_SUCCEEDED
+        job.progress = 100
+        job.result = json.dumps(result) if result is not None else None
+        job.finished_at = datetime.now(timezone.utc)
+        db.session.commit()
+
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error("Job %s (%s) failed: %s", job_id, job.kind, e)
+        job = db.session.get(Job, job_id)
+        job.status = Job.STATUS_FAILED
+        job.error = str(e)
+        job.finished_at = datetime.now(timezone.utc)
+        db.session.commit()
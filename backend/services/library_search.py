@@ -0,0 +1,43 @@
+"""
+Ranked full-text search over a user's own songs
+
+PostgreSQL matches against songs.search_vector, a generated tsvector behind
+the GIN index ix_songs_search_vector, and ranks with ts_rank_cd; columns and
+query both go through songs_fold() so accents fold as on SQLite. SQLite
+matches against songs_fts, an FTS5 table the triggers in database/models.py
+keep in step with songs, and ranks with bm25 using the same column weights
+(title > artist > album > genre). Either way every word of the query must
+match, each as a prefix, so "beat lov" finds "The Beatles - Love Me Do".
+"""
+
+import re
+from typing import List
+
+from sqlalchemy import column, table
+
+from database.models import IS_POSTGRESQL, Song, db
+
+MAX_TERMS = 8
+BM25_WEIGHTS = (10.0, 5.0, 2.0, 1.0)  # title, artist, album, genre
+
+_songs_fts = table('songs_fts', column('rowid'))
+_WORD = re.compile(r'\w+')
+
+
+def search_terms(query: str) -> List[str]:
+    """The words of `?q=`, lowercased and deduplicated; punctuation never reaches the match syntax"""
+    return list(dict.fromkeys(_WORD.findall(query.lower())))[:MAX_TERMS]
+
+
+def apply_search(query, user_id, terms: List[str]):
+    """Restrict a select() over Song columns to the user's songs matching all `terms`, best match first"""
+    query = query.where(Song.user_id == user_id)
+    if IS_POSTGRESQL:
+        tsquery = db.func.to_tsquery('simple', db.func.songs_fold(' & '.join(f"{term}:*" for term in terms)))
+        return query.where(Song.search_vector.op('@@')(tsquery)) \
+            .order_by(db.func.ts_rank_cd(Song.search_vector, tsquery).desc(), Song.id)
+
+    fts = db.literal_column('songs_fts')
+    return query.join(_songs_fts, _songs_fts.c.rowid == Song.id) \
+        .where(fts.op('MATCH')(' '.join(f'"{term}"*' for term in terms))) \
+        .order_by(db.func.bm25(fts, *BM25_WEIGHTS), Song.id)
@@ -1,9 +1,12 @@
+import logging
 import requests
 import yt_dlp
 import os
 from typing import List, Dict, Optional
 import musicbrainzngs
 
+logger = logging.getLogger(__name__)
+
 class MusicSearchService:
     def __init__(self):
         musicbrainzngs.set_useragent("Waves", "0.1", "https://github.com/timothyhioe/waves")
@@ -50,7 +53,7 @@ class MusicSearchService:
                 return songs
             
         except Exception as e:
-            print(f"YouTube search error: {e}")
+            logger.warning("YouTube search error: %s", e)
             return []
 
 
@@ -89,6 +92,8 @@ class MusicSearchService:
                         'skip': ['hls', 'dash']
                     }
                 },
+                # keep the video thumbnail as cover art (<title>.webp/.jpg next to the audio)
+                'writethumbnail': True,
                 'retries': 10,
                 'fragment_retries': 10,
                 'quiet': False, 
@@ -108,6 +113,17 @@ class MusicSearchService:
                 return filename
                 
         except Exception as e:
-            print(f"YouTube download error: {e}")
+            logger.warning("YouTube download error: %s", e)
             return None
 
+    THUMBNAIL_EXTENSIONS = ('.webp', '.jpg', '.jpeg', '.png')
+
+    @classmethod
+    def thumbnail_for(cls, audio_path: str) -> Optional[str]:
+        """The thumbnail yt-dlp wrote alongside a downloaded file, if any"""
+        base = audio_path.rsplit('.', 1)[0]
+        for ext in cls.THUMBNAIL_EXTENSIONS:
+            if os.path.exists(base + ext):
+                return base + ext
+        return None
+
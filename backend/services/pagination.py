@@ -0,0 +1,50 @@
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Sequence
+
+
+def _integer(name: str, value: str) -> int:
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an integer") from None
+
+
+def page_size(value: Optional[str], default: Optional[int], maximum: int) -> Optional[int]:
+    """`?limit=` clamped to 1..maximum; ValueError if it is not a number"""
+    if value in (None, ''):
+        return default
+    return max(1, min(_integer('limit', value), maximum))
+
+
+def offset(value: Optional[str]) -> int:
+    """`?offset=` as a non-negative int (0 when absent); ValueError otherwise"""
+    if value in (None, ''):
+        return 0
+    result = _integer('offset', value)
+    if result < 0:
+        raise ValueError('offset must not be negative')
+    return result
+
+
+def flag(value: Optional[str]) -> bool:
+    return (value or '').lower() in ('1', 'true', 'yes')
+
+
+def encode_cursor(*values) -> str:
+    """Opaque cursor for the sort key of the last row on a page"""
+    raw = json.dumps([value.isoformat() if isinstance(value, datetime) else str(value) for value in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, types: Sequence[type]) -> tuple:
+    """Inverse of encode_cursor; `types` converts each value back. ValueError if it was tampered with"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError('wrong number of values')
+        return tuple(datetime.fromisoformat(value) if kind is datetime else kind(value)
+                     for kind, value in zip(types, values))
+    except (ValueError, TypeError) as e:
+        raise ValueError('Invalid cursor') from e
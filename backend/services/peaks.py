@@ -0,0 +1,123 @@
+import os
+import struct
+import tempfile
+from typing import Sequence
+
+import numpy as np
+from flask import current_app
+
+from blob_store import BlobStore
+from database.models import Song
+from file_manager import resolve_audio_path
+from services.audio_decode import decode_pcm
+from services.jobs import enqueue, job_handler, recent_failure
+
+
+# peak pairs per track; each level is derived from the next finer one
+RESOLUTIONS = (256, 1024, 4096)
+DEFAULT_RESOLUTION = 1024
+SAMPLE_RATE = 8000
+PEAKS_SUFFIX = '.peaks'
+
+MAGIC = b'PEAK'
+VERSION = 1
+# magic, version, level count, reserved, sample rate, sample count
+FILE_HEADER = struct.Struct('<4sBBHII')
+# magic, version, bits per value, reserved, peak pairs, duration in ms
+RESPONSE_HEADER = struct.Struct('<4sBBHII')
+
+
+def peaks_path(song) -> str:
+    """Peaks live next to the blob (`<sha>.peaks`) so duplicates share them"""
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    if song.blob_hash:
+        return BlobStore.sidecar_path(os.path.join(upload_folder, song.file_path), PEAKS_SUFFIX)
+    return os.path.join(upload_folder, 'peaks', f"song-{song.id}{PEAKS_SUFFIX}")
+
+
+def has_peaks(song) -> bool:
+    return os.path.exists(peaks_path(song))
+
+
+def compute_peaks(samples: np.ndarray, resolutions: Sequence[int] = RESOLUTIONS) -> dict:
+    """Min/max int16 pairs per bucket for every resolution, shape (buckets, 2).
+
+    The finest level is a single reduceat pass over the samples; coarser
+    levels fold it, so they stay consistent with each other.
+    """
+    finest = max(resolutions)
+    if samples.size == 0:
+        levels = {finest: np.zeros((finest, 2), dtype=np.int16)}
+    else:
+        starts = np.linspace(0, samples.size, finest, endpoint=False).astype(np.int64)
+        pairs = np.empty((finest, 2), dtype=np.int16)
+        pairs[:, 0] = np.minimum.reduceat(samples, starts)
+        pairs[:, 1] = np.maximum.reduceat(samples, starts)
+        levels = {finest: pairs}
+
+    for resolution in sorted(resolutions, reverse=True)[1:]:
+        factor = finest // resolution
+        folded = levels[finest].reshape(resolution, factor, 2)
+        levels[resolution] = np.stack([folded[:, :, 0].min(axis=1), folded[:, :, 1].max(axis=1)], axis=1)
+    return levels
+
+
+def write_peaks(path: str, levels: dict, sample_rate: int, sample_count: int):
+    """Store all levels in one small file, written atomically"""
+    resolutions = sorted(levels)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            out.write(FILE_HEADER.pack(MAGIC, VERSION, len(resolutions), 0, sample_rate, sample_count))
+            out.write(struct.pack(f"<{len(resolutions)}I", *resolutions))
+            for resolution in resolutions:
+                out.write(levels[resolution].astype('<i2').tobytes())
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def read_peaks(path: str, resolution: int, bits: int = 16) -> bytes:
+    """Response body for one level: RESPONSE_HEADER then interleaved min/max values"""
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    magic, version, level_count, _, sample_rate, sample_count = FILE_HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError('Unrecognized peaks file')
+    resolutions = struct.unpack_from(f"<{level_count}I", data, FILE_HEADER.size)
+    if resolution not in resolutions:
+        raise KeyError(resolution)
+
+    offset = FILE_HEADER.size + 4 * level_count
+    for level in resolutions:
+        if level == resolution:
+            break
+        offset += level * 4
+    values = np.frombuffer(data, dtype='<i2', count=resolution * 2, offset=offset)
+    if bits == 8:
+        values = (values >> 8).astype(np.int8)
+
+    duration_ms = int(sample_count * 1000 / sample_rate) if sample_rate else 0
+    return RESPONSE_HEADER.pack(MAGIC, VERSION, bits, 0, resolution, duration_ms) + values.tobytes()
+
+
+def enqueue_peaks(song):
+    """Queue peak extraction once per blob, or return the recently failed attempt"""
+    key = f"peaks:{song.blob_hash or f'song-{song.id}'}"
+    return recent_failure(key) or enqueue('peaks', {'song_id': str(song.id)}, dedupe_key=key)
+
+
+@job_handler('peaks')
+def extract_peaks(job, payload):
+    """Background job: decode a song once and store its waveform peaks"""
+    song = Song.query.filter_by(id=payload['song_id']).first()
+    if song is None or has_peaks(song):
+        return None
+
+    source_path = resolve_audio_path(current_app.config['UPLOAD_FOLDER'], song.file_path)
+    samples = decode_pcm(source_path, SAMPLE_RATE)
+    write_peaks(peaks_path(song), compute_peaks(samples), SAMPLE_RATE, samples.size)
+    return {'peaks': f"/api/songs/{song.id}/peaks"}
@@ -0,0 +1,99 @@
+from typing import Optional
+
+from database.models import Playlist, PlaylistSong, Song, db
+from services.jobs import enqueue, job_handler
+
+
+# Playlist.song_count and total_duration are maintained with relative UPDATEs
+# in the same transaction as the playlist_songs change, so concurrent edits
+# never lose an increment and listing playlists needs no join or count.
+
+def _duration(value) -> float:
+    return value or 0.0
+
+
+def song_added(playlist_id, song):
+    db.session.execute(
+        db.update(Playlist)
+        .where(Playlist.id == playlist_id)
+        .values(song_count=Playlist.song_count + 1,
+                total_duration=Playlist.total_duration + _duration(song.duration))
+    )
+
+
+def song_removed(playlist_id, song):
+    db.session.execute(
+        db.update(Playlist)
+        .where(Playlist.id == playlist_id)
+        .values(song_count=Playlist.song_count - 1,
+                total_duration=Playlist.total_duration - _duration(song.duration))
+    )
+
+
+def _containing(song_id):
+    return db.select(PlaylistSong.playlist_id).where(PlaylistSong.song_id == song_id).scalar_subquery()
+
+
+def song_deleted(song):
+    """Call before deleting a song; its playlist entries go with it (cascade)"""
+    db.session.execute(
+        db.update(Playlist)
+        .where(Playlist.id.in_(_containing(song.id)))
+        .values(song_count=Playlist.song_count - 1,
+                total_duration=Playlist.total_duration - _duration(song.duration)),
+        execution_options={'synchronize_session': False}
+    )
+
+
+def duration_changed(song, old_duration):
+    """A song's duration was corrected (e.g. by the ingest job) while it was already in playlists"""
+    delta = _duration(song.duration) - _duration(old_duration)
+    if delta:
+        db.session.execute(
+            db.update(Playlist)
+            .where(Playlist.id.in_(_containing(song.id)))
+            .values(total_duration=Playlist.total_duration + delta),
+            execution_options={'synchronize_session': False}
+        )
+
+
+def repair_playlist_stats(user_id=None) -> int:
+    """Recompute the counters from playlist_songs with one grouped query; returns playlists changed"""
+    totals = db.select(
+        PlaylistSong.playlist_id,
+        db.func.count().label('song_count'),
+        db.func.coalesce(db.func.sum(Song.duration), 0.0).label('total_duration')
+    ).join(Song, PlaylistSong.song_id == Song.id).group_by(PlaylistSong.playlist_id)
+    playlists = db.select(Playlist.id, Playlist.song_count, Playlist.total_duration)
+    if user_id is not None:
+        totals = totals.join(Playlist, PlaylistSong.playlist_id == Playlist.id).where(Playlist.user_id == user_id)
+        playlists = playlists.where(Playlist.user_id == user_id)
+
+    actual = {row.playlist_id: (row.song_count, float(row.total_duration)) for row in db.session.execute(totals)}
+    updates = []
+    for playlist_id, song_count, total_duration in db.session.execute(playlists):
+        count, duration = actual.get(playlist_id, (0, 0.0))
+        if (song_count, round(total_duration or 0.0, 3)) != (count, round(duration, 3)):
+            updates.append({'id': playlist_id, 'song_count': count, 'total_duration': duration})
+    if updates:
+        db.session.execute(db.update(Playlist), updates)
+    db.session.commit()
+    return len(updates)
+
+
+def enqueue_playlist_repair(user_id: Optional[object] = None):
+    return enqueue(
+        'playlist_stats',
+        {'user_id': str(user_id) if user_id is not None else None},
+        user_id=user_id,
+        dedupe_key=f"playlist_stats:{user_id or 'all'}"
+    )
+
+
+@job_handler('playlist_stats')
+def repair_job(job, payload):
+    """Background job: fix drifted playlist counters (one user's, or all)"""
+    user_id = payload.get('user_id')
+    if user_id is not None:
+        user_id = Playlist.__table__.c.user_id.type.python_type(user_id)
+    return {'repaired': repair_playlist_stats(user_id)}
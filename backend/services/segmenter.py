@@ -0,0 +1,96 @@
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+
+from flask import current_app
+
+from database.models import Song
+from file_manager import resolve_audio_path
+from services.jobs import enqueue, job_handler, recent_failure
+
+
+MANIFEST_NAME = 'index.m3u8'
+SEGMENT_PATTERN = re.compile(r'^seg_\d{5}\.ts$')
+
+
+class SegmentError(Exception):
+    """Raised when ffmpeg cannot segment a song"""
+
+
+def segment_key(song) -> str:
+    """Segments are shared by every song with the same blob"""
+    return song.blob_hash or f"song-{song.id}"
+
+
+def segment_root() -> str:
+    return current_app.config.get('HLS_FOLDER') or os.path.join(current_app.config['UPLOAD_FOLDER'], 'hls')
+
+
+def segment_dir(song) -> str:
+    return os.path.join(segment_root(), segment_key(song))
+
+
+def is_segmented(song) -> bool:
+    return os.path.exists(os.path.join(segment_dir(song), MANIFEST_NAME))
+
+
+def build_segments(source_path: str, output_dir: str, segment_seconds: int, bitrate_kbps: int = 160):
+    """Cut `source_path` into fixed-duration AAC/MPEG-TS segments plus a VOD manifest.
+
+    Output is written to a scratch directory and renamed into place, so readers
+    never see a half-written manifest and finished segments never change.
+    """
+    parent = os.path.dirname(output_dir)
+    os.makedirs(parent, exist_ok=True)
+    work_dir = tempfile.mkdtemp(dir=parent, prefix='.tmp-')
+    try:
+        cmd = [
+            'ffmpeg', '-nostdin', '-v', 'error', '-y',
+            '-i', source_path,
+            '-vn', '-c:a', 'aac', '-b:a', f"{bitrate_kbps}k",
+            '-f', 'hls',
+            '-hls_time', str(segment_seconds),
+            '-hls_playlist_type', 'vod',
+            '-hls_segment_filename', os.path.join(work_dir, 'seg_%05d.ts'),
+            os.path.join(work_dir, MANIFEST_NAME),
+        ]
+        try:
+            result = subprocess.run(cmd, capture_output=True, timeout=600)
+        except FileNotFoundError:
+            raise SegmentError('ffmpeg is not installed')
+        except subprocess.TimeoutExpired:
+            raise SegmentError('Segmenting timed out')
+        if result.returncode != 0:
+            raise SegmentError(result.stderr.decode('utf-8', errors='replace').strip() or 'ffmpeg failed')
+
+        try:
+            os.rename(work_dir, output_dir)
+        except OSError:
+            # another worker finished the same blob first; its segments are identical
+            if not os.path.exists(os.path.join(output_dir, MANIFEST_NAME)):
+                raise
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def enqueue_segmenting(song):
+    """Queue segmenting once per blob, however many songs or requests ask for it.
+
+    While the last attempt failed recently, that failed job is returned instead.
+    """
+    key = f"segment:{segment_key(song)}"
+    return recent_failure(key) or enqueue('segment', {'song_id': str(song.id)}, dedupe_key=key)
+
+
+@job_handler('segment')
+def segment_song(job, payload):
+    """Background job: pre-segment one song for HLS playback"""
+    song = Song.query.filter_by(id=payload['song_id']).first()
+    if song is None or is_segmented(song):
+        return None
+
+    source_path = resolve_audio_path(current_app.config['UPLOAD_FOLDER'], song.file_path)
+    build_segments(source_path, segment_dir(song), current_app.config['HLS_SEGMENT_SECONDS'])
+    return {'manifest': f"/api/songs/{song.id}/hls/{MANIFEST_NAME}"}
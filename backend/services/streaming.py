@@ -0,0 +1,230 @@
+import hashlib
+import os
+import uuid
+from datetime import datetime, timezone
+from typing import Iterator, List, Optional, Tuple
+from urllib.parse import quote
+
+from flask import Response, request
+from werkzeug.http import http_date, parse_date, parse_etags, quote_etag
+
+
+CHUNK_SIZE = 64 * 1024
+MAX_RANGES = 16  # more ranges than this is treated as abuse and ignored
+
+
+class RangeNotSatisfiable(Exception):
+    """Raised when none of the requested byte ranges overlap the file"""
+
+
+def build_etag(song, stat: os.stat_result) -> str:
+    """Strong validator built from the song row and the file on disk"""
+    updated = song.updated_at.isoformat() if getattr(song, 'updated_at', None) else ''
+    raw = f"{song.id}:{song.format}:{updated}:{stat.st_ino}:{stat.st_size}:{stat.st_mtime_ns}"
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def parse_range_header(header: Optional[str], file_size: int) -> Optional[List[Tuple[int, int]]]:
+    """Parse a `Range: bytes=...` header into sorted, coalesced (start, end) pairs.
+
+    `end` is inclusive. Returns None when the header is absent or malformed (the
+    caller then serves the full body, as RFC 9110 requires), and raises
+    RangeNotSatisfiable when the header is valid but no range overlaps the file.
+    """
+    if not header:
+        return None
+
+    unit, _, spec = header.partition('=')
+    if unit.strip().lower() != 'bytes' or not spec.strip():
+        return None
+
+    ranges = []
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        first, dash, last = part.partition('-')
+        if not dash:
+            return None
+        first, last = first.strip(), last.strip()
+
+        try:
+            if not first:
+                # suffix range: last N bytes
+                suffix = int(last)
+                if suffix < 0:
+                    return None
+                if suffix == 0:
+                    continue
+                start, end = max(file_size - suffix, 0), file_size - 1
+            else:
+                start = int(first)
+                end = int(last) if last else file_size - 1
+                if start < 0 or (last and end < start):
+                    return None
+                end = min(end, file_size - 1)
+        except ValueError:
+            return None
+
+        if start < file_size:
+            ranges.append((start, end))
+
+    if len(ranges) > MAX_RANGES:
+        return None
+    if not ranges:
+        raise RangeNotSatisfiable()
+
+    ranges.sort()
+    merged = [ranges[0]]
+    for start, end in ranges[1:]:
+        prev_start, prev_end = merged[-1]
+        if start <= prev_end + 1:
+            merged[-1] = (prev_start, max(prev_end, end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _if_range_matches(if_range: str, etag: str, last_modified: datetime) -> bool:
+    if_range = if_range.strip()
+    if if_range.startswith('W/'):
+        # weak validators can never satisfy If-Range
+        return False
+    if if_range.startswith('"'):
+        return if_range == quote_etag(etag)
+    date = parse_date(if_range)
+    return date is not None and date == last_modified.replace(microsecond=0)
+
+
+def _not_modified(etag: str, last_modified: datetime) -> bool:
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match:
+        return parse_etags(if_none_match).contains_weak(etag)
+
+    if_modified_since = parse_date(request.headers.get('If-Modified-Since'))
+    if if_modified_since is not None:
+        return last_modified.replace(microsecond=0) <= if_modified_since
+    return False
+
+
+def _read_file(f, start: int, length: int) -> Iterator[bytes]:
+    f.seek(start)
+    remaining = length
+    while remaining > 0:
+        chunk = f.read(min(CHUNK_SIZE, remaining))
+        if not chunk:
+            break
+        remaining -= len(chunk)
+        yield chunk
+
+
+def _file_body(f, start: int, length: int, file_size: int):
+    """Body for a contiguous byte span.
+
+    When the WSGI server exposes `wsgi.file_wrapper` (gunicorn does) and the span
+    runs to end of file, hand it the file object positioned at `start` so the
+    server can use sendfile(2). Servers only bound the wrapper by Content-Length
+    reliably for spans that end at EOF, so anything else goes through a plain
+    bounded reader.
+    """
+    file_wrapper = request.environ.get('wsgi.file_wrapper')
+    if file_wrapper is not None and start + length == file_size:
+        f.seek(start)
+        return file_wrapper(f, CHUNK_SIZE)
+    return _read_file(f, start, length)
+
+
+def _multipart_body(f, ranges, boundary: str, mimetype: str, file_size: int):
+    headers = []
+    for start, end in ranges:
+        headers.append((
+            f"--{boundary}\r\n"
+            f"Content-Type: {mimetype}\r\n"
+            f"Content-Range: bytes {start}-{end}/{file_size}\r\n\r\n"
+        ).encode('ascii'))
+    closing = f"--{boundary}--\r\n".encode('ascii')
+
+    length = sum(len(h) for h in headers) + len(closing)
+    length += sum(end - start + 1 for start, end in ranges) + 2 * len(ranges)
+
+    def generate():
+        for header, (start, end) in zip(headers, ranges):
+            yield header
+            yield from _read_file(f, start, end - start + 1)
+            yield b'\r\n'
+        yield closing
+
+    return generate(), length
+
+
+def send_file_ranges(file_path: str, mimetype: str, etag: str,
+                     download_name: Optional[str] = None,
+                     cache_control: str = 'private, no-cache') -> Response:
+    """Serve `file_path` honouring Range, If-Range, If-None-Match and If-Modified-Since.
+
+    The file is opened before anything else and the body reads from that
+    handle, so a concurrent unlink (rendition cache eviction) either raises
+    FileNotFoundError here or cannot cut the response short.
+    """
+    f = open(file_path, 'rb')
+    try:
+        response = _send_open_file(f, mimetype, etag, download_name, cache_control)
+    except BaseException:
+        f.close()
+        raise
+    response.call_on_close(f.close)
+    return response
+
+
+def _send_open_file(f, mimetype: str, etag: str, download_name: Optional[str], cache_control: str) -> Response:
+    stat = os.fstat(f.fileno())
+    file_size = stat.st_size
+    last_modified = datetime.fromtimestamp(stat.st_mtime, timezone.utc)
+
+    headers = {
+        'Accept-Ranges': 'bytes',
+        'ETag': quote_etag(etag),
+        'Last-Modified': http_date(last_modified),
+        'Cache-Control': cache_control,
+    }
+    if download_name:
+        headers['Content-Disposition'] = f"inline; filename*=UTF-8''{quote(download_name, safe='')}"
+
+    if _not_modified(etag, last_modified):
+        return Response(status=304, headers=headers)
+
+    ranges = None
+    range_header = request.headers.get('Range')
+    if_range = request.headers.get('If-Range')
+    if range_header and (not if_range or _if_range_matches(if_range, etag, last_modified)):
+        try:
+            ranges = parse_range_header(range_header, file_size)
+        except RangeNotSatisfiable:
+            headers['Content-Range'] = f"bytes */{file_size}"
+            return Response(status=416, headers=headers)
+
+    head_only = request.method == 'HEAD'
+
+    if ranges is None:
+        status, start, length = 200, 0, file_size
+    elif len(ranges) == 1:
+        start, end = ranges[0]
+        status, length = 206, end - start + 1
+        headers['Content-Range'] = f"bytes {start}-{end}/{file_size}"
+    else:
+        boundary = uuid.uuid4().hex
+        body, length = _multipart_body(f, ranges, boundary, mimetype, file_size)
+        response = Response(
+            () if head_only else body,
+            status=206,
+            headers=headers,
+            mimetype=f"multipart/byteranges; boundary={boundary}",
+            direct_passthrough=True,
+        )
+        response.headers['Content-Length'] = str(length)
+        return response
+
+    body = () if head_only else _file_body(f, start, length, file_size)
+    response = Response(body, status=status, headers=headers, mimetype=mimetype, direct_passthrough=True)
+    response.headers['Content-Length'] = str(length)
+    return response
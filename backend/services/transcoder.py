@@ -0,0 +1,237 @@
+import fcntl
+import os
+import subprocess
+import tempfile
+import threading
+import time
+from typing import Optional, Tuple
+
+from flask import current_app
+
+
+# codec -> container/encoder settings and the bitrate ladder (kbps) per quality
+CODECS = {
+    'opus': {
+        'ext': 'opus',
+        'mimetype': 'audio/ogg',
+        'args': ['-c:a', 'libopus', '-f', 'ogg'],
+        'bitrates': {'low': 96, 'high': 160},
+    },
+    'mp3': {
+        'ext': 'mp3',
+        'mimetype': 'audio/mpeg',
+        'args': ['-c:a', 'libmp3lame', '-f', 'mp3'],
+        'bitrates': {'low': 128, 'high': 192},
+    },
+}
+DEFAULT_CODEC = 'mp3'  # plays in every browser's <audio>
+DEFAULT_QUALITY = 'high'
+
+
+class TranscodeError(Exception):
+    """Raised when a rendition cannot be produced (ffmpeg missing, bad source, timeout)"""
+
+
+def resolve_rendition(codec: Optional[str], quality: Optional[str]) -> Optional[Tuple[str, int]]:
+    """Map `?codec=`/`?quality=` query values to (codec, kbps).
+
+    Returns None when neither is given (serve the original). `quality` is either
+    a ladder name (low/high) or an explicit bitrate on the codec's ladder.
+    Raises ValueError for anything else.
+    """
+    if not codec and not quality:
+        return None
+
+    codec = (codec or DEFAULT_CODEC).lower()
+    if codec not in CODECS:
+        raise ValueError(f"Unsupported codec '{codec}'")
+
+    ladder = CODECS[codec]['bitrates']
+    quality = (quality or DEFAULT_QUALITY).lower()
+    if quality in ladder:
+        return codec, ladder[quality]
+    if quality.isdigit() and int(quality) in ladder.values():
+        return codec, int(quality)
+    raise ValueError(f"Unsupported quality '{quality}' for {codec}, use one of "
+                     f"{', '.join(list(ladder) + [str(b) for b in ladder.values()])}")
+
+
+class RenditionCache:
+    """Disk cache of transcoded renditions with LRU eviction under a byte budget.
+
+    Entries are keyed by blob hash + codec + bitrate, so a rendition is shared
+    by every song pointing at the same audio. The directory is the index:
+    usage is the size of the renditions on disk and recency is their mtime
+    (bumped on every hit), so all gunicorn workers sharing the directory
+    enforce one budget between them, and eviction runs under a flock on
+    EVICT_LOCK so they do not race each other. Concurrent requests for a
+    rendition that is still encoding wait for the one encode in flight:
+    threads in this process through an Event, other workers through a flock
+    on the entry's lock file, which is removed once the rendition is in place.
+    """
+    EVICT_LOCK = '.evict.lock'
+
+    def __init__(self, cache_dir: str, max_bytes: int, timeout: int = 300):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._inflight = {}
+        os.makedirs(cache_dir, exist_ok=True)
+        self._remove_stale_locks()
+
+    def _renditions(self):
+        """(mtime, name, size) of every finished rendition, least recently used first"""
+        files = []
+        with os.scandir(self.cache_dir) as entries:
+            for entry in entries:
+                if entry.name.startswith('.') or entry.name.endswith(('.lock', '.tmp')):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue  # evicted by another worker while listing
+                if entry.is_file():
+                    files.append((stat.st_mtime_ns, entry.name, stat.st_size))
+        return sorted(files)
+
+    def _remove_stale_locks(self):
+        # lock files left by a worker killed mid-encode; anything younger may still be held
+        cutoff = time.time() - self.timeout
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            try:
+                if name.endswith(('.lock', '.tmp')) and name != self.EVICT_LOCK and os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    @staticmethod
+    def entry_name(source_key: str, codec: str, bitrate: int) -> str:
+        return f"{source_key}-{codec}-{bitrate}.{CODECS[codec]['ext']}"
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(size for _, _, size in self._renditions())
+
+    def get_or_create(self, source_key: str, source_path: str, codec: str, bitrate: int) -> str:
+        """Return the path of the rendition, encoding it first if needed.
+
+        Another worker may evict it before the caller opens it; callers retry
+        once on FileNotFoundError.
+        """
+        name = self.entry_name(source_key, codec, bitrate)
+        path = os.path.join(self.cache_dir, name)
+
+        while True:
+            with self._lock:
+                if self._touch(path):
+                    return path
+                event = self._inflight.get(name)
+                if event is None:
+                    event = self._inflight[name] = threading.Event()
+                    break
+
+            # another thread is already encoding this rendition
+            if not event.wait(self.timeout):
+                raise TranscodeError('Timed out waiting for rendition')
+
+        try:
+            self._encode_once(source_path, path, codec, bitrate)
+            self._touch(path)
+            self._evict(keep=name)
+            return path
+        finally:
+            with self._lock:
+                self._inflight.pop(name, None)
+            event.set()
+
+    @staticmethod
+    def _touch(path: str) -> bool:
+        """Mark a rendition as just used; False if it is not on disk"""
+        try:
+            now = time.time_ns()  # finer than the filesystem's own timestamps, so LRU order has no ties
+            os.utime(path, ns=(now, now))
+            return True
+        except FileNotFoundError:
+            return False
+        except OSError:
+            return os.path.exists(path)
+
+    def _evict(self, keep: str):
+        with open(os.path.join(self.cache_dir, self.EVICT_LOCK), 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                files = self._renditions()
+                total = sum(size for _, _, size in files)
+                for _, name, size in files:
+                    if total <= self.max_bytes:
+                        break
+                    if name == keep:
+                        continue
+                    try:
+                        os.remove(os.path.join(self.cache_dir, name))
+                    except FileNotFoundError:
+                        pass
+                    except OSError:
+                        continue
+                    total -= size
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _encode_once(self, source_path: str, path: str, codec: str, bitrate: int):
+        # serialize with other worker processes encoding the same rendition
+        lock_path = f"{path}.lock"
+        with open(lock_path, 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                if os.path.exists(path):
+                    return
+                fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+                os.close(fd)
+                try:
+                    self._encode(source_path, tmp_path, codec, bitrate)
+                    os.replace(tmp_path, path)
+                finally:
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+            finally:
+                # a waiter that already opened this lock file re-checks `path` once it gets the lock
+                try:
+                    os.remove(lock_path)
+                except OSError:
+                    pass
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _encode(self, source_path: str, output_path: str, codec: str, bitrate: int):
+        cmd = [
+            'ffmpeg', '-nostdin', '-v', 'error', '-y',
+            '-i', source_path,
+            '-vn',  # drop embedded cover art streams
+            *CODECS[codec]['args'],
+            '-b:a', f"{bitrate}k",
+            output_path,
+        ]
+        try:
+            result = subprocess.run(cmd, capture_output=True, timeout=self.timeout)
+        except FileNotFoundError:
+            raise TranscodeError('ffmpeg is not installed')
+        except subprocess.TimeoutExpired:
+            raise TranscodeError('Transcode timed out')
+        if result.returncode != 0:
+            raise TranscodeError(result.stderr.decode('utf-8', errors='replace').strip() or 'ffmpeg failed')
+
+
+_cache_lock = threading.Lock()
+
+
+def get_rendition_cache() -> RenditionCache:
+    """Process-wide cache for the current app"""
+    with _cache_lock:
+        cache = current_app.extensions.get('rendition_cache')
+        if cache is None:
+            cache_dir = current_app.config.get('RENDITION_CACHE_DIR') or os.path.join(
+                current_app.config['UPLOAD_FOLDER'], 'renditions')
+            cache = RenditionCache(cache_dir, current_app.config['RENDITION_CACHE_MAX_BYTES'])
+            current_app.extensions['rendition_cache'] = cache
+        return cache
@@ -0,0 +1,142 @@
+"""
+Structured, queued logging
+
+configure_logging() installs one QueueHandler on the root logger. Records
+are put on an in-memory queue and a QueueListener thread encodes them (JSON
+lines by default) and writes them out, so request threads never wait on
+stdout; if the queue is full the record is dropped rather than blocking.
+Use module loggers with %-style arguments (logger.debug("x %s", y)) so
+nothing is formatted for levels that are off.
+
+Environment:
+    LOG_LEVEL      root level (default INFO)
+    LOG_LEVELS     per-logger overrides, e.g. "metadata=DEBUG,routes.songs=WARNING"
+    LOG_FORMAT     json (default) or text
+    LOG_QUEUE_SIZE records buffered before new ones are dropped (default 10000)
+
+High-volume events can pass extra={'sample': N} to keep one record in N.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+
+# attributes every LogRecord has; anything else came in through `extra`
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'taskName'}
+
+_lock = threading.Lock()
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message and any `extra` fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and key != 'sample':
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps one in N records that carry extra={'sample': N}, counted per call site"""
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+        self._counts: Dict[tuple, int] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        every = getattr(record, 'sample', None)
+        if not every or every <= 1:
+            return True
+        key = (record.name, record.msg)
+        with self._lock:
+            count = self._counts.get(key, 0)
+            self._counts[key] = count + 1
+        if count % every:
+            return False
+        record.sampled = every
+        return True
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Never blocks the caller: when the listener falls behind, records are dropped and counted"""
+
+    dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            type(self).dropped += 1
+
+
+def parse_levels(spec: str) -> Dict[str, int]:
+    """'metadata=DEBUG, routes.songs=warning' -> {'metadata': 10, 'routes.songs': 30}"""
+    levels = {}
+    for item in (spec or '').split(','):
+        name, _, level = item.partition('=')
+        if name.strip() and level.strip():
+            levels[name.strip()] = logging.getLevelName(level.strip().upper())
+    return {name: level for name, level in levels.items() if isinstance(level, int)}
+
+
+def configure_logging(stream=None, force: bool = False) -> logging.handlers.QueueListener:
+    """Route every logger through the queue; safe to call more than once"""
+    global _listener
+    with _lock:
+        if _listener is not None and not force:
+            return _listener
+        if _listener is not None:
+            _listener.stop()
+
+        formatter = (logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s')
+                     if os.getenv('LOG_FORMAT', 'json').lower() == 'text' else JsonFormatter())
+        output = logging.StreamHandler(stream or sys.stdout)
+        output.setFormatter(formatter)
+
+        handler = _DroppingQueueHandler(queue.Queue(int(os.getenv('LOG_QUEUE_SIZE', 10000))))
+        handler.addFilter(SamplingFilter())
+
+        root = logging.getLogger()
+        for existing in [h for h in root.handlers if isinstance(h, logging.handlers.QueueHandler)]:
+            root.removeHandler(existing)
+        root.addHandler(handler)
+        root.setLevel(os.getenv('LOG_LEVEL', 'INFO').upper())
+        for name, level in parse_levels(os.getenv('LOG_LEVELS', '')).items():
+            logging.getLogger(name).setLevel(level)
+
+        _listener = logging.handlers.QueueListener(handler.queue, output, respect_handler_level=True)
+        _listener.start()
+        return _listener
+
+
+def shutdown_logging():
+    """Flush what is queued; registered with atexit"""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+atexit.register(shutdown_logging)
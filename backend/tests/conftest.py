@@ -1,10 +1,19 @@
+import atexit
 import os
+import shutil
 import sys
+import tempfile
 
 # This file runs BEFORE any test imports
 # Remove PostgreSQL connection and force SQLite for all tests
 if 'DATABASE_URL' in os.environ:
     del os.environ['DATABASE_URL']
 
+# Keep stored blobs and the SQLite file out of the source tree
+TEST_DIR = tempfile.mkdtemp(prefix='waves-tests-')
+atexit.register(shutil.rmtree, TEST_DIR, ignore_errors=True)
+os.environ['UPLOAD_FOLDER'] = os.path.join(TEST_DIR, 'uploads')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(TEST_DIR, 'music_player.db')}"
+
 # Ensure backend is in path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
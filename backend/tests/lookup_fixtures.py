@@ -0,0 +1,51 @@
+"""Offline MusicBrainz fixtures shared by the lookup and backfill tests"""
+
+from database import db
+from database.models import User
+from metadata.online_lookup import MusicDBLookup
+from routes.users import generate_token
+
+
+def recording(artist, title, album='Album'):
+    return {'title': title, 'artist-credit': [{'name': artist}], 'releases': [{'title': album}]}
+
+
+def auth_headers():
+    """Bearer header for a throwaway user; /api/metrics is not public"""
+    user = User(username='metrics', email='metrics@example.com')
+    user.set_password('TestPass123')
+    db.session.add(user)
+    db.session.commit()
+    return {'Authorization': f'Bearer {generate_token(user.id)}'}
+
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self, recordings):
+        self.recordings = recordings
+
+    def json(self):
+        return {'recordings': self.recordings}
+
+
+class OfflineLookup(MusicDBLookup):
+    """Answers MusicBrainz queries from `catalogue` instead of the network, counting them"""
+
+    def __init__(self, catalogue, singles=None):
+        super().__init__()
+        self.lastfm_api_key = None
+        self.catalogue = catalogue
+        self.singles = singles or catalogue  # what a limit=1 query can still find
+        self.queries = []
+        self.http = self
+
+    def _rate_limit(self):
+        pass
+
+    def get(self, url, params=None, **kwargs):
+        self.queries.append(params)
+        if params['limit'] == 1:
+            matches = [r for r in self.singles if f'recording:"{r["title"]}"' in params['query']]
+            return FakeResponse(matches[:1])
+        return FakeResponse(self.catalogue[:params['limit']])
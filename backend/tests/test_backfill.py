@@ -0,0 +1,105 @@
+import unittest
+from types import SimpleNamespace
+from datetime import datetime, timedelta, timezone
+from app import app
+from database import db
+from database.models import BackfillCheckpoint, Song, User
+from metadata.lookup_cache import lookup_cache
+from metadata.metadata_enhancer import MetadataEnhancer
+from backfill_metadata import LEASE_SECONDS, Lease, LeaseLost, acquire_lease, backfill, lease_throttle
+from tests.lookup_fixtures import OfflineLookup, recording
+
+
+class BackfillTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = app
+        self.app.config['TESTING'] = True
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+        user = User(username='backfill', email='backfill@example.com')
+        user.set_password('TestPass123')
+        db.session.add(user)
+        db.session.commit()
+
+        catalogue = [recording(f'Artist {n}', f'Song {n}', f'Album {n}') for n in range(5)]
+        self.enhancer = MetadataEnhancer(OfflineLookup(catalogue))
+        old = datetime.now(timezone.utc) - timedelta(days=1)
+        songs = [
+            # untagged uploads keep the original name in the title
+            Song(title=f'Artist {n} - Song {n}', artist='Unknown', album='Unknown', genre='Unknown')
+            for n in range(5)
+        ] + [
+            Song(title='Tagged', artist='Someone', album='Complete', genre='Jazz'),
+            Song(title='Nothing Online', artist='Nobody', album=None, genre=None),
+        ]
+        for song in songs:
+            song.user_id, song.file_path, song.file_size, song.format, song.upload_date = user.id, 'x.mp3', 1, 'mp3', old
+        fresh = Song(title='Artist 0 - Song 0', artist='Unknown', album='Unknown', genre='Unknown',
+                     user_id=user.id, file_path='y.mp3', file_size=1, format='mp3')
+        db.session.add_all(songs + [fresh])
+        db.session.commit()
+        self.fresh_id = fresh.id
+
+    def tearDown(self):
+        lookup_cache.clear_memory()
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def test_resumes_from_checkpoint(self):
+        first = backfill(batch_size=2, max_songs=3, enhancer=self.enhancer)
+        self.assertEqual((first['processed'], first['updated'], first['batches']), (3, 3, 2))
+        checkpoint = db.session.get(BackfillCheckpoint, 'metadata')
+        self.assertIsNotNone(checkpoint.last_id)
+        self.assertIsNone(checkpoint.locked_by)
+
+        # a new run (e.g. after a pod restart) continues after the checkpoint
+        second = backfill(batch_size=2, enhancer=self.enhancer)
+        self.assertEqual((second['processed'], second['updated']), (3, 2))
+        self.assertTrue(second['pass_complete'])
+
+        songs = {song.title: song for song in Song.query.all()}
+        self.assertEqual((songs['Song 4'].artist, songs['Song 4'].album), ('Artist 4', 'Album 4'))
+        self.assertEqual(songs['Tagged'].album, 'Complete')
+        self.assertIsNone(songs['Nothing Online'].album)
+        self.assertEqual(db.session.get(Song, self.fresh_id).artist, 'Unknown')  # left to the ingest job
+
+        checkpoint = db.session.get(BackfillCheckpoint, 'metadata')
+        self.assertIsNone(checkpoint.last_id)
+        self.assertIsNotNone(checkpoint.finished_at)
+        self.assertEqual((checkpoint.processed, checkpoint.updated), (6, 5))
+
+    def test_one_run_at_a_time(self):
+        self.assertTrue(acquire_lease('metadata', 'other-pod:1', datetime.now(timezone.utc)))
+        self.assertIsNone(backfill(enhancer=self.enhancer))
+
+        # an expired lease is taken over
+        db.session.get(BackfillCheckpoint, 'metadata').locked_until = datetime.now(timezone.utc) - timedelta(seconds=1)
+        db.session.commit()
+        self.assertEqual(backfill(enhancer=self.enhancer)['updated'], 5)
+
+    def test_lease_is_renewed_during_lookups(self):
+        now = datetime.now(timezone.utc)
+        self.assertTrue(acquire_lease('metadata', 'this-pod:1', now))
+        lease = Lease('metadata', 'this-pod:1')
+        acquired = []
+        throttle = lease_throttle(lease, SimpleNamespace(acquire=lambda: acquired.append(1)))
+
+        # a batch running past a quarter of the lease renews it before the next request
+        lease.renewed_at -= LEASE_SECONDS / 2
+        throttle()
+        db.session.expire_all()
+        locked_until = db.session.get(BackfillCheckpoint, 'metadata').locked_until.replace(tzinfo=timezone.utc)
+        self.assertGreater(locked_until, now + timedelta(seconds=LEASE_SECONDS))
+        self.assertEqual(acquired, [1])
+
+        # once another run has taken over, the old run stops instead of writing
+        db.session.get(BackfillCheckpoint, 'metadata').locked_by = 'other-pod:1'
+        db.session.commit()
+        with self.assertRaises(LeaseLost):
+            lease.renew(force=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import unittest
+from app import app
+from database import db
+from metadata.lookup_cache import lookup_cache, normalize_key
+from metadata.metadata_enhancer import MetadataEnhancer
+from metadata.online_lookup import MusicDBLookup, batch_stats
+from tests.lookup_fixtures import OfflineLookup, auth_headers, recording
+
+
+class BatchLookupTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = app
+        self.app.config['TESTING'] = True
+        self.client = self.app.test_client()
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+    def tearDown(self):
+        lookup_cache.clear_memory()
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def test_best_candidate(self):
+        recordings = [recording('Radiohead', 'Karma Police'), recording('Radiohead', 'No Surprises')]
+        score, best = MusicDBLookup._best_candidate('radiohead', 'no surprises!', recordings)
+        self.assertEqual(best['title'], 'No Surprises')
+        self.assertGreater(score, 0.95)
+        self.assertIsNone(MusicDBLookup._best_candidate('a', 'b', []))
+
+    def test_one_query_for_many_tracks(self):
+        catalogue = [recording(f'Artist {n}', f'Song Title {n}', f'LP {n}') for n in range(6)]
+        lookup = OfflineLookup(catalogue)
+        pairs = [(f'artist {n}', f'Song Title {n}') for n in range(6)] + [('Artist 0', 'Song Title 0')]
+
+        results = lookup.search_tracks(pairs)
+        self.assertEqual(len(lookup.queries), 1)
+        self.assertIn(' OR ', lookup.queries[0]['query'])
+        self.assertEqual([r['album'] for r in results], [f'LP {n}' for n in range(6)] + ['LP 0'])
+        self.assertEqual(lookup.last_batch_stats['requests_saved'], 5)
+
+        # the answers were cached per track, so a repeat costs nothing
+        self.assertEqual(lookup.search_tracks(pairs[:2])[1]['title'], 'Song Title 1')
+        self.assertEqual(len(lookup.queries), 1)
+        self.assertEqual(lookup.last_batch_stats['cache_hits'], 2)
+
+    def test_ambiguous_tracks_fall_back(self):
+        catalogue = [recording('Some Band', 'Exact Song'),
+                     recording('Band of Horses', 'The Funeral (Live at Red Rocks)')]
+        lookup = OfflineLookup(catalogue, singles=[recording('Band of Horses', 'The Funeral')])
+        pairs = [('Some Band', 'Exact Song'), ('Band Of Horse', 'The Funeral'), ('Zzyzx', 'Qwerty')]
+
+        results = lookup.search_tracks(pairs)
+        # batch + one single query for the near miss; the unrelated track is a definitive miss
+        self.assertEqual(len(lookup.queries), 2)
+        self.assertEqual(lookup.queries[1]['limit'], 1)
+        self.assertEqual(results[0]['title'], 'Exact Song')
+        self.assertEqual(results[1]['title'], 'The Funeral')
+        self.assertIsNone(results[2])
+        self.assertIsNone(lookup_cache.get('musicbrainz', normalize_key('Zzyzx', 'Qwerty')))
+        self.assertEqual(lookup.last_batch_stats['fallback_requests'], 1)
+        self.assertEqual(lookup.last_batch_stats['requests_saved'], 1)
+
+    def test_enhance_batch_tries_swapped_pairs(self):
+        catalogue = [recording('Daft Punk', 'Get Lucky', 'Random Access Memories'),
+                     recording('Air', 'Sexy Boy', 'Moon Safari')]
+        enhancer = MetadataEnhancer()
+        enhancer.lookup_service = OfflineLookup(catalogue)
+        unknown = {'title': 'Unknown', 'artist': 'Unknown', 'album': 'Unknown', 'genre': 'Unknown'}
+        items = [(dict(unknown), 'Daft Punk - Get Lucky.mp3'), (dict(unknown), 'Sexy Boy - Air.mp3')]
+
+        enhanced = enhancer.enhance_batch(items)
+        self.assertEqual(enhanced[0]['album'], 'Random Access Memories')
+        self.assertEqual((enhanced[1]['artist'], enhanced[1]['title']), ('Air', 'Sexy Boy'))
+
+        totals = self.client.get('/api/metrics', headers=auth_headers()).get_json()['musicbrainz_batches']
+        self.assertEqual(totals, batch_stats())
+        self.assertGreaterEqual(totals['batches'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,153 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from PIL import Image
+from mutagen.flac import FLAC, Picture
+from mutagen.id3 import APIC
+from mutagen.wave import WAVE
+from app import app
+from cover_store import CoverStore
+from database import db
+from database.models import Song, User
+from file_manager import AudioFileManager
+from tests.test_tag_reader import write_flac, write_wav
+
+
+def image_bytes(color, size=(800, 800), fmt='PNG'):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color).save(buffer, fmt)
+    return buffer.getvalue()
+
+
+class CoverArtTestCase(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.upload_folder = app.config['UPLOAD_FOLDER']
+        app.config['UPLOAD_FOLDER'] = self.dir
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+        self.ctx = app.app_context()
+        self.ctx.push()
+        db.create_all()
+        self.covers = CoverStore(self.dir)
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+        app.config['UPLOAD_FOLDER'] = self.upload_folder
+        shutil.rmtree(self.dir)
+
+    def stored_files(self):
+        return sorted(name for _, _, names in os.walk(self.covers.root) for name in names)
+
+    def test_variants_are_stored_once_per_image(self):
+        data = image_bytes('red')
+        cover_hash = self.covers.save(data)
+        self.assertEqual(self.covers.save(data), cover_hash)
+        self.assertEqual(len(self.stored_files()), len(CoverStore.SIZES))
+        for size in CoverStore.SIZES:
+            with Image.open(self.covers.path(cover_hash, size)) as image:
+                self.assertEqual((image.format, image.size), ('JPEG', (size, size)))
+
+        self.assertIsNone(self.covers.save(b'not an image'))
+        self.assertIsNone(self.covers.save(None))
+
+    def test_embedded_art(self):
+        front, back = image_bytes('blue', fmt='JPEG'), image_bytes('green')
+        flac_path = os.path.join(self.dir, 'a.flac')
+        write_flac(flac_path)
+        audio = FLAC(flac_path)
+        for picture_type, data in ((4, back), (3, front)):
+            picture = Picture()
+            picture.type, picture.mime, picture.data = picture_type, 'image/jpeg', data
+            audio.add_picture(picture)
+        audio.save()
+
+        wav_path = os.path.join(self.dir, 'b.wav')
+        write_wav(wav_path)
+        audio = WAVE(wav_path)
+        audio.add_tags()
+        audio.tags.add(APIC(encoding=3, mime='image/jpeg', type=3, desc='', data=front))
+        audio.save()
+
+        # two tracks of one album embed the same front cover and share its files
+        flac = AudioFileManager._extract_embedded_tags(flac_path, covers=self.covers)
+        wav = AudioFileManager._extract_embedded_tags(wav_path, covers=self.covers)
+        self.assertIsNotNone(flac['cover_hash'])
+        self.assertEqual(flac['cover_hash'], wav['cover_hash'])
+        self.assertEqual(len(self.stored_files()), len(CoverStore.SIZES))
+
+        plain_path = os.path.join(self.dir, 'c.wav')
+        write_wav(plain_path)
+        self.assertIsNone(AudioFileManager._extract_embedded_tags(plain_path, covers=self.covers)['cover_hash'])
+
+    def test_cover_endpoint(self):
+        self.client.post('/api/register', json={'username': 'covers', 'email': 'covers@example.com', 'password': 'TestPass123'})
+        token = self.client.post('/api/login', json={'username': 'covers', 'password': 'TestPass123'}).get_json()['token']
+        headers = {'Authorization': f'Bearer {token}'}
+        user = User.query.filter_by(username='covers').first()
+
+        cover_hash = self.covers.save(image_bytes('red'))
+        songs = [Song(title=f'Track {n}', artist='A', album='Album', file_path=f'{n}.mp3', file_size=1, format='mp3',
+                      user_id=user.id, cover_hash=cover_hash if n < 2 else None) for n in range(3)]
+        db.session.add_all(songs)
+        db.session.commit()
+        ids = [song.id for song in songs]
+
+        response = self.client.get(f'/api/songs/{ids[0]}/cover?size=64', headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'image/jpeg')
+        self.assertIn('immutable', response.headers['Cache-Control'])
+        with Image.open(io.BytesIO(response.data)) as image:
+            self.assertEqual(image.size, (64, 64))
+
+        etag = response.headers['ETag']
+        self.assertEqual(self.client.get(f'/api/songs/{ids[0]}/cover?size=64',
+                                         headers={**headers, 'If-None-Match': etag}).status_code, 304)
+        self.assertEqual(self.client.get(f'/api/songs/{ids[0]}/cover?size=65', headers=headers).status_code, 400)
+        self.assertEqual(self.client.get(f'/api/songs/{ids[2]}/cover', headers=headers).status_code, 404)
+
+        # shared by two songs: removed with the second
+        self.client.delete(f'/api/songs/{ids[0]}', headers=headers)
+        self.assertTrue(self.covers.has(cover_hash))
+        self.client.delete(f'/api/songs/{ids[1]}', headers=headers)
+        self.assertFalse(self.covers.has(cover_hash))
+
+    def test_cover_removed_under_a_new_song_is_restored(self):
+        self.client.post('/api/register', json={'username': 'covers', 'email': 'covers@example.com', 'password': 'TestPass123'})
+        token = self.client.post('/api/login', json={'username': 'covers', 'password': 'TestPass123'}).get_json()['token']
+        headers = {'Authorization': f'Bearer {token}'}
+        user = User.query.filter_by(username='covers').first()
+
+        wav_path = os.path.join(self.dir, 'a.wav')
+        write_wav(wav_path)
+        audio = WAVE(wav_path)
+        audio.add_tags()
+        audio.tags.add(APIC(encoding=3, mime='image/jpeg', type=3, desc='', data=image_bytes('blue', fmt='JPEG')))
+        audio.save()
+        cover_hash = AudioFileManager._extract_embedded_tags(wav_path, covers=self.covers)['cover_hash']
+
+        # the last other song using the cover is deleted between this one's tag read and its commit
+        self.covers.release(cover_hash)
+        self.assertEqual(self.stored_files(), [])
+        song = Song(title='Track', artist='A', file_path='a.wav', file_size=1, format='wav', user_id=user.id, cover_hash=cover_hash)
+        db.session.add(song)
+        db.session.commit()
+
+        response = self.client.get(f'/api/songs/{song.id}/cover?size=600', headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(self.covers.has(cover_hash))
+
+        # downloaded thumbnails are not in the audio file and cannot be restored
+        song.cover_hash = self.covers.save(image_bytes('red'))
+        db.session.commit()
+        for size in CoverStore.SIZES:
+            os.remove(self.covers.path(song.cover_hash, size))
+        self.assertEqual(self.client.get(f'/api/songs/{song.id}/cover', headers=headers).status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
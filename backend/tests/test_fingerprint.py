@@ -0,0 +1,65 @@
+import unittest
+
+import numpy as np
+
+from services.fingerprint import (
+    SAMPLE_RATE, MATCH_THRESHOLD, compute_fingerprint, index_terms, required_shared_terms, similarity
+)
+
+
+def synthetic_song(seed, seconds=30):
+    """Random three-note chords, half a second each, with a decay envelope"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(SAMPLE_RATE // 2) / SAMPLE_RATE
+    chords = []
+    for _ in range(seconds * 2):
+        notes = rng.integers(40, 80, 3)
+        chord = sum(np.sin(2 * np.pi * 440 * 2 ** ((note - 69) / 12) * t) for note in notes)
+        chords.append(chord * np.exp(-t * 2))
+    return (np.concatenate(chords) * 8000).astype(np.int16)
+
+
+def reencoded(samples, seed=0, lead_in=3000):
+    """Quieter, noisy copy with some leading silence, like a re-download"""
+    noise = np.random.default_rng(seed).normal(0, 500, samples.size)
+    copy = (samples * 0.7 + noise).astype(np.int16)
+    return np.concatenate([np.zeros(lead_in, dtype=np.int16), copy])
+
+
+class FingerprintTestCase(unittest.TestCase):
+    def test_same_recording_matches(self):
+        original = compute_fingerprint(synthetic_song(1))
+        copy = compute_fingerprint(reencoded(synthetic_song(1)))
+        self.assertEqual(original.dtype, np.uint32)
+        self.assertGreaterEqual(similarity(original, copy), MATCH_THRESHOLD)
+        self.assertAlmostEqual(similarity(original, original), 1.0)
+
+    def test_different_recordings_do_not_match(self):
+        first = compute_fingerprint(synthetic_song(1))
+        second = compute_fingerprint(synthetic_song(2))
+        self.assertLess(similarity(first, second), MATCH_THRESHOLD)
+
+    def test_index_terms_overlap(self):
+        original = set(index_terms(compute_fingerprint(synthetic_song(1))))
+        copy = set(index_terms(compute_fingerprint(reencoded(synthetic_song(1)))))
+        other = set(index_terms(compute_fingerprint(synthetic_song(2))))
+        self.assertGreater(len(original & copy), len(original & other))
+
+    def test_unrelated_songs_are_pruned(self):
+        # only candidates sharing enough bands reach the frame-by-frame comparison
+        terms = {seed: set(index_terms(compute_fingerprint(synthetic_song(seed, seconds=60)))) for seed in range(1, 6)}
+        copy = set(index_terms(compute_fingerprint(reencoded(synthetic_song(1, seconds=60)))))
+        self.assertGreaterEqual(len(terms[1] & copy), required_shared_terms(len(terms[1]), len(copy)))
+        for seed in range(2, 6):
+            self.assertLess(len(terms[1] & terms[seed]), required_shared_terms(len(terms[1]), len(terms[seed])))
+        self.assertLess(max(terms[1]), 2 ** 31)
+
+    def test_silence(self):
+        self.assertEqual(compute_fingerprint(np.zeros(100, dtype=np.int16)).size, 0)
+        silent = compute_fingerprint(np.zeros(SAMPLE_RATE * 5, dtype=np.int16))
+        self.assertEqual(index_terms(silent), [])
+        self.assertEqual(similarity(silent[:0], silent), 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
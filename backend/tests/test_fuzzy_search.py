@@ -0,0 +1,155 @@
+import unittest
+from app import app
+from database import db
+from database.models import Song, User
+from services.fuzzy_search import TrigramIndex, get_trigram_indexes, trigrams
+
+
+class TrigramIndexTestCase(unittest.TestCase):
+    def setUp(self):
+        self.index = TrigramIndex([
+            (1, 'Halo', 'Beyoncé'),
+            (2, "Sweet Child O' Mine", "Guns N' Roses"),
+            (3, 'Hello', 'Adele'),
+            (4, 'Roses', 'OutKast'),
+        ])
+
+    def test_trigrams_match_pg_trgm(self):
+        # SELECT show_trgm('Beyoncé') on an unaccented copy
+        self.assertEqual(trigrams('Beyoncé'), {'  b', ' be', 'bey', 'eyo', 'yon', 'onc', 'nce', 'ce '})
+        self.assertEqual(trigrams("GUNS N' roses"), trigrams('guns n roses'))
+        self.assertEqual(trigrams(None), set())
+
+    def test_folding_and_typos(self):
+        self.assertEqual([song_id for song_id, _ in self.index.search('beyonce')], [1])
+        self.assertEqual([song_id for song_id, _ in self.index.search('Beyonse')], [1])
+        self.assertEqual(self.index.search('guns n roses')[0], (2, 1.0))
+        self.assertEqual([song_id for song_id, _ in self.index.search('adel')], [3])
+
+    def test_ranking_and_threshold(self):
+        # the artist match is exact, the title match only shares "roses"
+        self.assertEqual([song_id for song_id, _ in self.index.search("guns n' roses", threshold=0.2)], [2, 4])
+        self.assertEqual(self.index.search('zzz'), [])
+        self.assertEqual(self.index.search('!!'), [])
+
+    def test_upsert_and_remove(self):
+        self.index.upsert(3, 'Hello', 'Lionel Richie')
+        self.index.upsert(5, 'Crazy in Love', 'Beyoncé')
+        self.index.remove(1)
+        self.assertEqual(len(self.index), 4)
+        self.assertEqual([song_id for song_id, _ in self.index.search('beyonce')], [5])
+        self.assertEqual([song_id for song_id, _ in self.index.search('lionel richy')], [3])
+        self.assertEqual(self.index.search('adele'), [])
+
+        before = self.index.search("guns n' roses", threshold=0.2)
+        self.index.compact()
+        self.assertEqual(self.index.search("guns n' roses", threshold=0.2), before)
+        self.assertEqual([song_id for song_id, _ in self.index.search('beyonce')], [5])
+
+
+class FuzzySearchTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = app
+        self.app.config['TESTING'] = True
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        self.client = self.app.test_client()
+
+        with self.app.app_context():
+            db.create_all()
+            self.client.post('/api/register', json={
+                'username': 'fuzzy', 'email': 'fuzzy@example.com', 'password': 'TestPass123'
+            })
+            user = User.query.filter_by(username='fuzzy').one()
+            other = User(username='other', email='other@example.com')
+            other.set_password('OtherPass123')
+            db.session.add(other)
+            db.session.flush()
+            song = lambda title, artist, owner=user: Song(
+                title=title, artist=artist, file_path=f'{title}.mp3', file_size=1, format='mp3', user_id=owner.id)
+            db.session.add_all([
+                song('Halo', 'Beyoncé'),
+                song('Crazy in Love', 'Beyoncé'),
+                song("Sweet Child O' Mine", "Guns N' Roses"),
+                song('Hello', 'Adele'),
+                song('Partition', 'Beyoncé', owner=other),
+            ])
+            db.session.commit()
+
+        token = self.client.post('/api/login', json={'username': 'fuzzy', 'password': 'TestPass123'}).get_json()['token']
+        self.headers = {'Authorization': f'Bearer {token}'}
+
+    def tearDown(self):
+        with self.app.app_context():
+            self.app.extensions.pop('trigram_indexes', None)
+            db.session.remove()
+            db.drop_all()
+
+    def search(self, q, **params):
+        return self.client.get('/api/songs/search', headers=self.headers,
+                               query_string={'q': q, 'fuzzy': 'true', **params}).get_json()
+
+    def test_fuzzy_search(self):
+        self.assertEqual(sorted(song['title'] for song in self.search('beyonse')['songs']), ['Crazy in Love', 'Halo'])
+        self.assertEqual([song['title'] for song in self.search('guns and roses')['songs']], ["Sweet Child O' Mine"])
+        # the exact (FTS) search does not forgive the typo
+        exact = self.client.get('/api/songs/search?q=beyonse', headers=self.headers).get_json()
+        self.assertEqual(exact['songs'], [])
+
+        page = self.search('beyonce', limit=1, fields='title')
+        self.assertEqual((len(page['songs']), page['next_offset']), (1, 1))
+        page = self.search('beyonce', limit=1, offset=1)
+        self.assertEqual((len(page['songs']), page['next_offset']), (1, None))
+
+    def test_index_follows_changes(self):
+        self.assertEqual([song['title'] for song in self.search('helo')['songs']], ['Hello'])
+        with self.app.app_context():
+            user_id = User.query.filter_by(username='fuzzy').one().id
+            index = get_trigram_indexes().get(user_id)
+            song = Song.query.filter_by(title='Hello').one()
+            song.artist = 'Lionel Richie'
+            db.session.commit()
+            db.session.delete(Song.query.filter_by(title='Halo').one())
+            db.session.commit()
+            # rolled back writes never reach the index
+            Song.query.filter_by(title='Crazy in Love').one().title = 'Drunk in Love'
+            db.session.flush()
+            db.session.rollback()
+        self.assertEqual([song['title'] for song in self.search('lionel richy')['songs']], ['Hello'])
+        self.assertEqual([song['title'] for song in self.search('beyonce')['songs']], ['Crazy in Love'])
+        self.assertEqual(self.search('drunk')['songs'], [])
+        with self.app.app_context():
+            # a savepoint ending is not the transaction ending
+            Song.query.filter_by(title='Crazy in Love').one().title = 'Drunk in Love'
+            db.session.flush()
+            with db.session.begin_nested():
+                pass
+            db.session.rollback()
+            Song.query.filter_by(title='Crazy in Love').one().title = 'Single Ladies'
+            db.session.flush()
+            savepoint = db.session.begin_nested()
+            Song.query.filter_by(title='Single Ladies').one().title = 'Drunk in Love'
+            db.session.flush()
+            savepoint.rollback()
+            db.session.commit()
+        self.assertEqual(self.search('drunk')['songs'], [])
+        self.assertEqual([song['title'] for song in self.search('single ladys')['songs']], ['Single Ladies'])
+        with self.app.app_context():
+            # updated in place, not rebuilt
+            self.assertIs(get_trigram_indexes().get(user_id), index)
+
+        # bulk writes bypass the session events; the staleness check picks them up
+        with self.app.app_context():
+            indexes = get_trigram_indexes()
+            indexes.recheck = 0
+            db.session.execute(db.insert(Song), [{
+                'title': 'Single Ladies', 'artist': 'Beyonce', 'file_path': 'x.mp3', 'file_size': 1,
+                'format': 'mp3', 'user_id': user_id
+            }])
+            db.session.commit()
+        self.assertEqual(len(self.search('beyonce')['songs']), 2)
+        with self.app.app_context():
+            self.assertIs(indexes.get(user_id), index)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from metadata.genres import GenreClassifier, get_classifier, normalize_tag
+
+
+class GenreClassifierTestCase(unittest.TestCase):
+    def setUp(self):
+        self.classifier = get_classifier()
+
+    def test_normalize_tag(self):
+        self.assertEqual(normalize_tag('  Drum & Bass '), 'drum and bass')
+        self.assertEqual(normalize_tag('Hip-Hop'), 'hip hop')
+        self.assertEqual(normalize_tag("Rock'n'Roll"), 'rocknroll')
+        self.assertEqual(normalize_tag('Música Latina'), 'musica latina')
+
+    def test_aliases_and_word_boundaries(self):
+        self.assertEqual(self.classifier.best_genre(['hip-hop']), 'Hip Hop')
+        self.assertEqual(self.classifier.best_genre(['rnb']), 'R&B')
+        self.assertEqual(self.classifier.best_genre(['dnb']), 'Drum and Bass')
+        self.assertIsNone(self.classifier.best_genre(['strap', 'seen live', 'female vocalists']))
+
+    def test_longest_match_wins_inside_a_tag(self):
+        self.assertEqual([genre for genre, _ in self.classifier.match_tag('rap metal')], ['Rap Metal'])
+        self.assertEqual(self.classifier.match_tag('90s indie rock'), (('Indie Rock', 0.5),))
+
+    def test_scoring(self):
+        # sub-genre backed by its parent beats the parent alone
+        tags = [{'name': 'rock', 'count': 100}, {'name': 'indie rock', 'count': 90}, {'name': 'seen live', 'count': 80}]
+        self.assertEqual(self.classifier.best_genre(tags), 'Indie Rock')
+        # Last.fm counts outweigh rank
+        tags = [{'name': 'pop', 'count': '30'}, {'name': 'jazz', 'count': 100}]
+        self.assertEqual(self.classifier.best_genre(tags), 'Jazz')
+        ranked = self.classifier.classify(['trap', 'rap', 'hip hop'])
+        self.assertEqual(ranked[0].parents, ('Hip Hop',))
+        # deterministic regardless of order of equal-scoring tags
+        a = self.classifier.classify([{'name': 'soul', 'count': 50}, {'name': 'funk', 'count': 50}])
+        b = self.classifier.classify([{'name': 'funk', 'count': 50}, {'name': 'soul', 'count': 50}])
+        self.assertEqual(a, b)
+
+    def test_custom_taxonomy(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir, True)
+        path = os.path.join(tmp_dir, 'genres.json')
+        with open(path, 'w') as f:
+            json.dump({'genres': {'Chiptune': {'parent': None, 'aliases': ['8-bit']}}}, f)
+        self.assertEqual(get_classifier(path).best_genre(['8 bit']), 'Chiptune')
+
+        with self.assertRaises(ValueError):
+            GenreClassifier({'Child': {'parent': 'Missing'}})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+import socket
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import requests
+from metadata.http_client import ProviderClient, fan_out
+from metadata.metadata_enhancer import MetadataEnhancer
+
+
+class ProviderHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.hits += 1
+            server.active += 1
+            server.peak = max(server.peak, server.active)
+            status = server.statuses.pop(0) if server.statuses else 200
+        time.sleep(server.delay)
+        with server.lock:
+            server.active -= 1
+        self.send_response(status)
+        self.send_header('Retry-After', '0')
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'ok')
+
+    def log_message(self, *args):
+        pass
+
+
+class RecordingLookup:
+    def __init__(self):
+        self.calls = []
+
+    def search_track(self, artist=None, title=None):
+        self.calls.append((artist, title))
+        if (artist, title) == ('Air', 'Sexy Boy'):
+            return {'artist': 'Air', 'title': 'Sexy Boy', 'album': 'Moon Safari', 'genre': 'Electronic'}
+        return None
+
+
+class ProviderClientTestCase(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), ProviderHandler)
+        self.server.lock = threading.Lock()
+        self.server.hits = self.server.active = self.server.peak = 0
+        self.server.statuses = []
+        self.server.delay = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/recording"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_retries_with_backoff(self):
+        self.server.statuses = [503, 502]
+        client = ProviderClient(retries=2, backoff=0.01)
+        throttled = []
+        response = client.get(self.url, throttle=lambda: throttled.append(1))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.server.hits, 3)
+        self.assertEqual(len(throttled), 3)  # every attempt goes through the rate limiter
+
+        stats = client.stats()[f"127.0.0.1:{self.server.server_address[1]}"]
+        self.assertEqual((stats['requests'], stats['retries'], stats['errors']), (3, 2, 0))
+
+        self.server.statuses = [503, 503, 503]
+        self.assertEqual(client.get(self.url).status_code, 503)  # retries exhausted
+
+    def test_connection_errors_raise(self):
+        closed = socket.socket()
+        closed.bind(('127.0.0.1', 0))
+        host = f"127.0.0.1:{closed.getsockname()[1]}"
+        closed.close()
+
+        client = ProviderClient(retries=1, backoff=0.01)
+        with self.assertRaises(requests.ConnectionError):
+            client.get(f"http://{host}/", timeout=1)
+        self.assertEqual(client.stats()[host]['errors'], 1)
+
+    def test_per_host_limit(self):
+        self.server.delay = 0.1
+        client = ProviderClient(max_per_host=2)
+        responses = fan_out(*[lambda: client.get(self.url) for _ in range(6)])
+        self.assertEqual([r.status_code for r in responses], [200] * 6)
+        self.assertEqual(self.server.peak, 2)
+
+    def test_fan_out(self):
+        start = time.monotonic()
+        results = fan_out(*[lambda n=n: time.sleep(0.2) or n for n in range(4)])
+        self.assertEqual(results, [0, 1, 2, 3])
+        self.assertLess(time.monotonic() - start, 0.35)
+
+        # nested fan-outs wider than the pool finish instead of deadlocking
+        nested = fan_out(*[lambda n=n: sum(fan_out(*[lambda: n] * 4)) for n in range(12)])
+        self.assertEqual(nested, [4 * n for n in range(12)])
+
+        def fail():
+            raise ValueError('boom')
+        with self.assertRaises(ValueError):
+            fan_out(lambda: 1, fail)
+
+    def test_reversed_lookup_is_a_fallback(self):
+        enhancer = MetadataEnhancer()
+        enhancer.lookup_service = RecordingLookup()
+        unknown = {'title': 'Unknown', 'artist': 'Unknown', 'album': 'Unknown', 'genre': 'Unknown'}
+
+        enhanced = enhancer.enhance_metadata(unknown, 'Air - Sexy Boy.mp3')
+        self.assertEqual(enhancer.lookup_service.calls, [('Air', 'Sexy Boy')])
+        self.assertEqual(enhanced['album'], 'Moon Safari')
+
+        enhancer.lookup_service.calls.clear()
+        enhanced = enhancer.enhance_metadata(unknown, 'Sexy Boy - Air.mp3')
+        self.assertEqual(enhancer.lookup_service.calls, [('Sexy Boy', 'Air'), ('Air', 'Sexy Boy')])
+        self.assertEqual((enhanced['artist'], enhanced['title'], enhanced['album']), ('Air', 'Sexy Boy', 'Moon Safari'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import time
+import unittest
+from datetime import datetime, timedelta, timezone
+from app import app
+from database import db
+from database.models import Job
+from services.jobs import enqueue, job_handler, recover_jobs, requeue_stale
+
+ran = []
+
+
+@job_handler('test-recover')
+def _record(job, payload):
+    ran.append(payload['n'])
+
+
+@job_handler('test-slow')
+def _slow(job, payload):
+    time.sleep(payload['seconds'])
+
+
+class JobRecoveryTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = app
+        self.app.config['TESTING'] = True
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        ran.clear()
+        with self.app.app_context():
+            db.create_all()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_recover_jobs_lost_in_a_restart(self):
+        old = datetime.now(timezone.utc) - timedelta(hours=1)
+        with self.app.app_context():
+            # a job that was running and one that was still waiting when the process died
+            db.session.add_all([
+                Job(kind='test-recover', payload='{"n": 1}', status=Job.STATUS_RUNNING,
+                    dedupe_key='recover:1', created_at=old, started_at=old),
+                Job(kind='test-recover', payload='{"n": 2}', created_at=old),
+                Job(kind='test-recover', payload='{"n": 3}'),
+            ])
+            db.session.commit()
+
+            # dedupe used to hand back the dead job forever
+            self.assertEqual(enqueue('test-recover', {'n': 1}, dedupe_key='recover:1').status, Job.STATUS_RUNNING)
+
+            self.assertEqual(recover_jobs(max_age_seconds=900), 2)
+            self.assertEqual(sorted(ran), [1, 2])
+            db.session.expire_all()
+            statuses = sorted(job.status for job in Job.query.all())
+            self.assertEqual(statuses, [Job.STATUS_QUEUED, Job.STATUS_SUCCEEDED, Job.STATUS_SUCCEEDED])
+
+    def test_long_running_job_keeps_its_lease(self):
+        old = datetime.now(timezone.utc) - timedelta(hours=1)
+        with self.app.app_context():
+            db.session.add_all([
+                # started long ago but still beating
+                Job(id='alive', kind='test-recover', status=Job.STATUS_RUNNING, started_at=old,
+                    heartbeat_at=datetime.now(timezone.utc)),
+                Job(id='dead', kind='test-recover', status=Job.STATUS_RUNNING, started_at=old, heartbeat_at=old),
+            ])
+            db.session.commit()
+            self.assertEqual(requeue_stale(max_age_seconds=900), 1)
+            db.session.expire_all()
+            self.assertEqual(db.session.get(Job, 'alive').status, Job.STATUS_RUNNING)
+            self.assertEqual(db.session.get(Job, 'dead').status, Job.STATUS_QUEUED)
+
+    def test_heartbeat_is_renewed_while_running(self):
+        self.app.config['JOB_HEARTBEAT_INTERVAL'] = 0.05
+        try:
+            with self.app.app_context():
+                job = enqueue('test-slow', {'seconds': 0.3})
+                db.session.expire_all()
+                job = db.session.get(Job, job.id)
+                self.assertEqual(job.status, Job.STATUS_SUCCEEDED)
+                self.assertGreater(job.heartbeat_at, job.started_at + timedelta(seconds=0.2))
+        finally:
+            self.app.config['JOB_HEARTBEAT_INTERVAL'] = 60
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+from app import app
+from database import db
+from metadata.lookup_cache import LookupCache, lookup_cache, normalize_key
+from metadata.online_lookup import MusicDBLookup
+from metadata.rate_limiter import limiter_stats
+from tests.lookup_fixtures import auth_headers
+
+
+class LookupCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = app
+        self.app.config['TESTING'] = True
+        self.client = self.app.test_client()
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+        self.cache = LookupCache()
+
+    def tearDown(self):
+        lookup_cache.clear_memory()
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def test_normalize_key(self):
+        self.assertEqual(normalize_key('Beyoncé', 'Halo!'), normalize_key('  beyonce ', 'HALO'))
+        self.assertNotEqual(normalize_key('a b', 'c'), normalize_key('a', 'b c'))
+
+    def test_memory_and_db_hits(self):
+        key = normalize_key('Artist', 'Title')
+        self.assertIs(self.cache.get('musicbrainz', key), LookupCache.MISS)
+        self.cache.set('musicbrainz', key, {'title': 'Title'})
+        self.assertEqual(self.cache.get('musicbrainz', key), {'title': 'Title'})
+
+        # a fresh process only has the table
+        other = LookupCache()
+        self.assertEqual(other.get('musicbrainz', key), {'title': 'Title'})
+        self.assertEqual(other.get('musicbrainz', key), {'title': 'Title'})
+        stats = other.stats()['musicbrainz']
+        self.assertEqual((stats['db_hits'], stats['memory_hits'], stats['misses']), (1, 1, 0))
+
+        # sources are cached independently
+        self.assertIs(self.cache.get('lastfm', key), LookupCache.MISS)
+
+    def test_negative_caching_and_ttl(self):
+        key = normalize_key('Nobody', 'Nothing')
+        self.cache.set('lastfm', key, None)
+        self.assertIsNone(LookupCache().get('lastfm', key))
+        self.assertEqual(self.cache.stats()['lastfm']['stores'], 1)
+
+        self.cache.set('lastfm', key, 'Rock', ttl=-1)
+        self.assertIs(LookupCache().get('lastfm', key), LookupCache.MISS)
+
+    def test_search_track_served_from_cache(self):
+        lookup_cache.set('musicbrainz', normalize_key('Cached Artist', 'Cached Song'),
+                         {'title': 'Cached Song', 'artist': 'Cached Artist', 'album': 'LP', 'genre': 'Unknown'})
+        lookup = MusicDBLookup()
+        lookup.lastfm_api_key = 'test-key'
+        lookup_cache.set('lastfm', normalize_key('Cached Artist', 'Cached Song'), 'Jazz')
+
+        acquired = limiter_stats().get('musicbrainz', {}).get('acquired', 0)
+        result = lookup.search_track(artist='cached artist', title='Cached Song!')
+        self.assertEqual(result['album'], 'LP')
+        self.assertEqual(result['genre'], 'Jazz')
+        # never rate limited, never hit the network
+        self.assertEqual(limiter_stats().get('musicbrainz', {}).get('acquired', 0), acquired)
+
+        self.assertEqual(self.client.get('/api/metrics').status_code, 401)
+        response = self.client.get('/api/metrics', headers=auth_headers())
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('musicbrainz', response.get_json()['metadata_lookup_cache'])
+
+
+if __name__ == '__main__':
+    unittest.main()
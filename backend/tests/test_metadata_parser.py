@@ -0,0 +1,70 @@
+import contextlib
+import io
+import os
+import unittest
+from metadata.metadata_parser import FilenameRule, MetadataParser
+
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'filename_corpus.tsv')
+MIN_ACCURACY = 0.95
+
+
+def load_corpus():
+    """(filename, artist, title) rows of the labelled corpus"""
+    with open(CORPUS, encoding='utf-8') as f:
+        return [tuple(line.rstrip('\n').split('\t')) for line in f if line.strip() and not line.startswith('#')]
+
+
+class MetadataParserTestCase(unittest.TestCase):
+    def setUp(self):
+        self.parser = MetadataParser()
+
+    def test_corpus_accuracy(self):
+        corpus = load_corpus()
+        parsed = self.parser.parse_filenames([filename for filename, _, _ in corpus])
+        misses = [
+            (filename, (result['artist'], result['title']))
+            for (filename, artist, title), result in zip(corpus, parsed)
+            if (result['artist'], result['title']) != (artist, title)
+        ]
+        accuracy = 1 - len(misses) / len(corpus)
+        self.assertGreaterEqual(accuracy, MIN_ACCURACY, f"{accuracy:.1%} correct, misses: {misses}")
+
+    def test_rules(self):
+        def title_of(filename):
+            return self.parser.parse_filename(filename)['title']
+
+        self.assertEqual(self.parser.parse_filename('01 - Radiohead - Airbag.mp3')['artist'], 'Radiohead')
+        self.assertEqual(self.parser.parse_filename('50 Cent - In Da Club.mp3')['artist'], '50 Cent')
+        self.assertEqual(title_of('Oasis - Wonderwall (Remastered) [HD].mp3'), 'Wonderwall')
+        self.assertEqual(title_of('Nirvana - Come As You Are (Live).mp3'), 'Come As You Are (Live)')
+        self.assertEqual(title_of('Mark_Ronson_-_Uptown_Funk_ft._Bruno_Mars.mp3'), 'Uptown Funk')
+        # keywords only count as whole words
+        self.assertEqual(title_of('The Buggles - Video Killed the Radio Star.mp3'), 'Video Killed the Radio Star')
+        self.assertEqual(self.parser.parse_filename('Intro.mp3'),
+                         {'artist': 'Unknown', 'title': 'Intro', 'album': 'Unknown', 'genre': 'Unknown'})
+
+    def test_batch_matches_single_and_is_silent(self):
+        filenames = [filename for filename, _, _ in load_corpus()]
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            batch = self.parser.parse_filenames(filenames)
+            single = [self.parser.parse_filename(filename) for filename in filenames]
+        self.assertEqual(batch, single)
+        self.assertEqual(output.getvalue(), '')
+
+    def test_pluggable_rules(self):
+        def catalogue_prefix(parsed):
+            if parsed.stem.startswith('CAT-'):
+                parsed.stem = parsed.stem.split(' ', 1)[1]
+
+        self.parser.add_rule(FilenameRule('catalogue_prefix', catalogue_prefix), before='track_number')
+        self.assertEqual(self.parser.rules[1].name, 'catalogue_prefix')
+        result = self.parser.parse_filename('CAT-0042 Boards of Canada - Roygbiv.flac')
+        self.assertEqual((result['artist'], result['title']), ('Boards of Canada', 'Roygbiv'))
+        # other parsers keep the default table
+        self.assertEqual(len(MetadataParser().rules), len(self.parser.rules) - 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
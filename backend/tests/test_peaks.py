@@ -0,0 +1,61 @@
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+
+import numpy as np
+
+from services.peaks import RESOLUTIONS, RESPONSE_HEADER, compute_peaks, read_peaks, write_peaks
+
+
+class PeaksTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'song.peaks')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_compute_peaks(self):
+        samples = np.zeros(8000 * 10, dtype=np.int16)
+        samples[100] = 1000
+        samples[200] = -2000
+        levels = compute_peaks(samples)
+        self.assertEqual(sorted(levels), sorted(RESOLUTIONS))
+        for resolution, pairs in levels.items():
+            self.assertEqual(pairs.shape, (resolution, 2))
+            self.assertEqual(int(pairs[:, 0].min()), -2000)
+            self.assertEqual(int(pairs[:, 1].max()), 1000)
+        # coarse buckets fold both spikes into the first pair
+        self.assertEqual(levels[256][0].tolist(), [-2000, 1000])
+        self.assertEqual(int(np.abs(levels[256][1:]).max()), 0)
+
+    def test_compute_peaks_short_input(self):
+        # fewer samples than buckets still yields every level
+        levels = compute_peaks(np.array([5, -5, 7], dtype=np.int16))
+        self.assertEqual(levels[4096].shape, (4096, 2))
+        self.assertEqual(int(levels[256].max()), 7)
+        self.assertEqual(compute_peaks(np.array([], dtype=np.int16))[256].shape, (256, 2))
+
+    def test_round_trip(self):
+        samples = (np.sin(np.linspace(0, 200, 8000 * 30)) * 32767).astype(np.int16)
+        levels = compute_peaks(samples)
+        write_peaks(self.path, levels, 8000, samples.size)
+
+        body = read_peaks(self.path, 1024)
+        magic, version, bits, _, resolution, duration_ms = RESPONSE_HEADER.unpack_from(body)
+        self.assertEqual((magic, bits, resolution, duration_ms), (b'PEAK', 16, 1024, 30000))
+        values = np.frombuffer(body, dtype='<i2', offset=RESPONSE_HEADER.size).reshape(-1, 2)
+        self.assertTrue(np.array_equal(values, levels[1024]))
+
+        body = read_peaks(self.path, 256, bits=8)
+        self.assertEqual(len(body), RESPONSE_HEADER.size + 256 * 2)
+        self.assertEqual(struct.unpack_from('<B', body, 5)[0], 8)
+
+        with self.assertRaises(KeyError):
+            read_peaks(self.path, 300)
+
+
+if __name__ == '__main__':
+    unittest.main()
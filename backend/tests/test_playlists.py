@@ -1,8 +1,10 @@
 import unittest
 import io
 import json
+from sqlalchemy import event
 from app import app
 from database import db
+from database.models import Playlist, PlaylistSong, Song
 
 class PlaylistTestCase(unittest.TestCase):
     def setUp(self):
@@ -159,6 +161,31 @@ class PlaylistTestCase(unittest.TestCase):
         self.assertEqual(data['description'], 'A test')
         self.assertIn('songs', data)
 
+    def test_get_playlist_fields(self):
+        """Test the ?fields= sparse fieldset on playlist songs"""
+        create_resp = self.client.post('/api/playlists',
+            headers={'Authorization': f'Bearer {self.token}'},
+            json={'name': 'Sparse'}
+        )
+        playlist_id = create_resp.get_json()['playlist']['id']
+        self.client.post(f'/api/playlists/{playlist_id}/songs',
+            headers={'Authorization': f'Bearer {self.token}'},
+            json={'song_id': self.song_id}
+        )
+
+        response = self.client.get(f'/api/playlists/{playlist_id}?fields=id,position',
+            headers={'Authorization': f'Bearer {self.token}'}
+        )
+        self.assertEqual(response.status_code, 200)
+        # the upload response always stringifies the id; the listing keeps the column's own type
+        songs = response.get_json()['songs']
+        self.assertEqual([{**song, 'id': str(song['id'])} for song in songs], [{'id': self.song_id, 'position': 1}])
+
+        response = self.client.get(f'/api/playlists/{playlist_id}?fields=nope',
+            headers={'Authorization': f'Bearer {self.token}'}
+        )
+        self.assertEqual(response.status_code, 400)
+
     def test_get_playlist_not_found(self):
         """Test getting non-existent playlist"""
         response = self.client.get('/api/playlists/99999',
@@ -555,4 +582,134 @@ class PlaylistTestCase(unittest.TestCase):
             json={}
         )
         self.assertEqual(response.status_code, 400)
-        self.assertIn('error', response.get_json())
\ No newline at end of file
+        self.assertIn('error', response.get_json())
+
+    def _set_duration(self, song_id, duration):
+        with self.app.app_context():
+            song = db.session.get(Song, int(song_id))
+            song.duration = duration
+            db.session.commit()
+
+    def test_counters_follow_playlist_changes(self):
+        """Test song_count/total_duration through add, remove and song deletion"""
+        headers = {'Authorization': f'Bearer {self.token}'}
+        self._set_duration(self.song_id, 200.0)
+        other_id = self.client.post('/api/songs', headers=headers, content_type='multipart/form-data',
+                                    data={'file': (io.BytesIO(b"other mp3 data"), 'other.mp3')}).get_json()['song']['id']
+        self._set_duration(other_id, 100.5)
+
+        playlist_ids = [self.client.post('/api/playlists', headers=headers, json={'name': f'P{n}'}).get_json()['playlist']['id']
+                        for n in range(2)]
+        for playlist_id in playlist_ids:
+            for song_id in (self.song_id, other_id):
+                self.client.post(f'/api/playlists/{playlist_id}/songs', headers=headers, json={'song_id': song_id})
+        self.client.delete(f'/api/playlists/{playlist_ids[0]}/songs/{self.song_id}', headers=headers)
+        self.client.delete(f'/api/songs/{other_id}', headers=headers)
+
+        listed = {pl['id']: pl for pl in self.client.get('/api/playlists', headers=headers).get_json()['playlists']}
+        self.assertEqual((listed[playlist_ids[0]]['song_count'], listed[playlist_ids[0]]['total_duration']), (0, 0.0))
+        self.assertEqual((listed[playlist_ids[1]]['song_count'], listed[playlist_ids[1]]['total_duration']), (1, 200.0))
+
+    def test_list_playlists_is_one_query(self):
+        """Test listing playlists does not load playlist_songs per playlist"""
+        headers = {'Authorization': f'Bearer {self.token}'}
+        for n in range(5):
+            playlist_id = self.client.post('/api/playlists', headers=headers, json={'name': f'P{n}'}).get_json()['playlist']['id']
+            self.client.post(f'/api/playlists/{playlist_id}/songs', headers=headers, json={'song_id': self.song_id})
+
+        statements = []
+        with self.app.app_context():
+            listener = lambda *args: statements.append(args[2])
+            event.listen(db.engine, 'before_cursor_execute', listener)
+            try:
+                response = self.client.get('/api/playlists', headers=headers)
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', listener)
+        self.assertEqual(len(response.get_json()['playlists']), 5)
+        # the token's user lookup plus the playlists themselves
+        self.assertEqual(len([sql for sql in statements if 'playlist' in sql.lower()]), 1)
+        self.assertEqual(len(statements), 2)
+
+    def test_repair_job(self):
+        """Test the repair job recomputes drifted counters"""
+        headers = {'Authorization': f'Bearer {self.token}'}
+        self._set_duration(self.song_id, 42.0)
+        playlist_id = self.client.post('/api/playlists', headers=headers, json={'name': 'Drift'}).get_json()['playlist']['id']
+        self.client.post(f'/api/playlists/{playlist_id}/songs', headers=headers, json={'song_id': self.song_id})
+        with self.app.app_context():
+            db.session.execute(db.update(Playlist).values(song_count=7, total_duration=1.0))
+            db.session.commit()
+
+        response = self.client.post('/api/playlists/repair', headers=headers)
+        self.assertEqual(response.status_code, 202)
+        job = self.client.get(response.headers['Location'], headers=headers).get_json()['job']
+        self.assertEqual(job['result'], {'repaired': 1})
+        playlist = self.client.get('/api/playlists', headers=headers).get_json()['playlists'][0]
+        self.assertEqual((playlist['song_count'], playlist['total_duration']), (1, 42.0))
+
+    def _playlist_with_songs(self, count):
+        """A playlist of `count` songs whose positions run opposite to insertion order"""
+        headers = {'Authorization': f'Bearer {self.token}'}
+        playlist_id = self.client.post('/api/playlists', headers=headers, json={'name': 'Big'}).get_json()['playlist']['id']
+        with self.app.app_context():
+            user_id = db.session.get(Playlist, int(playlist_id)).user_id
+            songs = [Song(title=f'Song {n}', artist='Artist', file_path=f'blobs/{n}.mp3', file_size=1, format='mp3',
+                          user_id=user_id) for n in range(count)]
+            db.session.add_all(songs)
+            db.session.flush()
+            db.session.add_all(PlaylistSong(playlist_id=int(playlist_id), song_id=song.id, position=count - n)
+                               for n, song in enumerate(songs))
+            db.session.commit()
+        return playlist_id
+
+    def test_get_playlist_ordered_by_position(self):
+        """Test playlist songs come back in position order, in one query"""
+        playlist_id = self._playlist_with_songs(50)
+
+        statements = []
+        with self.app.app_context():
+            listener = lambda *args: statements.append(args[2])
+            event.listen(db.engine, 'before_cursor_execute', listener)
+            try:
+                response = self.client.get(f'/api/playlists/{playlist_id}?fields=title,position',
+                    headers={'Authorization': f'Bearer {self.token}'}
+                )
+                data = response.get_json()
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', listener)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([song['position'] for song in data['songs']], list(range(1, 51)))
+        self.assertEqual(data['songs'][0]['title'], 'Song 49')
+        # the token's user lookup plus the playlist with its songs
+        self.assertEqual(len(statements), 2)
+
+    def test_get_playlist_range(self):
+        """Test ?offset=&limit= returns a slice, with the full song_count"""
+        headers = {'Authorization': f'Bearer {self.token}'}
+        playlist_id = self._playlist_with_songs(20)
+        with self.app.app_context():
+            db.session.execute(db.update(Playlist).where(Playlist.id == int(playlist_id)).values(song_count=20))
+            db.session.commit()
+
+        data = self.client.get(f'/api/playlists/{playlist_id}?offset=5&limit=10&fields=position', headers=headers).get_json()
+        self.assertEqual([song['position'] for song in data['songs']], list(range(6, 16)))
+        self.assertEqual((data['offset'], data['limit'], data['song_count']), (5, 10, 20))
+
+        # past the end: still the playlist, with no songs
+        response = self.client.get(f'/api/playlists/{playlist_id}?offset=100', headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['songs'], [])
+        self.assertEqual(response.get_json()['name'], 'Big')
+
+        self.assertEqual(self.client.get(f'/api/playlists/{playlist_id}?offset=-1', headers=headers).status_code, 400)
+        response = self.client.get(f'/api/playlists/{playlist_id}?limit=ten', headers=headers)
+        self.assertEqual((response.status_code, response.get_json()['error']), (400, 'limit must be an integer'))
+        self.assertEqual(self.client.get('/api/playlists/99999?offset=100', headers=headers).status_code, 404)
+
+    def test_get_empty_playlist(self):
+        """Test an empty playlist has no songs (not a row of nulls)"""
+        headers = {'Authorization': f'Bearer {self.token}'}
+        playlist_id = self.client.post('/api/playlists', headers=headers, json={'name': 'Empty'}).get_json()['playlist']['id']
+        data = self.client.get(f'/api/playlists/{playlist_id}', headers=headers).get_json()
+        self.assertEqual(data['songs'], [])
+        self.assertEqual(data['song_count'], 0)
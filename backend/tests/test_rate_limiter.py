@@ -0,0 +1,76 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from sqlalchemy import create_engine
+from database.models import RateLimitBucket
+from metadata.rate_limiter import RateLimitExceeded, TokenBucket
+
+
+class TokenBucketTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.tmp_dir, 'limits.sqlite')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_burst_then_rate(self):
+        bucket = TokenBucket('test', rate=20, burst=3)
+        waits = [bucket.acquire() for _ in range(5)]
+        self.assertEqual(waits[:3], [0, 0, 0])
+        self.assertGreater(waits[3], 0)
+        self.assertLessEqual(waits[4], 0.1 + 1e-6)
+
+        stats = bucket.stats()
+        self.assertEqual(stats['acquired'], 5)
+        self.assertEqual(stats['waited'], 2)
+        self.assertEqual(stats['backend'], 'process')
+
+    def test_threads_share_budget(self):
+        bucket = TokenBucket('test', rate=50, burst=1)
+        start = time.monotonic()
+        threads = [threading.Thread(target=bucket.acquire) for _ in range(11)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # 1 from the burst, 10 more at 50/s
+        self.assertGreaterEqual(time.monotonic() - start, 0.18)
+        self.assertEqual(bucket.stats()['waiting'], 0)
+
+    def test_shared_between_processes(self):
+        # two buckets on one file behave like two gunicorn workers
+        first = TokenBucket('shared', rate=10, burst=2, db_path=self.db_path)
+        second = TokenBucket('shared', rate=10, burst=2, db_path=self.db_path)
+        self.assertEqual(first.acquire(), 0)
+        self.assertEqual(second.acquire(), 0)
+        self.assertGreater(first.acquire(), 0)
+        self.assertEqual(second.stats()['backend'], 'sqlite')
+
+    def test_shared_through_database(self):
+        # buckets in the app database behave like the API pods and the backfill CronJob
+        engine = create_engine(f"sqlite:///{self.db_path}")
+        RateLimitBucket.__table__.create(engine)
+        first = TokenBucket('shared', rate=10, burst=2, engine=engine)
+        second = TokenBucket('shared', rate=10, burst=2, engine=engine)
+        self.assertEqual(first.acquire(), 0)
+        self.assertEqual(second.acquire(), 0)
+        self.assertGreater(first.acquire(), 0)
+        self.assertEqual(second.stats()['backend'], 'database')
+        engine.dispose()
+
+    def test_max_wait(self):
+        bucket = TokenBucket('test', rate=1, burst=1, db_path=self.db_path)
+        bucket.acquire()
+        with self.assertRaises(RateLimitExceeded):
+            bucket.acquire(max_wait=0.1)
+        self.assertEqual(bucket.stats()['rejected'], 1)
+        # a rejected request does not use up the budget
+        self.assertLessEqual(bucket.acquire(max_wait=2), 1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import json
+import unittest
+from datetime import datetime, timezone
+from app import app
+from database import db
+from database.models import Song, User
+from database.serializers import SONG_FIELDS, PLAYLIST_SONG_FIELDS, Raw, RawRows, json_body, json_stream
+
+
+class SerializerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.ctx = app.app_context()
+        self.ctx.push()
+        db.create_all()
+        user = User(username='serial', email='serial@example.com')
+        user.set_password('TestPass123')
+        db.session.add(user)
+        db.session.commit()
+        self.songs = [
+            Song(title='Say "Hi" \\ Ünïcode ☃', artist='A\nB', album=None, genre='Rock', duration=201.5,
+                 file_path='a.mp3', file_size=10, bitrate=320, format='mp3', cover_hash='ab' * 32,
+                 upload_date=datetime(2026, 1, 2, 3, 4, 5, 678, tzinfo=timezone.utc), user_id=user.id),
+            Song(title='Plain', artist='C', file_path='b.mp3', file_size=20, format='flac', user_id=user.id),
+        ]
+        db.session.add_all(self.songs)
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def test_encoder_matches_dict_form(self):
+        for spec in (None, 'cover_url,title', 'id,user_id,upload_date,duration'):
+            fields = SONG_FIELDS.parse_fields(spec)
+            rows = db.session.execute(SONG_FIELDS.select(fields).order_by(Song.id)).all()
+            encoded = json.loads(SONG_FIELDS.encode_rows(rows, fields))
+            expected = json.loads(json.dumps([SONG_FIELDS.as_dict(song, fields) for song in self.songs]))
+            self.assertEqual(encoded, expected)
+            self.assertEqual(list(encoded[0]), list(fields))
+
+        song = self.songs[0].to_dict()
+        self.assertEqual(song['cover_url'], f"/api/songs/{song['id']}/cover")
+        self.assertIsNone(self.songs[1].to_dict()['cover_url'])
+
+    def test_ids_keep_backend_type(self):
+        # integer keys stay JSON numbers; only UUID keys go out as strings
+        id_type = Song.id.type.python_type
+        fields = ('id', 'user_id')
+        rows = db.session.execute(SONG_FIELDS.select(fields).order_by(Song.id)).all()
+        encoded = json.loads(SONG_FIELDS.encode_rows(rows, fields))
+        song = self.songs[0].to_dict()
+        for value in (encoded[0]['id'], encoded[0]['user_id'], song['id'], song['user_id']):
+            self.assertIsInstance(value, int if id_type is int else str)
+
+    def test_non_finite_numbers_are_null(self):
+        self.songs[0].duration = float('nan')
+        self.songs[1].duration = float('inf')
+        db.session.commit()
+        rows = db.session.execute(SONG_FIELDS.select(('duration',)).order_by(Song.id)).all()
+        # strict parsers reject NaN/Infinity, so they never reach the body
+        encoded = json.loads(SONG_FIELDS.encode_rows(rows, ('duration',)), parse_constant=self.fail)
+        self.assertEqual(encoded, [{'duration': None}, {'duration': None}])
+        self.assertEqual(SONG_FIELDS.encoder(('duration',))((float('nan'),)), '{"duration":null}')
+        self.assertIsNone(self.songs[1].to_dict()['duration'])
+
+    def test_sort_keys_after_projection(self):
+        fields = ('title',)
+        rows = db.session.execute(SONG_FIELDS.select(fields, Song.upload_date, Song.id).order_by(Song.id)).all()
+        self.assertEqual(json.loads(SONG_FIELDS.encode_rows(rows, fields)), [{'title': song.title} for song in self.songs])
+        self.assertEqual(rows[0][-1], self.songs[0].id)
+
+    def test_parse_fields(self):
+        self.assertEqual(SONG_FIELDS.parse_fields('title, id,title'), ('title', 'id'))
+        self.assertEqual(PLAYLIST_SONG_FIELDS.default[-1], 'position')
+        for spec in ('title,secret', ',', 'position'):
+            with self.assertRaises(ValueError):
+                SONG_FIELDS.parse_fields(spec)
+
+    def test_json_body(self):
+        body = json_body(songs=Raw('[{"a":1}]'), next_cursor=None, when=datetime(2026, 1, 1))
+        self.assertEqual(json.loads(body), {'songs': [{'a': 1}], 'next_cursor': None, 'when': '2026-01-01T00:00:00'})
+
+    def test_json_stream(self):
+        rows = [(n,) for n in range(7)]
+        chunks = list(json_stream(name='x', songs=RawRows(rows, lambda row: '{"n":%d}' % row[0], batch=3), empty=RawRows((), str)))
+        self.assertEqual(json.loads(''.join(chunks)), {'name': 'x', 'songs': [{'n': n} for n in range(7)], 'empty': []})
+        self.assertEqual(len([chunk for chunk in chunks if chunk.startswith(('{"n"', ',{"n"'))]), 3)
+        self.assertEqual(''.join(json_stream()), '{}')
+
+
+if __name__ == '__main__':
+    unittest.main()
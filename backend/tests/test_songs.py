@@ -1,9 +1,20 @@
 import unittest
 import io
+import os
+import shutil
+import tempfile
 import json
+from datetime import datetime, timedelta, timezone
 from app import app
+from blob_store import BlobStore
 from database import db
-from database.models import User, Song
+from database.models import Job, User, Song
+from services.transcoder import RenditionCache
+from services.peaks import compute_peaks, peaks_path, write_peaks
+from services import fingerprint
+from services.fingerprint import MAX_TERM_SONGS, compute_fingerprint, find_duplicates, store_fingerprint
+from tests.test_fingerprint import reencoded, synthetic_song
+import numpy as np
 
 class SongTestCase(unittest.TestCase):
     def setUp(self):
@@ -40,10 +51,24 @@ class SongTestCase(unittest.TestCase):
             content_type='multipart/form-data',
             data=data
         )
-        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.status_code, 202)  # metadata work runs in the ingest job
         resp_json = response.get_json()
         self.assertIn('song', resp_json)
+        self.assertIn('job', resp_json)
         self.assertEqual(resp_json['song']['title'], 'test')  # Title from filename
+        return resp_json
+
+    def test_upload_job_status(self):
+        resp_json = self.test_upload_song()
+        response = self.client.get(f"/api/jobs/{resp_json['job']['id']}",
+            headers={'Authorization': f'Bearer {self.token}'}
+        )
+        self.assertEqual(response.status_code, 200)
+        job = response.get_json()['job']
+        self.assertEqual(job['kind'], 'ingest')
+        self.assertEqual(job['status'], 'succeeded')  # jobs run inline under TESTING
+        self.assertEqual(job['progress'], 100)
+        self.assertEqual(job['result']['song_id'], resp_json['song']['id'])
 
     def test_list_songs(self):
         # Upload a song first
@@ -56,6 +81,92 @@ class SongTestCase(unittest.TestCase):
         self.assertIn('songs', resp_json)
         self.assertGreaterEqual(len(resp_json['songs']), 1)
 
+    def test_list_songs_pages(self):
+        with self.app.app_context():
+            user = User.query.filter_by(username='testuser').first()
+            same_time = datetime(2026, 1, 1, tzinfo=timezone.utc)
+            # five share an upload_date, so the id tie-breaker has to hold the order together
+            db.session.add_all([
+                Song(title=f'Song {n}', artist='A', file_path=f'{n}.mp3', file_size=1, format='mp3', user_id=user.id,
+                     upload_date=same_time if n < 5 else same_time + timedelta(minutes=n))
+                for n in range(12)
+            ])
+            db.session.commit()
+
+        headers = {'Authorization': f'Bearer {self.token}'}
+        seen, cursor, pages = [], None, 0
+        while True:
+            query = f'/api/songs?limit=5&cursor={cursor}' if cursor else '/api/songs?limit=5&include_total=1'
+            resp_json = self.client.get(query, headers=headers).get_json()
+            if pages == 0:
+                self.assertEqual(resp_json['total_songs'], 12)
+            else:
+                self.assertNotIn('total_songs', resp_json)
+            seen += [song['title'] for song in resp_json['songs']]
+            pages += 1
+            cursor = resp_json['next_cursor']
+            if not cursor:
+                break
+
+        self.assertEqual(pages, 3)
+        self.assertEqual(seen, [f'Song {n}' for n in range(11, -1, -1)])
+
+        sparse = self.client.get('/api/songs?limit=2&fields=title,id', headers=headers).get_json()['songs']
+        self.assertEqual([list(song) for song in sparse], [['title', 'id'], ['title', 'id']])
+
+        for bad in ('limit=abc', 'cursor=not-a-cursor', 'fields=title,password_hash'):
+            self.assertEqual(self.client.get(f'/api/songs?{bad}', headers=headers).status_code, 400)
+
+    def test_search_library(self):
+        with self.app.app_context():
+            user = User.query.filter_by(username='testuser').first()
+            other = User(username='other', email='other@example.com')
+            other.set_password('OtherPass123')
+            db.session.add(other)
+            db.session.flush()
+            song = lambda title, artist, album=None, genre=None, owner=user: Song(
+                title=title, artist=artist, album=album, genre=genre, file_path=f'{title}.mp3', file_size=1,
+                format='mp3', user_id=owner.id)
+            db.session.add_all([
+                song('Love Me Do', 'The Beatles', 'Please Please Me', 'Rock'),
+                song('Lovely Day', 'Bill Withers'),
+                song('Halo', 'Beyoncé', 'I Am... Sasha Fierce', 'Pop'),
+                song('Something', 'Lover Boy', genre='Rock'),
+                song('Love Me Do', 'The Beatles', owner=other),
+            ])
+            db.session.commit()
+            user_id = user.id
+
+        headers = {'Authorization': f'Bearer {self.token}'}
+        search = lambda q: [item['title'] for item in
+                            self.client.get(f'/api/songs/search?q={q}', headers=headers).get_json()['songs']]
+
+        # prefix matches, title hits rank above artist hits, other users' songs never show up
+        titles = search('lov')
+        self.assertEqual(sorted(titles[:2]), ['Love Me Do', 'Lovely Day'])
+        self.assertEqual(titles[2:], ['Something'])
+        self.assertEqual(search('beat lov'), ['Love Me Do'])
+        self.assertEqual(search('beyonce'), ['Halo'])
+        self.assertEqual(search('"rock"  OR'), [])
+        self.assertEqual(sorted(search('rock')), ['Love Me Do', 'Something'])
+
+        page = self.client.get('/api/songs/search?q=lov&limit=2&fields=title', headers=headers).get_json()
+        self.assertEqual((len(page['songs']), page['next_offset']), (2, 2))
+        page = self.client.get('/api/songs/search?q=lov&limit=2&offset=2', headers=headers).get_json()
+        self.assertEqual(([item['title'] for item in page['songs']], page['next_offset']), (['Something'], None))
+
+        # the index follows renames and deletes
+        with self.app.app_context():
+            renamed = Song.query.filter_by(title='Lovely Day', user_id=user_id).one()
+            renamed.title = 'Ain\'t No Sunshine'
+            db.session.delete(Song.query.filter_by(title='Something').one())
+            db.session.commit()
+        self.assertEqual(search('lov'), ['Love Me Do'])
+        self.assertEqual(search('sunsh'), ['Ain\'t No Sunshine'])
+
+        for bad in ('q=', 'q=%20!!', 'q=a&offset=-1', 'q=a&fields=nope'):
+            self.assertEqual(self.client.get(f'/api/songs/search?{bad}', headers=headers).status_code, 400)
+
     def test_get_song(self):
         # Upload a song first
         self.test_upload_song()
@@ -99,5 +210,286 @@ class SongTestCase(unittest.TestCase):
         resp_json = response.get_json()
         self.assertIn('error', resp_json)
 
+    def _upload_and_get_id(self):
+        self.test_upload_song()
+        response = self.client.get('/api/songs',
+            headers={'Authorization': f'Bearer {self.token}'}
+        )
+        return response.get_json()['songs'][0]['id']
+
+    def test_stream_song_full(self):
+        song_id = self._upload_and_get_id()
+        response = self.client.get(f'/api/songs/{song_id}/stream',
+            headers={'Authorization': f'Bearer {self.token}'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, b"fake mp3 data")
+        self.assertEqual(response.headers['Accept-Ranges'], 'bytes')
+        self.assertIn('ETag', response.headers)
+        self.assertIn('Last-Modified', response.headers)
+
+    def test_stream_song_single_range(self):
+        song_id = self._upload_and_get_id()
+        response = self.client.get(f'/api/songs/{song_id}/stream',
+            headers={'Authorization': f'Bearer {self.token}', 'Range': 'bytes=5-7'}
+        )
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.data, b"mp3")
+        self.assertEqual(response.headers['Content-Range'], 'bytes 5-7/13')
+
+        # suffix range
+        response = self.client.get(f'/api/songs/{song_id}/stream',
+            headers={'Authorization': f'Bearer {self.token}', 'Range': 'bytes=-4'}
+        )
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.data, b"data")
+
+    def test_stream_song_multi_range(self):
+        song_id = self._upload_and_get_id()
+        response = self.client.get(f'/api/songs/{song_id}/stream',
+            headers={'Authorization': f'Bearer {self.token}', 'Range': 'bytes=0-3,9-12'}
+        )
+        self.assertEqual(response.status_code, 206)
+        self.assertTrue(response.mimetype.startswith('multipart/byteranges'))
+        self.assertEqual(int(response.headers['Content-Length']), len(response.data))
+        self.assertIn(b'Content-Range: bytes 0-3/13\r\n\r\nfake\r\n', response.data)
+        self.assertIn(b'Content-Range: bytes 9-12/13\r\n\r\ndata\r\n', response.data)
+
+    def test_stream_song_range_not_satisfiable(self):
+        song_id = self._upload_and_get_id()
+        response = self.client.get(f'/api/songs/{song_id}/stream',
+            headers={'Authorization': f'Bearer {self.token}', 'Range': 'bytes=100-'}
+        )
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response.headers['Content-Range'], 'bytes */13')
+
+    def test_stream_song_conditional(self):
+        song_id = self._upload_and_get_id()
+        response = self.client.get(f'/api/songs/{song_id}/stream',
+            headers={'Authorization': f'Bearer {self.token}'}
+        )
+        etag = response.headers['ETag']
+
+        # cached copy is still fresh
+        response = self.client.get(f'/api/songs/{song_id}/stream',
+            headers={'Authorization': f'Bearer {self.token}', 'If-None-Match': etag}
+        )
+        self.assertEqual(response.status_code, 304)
+
+        # If-Range with the current ETag keeps the range
+        response = self.client.get(f'/api/songs/{song_id}/stream',
+            headers={'Authorization': f'Bearer {self.token}', 'Range': 'bytes=0-3', 'If-Range': etag}
+        )
+        self.assertEqual(response.status_code, 206)
+
+        # stale If-Range falls back to the full body
+        response = self.client.get(f'/api/songs/{song_id}/stream',
+            headers={'Authorization': f'Bearer {self.token}', 'Range': 'bytes=0-3', 'If-Range': '"stale"'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, b"fake mp3 data")
+
+    def test_stream_song_invalid_rendition(self):
+        song_id = self._upload_and_get_id()
+        response = self.client.get(f'/api/songs/{song_id}/stream?codec=wma',
+            headers={'Authorization': f'Bearer {self.token}'}
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_stream_rendition_evicted_before_open(self):
+        song_id = self._upload_and_get_id()
+        cache_dir = tempfile.mkdtemp()
+
+        class EvictingCache(RenditionCache):
+            """Another worker evicts the first rendition between lookup and open"""
+            calls = 0
+
+            def _encode(self, source_path, output_path, codec, bitrate):
+                with open(output_path, 'wb') as f:
+                    f.write(b'rendition')
+
+            def get_or_create(self, *args):
+                path = super().get_or_create(*args)
+                EvictingCache.calls += 1
+                if EvictingCache.calls == 1:
+                    os.remove(path)
+                return path
+
+        self.app.extensions['rendition_cache'] = EvictingCache(cache_dir, max_bytes=1000)
+        try:
+            response = self.client.get(f'/api/songs/{song_id}/stream?codec=opus',
+                headers={'Authorization': f'Bearer {self.token}'}
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data, b'rendition')
+            self.assertEqual(EvictingCache.calls, 2)
+        finally:
+            del self.app.extensions['rendition_cache']
+            shutil.rmtree(cache_dir)
+
+    def test_hls_manifest_and_segments(self):
+        song_id = self._upload_and_get_id()
+        auth = {'Authorization': f'Bearer {self.token}'}
+
+        # ffmpeg cannot read fake data: the failed job is reported, not retried on every poll
+        response = self.client.get(f'/api/songs/{song_id}/hls/index.m3u8', headers=auth)
+        self.assertEqual(response.status_code, 422)
+        self.assertTrue(response.get_json()['reason'])
+        with self.app.app_context():
+            self.assertEqual(Job.query.filter_by(kind='segment').count(), 1)
+
+        with self.app.app_context():
+            blob_hash = Song.query.first().blob_hash
+        hls_dir = os.path.join(self.app.config['UPLOAD_FOLDER'], 'hls', blob_hash)
+        os.makedirs(hls_dir)
+        self.addCleanup(shutil.rmtree, hls_dir, True)
+        with open(os.path.join(hls_dir, 'index.m3u8'), 'w') as f:
+            f.write("#EXTM3U\n#EXT-X-TARGETDURATION:6\n#EXTINF:6.0,\nseg_00000.ts\n#EXT-X-ENDLIST\n")
+        with open(os.path.join(hls_dir, 'seg_00000.ts'), 'wb') as f:
+            f.write(b'segment bytes')
+
+        response = self.client.get(f'/api/songs/{song_id}/hls/index.m3u8', headers=auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'seg_00000.ts', response.data)
+
+        response = self.client.get(f'/api/songs/{song_id}/hls/seg_00000.ts', headers=auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, b'segment bytes')
+        self.assertIn('immutable', response.headers['Cache-Control'])
+
+        response = self.client.get(f'/api/songs/{song_id}/hls/..%2Fsecret', headers=auth)
+        self.assertEqual(response.status_code, 404)
+
+        # segments go with the last song using the blob
+        response = self.client.delete(f'/api/songs/{song_id}', headers=auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(os.path.exists(hls_dir))
+
+    def test_song_peaks(self):
+        song_id = self._upload_and_get_id()
+        auth = {'Authorization': f'Bearer {self.token}'}
+
+        response = self.client.get(f'/api/songs/{song_id}/peaks?resolution=300', headers=auth)
+        self.assertEqual(response.status_code, 400)
+
+        # fake data cannot be decoded: the failed job is reported, not retried on every poll
+        response = self.client.get(f'/api/songs/{song_id}/peaks', headers=auth)
+        self.assertEqual(response.status_code, 422)
+        self.assertTrue(response.get_json()['reason'])
+        with self.app.app_context():
+            self.assertEqual(Job.query.filter_by(kind='peaks').count(), 1)
+            # once the failure is older than JOB_RETRY_AFTER the song is tried again
+            Job.query.filter_by(kind='peaks').update({'finished_at': datetime.now(timezone.utc) - timedelta(hours=2)})
+            db.session.commit()
+        response = self.client.get(f'/api/songs/{song_id}/peaks', headers=auth)
+        self.assertEqual(response.status_code, 202)
+        with self.app.app_context():
+            self.assertEqual(Job.query.filter_by(kind='peaks').count(), 2)
+
+        with self.app.app_context():
+            song = Song.query.first()
+            path = peaks_path(song)
+            write_peaks(path, compute_peaks(np.arange(-1000, 1000, dtype=np.int16)), 8000, 2000)
+        self.addCleanup(os.remove, path)
+
+        response = self.client.get(f'/api/songs/{song_id}/peaks?resolution=256&bits=8', headers=auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'application/octet-stream')
+        self.assertEqual(len(response.data), 16 + 256 * 2)
+        self.assertIn('immutable', response.headers['Cache-Control'])
+
+        response = self.client.get(f'/api/songs/{song_id}/peaks?resolution=256&bits=8',
+            headers={**auth, 'If-None-Match': response.headers['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+    def test_duplicates_report(self):
+        for name in ('original.mp3', 'rip.mp3', 'other.mp3'):
+            self.client.post('/api/songs',
+                headers={'Authorization': f'Bearer {self.token}'},
+                content_type='multipart/form-data',
+                data={'file': (io.BytesIO(name.encode()), name)}
+            )
+
+        with self.app.app_context():
+            songs = {song.title: song for song in Song.query.all()}
+            store_fingerprint(songs['original'], compute_fingerprint(synthetic_song(1)))
+            store_fingerprint(songs['other'], compute_fingerprint(synthetic_song(2)))
+            rip = compute_fingerprint(reencoded(synthetic_song(1)))
+            store_fingerprint(songs['rip'], rip)
+            db.session.commit()
+
+            matches = find_duplicates(songs['rip'], rip)
+            self.assertEqual([song_id for song_id, _ in matches], [songs['original'].id])
+
+        response = self.client.get('/api/songs/duplicates',
+            headers={'Authorization': f'Bearer {self.token}'}
+        )
+        self.assertEqual(response.status_code, 200)
+        groups = response.get_json()['groups']
+        self.assertEqual(len(groups), 1)
+        self.assertEqual(sorted(song['title'] for song in groups[0]['songs']), ['original', 'rip'])
+
+        # bands every fingerprinted song shares are dropped from the self-join
+        with self.app.app_context():
+            fingerprint.MAX_TERM_SONGS = 1
+            try:
+                self.assertEqual(fingerprint.duplicate_groups(songs['rip'].user_id), [])
+            finally:
+                fingerprint.MAX_TERM_SONGS = MAX_TERM_SONGS
+
+    def test_duplicate_uploads_share_blob(self):
+        # the same bytes uploaded twice are stored once
+        self.test_upload_song()
+        self.test_upload_song()
+        with self.app.app_context():
+            songs = Song.query.all()
+            self.assertEqual(len(songs), 2)
+            self.assertEqual(songs[0].blob_hash, songs[1].blob_hash)
+            self.assertEqual(songs[0].file_path, songs[1].file_path)
+            blob_path = os.path.join(self.app.config['UPLOAD_FOLDER'], songs[0].file_path)
+            song_ids = [str(song.id) for song in songs]
+        self.assertTrue(os.path.exists(blob_path))
+
+        # first delete keeps the blob for the other song
+        self.client.delete(f'/api/songs/{song_ids[0]}',
+            headers={'Authorization': f'Bearer {self.token}'}
+        )
+        self.assertTrue(os.path.exists(blob_path))
+
+        # last reference removes it
+        self.client.delete(f'/api/songs/{song_ids[1]}',
+            headers={'Authorization': f'Bearer {self.token}'}
+        )
+        self.assertFalse(os.path.exists(blob_path))
+
+    def test_dedupe_survives_concurrent_delete(self):
+        self.test_upload_song()
+        with self.app.app_context():
+            store = BlobStore(self.app.config['UPLOAD_FOLDER'])
+            blob_hash, rel_path, size = store.write_stream(io.BytesIO(b"fake mp3 data"), '.mp3')
+            blob_path = store.absolute_path(rel_path)
+            # a delete of the only other song unlinks the file before this upload commits
+            song = Song.query.one()
+            unreferenced_path = store.release(song.blob_hash)
+            db.session.delete(song)
+            db.session.flush()
+            os.remove(blob_path)
+            store.acquire(blob_hash, rel_path, size)
+            db.session.commit()
+            self.assertTrue(os.path.exists(blob_path))
+
+            # the delete's late unlink sees the new reference and keeps the file
+            store.unlink(unreferenced_path)
+            self.assertTrue(os.path.exists(blob_path))
+            self.assertEqual(os.listdir(os.path.dirname(blob_path)), [os.path.basename(blob_path)])
+
+    def test_rolled_back_blob_is_removed(self):
+        with self.app.app_context():
+            store = BlobStore(self.app.config['UPLOAD_FOLDER'])
+            _, rel_path, _ = store.write_stream(io.BytesIO(b"never referenced"), '.mp3')
+            self.assertTrue(os.path.exists(store.absolute_path(rel_path)))
+            db.session.rollback()
+            self.assertFalse(os.path.exists(store.absolute_path(rel_path)))
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,82 @@
+import io
+import json
+import logging
+import logging.handlers
+import queue
+import unittest
+from structured_logging import JsonFormatter, SamplingFilter, _DroppingQueueHandler, parse_levels
+
+
+class CountingArg:
+    formatted = 0
+
+    def __str__(self):
+        CountingArg.formatted += 1
+        return 'arg'
+
+
+class StructuredLoggingTestCase(unittest.TestCase):
+    def setUp(self):
+        self.logger = logging.getLogger('tests.structured')
+        self.logger.propagate = False
+        self.queue = queue.Queue()
+        self.handler = _DroppingQueueHandler(self.queue)
+        self.handler.addFilter(SamplingFilter())
+        self.logger.addHandler(self.handler)
+        self.logger.setLevel(logging.DEBUG)
+
+    def tearDown(self):
+        self.logger.removeHandler(self.handler)
+        self.logger.propagate = True
+        self.logger.setLevel(logging.NOTSET)
+
+    def drain(self):
+        records = []
+        while not self.queue.empty():
+            records.append(self.queue.get_nowait())
+        return records
+
+    def test_json_lines_through_the_queue(self):
+        stream = io.StringIO()
+        output = logging.StreamHandler(stream)
+        output.setFormatter(JsonFormatter())
+        listener = logging.handlers.QueueListener(self.queue, output)
+        listener.start()
+        self.logger.info("Imported %d songs", 3, extra={'user_id': 7})
+        listener.stop()
+
+        entry = json.loads(stream.getvalue())
+        self.assertEqual(entry['message'], 'Imported 3 songs')
+        self.assertEqual((entry['level'], entry['logger'], entry['user_id']), ('INFO', 'tests.structured', 7))
+
+    def test_disabled_debug_is_never_formatted(self):
+        self.logger.setLevel(logging.INFO)
+        CountingArg.formatted = 0
+        for _ in range(100):
+            self.logger.debug("Parsed %s", CountingArg())
+        self.assertEqual(CountingArg.formatted, 0)
+        self.assertEqual(self.drain(), [])
+
+    def test_sampling(self):
+        for n in range(10):
+            self.logger.info("Streaming song %s", n, extra={'sample': 4})
+            self.logger.info("Not sampled %s", n)
+        records = self.drain()
+        sampled = [record.getMessage() for record in records if record.msg.startswith('Streaming')]
+        self.assertEqual(sampled, ['Streaming song 0', 'Streaming song 4', 'Streaming song 8'])
+        self.assertEqual(len(records) - len(sampled), 10)
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        handler = _DroppingQueueHandler(queue.Queue(maxsize=1))
+        dropped = _DroppingQueueHandler.dropped
+        for n in range(3):
+            handler.handle(logging.LogRecord('x', logging.INFO, __file__, 0, 'event %s', (n,), None))
+        self.assertEqual(_DroppingQueueHandler.dropped - dropped, 2)
+
+    def test_parse_levels(self):
+        self.assertEqual(parse_levels('metadata=DEBUG, routes.songs=warning,bogus=LOUD,,'),
+                         {'metadata': logging.DEBUG, 'routes.songs': logging.WARNING})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+import wave
+from mutagen.flac import FLAC
+from mutagen.id3 import TALB, TCON, TDRC, TIT2, TPE1, TPE2, TRCK, TXXX
+from mutagen.mp4 import MP4FreeForm, MP4Tags
+from mutagen.wave import WAVE
+from file_manager import AudioFileManager
+from metadata.tag_reader import extract_tags, split_extras
+
+
+def write_flac(path):
+    """fLaC marker and a last-block STREAMINFO (44.1 kHz, stereo, 16 bit, no frames)"""
+    info = struct.pack('>HH', 4096, 4096) + b'\x00' * 6
+    info += ((44100 << 44) | (1 << 41) | (15 << 36)).to_bytes(8, 'big') + b'\x00' * 16
+    with open(path, 'wb') as f:
+        f.write(b'fLaC' + bytes([0x80]) + len(info).to_bytes(3, 'big') + info)
+
+
+def write_wav(path):
+    with wave.open(path, 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(8000)
+        f.writeframes(b'\x00\x00' * 800)
+
+
+class TagReaderTestCase(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_vorbis_comments(self):
+        path = os.path.join(self.dir, 'a1b2c3.flac')
+        write_flac(path)
+        audio = FLAC(path)
+        audio['TITLE'] = 'Teardrop'
+        audio['ARTIST'] = 'Massive Attack'
+        audio['ALBUM'] = 'Mezzanine'
+        audio['GENRE'] = 'Trip Hop'
+        audio['TRACKNUMBER'] = '3/11'
+        audio['DATE'] = '1998-04-20'
+        audio['ALBUMARTIST'] = 'Massive Attack'
+        audio['REPLAYGAIN_TRACK_GAIN'] = '-6.48 dB'
+        audio['REPLAYGAIN_TRACK_PEAK'] = '0.988553'
+        audio.save()
+
+        metadata = AudioFileManager._extract_embedded_tags(path, 'upload.flac')
+        self.assertEqual((metadata['title'], metadata['artist'], metadata['album'], metadata['genre']),
+                         ('Teardrop', 'Massive Attack', 'Mezzanine', 'Trip Hop'))
+        self.assertEqual(metadata['format'], 'flac')
+        self.assertEqual(metadata['metadata_json'], {
+            'track_number': 3, 'year': 1998, 'album_artist': 'Massive Attack',
+            'replaygain_track_gain': -6.48, 'replaygain_track_peak': 0.988553,
+        })
+
+    def test_id3_frames(self):
+        path = os.path.join(self.dir, 'tagged.wav')
+        write_wav(path)
+        audio = WAVE(path)
+        audio.add_tags()
+        for frame in (TIT2(text=['Roygbiv']), TPE1(text=['Boards of Canada']), TALB(text=['Music Has the Right']),
+                      TCON(text=['(52)']), TRCK(text=['07']), TDRC(text=['1998']), TPE2(text=['BoC']),
+                      TXXX(desc='REPLAYGAIN_ALBUM_GAIN', text=['+1.20 dB'])):
+            audio.tags.add(frame)
+        audio.save()
+
+        metadata = AudioFileManager._extract_embedded_tags(path)
+        self.assertEqual((metadata['title'], metadata['artist'], metadata['genre']),
+                         ('Roygbiv', 'Boards of Canada', 'Electronic'))
+        self.assertEqual(metadata['metadata_json'], {
+            'track_number': 7, 'year': 1998, 'album_artist': 'BoC', 'replaygain_album_gain': 1.2,
+        })
+
+    def test_untagged_file_keeps_filename_title(self):
+        path = os.path.join(self.dir, 'plain.wav')
+        write_wav(path)
+        metadata = AudioFileManager._extract_embedded_tags(path, 'Artist - Song.wav')
+        self.assertEqual((metadata['title'], metadata['artist']), ('Artist - Song', 'Unknown'))
+        self.assertIsNone(metadata['metadata_json'])
+        self.assertAlmostEqual(metadata['duration'], 0.1)
+
+    def test_mp4_atoms(self):
+        tags = MP4Tags()
+        tags['\xa9nam'] = ['Hyperballad']
+        tags['\xa9ART'] = ['Björk']
+        tags['\xa9gen'] = ['Electronic']
+        tags['trkn'] = [(4, 11)]
+        tags['\xa9day'] = ['1995']
+        tags['aART'] = ['Björk']
+        tags['----:com.apple.iTunes:replaygain_track_gain'] = [MP4FreeForm(b'-3.10 dB')]
+
+        fields = extract_tags(tags)
+        self.assertEqual((fields['title'], fields['artist'], fields['genre']), ('Hyperballad', 'Björk', 'Electronic'))
+        self.assertEqual(split_extras(fields), {
+            'track_number': 4, 'year': 1995, 'album_artist': 'Björk', 'replaygain_track_gain': -3.1,
+        })
+
+    def test_first_value_wins(self):
+        path = os.path.join(self.dir, 'multi.flac')
+        write_flac(path)
+        audio = FLAC(path)
+        audio['ARTIST'] = ['First', 'Second']
+        audio['YEAR'] = '2001'
+        audio['DATE'] = '1999'
+        audio.save()
+        self.assertEqual(extract_tags(FLAC(path).tags), {'artist': 'First', 'year': 2001})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from services.transcoder import RenditionCache, resolve_rendition
+
+
+class FakeEncodeCache(RenditionCache):
+    """Writes a fixed-size file instead of running ffmpeg"""
+    def __init__(self, *args, size=100, delay=0, **kwargs):
+        self.size = size
+        self.delay = delay
+        self.encodes = 0
+        super().__init__(*args, **kwargs)
+
+    def _encode(self, source_path, output_path, codec, bitrate):
+        self.encodes += 1
+        time.sleep(self.delay)
+        with open(output_path, 'wb') as f:
+            f.write(b'x' * self.size)
+
+
+class RenditionCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def test_resolve_rendition(self):
+        self.assertIsNone(resolve_rendition(None, None))
+        self.assertEqual(resolve_rendition('opus', 'low'), ('opus', 96))
+        self.assertEqual(resolve_rendition('mp3', '128'), ('mp3', 128))
+        self.assertEqual(resolve_rendition(None, 'high'), ('mp3', 192))
+        with self.assertRaises(ValueError):
+            resolve_rendition('wma', None)
+        with self.assertRaises(ValueError):
+            resolve_rendition('opus', '64')
+
+    def test_cache_hit(self):
+        cache = FakeEncodeCache(self.cache_dir, max_bytes=1000)
+        first = cache.get_or_create('abc', 'song.flac', 'opus', 96)
+        second = cache.get_or_create('abc', 'song.flac', 'opus', 96)
+        self.assertEqual(first, second)
+        self.assertEqual(cache.encodes, 1)
+
+    def test_lru_eviction(self):
+        cache = FakeEncodeCache(self.cache_dir, max_bytes=250)
+        a = cache.get_or_create('a', 'a.flac', 'mp3', 128)
+        b = cache.get_or_create('b', 'b.flac', 'mp3', 128)
+        cache.get_or_create('a', 'a.flac', 'mp3', 128)  # a is now most recently used
+        c = cache.get_or_create('c', 'c.flac', 'mp3', 128)
+        self.assertTrue(os.path.exists(a))
+        self.assertFalse(os.path.exists(b))
+        self.assertTrue(os.path.exists(c))
+        self.assertLessEqual(cache.total_bytes, 250)
+
+    def test_concurrent_requests_share_one_encode(self):
+        cache = FakeEncodeCache(self.cache_dir, max_bytes=1000, delay=0.2)
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(cache.get_or_create('abc', 'song.flac', 'opus', 160)))
+            for _ in range(5)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(cache.encodes, 1)
+        self.assertEqual(len(set(results)), 1)
+
+    def test_budget_is_shared_between_workers(self):
+        # two gunicorn workers: separate cache objects over one directory
+        first = FakeEncodeCache(self.cache_dir, max_bytes=250)
+        second = FakeEncodeCache(self.cache_dir, max_bytes=250)
+        first.get_or_create('a', 'a.flac', 'mp3', 128)
+        first.get_or_create('b', 'b.flac', 'mp3', 128)
+        second.get_or_create('c', 'c.flac', 'mp3', 128)
+        self.assertLessEqual(first.total_bytes, 250)
+        self.assertEqual(second.total_bytes, first.total_bytes)
+        self.assertEqual(second.get_or_create('b', 'b.flac', 'mp3', 128), os.path.join(self.cache_dir, 'b-mp3-128.mp3'))
+        self.assertEqual(second.encodes, 1)
+
+    def test_lock_files_are_removed(self):
+        cache = FakeEncodeCache(self.cache_dir, max_bytes=1000)
+        cache.get_or_create('abc', 'song.flac', 'opus', 96)
+        self.assertEqual([name for name in os.listdir(self.cache_dir) if name.endswith('.lock') and name != cache.EVICT_LOCK], [])
+
+if __name__ == '__main__':
+    unittest.main()
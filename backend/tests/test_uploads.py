@@ -0,0 +1,198 @@
+import unittest
+import base64
+import fcntl
+import hashlib
+import os
+import shutil
+import tempfile
+from datetime import datetime, timedelta, timezone
+from app import app
+from database import db
+from database.models import Song, UploadSession
+from routes import uploads
+from routes.uploads import expire_uploads
+
+class UploadTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = app
+        self.app.config['TESTING'] = True
+        self.dir = tempfile.mkdtemp()
+        self.upload_folder = self.app.config['UPLOAD_FOLDER']
+        self.app.config['UPLOAD_FOLDER'] = self.dir
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        self.client = self.app.test_client()
+        with self.app.app_context():
+            db.create_all()
+            self.client.post('/api/register', json={
+                'username': 'testuser',
+                'email': 'testuser@example.com',
+                'password': 'TestPass123'
+            })
+            login_resp = self.client.post('/api/login', json={
+                'username': 'testuser',
+                'password': 'TestPass123'
+            })
+            self.token = login_resp.get_json()['token']
+        self.auth = {'Authorization': f'Bearer {self.token}'}
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+        self.app.config['UPLOAD_FOLDER'] = self.upload_folder
+        shutil.rmtree(self.dir)
+
+    def _create(self, data):
+        filename = base64.b64encode(b'chunked.mp3').decode()
+        response = self.client.post('/api/uploads', headers={
+            **self.auth,
+            'Tus-Resumable': '1.0.0',
+            'Upload-Length': str(len(data)),
+            'Upload-Metadata': f'filename {filename}'
+        })
+        self.assertEqual(response.status_code, 201)
+        return response.headers['Location']
+
+    def _patch(self, location, offset, chunk):
+        return self.client.patch(location, data=chunk, headers={
+            **self.auth,
+            'Tus-Resumable': '1.0.0',
+            'Upload-Offset': str(offset),
+            'Content-Type': 'application/offset+octet-stream'
+        })
+
+    def test_chunked_upload(self):
+        data = b"resumable fake mp3 data" * 10
+        location = self._create(data)
+
+        response = self._patch(location, 0, data[:100])
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(response.headers['Upload-Offset'], '100')
+
+        # client asks where to resume after a dropped connection
+        response = self.client.head(location, headers=self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['Upload-Offset'], '100')
+
+        response = self._patch(location, 100, data[100:])
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(response.headers['Upload-Offset'], str(len(data)))
+
+        response = self.client.post(f'{location}/complete', headers=self.auth)
+        self.assertEqual(response.status_code, 202)
+        song = response.get_json()['song']
+        self.assertEqual(song['title'], 'chunked')  # Title from filename
+
+        with self.app.app_context():
+            self.assertEqual(Song.query.count(), 1)
+            self.assertEqual(Song.query.first().file_size, len(data))
+            self.assertEqual(UploadSession.query.count(), 0)
+
+    def test_offset_mismatch(self):
+        data = b"resumable fake mp3 data"
+        location = self._create(data)
+        response = self._patch(location, 5, data[5:])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.headers['Upload-Offset'], '0')
+
+    def test_complete_incomplete_upload(self):
+        data = b"resumable fake mp3 data"
+        location = self._create(data)
+        self._patch(location, 0, data[:4])
+        response = self.client.post(f'{location}/complete', headers=self.auth)
+        self.assertEqual(response.status_code, 409)
+
+    def test_unsupported_file_type(self):
+        response = self.client.post('/api/uploads', headers=self.auth,
+            json={'filename': 'notes.txt', 'size': 10}
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def _upload_id(self, location):
+        return location.rsplit('/', 1)[-1]
+
+    def _age(self, upload_id, seconds):
+        with self.app.app_context():
+            db.session.execute(db.update(UploadSession).where(UploadSession.id == upload_id)
+                               .values(updated_at=datetime.now(timezone.utc) - timedelta(seconds=seconds)))
+            db.session.commit()
+
+    def test_upload_expires(self):
+        data = b"resumable fake mp3 data"
+        location = self._create(data)
+        response = self._patch(location, 0, data[:4])
+        self.assertIn('Upload-Expires', response.headers)
+
+        self._age(self._upload_id(location), self.app.config['UPLOAD_EXPIRY_SECONDS'] + 1)
+        self.assertEqual(self.client.head(location, headers=self.auth).status_code, 404)
+        self.assertEqual(os.listdir(os.path.join(self.dir, 'partial')), [])
+
+    def test_sweep_abandoned_uploads(self):
+        data = b"resumable fake mp3 data"
+        stale, fresh = self._create(data), self._create(data)
+        self._age(self._upload_id(stale), 7200)
+        partial = os.path.join(self.dir, 'partial')
+        orphan = os.path.join(partial, 'orphan.part')
+        open(orphan, 'wb').close()
+        os.utime(orphan, (0, 0))
+
+        with self.app.app_context():
+            self.assertEqual(expire_uploads(self.dir, 3600), 2)
+            self.assertEqual([upload.id for upload in UploadSession.query.all()], [self._upload_id(fresh)])
+        self.assertEqual(os.listdir(partial), [f'{self._upload_id(fresh)}.part'])
+
+    def test_concurrent_chunk_is_rejected(self):
+        data = b"resumable fake mp3 data"
+        location = self._create(data)
+        part_path = os.path.join(self.dir, 'partial', f'{self._upload_id(location)}.part')
+        with open(part_path, 'r+b') as part:
+            # another request is writing this upload
+            fcntl.flock(part, fcntl.LOCK_EX)
+            self.assertEqual(self._patch(location, 0, data).status_code, 423)
+        response = self._patch(location, 0, data)
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(response.headers['Upload-Offset'], str(len(data)))
+
+    def test_hash_builds_up_with_chunks(self):
+        data = b"resumable fake mp3 data" * 10
+        location = self._create(data)
+        self._patch(location, 0, data[:100])
+        # the next chunk lands on a process that never saw the first one
+        uploads._forget_digest(self._upload_id(location))
+        self._patch(location, 100, data[100:])
+        with self.app.app_context():
+            upload = db.session.get(UploadSession, self._upload_id(location))
+            self.assertEqual(upload.sha256, hashlib.sha256(data).hexdigest())
+
+        response = self.client.post(f'{location}/complete', headers=self.auth)
+        self.assertEqual(response.status_code, 202)
+        with self.app.app_context():
+            self.assertEqual(Song.query.one().blob_hash, hashlib.sha256(data).hexdigest())
+
+    def test_failed_finalize_can_be_retried(self):
+        data = b"resumable fake mp3 data"
+        location = self._create(data)
+        self._patch(location, 0, data)
+        part_path = os.path.join(self.dir, 'partial', f'{self._upload_id(location)}.part')
+
+        class BrokenSong:
+            @staticmethod
+            def from_metadata(metadata, user_id):
+                raise RuntimeError(f"cannot store {metadata['file_path']}")
+
+        uploads.Song = BrokenSong
+        try:
+            response = self.client.post(f'{location}/complete', headers=self.auth)
+        finally:
+            uploads.Song = Song
+        self.assertEqual(response.status_code, 500)
+        self.assertNotIn(self.dir, response.get_json()['error'])
+        # the assembled file is back in place for the retry
+        self.assertTrue(os.path.exists(part_path))
+
+        response = self.client.post(f'{location}/complete', headers=self.auth)
+        self.assertEqual(response.status_code, 202)
+        self.assertFalse(os.path.exists(part_path))
+
+if __name__ == '__main__':
+    unittest.main()
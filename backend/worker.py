@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Background job worker
+
+Drains the jobs table when the API runs with JOB_BACKEND=queue, so ingest,
+segmenting and other background work can run in their own pod/process
+instead of on the API workers' thread pool.
+
+Usage:
+    JOB_BACKEND=queue python worker.py --concurrency 4
+"""
+
+import argparse
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app import app
+from services.jobs import claim_next, execute, requeue_stale
+
+
+def run_claimed(job_id):
+    with app.app_context():
+        execute(job_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, default=4, help='jobs running at once')
+    parser.add_argument('--poll-interval', type=float, default=1.0, help='seconds to sleep when the queue is empty')
+    parser.add_argument('--once', action='store_true', help='exit when the queue is empty')
+    args = parser.parse_args()
+
+    with app.app_context():
+        recovered = requeue_stale(app.config['JOB_STALE_SECONDS'])
+        if recovered:
+            print(f"Requeued {recovered} stale job(s)")
+
+    slots = threading.BoundedSemaphore(args.concurrency)
+    with ThreadPoolExecutor(max_workers=args.concurrency, thread_name_prefix='waves-worker') as pool:
+        while True:
+            slots.acquire()
+            with app.app_context():
+                job_id = claim_next()
+
+            if job_id is None:
+                slots.release()
+                if args.once:
+                    break
+                time.sleep(args.poll_interval)
+                continue
+
+            future = pool.submit(run_claimed, job_id)
+            future.add_done_callback(lambda _: slots.release())
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except KeyboardInterrupt:
+        sys.exit(0)
@@ -1,4 +1,4 @@
-import React, { useEffect, useState } from "react";
+import React, { useEffect, useRef, useState } from "react";
 import "./App.css";
 import { apiEndpoint } from "./config";
 
@@ -14,12 +14,20 @@ import { EditSongDialog } from "./components/EditSongDialog";
 import { CreatePlaylistDialog } from "./components/CreatePlaylistDialog";
 import { Toaster, toast } from "./components/ui/sonner";
 
+const SONGS_PAGE_SIZE = 100;
+
 function App() {
   const [isAuthenticated, setIsAuthenticated] = useState(false);
   const [songs, setSongs] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const loadingRef = useRef(false);
   const [currentPage, setCurrentPage] = useState("songs");
   const [currentSong, setCurrentSong] = useState(null);
   const [searchQuery, setSearchQuery] = useState("");
+  const [searchResults, setSearchResults] = useState([]);
+  const [searchNextOffset, setSearchNextOffset] = useState(null);
+  const searchRequestRef = useRef(0);
   const [isPlaying, setIsPlaying] = useState(false);
 
   // Dialog states
@@ -41,32 +49,66 @@ function App() {
     }
   }, []);
 
-  // Fetch songs from backend
+  // Fetch one page of the library (the first when `cursor` is null)
+  const fetchSongPage = async (cursor) => {
+    const token = localStorage.getItem("token");
+    const params = new URLSearchParams({ limit: String(SONGS_PAGE_SIZE) });
+    if (cursor) params.set("cursor", cursor);
+
+    const res = await fetch(apiEndpoint(`/api/songs?${params}`), {
+      headers: {
+        Authorization: `Bearer ${token}`,
+      },
+    });
+
+    if (res.status === 401) {
+      // Token expired or invalid
+      localStorage.removeItem("token");
+      localStorage.removeItem("user");
+      setIsAuthenticated(false);
+      return null;
+    }
+
+    const data = await res.json();
+    return {
+      songs: Array.isArray(data) ? data : data.songs || [],
+      nextCursor: data.next_cursor || null,
+    };
+  };
+
+  // Fetch the first page from backend; later pages load as the list is scrolled
   const fetchSongs = async () => {
     if (!isAuthenticated) return;
 
-    const token = localStorage.getItem("token");
-
     try {
-      const res = await fetch(apiEndpoint("/api/songs"), {
-        headers: {
-          Authorization: `Bearer ${token}`,
-        },
-      });
+      const page = await fetchSongPage(null);
+      if (!page) return;
+      setSongs(page.songs);
+      setNextCursor(page.nextCursor);
+    } catch (err) {
+      console.error("Error fetching songs:", err);
+    }
+  };
 
-      if (res.status === 401) {
-        // Token expired or invalid
-        localStorage.removeItem("token");
-        localStorage.removeItem("user");
-        setIsAuthenticated(false);
-        return;
-      }
+  const loadMoreSongs = async () => {
+    if (!nextCursor || loadingRef.current) return;
 
-      const data = await res.json();
-      const songsArray = Array.isArray(data) ? data : data.songs || [];
-      setSongs(songsArray);
+    loadingRef.current = true;
+    setLoadingMore(true);
+    try {
+      const page = await fetchSongPage(nextCursor);
+      if (!page) return;
+      // a song can move between pages if the library changed in between
+      setSongs((loaded) => {
+        const seen = new Set(loaded.map((s) => s.id));
+        return [...loaded, ...page.songs.filter((s) => !seen.has(s.id))];
+      });
+      setNextCursor(page.nextCursor);
     } catch (err) {
       console.error("Error fetching songs:", err);
+    } finally {
+      loadingRef.current = false;
+      setLoadingMore(false);
     }
   };
 
@@ -74,6 +116,75 @@ function App() {
     fetchSongs();
   }, [isAuthenticated]);
 
+  // One page of server-side search results; the loaded library pages are
+  // only part of it, so filtering them would miss songs not scrolled to yet
+  const fetchSearchPage = async (query, offset) => {
+    const token = localStorage.getItem("token");
+    const params = new URLSearchParams({
+      q: query,
+      limit: String(SONGS_PAGE_SIZE),
+      offset: String(offset),
+    });
+    const res = await fetch(apiEndpoint(`/api/songs/search?${params}`), {
+      headers: {
+        Authorization: `Bearer ${token}`,
+      },
+    });
+    if (!res.ok) {
+      // e.g. a query of punctuation only has no words to search for
+      return { songs: [], nextOffset: null };
+    }
+    const data = await res.json();
+    return { songs: data.songs || [], nextOffset: data.next_offset ?? null };
+  };
+
+  useEffect(() => {
+    const query = searchQuery.trim();
+    const request = ++searchRequestRef.current;
+    if (!isAuthenticated || !query) {
+      setSearchResults([]);
+      setSearchNextOffset(null);
+      return;
+    }
+
+    // wait for a pause in typing before asking the server
+    const timer = setTimeout(async () => {
+      try {
+        const page = await fetchSearchPage(query, 0);
+        if (request !== searchRequestRef.current) return;
+        setSearchResults(page.songs);
+        setSearchNextOffset(page.nextOffset);
+      } catch (err) {
+        console.error("Error searching songs:", err);
+      }
+    }, 250);
+    return () => clearTimeout(timer);
+  }, [searchQuery, isAuthenticated]);
+
+  const loadMoreSearchResults = async () => {
+    if (searchNextOffset === null || loadingRef.current) return;
+
+    const request = searchRequestRef.current;
+    loadingRef.current = true;
+    setLoadingMore(true);
+    try {
+      const page = await fetchSearchPage(searchQuery.trim(), searchNextOffset);
+      if (request !== searchRequestRef.current) return;
+      setSearchResults((loaded) => {
+        const seen = new Set(loaded.map((s) => s.id));
+        return [...loaded, ...page.songs.filter((s) => !seen.has(s.id))];
+      });
+      setSearchNextOffset(page.nextOffset);
+    } catch (err) {
+      console.error("Error searching songs:", err);
+    } finally {
+      loadingRef.current = false;
+      setLoadingMore(false);
+    }
+  };
+
+  const searching = searchQuery.trim() !== "";
+
   // Handlers
   const handlePlaySong = (song) => {
     setCurrentSong(song);
@@ -217,8 +328,11 @@ function App() {
           <main className="app-content">
             {currentPage === "songs" && (
               <MySongs
-                songs={songs}
+                songs={searching ? searchResults : songs}
                 searchQuery={searchQuery}
+                hasMore={searching ? searchNextOffset !== null : Boolean(nextCursor)}
+                loadingMore={loadingMore}
+                onLoadMore={searching ? loadMoreSearchResults : loadMoreSongs}
                 onPlay={handlePlaySong}
                 onEdit={handleEditSong}
                 onDelete={handleDeleteSong}
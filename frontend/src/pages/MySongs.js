@@ -1,4 +1,4 @@
-import React from 'react';
+import React, { useEffect, useRef } from 'react';
 import { Play, Edit2, Trash2, MoreVertical } from 'lucide-react';
 import { Button } from '../components/ui/button';
 import {
@@ -17,17 +17,21 @@ import {
 } from '../components/ui/table';
 import './MySongs.css';
 
-export function MySongs({ songs, searchQuery, onPlay, onEdit, onDelete }) {
-  const filteredSongs = songs.filter((song) => {
-    const query = searchQuery.toLowerCase();
-    return (
-      song.title.toLowerCase().includes(query) ||
-      song.artist.toLowerCase().includes(query) ||
-      (song.album && song.album.toLowerCase().includes(query)) ||
-      (song.genre && song.genre.toLowerCase().includes(query))
-    );
-  });
+export function MySongs({ songs, searchQuery, hasMore, loadingMore, onLoadMore, onPlay, onEdit, onDelete }) {
+  const sentinelRef = useRef(null);
 
+  // load the next page when the end of the table scrolls into view
+  useEffect(() => {
+    const sentinel = sentinelRef.current;
+    if (!sentinel || !hasMore || typeof IntersectionObserver === 'undefined') return;
+    const observer = new IntersectionObserver((entries) => {
+      if (entries[0].isIntersecting) onLoadMore();
+    }, { rootMargin: '400px' });
+    observer.observe(sentinel);
+    return () => observer.disconnect();
+  }, [hasMore, onLoadMore]);
+
+  // with a search query, `songs` already holds the server's matches (App.js)
   const formatDuration = (seconds) => {
     if (!seconds) return '0:00';
     const mins = Math.floor(seconds / 60);
@@ -62,14 +66,14 @@ export function MySongs({ songs, searchQuery, onPlay, onEdit, onDelete }) {
             </TableRow>
           </TableHeader>
           <TableBody>
-            {filteredSongs.length === 0 ? (
+            {songs.length === 0 ? (
               <TableRow>
                 <TableCell colSpan={8} className="mysongs-empty">
                   {searchQuery ? 'No songs found matching your search' : 'No songs in your library yet'}
                 </TableCell>
               </TableRow>
             ) : (
-              filteredSongs.map((song, index) => (
+              songs.map((song, index) => (
                 <TableRow key={song.id} className="mysongs-table-row">
                   <TableCell className="mysongs-index">{index + 1}</TableCell>
                   <TableCell>
@@ -119,6 +123,13 @@ export function MySongs({ songs, searchQuery, onPlay, onEdit, onDelete }) {
             )}
           </TableBody>
         </Table>
+        {hasMore && (
+          <div ref={sentinelRef} className="mysongs-load-more">
+            <Button variant="ghost" size="sm" onClick={onLoadMore} disabled={loadingMore}>
+              {loadingMore ? 'Loading…' : 'Load more songs'}
+            </Button>
+          </div>
+        )}
       </div>
     </div>
   );